@@ -105,10 +105,38 @@ class Settings(BaseSettings):
     QCACHE_TTL: int = 90 * 24 * 3600          # provider-search result cache (90d)
     RCACHE_TTL: int = 90 * 24 * 3600          # final ranked-result cache per query (90d)
 
+    # ── Inline mode ───────────────────────────────────────────────────────
+    # Telegram drops inline answers that arrive late, so the handler answers
+    # from caches/local DB within the budget and keeps the full provider search
+    # warming in the background for the next keystroke.
+    INLINE_ANSWER_BUDGET_SEC: float = 1.5
+    INLINE_DEBOUNCE_SEC: float = 0.25      # per-user quiet period before provider fan-out
+    INLINE_CACHE_TTL: int = 6 * 3600       # full inline result per normalized query
+
+    # ── Spell correction (bot.services.speller) ─────────────────────────
+    # Local SymSpell index over catalog words + popular queries; the Yandex
+    # Speller round trip is only an opt-in fallback for what it cannot fix.
+    SPELLER_MAX_DISTANCE: int = 2
+    SPELLER_QUERY_MIN_COUNT: int = 3        # queries a non-catalog word needs before it is indexed
+    SPELLER_REFRESH_SEC: int = 300          # incremental index refresh (new tracks / queries)
+    SPELLER_REMOTE_FALLBACK: bool = False
+    # "Did you mean?" index (bot.services.suggest_index)
+    SUGGEST_CORPUS_SIZE: int = 100_000      # most downloaded titles indexed (+ learned queries)
+    SUGGEST_REBUILD_SEC: int = 1800
+    # Search phase tracing (bot.services.search_trace)
+    SEARCH_TRACE_SAMPLE_RATE: float = 0.1   # share of searches timed per phase
+    SEARCH_TRACE_DUMP_MS: int = 0           # log + keep traces of searches slower than this (0 = off)
+
+
     # ── Paths ─────────────────────────────────────────────────────────────
     DOWNLOAD_DIR: Path = _BASE / "downloads"
     DATA_DIR: Path = _BASE / "data"
 
+    # ── AUTO MIX ──────────────────────────────────────────────────────────
+    AUTOMIX_ANALYSIS_DIR: Path = _BASE / "data" / "automix"  # per-track analysis sidecars
+    AUTOMIX_TARGET_LUFS: float = -14.0
+    AUTOMIX_DOWNLOAD_CONCURRENCY: int = 3                    # parallel track downloads per mix
+
     # ── Rate limiting ─────────────────────────────────────────────────────
     # 30/hour + 2s: the old 10/hour + 5s cap was hit by 9% of users (audit
     # 2026-07) — competing music bots are effectively unlimited, and the limit
@@ -130,12 +158,45 @@ class Settings(BaseSettings):
 
     # ── Telegram CDN Cache ────────────────────────────────────────────────
     CACHE_CHANNEL_ID: Optional[int] = None  # private channel ID, e.g. -100xxxx
+    # Durable upload queue (bot.services.upload_queue). Telegram allows ~20 posts/min
+    # into one channel; the budget is shared by every worker draining the queue.
+    CDN_UPLOAD_PER_MINUTE: int = 18
+    CDN_UPLOAD_CONCURRENCY: int = 3         # parallel uploads per worker process
+    CDN_UPLOAD_MAX_ATTEMPTS: int = 5
+    CDN_UPLOAD_WORKER: bool = True          # drain the queue inside the bot process
+
+    # ── Mass messaging (bot.services.mass_sender) ────────────────────────
+    # Telegram allows ~30 messages/s per bot and ~1 message/s per chat.
+    MASS_SEND_RATE: float = 25.0
+    MASS_SEND_PER_CHAT_INTERVAL: float = 1.0
+    MASS_SEND_WORKERS: int = 32             # mostly idle: per-chat spacing parks each one ~1s
+    MASS_SEND_BATCH: int = 500              # recipients per checkpoint / DB flag flush
+
+    # ── Story cards (bot.services.story_cards) ──────────────────────────
+    STORY_RENDER_WORKERS: int = 2              # render processes (0 = render in a thread)
+    STORY_CARD_CACHE_DIR: Path = _BASE / "data" / "story_cards"
+    STORY_CARD_CACHE_MAX_FILES: int = 300      # rendered PNGs kept on disk (~2.7 MB each)
+    STORY_BG_CACHE_SIZE: int = 8               # per-cover background layers kept per worker (~8 MB each)
+
+    # ── DJ voice clips (bot.services.tts_engine) ────────────────────────
+    TTS_CLIP_DIR: Path = _BASE / "data" / "tts"
+    TTS_CLIP_MAX_MB: int = 200                 # disk budget of the clip store (LRU by last use)
+    TTS_PRESYNTH_CONCURRENCY: int = 2          # background synthesis workers
+    TTS_PRESYNTH_QUEUE: int = 500              # queued phrases; extra ones are dropped
 
     # ── Каналы экосистемы (v1.1) ─────────────────────────────────────────
     TEQUILA_CHANNEL: str = ""
     FULLMOON_CHANNEL: str = ""
     BLACKROOM_GROUP_ID: Optional[str] = None
 
+    # ── Voice-chat streamer (streamer/voice_chat.py) ─────────────────────
+    STREAMER_PREFETCH_DEPTH: int = 3           # upcoming queue entries kept on local disk
+    STREAMER_DOWNLOAD_CONCURRENCY: int = 2     # shared by every voice chat of the process
+    STREAMER_CACHE_DIR: Path = _BASE / "downloads" / "voice_chat"
+    STREAMER_CACHE_MAX_FILES: int = 40
+    STREAMER_PREFETCH_WAIT_SEC: float = 5.0    # play_next waits this long for an in-flight prefetch
+    STREAMER_METRICS_PORT: int = 9091          # 0 = disabled
+
     # ── YouTube cookies (base64-encoded Netscape cookies.txt) ────────────
     YT_COOKIES: Optional[str] = None
     YT_COOKIE_ALERT_TELEGRAM: bool = True
@@ -188,6 +249,9 @@ class Settings(BaseSettings):
 
     # ── Proxy pool ────────────────────────────────────────────────────────
     PROXY_POOL: Optional[str] = None  # comma-separated: socks5://ip:port,http://ip:port
+    PROXY_MAX_INFLIGHT: int = 16      # concurrent requests per proxy before it is skipped
+    PROXY_EWMA_TAU: float = 30.0      # seconds: latency/success EWMA time constant
+    PROXY_RECOVERY_SEC: float = 120.0 # an idle proxy's penalty fades back to the pool prior over ~this
 
     # ── Sentry ───────────────────────────────────────────────────────────────
     SENTRY_DSN: Optional[str] = None
@@ -245,6 +309,10 @@ class Settings(BaseSettings):
     ML_MAX_PER_GENRE: int = 3                    # Diversity: max tracks per genre
     ML_COLD_START_THRESHOLD: int = 5             # Min plays for ML (vs pure content-based)
     ML_RECO_CACHE_TTL: int = 3600                # ML reco cache TTL (seconds)
+    ML_EXPORT_CHUNK_ROWS: int = 50_000           # History rows per cursor chunk in training exports
+    ML_EXPORT_MAX_MB: int = 512                  # Memory ceiling for exported columns (newest rows kept)
+    PROFILE_BATCH_INTERVAL_MIN: int = 30         # Incremental batch profile rebuild period
+    PROFILE_FULL_REBUILD_HOURS: int = 24         # Rebuild every active user's profile this often
 
     # ── Supabase AI Service (primary recommendation + DB backend) ──────────
     SUPABASE_URL: Optional[str] = None           # e.g. https://xxxx.supabase.co
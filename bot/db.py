@@ -3,7 +3,7 @@ import asyncio
 
 from aiogram.types import User as TgUser
 from datetime import datetime, timedelta, timezone
-from sqlalchemy import case, desc, or_, select, text, update
+from sqlalchemy import and_, case, desc, or_, select, text, update
 from sqlalchemy.sql import func
 
 from bot.config import settings
@@ -429,6 +429,11 @@ async def upsert_track(
             for field, value in _fill.items():
                 if value and not getattr(track, field, None):
                     update_vals[field] = value
+            if "artist" in update_vals or "title" in update_vals or not track.search_text:
+                from bot.services.search_engine import track_search_text
+                update_vals["search_text"] = track_search_text(
+                    update_vals.get("artist", track.artist), update_vals.get("title", track.title),
+                )
             if explicit is not None and track.explicit is None:
                 update_vals["explicit"] = explicit
             if popularity is not None and (track.popularity is None or popularity > (track.popularity or 0)):
@@ -514,7 +519,11 @@ async def get_user_stats(user_id: int) -> dict:
 
 
 async def search_local_tracks(query: str, limit: int = 5) -> list[Track]:
-    """Search tracks in local DB with fuzzy matching + transliteration."""
+    """Search tracks in local DB with fuzzy matching + transliteration.
+
+    Matches against the precomputed ``Track.search_text`` blob; rows not yet
+    backfilled fall back to the raw artist/title columns.
+    """
     from bot.models.base import _is_pg
     from bot.services.search_engine import (
         detect_script, normalize_query, transliterate_cyr_to_lat, transliterate_lat_to_cyr,
@@ -530,12 +539,13 @@ async def search_local_tracks(query: str, limit: int = 5) -> list[Track]:
 
     async with async_session() as session:
         if _is_pg:
-            # PostgreSQL: use pg_trgm similarity for fuzzy matching
-            combined = func.lower(func.concat(func.coalesce(Track.artist, ''), ' ', func.coalesce(Track.title, '')))
+            # PostgreSQL: pg_trgm similarity on the normalized blob
+            raw = func.lower(func.concat(func.coalesce(Track.artist, ''), ' ', func.coalesce(Track.title, '')))
             conditions = []
             for q in queries:
-                conditions.append(func.similarity(combined, q) > 0.15)
-                conditions.append(combined.ilike(f"%{q}%"))
+                conditions.append(func.similarity(Track.search_text, q) > 0.15)
+                conditions.append(Track.search_text.like(f"%{q}%"))
+                conditions.append(and_(Track.search_text.is_(None), raw.ilike(f"%{q}%")))
             result = await session.execute(
                 select(Track)
                 .where(or_(*conditions))
@@ -545,18 +555,21 @@ async def search_local_tracks(query: str, limit: int = 5) -> list[Track]:
                         (Track.channel == "fullmoon", 1),
                         else_=2,
                     ),
-                    func.similarity(combined, norm).desc(),
+                    func.similarity(func.coalesce(Track.search_text, raw), norm).desc(),
                     Track.downloads.desc(),
                 )
                 .limit(limit)
             )
         else:
-            # SQLite fallback: ILIKE on all query variants
+            # SQLite fallback: LIKE on all query variants
             conditions = []
             for q in queries:
                 pat = f"%{q}%"
-                conditions.append(Track.title.ilike(pat))
-                conditions.append(Track.artist.ilike(pat))
+                conditions.append(Track.search_text.like(pat))
+                conditions.append(and_(
+                    Track.search_text.is_(None),
+                    or_(Track.title.ilike(pat), Track.artist.ilike(pat)),
+                ))
             result = await session.execute(
                 select(Track)
                 .where(or_(*conditions))
@@ -573,6 +586,44 @@ async def search_local_tracks(query: str, limit: int = 5) -> list[Track]:
         return list(result.scalars().all())
 
 
+async def backfill_track_search_text(batch_size: int = 1000) -> int:
+    """Fill ``Track.search_text`` for rows created before the column existed.
+
+    Runs in id-ordered batches so it can be fired at startup without holding
+    a long transaction. Returns the number of rows updated.
+    """
+    from sqlalchemy import bindparam
+
+    from bot.services.search_engine import track_search_text
+
+    total = 0
+    last_id = 0
+    while True:
+        async with async_session() as session:
+            rows = (await session.execute(
+                select(Track.id, Track.artist, Track.title)
+                .where(Track.search_text.is_(None), Track.id > last_id)
+                .order_by(Track.id)
+                .limit(batch_size)
+            )).all()
+            if not rows:
+                break
+            await session.execute(
+                update(Track.__table__)
+                .where(Track.__table__.c.id == bindparam("_id"))
+                .values(search_text=bindparam("_text")),
+                [{"_id": r.id, "_text": track_search_text(r.artist, r.title)} for r in rows],
+            )
+            await session.commit()
+        total += len(rows)
+        last_id = rows[-1].id
+        if len(rows) < batch_size:
+            break
+    if total:
+        logger.info("backfill_track_search_text: %d rows", total)
+    return total
+
+
 async def get_random_popular_track() -> "Track | None":
     """Return a random track from top-100 most downloaded (for 'play random' intent)."""
     async with async_session() as session:
@@ -1353,10 +1353,10 @@ async def handle_adm_health(callback: CallbackQuery) -> None:
     if not _is_admin(callback.from_user.id):
         return await callback.answer("⛔", show_alert=True)
     await callback.answer()
-    from bot.services.provider_health import ensure_stats_loaded, get_health_summary
+    from bot.services.provider_health import ensure_stats_loaded, get_fleet_stats, get_health_summary
 
     await ensure_stats_loaded()
-    text = get_health_summary()
+    text = get_health_summary(await get_fleet_stats())
     try:
         await callback.message.edit_text(text, parse_mode="HTML", reply_markup=_back_to_panel_kb)
     except Exception:
@@ -397,11 +397,14 @@ async def _fetch_yandex_chart() -> list[dict]:
         tokens = [None]
 
     token_cycle = itertools.cycle(tokens)
+    proxy_host = "api.music.yandex.net"
     try:
         attempts = max(len(tokens), 1)
         for _ in range(attempts):
             token = next(token_cycle)
-            proxy_url = proxy_pool.get_next() if proxy_pool.size else None
+            proxy_url = proxy_pool.acquire(proxy_host) if proxy_pool.size else None
+            t0 = time.monotonic()
+            proxy_ok = False
             try:
                 kwargs = {"proxy_url": proxy_url} if proxy_url else {}
                 if token:
@@ -411,8 +414,6 @@ async def _fetch_yandex_chart() -> list[dict]:
                 # chart() returns ChartInfo; chart("russia") for Russian chart
                 chart_info = await client.chart("russia")
                 if not chart_info or not getattr(chart_info, "chart", None):
-                    if proxy_url:
-                        proxy_pool.record_failure(proxy_url)
                     continue
 
                 tracks = []
@@ -453,16 +454,14 @@ async def _fetch_yandex_chart() -> list[dict]:
                     })
 
                 if tracks:
-                    if proxy_url:
-                        proxy_pool.record_success(proxy_url)
+                    proxy_ok = True
                     return tracks
-                if proxy_url:
-                    proxy_pool.record_failure(proxy_url)
             except Exception as inner_e:
-                if proxy_url:
-                    proxy_pool.record_failure(proxy_url)
                 logger.warning("Yandex chart attempt failed (proxy=%s): %s", bool(proxy_url), inner_e)
                 continue
+            finally:
+                if proxy_url:
+                    proxy_pool.release(proxy_url, proxy_ok, time.monotonic() - t0, proxy_host)
         return []
     except Exception as e:
         logger.error("Яндекс Музыка chart error: %s", e)
@@ -112,12 +112,17 @@ async def _process_import(message: Message, user, url: str) -> None:
         session.add(pl)
         await session.flush()
 
-        for i, tr in enumerate(found_tracks[:50]):
+        batch = found_tracks[:50]
+        # One lookup for the whole batch (catalog matches are already in the DB)
+        ids = [tr.get("video_id", "") for tr in batch if tr.get("video_id")]
+        existing = {
+            row.source_id: row
+            for row in (await session.execute(select(Track).where(Track.source_id.in_(ids)))).scalars()
+        } if ids else {}
+
+        for i, tr in enumerate(batch):
             # Find or create track in DB
-            existing = await session.execute(
-                select(Track).where(Track.source_id == tr.get("video_id", ""))
-            )
-            track = existing.scalar_one_or_none()
+            track = existing.get(tr.get("video_id", ""))
 
             if not track:
                 track = Track(
@@ -129,6 +134,7 @@ async def _process_import(message: Message, user, url: str) -> None:
                 )
                 session.add(track)
                 await session.flush()
+                existing[track.source_id] = track
 
             pt = PlaylistTrack(
                 playlist_id=pl.id,
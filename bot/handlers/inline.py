@@ -1,5 +1,6 @@
 import asyncio
 import base64
+import itertools
 import logging
 
 from aiogram import Router
@@ -17,8 +18,9 @@ from bot.services.downloader import search_tracks
 from bot.services.yandex_provider import search_yandex
 from bot.services.spotify_provider import search_spotify
 from bot.services.vk_provider import search_vk
+from bot.config import settings
 from bot.services.cache import cache
-from bot.services.search_engine import deduplicate_results, detect_script
+from bot.services.search_engine import deduplicate_results, detect_script, normalize_query
 from bot.utils import fmt_duration
 
 logger = logging.getLogger(__name__)
@@ -35,6 +37,103 @@ _SOURCE_ICON = {
 }
 
 
+# Per-user inline state: the latest query generation (debounce) and the
+# in-flight full search (normalized query, task) so a longer prefix can
+# supersede it. Entries are dropped once the owning request finishes.
+_generations = itertools.count(1)
+_user_generation: dict[int, int] = {}
+_user_inflight: dict[int, tuple[str, asyncio.Task]] = {}
+
+# Detached full searches: the event loop only holds weak references to tasks,
+# so they are kept here until done. At most _MAX_USER_FANOUTS run per user;
+# a fast typist's oldest fan-out is cancelled to make room.
+_MAX_USER_FANOUTS = 2
+_fanouts: set[asyncio.Task] = set()
+_user_fanouts: dict[int, list[asyncio.Task]] = {}
+
+
+async def _safe(coro, timeout: float = 5):
+    try:
+        return await asyncio.wait_for(coro, timeout=timeout)
+    except Exception:
+        return []
+
+
+async def _search_local(query: str) -> list[dict]:
+    tracks = await search_local_tracks(query, limit=5)
+    return [
+        {
+            "video_id": tr.source_id,
+            "title": tr.title or "Unknown",
+            "uploader": tr.artist or "Unknown",
+            "duration": tr.duration or 0,
+            "duration_fmt": fmt_duration(tr.duration) if tr.duration else "?:??",
+            "source": tr.source or "channel",
+            "file_id": tr.file_id,
+        }
+        for tr in tracks
+    ]
+
+
+async def _full_search(query: str, norm: str, local_res: list[dict]) -> list[dict]:
+    """D-01: Yandex + Spotify + VK + YouTube in parallel, merged with local hits.
+
+    Runs detached from the inline answer: the result lands in the inline cache
+    even when the answer already went out with partial results.
+    """
+    ym_res, sp_res, vk_res, yt_res = await asyncio.gather(
+        _safe(search_yandex(query, limit=5)),
+        _safe(search_spotify(query, limit=3)),
+        _safe(search_vk(query, limit=3)),
+        _safe(search_tracks(query, max_results=5)),
+    )
+    all_results = (local_res or []) + (ym_res or []) + (sp_res or []) + (vk_res or []) + (yt_res or [])
+    results = deduplicate_results(all_results, lang_hint=detect_script(query), query=query)[:10]
+    if results:
+        await cache.set_inline_cache(norm, [{k: v for k, v in r.items() if k != "file_id"} for r in results])
+    return results
+
+
+def _clear_inflight(user_id: int, task: asyncio.Task) -> None:
+    current = _user_inflight.get(user_id)
+    if current is not None and current[1] is task:
+        _user_inflight.pop(user_id, None)
+
+
+def _forget_fanout(user_id: int, task: asyncio.Task) -> None:
+    _fanouts.discard(task)
+    running = _user_fanouts.get(user_id)
+    if running is not None:
+        if task in running:
+            running.remove(task)
+        if not running:
+            _user_fanouts.pop(user_id, None)
+    _clear_inflight(user_id, task)
+
+
+def _start_full_search(user_id: int, query: str, norm: str, local_res: list[dict]) -> asyncio.Task:
+    running = _user_fanouts.setdefault(user_id, [])
+    while len(running) >= _MAX_USER_FANOUTS:
+        running.pop(0).cancel()
+    task = asyncio.create_task(_full_search(query, norm, local_res))
+    _fanouts.add(task)
+    running.append(task)
+    _user_inflight[user_id] = (norm, task)
+    task.add_done_callback(lambda t: _forget_fanout(user_id, t))
+    return task
+
+
+def _supersede_shorter_prefix(user_id: int, norm: str) -> None:
+    """Cancel the user's in-flight full search if *norm* extends its query."""
+    prev = _user_inflight.get(user_id)
+    if prev is None:
+        return
+    prev_norm, prev_task = prev
+    if prev_norm != norm and norm.startswith(prev_norm) and not prev_task.done():
+        prev_task.cancel()
+        _user_inflight.pop(user_id, None)
+
+
 @router.inline_query()
 async def handle_inline_query(inline_query: InlineQuery) -> None:
     query = inline_query.query.strip()
@@ -43,44 +142,50 @@ async def handle_inline_query(inline_query: InlineQuery) -> None:
         await inline_query.answer([], cache_time=1)
         return
 
-    # D-01: Search local DB + Yandex + Spotify + VK + YouTube in parallel
-    async def _safe(coro):
-        try:
-            return await asyncio.wait_for(coro, timeout=5)
-        except Exception:
-            return []
-
-    async def _search_local():
-        tracks = await search_local_tracks(query, limit=5)
-        return [
-            {
-                "video_id": tr.source_id,
-                "title": tr.title or "Unknown",
-                "uploader": tr.artist or "Unknown",
-                "duration": tr.duration or 0,
-                "duration_fmt": fmt_duration(tr.duration) if tr.duration else "?:??",
-                "source": tr.source or "channel",
-                "file_id": tr.file_id,
-            }
-            for tr in tracks
-        ]
-
-    local_res, ym_res, sp_res, vk_res, yt_res = await asyncio.gather(
-        _safe(_search_local()),
-        _safe(search_yandex(query, limit=5)),
-        _safe(search_spotify(query, limit=3)),
-        _safe(search_vk(query, limit=3)),
-        _safe(search_tracks(query, max_results=5)),
-    )
-
-    all_results = (local_res or []) + (ym_res or []) + (sp_res or []) + (vk_res or []) + (yt_res or [])
-    script = detect_script(query)
-    results_data = deduplicate_results(all_results, lang_hint=script, query=query)[:10]
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.INLINE_ANSWER_BUDGET_SEC
+    norm = normalize_query(query)
+    user_id = inline_query.from_user.id
+    generation = next(_generations)
+    _user_generation[user_id] = generation
+    _supersede_shorter_prefix(user_id, norm)
+
+    # Fast tier: inline cache / ranked-result cache (RAM only)
+    results_data = await cache.get_inline_cache(norm) or await cache.get_result_cache(norm, disk=False)
+    partial = False
+    if not results_data:
+        local_task = asyncio.create_task(_safe(_search_local(query), timeout=settings.INLINE_ANSWER_BUDGET_SEC))
+        # Debounce: a newer keystroke from the same user during the quiet
+        # period makes this query stale — answer from the local index only.
+        await asyncio.sleep(settings.INLINE_DEBOUNCE_SEC)
+        local_res = await local_task
+        if _user_generation.get(user_id) != generation:
+            results_data = local_res
+            partial = True
+        else:
+            task = _start_full_search(user_id, query, norm, local_res)
+            done, _ = await asyncio.wait({task}, timeout=max(0.0, deadline - loop.time()))
+            if task in done and not task.cancelled() and task.exception() is None:
+                results_data = task.result()
+            else:
+                # Over budget: answer with local hits, the full search keeps
+                # warming the inline cache for the next keystroke.
+                results_data = deduplicate_results(local_res, lang_hint=detect_script(query), query=query)[:10]
+                partial = True
+
+    if _user_generation.get(user_id) == generation:
+        _user_generation.pop(user_id, None)
+    results_data = (results_data or [])[:10]
 
     # D-02: Build deep-link URL for non-cached tracks
     bot_me = await inline_query.bot.me()
     bot_username = bot_me.username or "bot"
 
+    # One MGET for every result without a file_id from the local DB
+    cached_fids = await cache.get_file_ids(
+        [t["video_id"] for t in results_data if not t.get("file_id")]
+    )
+
     results = []
     for track in results_data:
         video_id = track["video_id"]
@@ -88,7 +193,7 @@ async def handle_inline_query(inline_query: InlineQuery) -> None:
         icon = _SOURCE_ICON.get(source, "♪")
 
         # Use file_id from track dict (local DB) or Redis cache
-        fid = track.get("file_id") or await cache.get_file_id(video_id)
+        fid = track.get("file_id") or cached_fids.get(video_id)
         if fid:
             results.append(
                 InlineQueryResultCachedAudio(
@@ -127,4 +232,5 @@ async def handle_inline_query(inline_query: InlineQuery) -> None:
                 )
             )
 
-    await inline_query.answer(results, cache_time=60)
+    # Partial answers must not be pinned by Telegram's own inline cache
+    await inline_query.answer(results, cache_time=5 if partial else 60)
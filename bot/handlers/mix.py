@@ -168,12 +168,14 @@ async def cmd_dj(message: Message) -> None:
     except Exception:
         logger.debug("Failed to read fav_vibe for user_id=%s", user.id, exc_info=True)
 
-    # Generate and send DJ voice intro
+    # Generate and send DJ voice intro; the comments synthesize in the background meanwhile
+    script = None
     if tts_enabled:
         try:
-            from bot.services.dj_comments import get_intro, generate_dj_voice
-            intro_text = get_intro(lang, name=user.first_name or "")
-            voice_data = await generate_dj_voice(intro_text, lang)
+            from bot.services.dj_comments import generate_dj_voice, plan_dj_script, prepare_dj_script
+            script = plan_dj_script(tracks, lang, name=user.first_name or "")
+            prepare_dj_script(script, lang)
+            voice_data = await generate_dj_voice(script.intro, lang)
             if voice_data:
                 from aiogram.types import BufferedInputFile
                 await message.answer_voice(
@@ -186,21 +188,13 @@ async def cmd_dj(message: Message) -> None:
     await send_daily_mix(message, user.id, lang)
 
     # Send DJ transition comments after every 3rd track
-    if tts_enabled:
+    if script is not None:
         try:
-            from bot.services.dj_comments import get_transition, get_energy, generate_dj_voice
+            from bot.services.dj_comments import generate_dj_voice
             from aiogram.types import BufferedInputFile
             import asyncio
 
-            for i in range(2, min(len(tracks), 10), 3):
-                tr = tracks[i]
-                artist = tr.get("uploader", "?")
-                title = tr.get("title", "?")
-                # Alternate between transition and energy comments
-                if i % 6 == 2:
-                    text = get_transition(artist, title, lang, name=user.first_name or "")
-                else:
-                    text = get_energy(lang, name=user.first_name or "")
+            for i, text in script.comments:
                 voice_data = await generate_dj_voice(text, lang)
                 if voice_data:
                     await message.answer_voice(
@@ -239,11 +233,13 @@ async def cb_dj(callback: CallbackQuery) -> None:
     except Exception:
         logger.debug("Failed to read fav_vibe in callback for user_id=%s", user.id, exc_info=True)
 
+    script = None
     if tts_enabled:
         try:
-            from bot.services.dj_comments import get_intro, generate_dj_voice
-            intro_text = get_intro(lang, name=user.first_name or "")
-            voice_data = await generate_dj_voice(intro_text, lang)
+            from bot.services.dj_comments import generate_dj_voice, plan_dj_script, prepare_dj_script
+            script = plan_dj_script(tracks, lang, name=user.first_name or "")
+            prepare_dj_script(script, lang)
+            voice_data = await generate_dj_voice(script.intro, lang)
             if voice_data:
                 from aiogram.types import BufferedInputFile
                 await callback.message.answer_voice(
@@ -256,20 +252,13 @@ async def cb_dj(callback: CallbackQuery) -> None:
     await send_daily_mix(callback.message, user.id, lang)
 
     # Send DJ transition comments after every 3rd track
-    if tts_enabled:
+    if script is not None:
         try:
-            from bot.services.dj_comments import get_transition, get_energy, generate_dj_voice
+            from bot.services.dj_comments import generate_dj_voice
             from aiogram.types import BufferedInputFile
             import asyncio
 
-            for i in range(2, min(len(tracks), 10), 3):
-                tr = tracks[i]
-                artist = tr.get("uploader", "?")
-                title = tr.get("title", "?")
-                if i % 6 == 2:
-                    text = get_transition(artist, title, lang, name=user.first_name or "")
-                else:
-                    text = get_energy(lang, name=user.first_name or "")
+            for i, text in script.comments:
                 voice_data = await generate_dj_voice(text, lang)
                 if voice_data:
                     await callback.message.answer_voice(
@@ -52,6 +52,7 @@ class LiveCb(CallbackData, prefix="live"):
 
 
 _LIVE_BATCH = 5  # tracks per "page"
+_MIN_MIX_BYTES = 64 * 1024  # ~3 s at 192k; anything smaller is a broken render
 
 
 async def _send_live_menu(message, lang: str, channel: str) -> None:
@@ -301,30 +302,46 @@ async def handle_automix_go(callback: CallbackQuery, callback_data: MixCb) -> No
         await status.edit_text(t(lang, "automix_no_tracks"))
         return
 
-    # Download all tracks
-    downloaded_paths: list[Path] = []
-    mix_path: Path | None = None
-    try:
-        for tr in tracks:
+    from mixer.automix import analyze_track, create_mix
+
+    # Download all tracks concurrently; each one is analyzed (cached by
+    # source_id) as soon as it lands, overlapping the remaining downloads
+    sem = asyncio.Semaphore(settings.AUTOMIX_DOWNLOAD_CONCURRENCY)
+
+    async def _fetch(tr: Track) -> Path | None:
+        async with sem:
             try:
                 mp3 = await download_track(tr.source_id, bitrate=192)
-                downloaded_paths.append(mp3)
             except Exception as e:
                 logger.warning("AutoMix: skip track %s: %s", tr.source_id, e)
+                return None
+        try:
+            await asyncio.to_thread(analyze_track, mp3, tr.source_id)
+        except Exception as e:
+            logger.debug("AutoMix: analysis deferred for %s: %s", tr.source_id, e)
+        return mp3
+
+    downloaded_paths: list[Path] = []
+    mix_keys: list[str] = []
+    mix_path: Path | None = None
+    try:
+        fetched = await asyncio.gather(*(_fetch(tr) for tr in tracks))
+        for tr, mp3 in zip(tracks, fetched):
+            if mp3 is not None:
+                downloaded_paths.append(mp3)
+                mix_keys.append(tr.source_id)
 
         if len(downloaded_paths) < 2:
             await status.edit_text(t(lang, "automix_no_tracks"))
             return
 
         # Create mix — per-request unique filename to avoid collisions across users
-        from mixer.automix import create_mix
-
         mix_path = settings.DOWNLOAD_DIR / f"automix_{user.id}_{int(time.monotonic() * 1000)}.mp3"
         crossfade = 7
-        await create_mix(downloaded_paths, mix_path, crossfade_ms=crossfade * 1000)
+        await create_mix(downloaded_paths, mix_path, crossfade_ms=crossfade * 1000, keys=mix_keys)
 
         mix_size = mix_path.stat().st_size
-        if mix_size > settings.MAX_FILE_SIZE:
+        if mix_size > settings.MAX_FILE_SIZE or mix_size < _MIN_MIX_BYTES:
             await status.edit_text(t(lang, "automix_error"))
             return
 
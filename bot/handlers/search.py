@@ -21,7 +21,7 @@ from aiogram.types import (
 )
 
 from bot.config import settings
-from bot.db import get_or_create_user, get_popular_titles, get_random_popular_track, increment_request_count, record_listening_event, search_local_tracks, upsert_track
+from bot.db import get_or_create_user, get_random_popular_track, increment_request_count, record_listening_event, search_local_tracks, upsert_track
 from bot.i18n import t
 from bot.services.cache import cache
 from bot.services.downloader import cleanup_file, download_track, search_tracks, is_youtube_url, extract_youtube_video_id, resolve_youtube_url
@@ -33,6 +33,7 @@ from bot.services.vk_provider import download_vk, search_vk
 from bot.services.yandex_provider import download_yandex, search_yandex, is_yandex_music_url, resolve_yandex_url
 from bot.services.metrics import cache_hits, cache_misses, requests_total
 from bot.services.provider_health import record_provider_event
+from bot.services.search_trace import span, start_trace
 from bot.services.search_engine import (
     _relevance_score,
     deduplicate_results,
@@ -41,7 +42,6 @@ from bot.services.search_engine import (
     normalize_query,
     parse_query,
     query_title_hint_coverage,
-    suggest_query,
     detect_script,
     transliterate_cyr_to_lat,
     transliterate_lat_to_cyr,
@@ -977,6 +977,9 @@ async def _do_search(message: Message, query: str, auto_deliver: bool = False, a
         status = await message.answer(t(lang, "searching"))
 
     _search_t0 = time.monotonic()
+    # Per-phase timing (sampled): laps for the sequential waves below, spans for
+    # tier-0 lookups and every provider call. Exported in _trace.finish().
+    _trace = start_trace(query)
     # Global wall-clock budget for the ENRICHMENT phases (aliases, canonical,
     # genius, translit, speller, parsed hints, lyric boost). Individually each has
     # an 8-12s timeout, but they run sequentially — with dead providers the waves
@@ -1009,6 +1012,7 @@ async def _do_search(message: Message, query: str, auto_deliver: bool = False, a
             "file_id": tr.file_id,
             "_downloads": tr.downloads or 0,
         })
+    _trace.lap("local_db")
 
     # ── Tier 0: instant answers that bypass the whole provider engine ──
     # A repeat query (cached ranked results), a curated/learned pin, or a local-DB
@@ -1024,24 +1028,28 @@ async def _do_search(message: Message, query: str, auto_deliver: bool = False, a
         # rcache entry for up to RCACHE_TTL. So check BOTH before the result cache.
         from bot.services.search_curated import curated_track_for_query
         from bot.services.search_memory import get_learned_track as _get_learned
-        _pin0 = curated_track_for_query(query) or curated_track_for_query(provider_query)
+        with span("tier0.curated"):
+            _pin0 = curated_track_for_query(query) or curated_track_for_query(provider_query)
         if _pin0 and _pin0.get("video_id"):
             _tier0 = [_pin0]
         # Dynamic (Redis) hot pins — admin /pin + auto-promoted corrections. Same
         # authority tier as static curated pins, editable with no deploy.
         if _tier0 is None:
             from bot.services.hot_pins import get_hot_pin as _get_hot_pin
-            _hp = await _get_hot_pin(provider_query)
-            if not (_hp and _hp.get("video_id")) and query != provider_query:
-                _hp = await _get_hot_pin(query)
+            with span("tier0.hot_pin"):
+                _hp = await _get_hot_pin(provider_query)
+                if not (_hp and _hp.get("video_id")) and query != provider_query:
+                    _hp = await _get_hot_pin(query)
             if _hp and _hp.get("video_id"):
                 _tier0 = [_hp]
         if _tier0 is None:
-            _lp = await _get_learned(provider_query)
+            with span("tier0.learned"):
+                _lp = await _get_learned(provider_query)
             if _lp and _lp.get("video_id"):
                 _tier0 = [_lp]
         if _tier0 is None:
-            _rc = await cache.get_result_cache(_norm_q)
+            with span("tier0.result_cache"):
+                _rc = await cache.get_result_cache(_norm_q)
             if _rc:
                 _tier0 = _rc
         if _tier0 is None and local_results and local_results[0].get("file_id"):
@@ -1053,6 +1061,7 @@ async def _do_search(message: Message, query: str, auto_deliver: bool = False, a
     except Exception:
         logger.debug("tier0 check failed", exc_info=True)
     _skip_engine = _tier0 is not None
+    _trace.lap("tier0")
     if _skip_engine:
         logger.info("search: tier0 hit q=%r n=%d", provider_query[:60], len(_tier0 or []))
 
@@ -1061,11 +1070,12 @@ async def _do_search(message: Message, query: str, auto_deliver: bool = False, a
         """Search a single source with cache and 12s timeout."""
         t0 = time.monotonic()
         try:
-            cached = await cache.get_query_cache(provider_query, source)
-            if cached is not None:
-                # Cache hit — do NOT record a provider success event (no real call made)
-                return cached
-            res = await asyncio.wait_for(search_fn(provider_query, limit=limit), timeout=8)
+            with span(f"provider.{source}"):
+                cached = await cache.get_query_cache(provider_query, source)
+                if cached is not None:
+                    # Cache hit — do NOT record a provider success event (no real call made)
+                    return cached
+                res = await asyncio.wait_for(search_fn(provider_query, limit=limit), timeout=8)
             elapsed = time.monotonic() - t0
             record_provider_event(source, "search", elapsed, True)
             if res:
@@ -1090,10 +1100,11 @@ async def _do_search(message: Message, query: str, auto_deliver: bool = False, a
         async def _lyrics_lookup() -> list[dict]:
             try:
                 from bot.services.lyrics_provider import search_by_lyrics
-                return await asyncio.wait_for(
-                    search_by_lyrics(provider_query, limit=3),
-                    timeout=10,
-                )
+                with span("lyrics_lookup"):
+                    return await asyncio.wait_for(
+                        search_by_lyrics(provider_query, limit=3),
+                        timeout=10,
+                    )
             except Exception:
                 logger.debug("parallel lyrics search failed", exc_info=True)
                 return []
@@ -1130,6 +1141,7 @@ async def _do_search(message: Message, query: str, auto_deliver: bool = False, a
                 all_results.extend(await _search_source("youtube", _search_yt, max_results))
             except Exception:
                 logger.debug("group youtube fallback failed", exc_info=True)
+        _trace.lap("providers")
 
     for alias_q in ([] if _skip_engine else get_query_search_aliases(provider_query)):
         if _budget_left() <= 0:
@@ -1140,6 +1152,7 @@ async def _do_search(message: Message, query: str, auto_deliver: bool = False, a
             max_results,
         )
         all_results.extend(alias_batch)
+        _trace.lap("enrich.aliases")
 
     # Query understanding: when iTunes AND Deezer independently agree on the same
     # "Artist - Title", we have a confident canonical for a vague/misspelled query
@@ -1163,6 +1176,8 @@ async def _do_search(message: Message, query: str, auto_deliver: bool = False, a
             all_results.extend(canon_batch)
         except Exception:
             logger.debug("canonical yandex search failed for %r", canonical_query, exc_info=True)
+    if not _skip_engine:
+        _trace.lap("enrich.canonical")
 
     # Lyric fragment ("words from a song") -> resolve the song via Genius, then
     # search providers for it so the pool holds the intended track (raw providers
@@ -1191,6 +1206,7 @@ async def _do_search(message: Message, query: str, auto_deliver: bool = False, a
                     all_results.extend(_lb)
                 except Exception:
                     logger.debug("lyric-resolved yandex search failed", exc_info=True)
+        _trace.lap("enrich.lyric_song")
 
     # A-05: If few results and query is mono-language, try transliterated search
     if len(all_results) < 3 and not _skip_engine and _budget_left() > 0:
@@ -1212,6 +1228,7 @@ async def _do_search(message: Message, query: str, auto_deliver: bool = False, a
             alt_results = await asyncio.gather(*alt_tasks)
             for batch in alt_results:
                 all_results.extend(batch)
+        _trace.lap("enrich.translit")
 
     # Spell-correction fallback: typos in the query → poor provider hits.
     # Only triggered when results are weak, to keep latency low.
@@ -1233,6 +1250,7 @@ async def _do_search(message: Message, query: str, auto_deliver: bool = False, a
             spell_results = await asyncio.gather(*spell_tasks)
             for batch in spell_results:
                 all_results.extend(batch)
+        _trace.lap("enrich.speller")
 
     # Merge local + external results, then deduplicate
     all_results = local_results + all_results
@@ -1243,6 +1261,7 @@ async def _do_search(message: Message, query: str, auto_deliver: bool = False, a
     # Deduplicate across sources (language-aware ranking)
     script = detect_script(provider_query)
     results = deduplicate_results(all_results, lang_hint=script, query=provider_query)[:max_results] if all_results else []
+    _trace.lap("merge")
 
     # Parsed artist+title / lyrics enrichment when top-1 is weak.
     lyric_hints: list[dict] = []
@@ -1251,6 +1270,7 @@ async def _do_search(message: Message, query: str, auto_deliver: bool = False, a
             lyric_hints = await lyrics_task
         except Exception:
             lyric_hints = []
+        _trace.lap("lyrics_wait")
 
     extra_tracks: list[dict] = []
     top_track = results[0] if results else None
@@ -1290,6 +1310,7 @@ async def _do_search(message: Message, query: str, auto_deliver: bool = False, a
                 )
             except Exception:
                 logger.debug("parsed-hint fetch timed out/failed", exc_info=True)
+            _trace.lap("enrich.parsed_hints")
 
     _has_artist_title = bool(
         parsed_query.get("artist_hint") and parsed_query.get("title_hint")
@@ -1392,6 +1413,7 @@ async def _do_search(message: Message, query: str, auto_deliver: bool = False, a
             ))
         except Exception:
             logger.debug("lyric boost timed out/failed for %r", provider_query[:60], exc_info=True)
+        _trace.lap("enrich.lyrics_boost")
 
     if extra_tracks:
         all_results.extend(extra_tracks)
@@ -1443,6 +1465,7 @@ async def _do_search(message: Message, query: str, auto_deliver: bool = False, a
                 break
         results = filter_blocked(results)
         blocked_count = before_count - len(results)
+    _trace.lap("rerank")
 
     if not results:
         # Log the miss BEFORE returning — zero-result searches are exactly what the
@@ -1459,10 +1482,11 @@ async def _do_search(message: Message, query: str, auto_deliver: bool = False, a
             await cache.redis.ltrim("search:audit", 0, 49999)
         except Exception:
             logger.debug("miss audit log failed", exc_info=True)
+        await _trace.finish(n=0)
         # TASK-012: "Did you mean?" suggestions
         try:
-            corpus = await get_popular_titles(limit=500)
-            suggestions = suggest_query(query, corpus, max_suggestions=1)
+            from bot.services.suggest_index import did_you_mean
+            suggestions = await did_you_mean(query, max_suggestions=1)
         except Exception:
             suggestions = []
         if suggestions:
@@ -1513,6 +1537,7 @@ async def _do_search(message: Message, query: str, auto_deliver: bool = False, a
         await cache.redis.ltrim("search:audit", 0, 49999)
     except Exception:
         logger.debug("search audit log failed", exc_info=True)
+    await _trace.finish(n=len(results), src=sorted({r.get("source", "?") for r in results}))
 
     # Tag every result with the originating query so downstream handlers
     # (e.g. "🔁 Не тот трек?") can learn the correct track for this query.
@@ -3200,24 +3225,6 @@ async def _load_track_by_id(track_id: int):
         return (await session.execute(_sel(Track).where(Track.id == track_id))).scalar_one_or_none()
 
 
-async def _fetch_cover_bytes(cover_url: str | None) -> bytes | None:
-    if not cover_url:
-        return None
-    try:
-        from bot.services.http_session import get_session
-
-        async with get_session().get(cover_url, timeout=8) as resp:
-            if resp.status != 200:
-                return None
-            content_type = resp.headers.get("content-type", "")
-            if "image" not in content_type:
-                return None
-            return await resp.read()
-    except Exception:
-        logger.debug("cover fetch failed url=%s", cover_url, exc_info=True)
-        return None
-
-
 async def _send_track_card(callback: CallbackQuery, track_id: int, *, story: bool) -> None:
     """Generate and send either a compact card or a story-style card."""
     try:
@@ -3232,13 +3239,12 @@ async def _send_track_card(callback: CallbackQuery, track_id: int, *, story: boo
         return
 
     await callback.answer("Генерирую карточку...")
-    from bot.services.story_cards import generate_track_card
+    from bot.services.story_cards import fetch_cover, render_track_card
     from bot.utils import fmt_duration
 
-    cover_bytes = await _fetch_cover_bytes(track.cover_url)
+    cover_bytes = await fetch_cover(track.cover_url)
 
-    card_bytes = await asyncio.to_thread(
-        generate_track_card,
+    card_bytes = await render_track_card(
         artist=track.artist or "Unknown",
         title=track.title or "Unknown",
         track_id=track.id,
@@ -1,4 +1,3 @@
-import asyncio
 import base64
 import html
 import logging
@@ -818,10 +817,9 @@ async def _show_wrapped(message: Message, tg_user) -> None:
     if top_vibe:
         lines.append(f"▸ Вайб недели: <b>{_VIBE_NAMES.get(top_vibe[0], 'black')}</b>")
 
-    from bot.services.story_cards import generate_recap_card
+    from bot.services.story_cards import render_recap_card
 
-    card_bytes = await asyncio.to_thread(
-        generate_recap_card,
+    card_bytes = await render_recap_card(
         user_name=tg_user.first_name or tg_user.username or str(tg_user.id),
         play_count=play_count,
         top_artists=[artist for artist, _ in top_artists],
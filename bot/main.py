@@ -119,6 +119,10 @@ async def on_startup(bot: Bot) -> None:
 
     await init_db()
 
+    # Precompute normalized search text for tracks stored before the column existed
+    from bot.db import backfill_track_search_text
+    _fire_task(backfill_track_search_text())
+
     # Load persisted admin IDs from Redis
     from bot.db import load_admin_ids_from_redis
     await load_admin_ids_from_redis()
@@ -145,6 +149,10 @@ async def on_startup(bot: Bot) -> None:
     from bot.services.release_radar import start_release_radar_scheduler
     await start_release_radar_scheduler(bot)
 
+    # Durable CDN upload queue worker
+    from bot.services.upload_queue import start_upload_worker
+    await start_upload_worker()
+
     # Chart cache prewarm scheduler
     from bot.handlers.charts import start_chart_cache_prewarm_scheduler
     await start_chart_cache_prewarm_scheduler()
@@ -162,11 +170,23 @@ async def on_startup(bot: Bot) -> None:
     from bot.services.cache_warmer import start_cache_warmer
     await start_cache_warmer()
 
+    # Local spell-correction index (catalog words + popular queries), refreshed incrementally
+    from bot.services.speller import start_speller_indexer
+    await start_speller_indexer()
+
+    # "Did you mean?" trigram index over popular titles + learned queries
+    from bot.services.suggest_index import start_suggest_index_scheduler
+    await start_suggest_index_scheduler()
+
     # Dynamic hot-pin auto-promoter — learned "🔁 Не тот трек?" corrections that
     # were confirmed enough times become listable, deploy-free pins.
     from bot.services.hot_pins import start_hot_pins_promoter
     await start_hot_pins_promoter()
 
+    # DJ voice: background TTS workers + warm-up of the static comment templates
+    from bot.services.dj_comments import start_dj_presynth
+    await start_dj_presynth()
+
     # Weekly recap scheduler (Monday 10:00 UTC)
     from bot.services.weekly_recap import start_weekly_recap_scheduler
     await start_weekly_recap_scheduler(bot)
@@ -180,6 +200,10 @@ async def on_startup(bot: Bot) -> None:
         from recommender.train import start_ml_training_scheduler
         await start_ml_training_scheduler()
 
+    # Batch user profile rebuild (users with new plays; everyone daily)
+    from recommender.profile_updater import start_profile_scheduler
+    await start_profile_scheduler()
+
     # Node heartbeat (Bot Fleet 5.2)
     if app_settings.NODE_ID:
         from bot.services.node_manager import register_node, start_heartbeat_loop
@@ -265,6 +289,9 @@ async def on_shutdown(bot: Bot) -> None:
         _ytdl_pool.shutdown(wait=False)
         _vk_pool.shutdown(wait=False)
 
+        from bot.services.story_cards import shutdown_render_pool
+        shutdown_render_pool()
+
     try:
         await asyncio.wait_for(_do_shutdown(), timeout=10)
     except asyncio.TimeoutError:
@@ -325,10 +352,11 @@ async def _global_error_handler(event: ErrorEvent) -> bool:
 
 async def _blocked_users_checker(bot: Bot) -> None:
     """Daily scan: check which users blocked the bot via sendChatAction."""
-    from sqlalchemy import select, update as sa_update
+    from datetime import datetime, timezone
+    from sqlalchemy import select
     from bot.models.base import async_session
     from bot.models.user import User
-    from aiogram.exceptions import TelegramForbiddenError, TelegramBadRequest
+    from bot.services.mass_sender import MassSender
 
     await asyncio.sleep(3600)  # Wait 1 hour before first scan
 
@@ -343,25 +371,14 @@ async def _blocked_users_checker(bot: Bot) -> None:
             if not user_ids:
                 logger.info("Blocked checker: no users to check")
             else:
-                blocked = 0
-                for uid in user_ids:
-                    try:
-                        await bot.send_chat_action(uid, "typing")
-                    except TelegramForbiddenError:
-                        # 403 = user explicitly blocked the bot
-                        await _mark_user_blocked(uid)
-                        blocked += 1
-                    except TelegramBadRequest as e:
-                        err = str(e).lower()
-                        # Only "user is deactivated" = deleted account
-                        if "user is deactivated" in err:
-                            await _mark_user_blocked(uid)
-                            blocked += 1
-                        # "chat not found" = user never started bot, skip
-                    except Exception:
-                        pass
-                    await asyncio.sleep(0.1)  # Rate limit
-                logger.info("Blocked checker: scanned %d users, %d blocked", len(user_ids), blocked)
+                # 403 / "user is deactivated" are marked blocked by the sender;
+                # "chat not found" (never started the bot) is skipped
+                report = await MassSender(bot).run(
+                    f"blocked_scan:{datetime.now(timezone.utc):%Y-%m-%d}",
+                    user_ids,
+                    lambda b, uid: b.send_chat_action(uid, "typing"),
+                )
+                logger.info("Blocked checker: scanned %d users, %d blocked", report.processed, report.blocked)
         except Exception as e:
             logger.warning("Blocked checker error: %s", e)
 
@@ -373,6 +390,7 @@ async def _broadcast_welcome(bot: Bot) -> None:
     from sqlalchemy import select, update
     from bot.models.base import async_session
     from bot.models.user import User
+    from bot.services.mass_sender import BatchResult, MassSender
     from bot.version import WELCOME_MESSAGE
 
     await asyncio.sleep(10)  # Wait for DB to be ready
@@ -393,37 +411,21 @@ async def _broadcast_welcome(bot: Bot) -> None:
             return
 
         logger.info("Welcome broadcast: sending to %d users", len(user_ids))
-        sent = 0
-        failed = 0
 
-        for user_id in user_ids:
-            try:
-                await bot.send_message(user_id, WELCOME_MESSAGE, parse_mode="HTML")
-                sent += 1
-                # Mark as sent
-                async with async_session() as session:
-                    await session.execute(
-                        update(User).where(User.id == user_id).values(welcome_sent=True)
-                    )
-                    await session.commit()
-            except Exception as e:
-                failed += 1
-                err_str = str(e).lower()
-                if "blocked by the user" in err_str or "user is deactivated" in err_str:
-                    await _mark_user_blocked(user_id)
-                # Still mark as sent to avoid retry spam on blocked users
-                try:
-                    async with async_session() as session:
-                        await session.execute(
-                            update(User).where(User.id == user_id).values(welcome_sent=True)
-                        )
-                        await session.commit()
-                except Exception:
-                    logger.debug("mark welcome_sent failed user=%s", user_id, exc_info=True)
-            # Rate limit: 30 msgs/sec max for Telegram
-            await asyncio.sleep(0.05)
-
-        logger.info("Welcome broadcast done: sent=%d, failed=%d", sent, failed)
+        async def _mark_sent(batch: BatchResult) -> None:
+            # Failed and blocked users are marked too, to avoid retry spam
+            done = batch.delivered + batch.blocked + batch.failed
+            async with async_session() as session:
+                await session.execute(update(User).where(User.id.in_(done)).values(welcome_sent=True))
+                await session.commit()
+
+        report = await MassSender(bot).run(
+            "welcome",
+            user_ids,
+            lambda b, uid: b.send_message(uid, WELCOME_MESSAGE, parse_mode="HTML"),
+            on_batch=_mark_sent,
+        )
+        logger.info("Welcome broadcast done: sent=%d, failed=%d", report.delivered, report.blocked + report.failed)
 
     except Exception as e:
         logger.error("Welcome broadcast error: %s", e)
@@ -434,6 +436,7 @@ async def _broadcast_version_update(bot: Bot) -> None:
     from sqlalchemy import select, update
     from bot.models.base import async_session
     from bot.models.user import User
+    from bot.services.mass_sender import BatchResult, MassSender
     from bot.version import VERSION, get_changelog_text
     from bot.i18n import t
 
@@ -454,38 +457,34 @@ async def _broadcast_version_update(bot: Bot) -> None:
             return
 
         logger.info("Version broadcast: sending v%s to %d users", VERSION, len(users))
-        sent = 0
-        failed = 0
-        sent_user_ids: list[int] = []
-
-        for user_id, language in users:
-            lang = language or "ru"
-            changelog_text = get_changelog_text(lang, VERSION)
-            message_text = (
-                f"<b>{t(lang, 'whats_new')}</b>\n\n{changelog_text}" if changelog_text else f"<b>{t(lang, 'bot_version', version=VERSION)}</b>"
-            )
-            try:
-                await bot.send_message(user_id, message_text, parse_mode="HTML")
-                sent += 1
-                sent_user_ids.append(user_id)
-            except Exception:
-                failed += 1
-
-            await asyncio.sleep(0.05)
+        langs = {user_id: language or "ru" for user_id, language in users}
+        texts: dict[str, str] = {}
+
+        def _message_text(lang: str) -> str:
+            if lang not in texts:
+                changelog_text = get_changelog_text(lang, VERSION)
+                texts[lang] = (
+                    f"<b>{t(lang, 'whats_new')}</b>\n\n{changelog_text}" if changelog_text else f"<b>{t(lang, 'bot_version', version=VERSION)}</b>"
+                )
+            return texts[lang]
 
-        if sent_user_ids:
-            try:
+        async def _mark_seen(batch: BatchResult) -> None:
+            if batch.delivered:
                 async with async_session() as session:
                     await session.execute(
                         update(User)
-                        .where(User.id.in_(sent_user_ids))
+                        .where(User.id.in_(batch.delivered))
                         .values(last_seen_version=VERSION)
                     )
                     await session.commit()
-            except Exception as e:
-                logger.error("Version broadcast post-update error: %s", e)
 
-        logger.info("Version broadcast done: sent=%d, failed=%d", sent, failed)
+        report = await MassSender(bot).run(
+            f"version:{VERSION}",
+            langs,
+            lambda b, uid: b.send_message(uid, _message_text(langs[uid]), parse_mode="HTML"),
+            on_batch=_mark_seen,
+        )
+        logger.info("Version broadcast done: sent=%d, failed=%d", report.delivered, report.blocked + report.failed)
 
     except Exception as e:
         logger.error("Version broadcast error: %s", e)
@@ -140,6 +140,7 @@ async def init_db(retries: int = 5, delay: float = 5.0) -> None:
                         "ALTER TABLE tracks ADD COLUMN IF NOT EXISTS explicit BOOLEAN",
                         "ALTER TABLE tracks ADD COLUMN IF NOT EXISTS popularity INTEGER",
                         "ALTER TABLE tracks ADD COLUMN IF NOT EXISTS language VARCHAR(10)",
+                        "ALTER TABLE tracks ADD COLUMN IF NOT EXISTS search_text VARCHAR(800)",
                         "ALTER TABLE tracks ALTER COLUMN genre TYPE VARCHAR(100)",
                         # BlockedTrack columns
                         "ALTER TABLE blocked_tracks ADD COLUMN IF NOT EXISTS alternative_source_id VARCHAR(100)",
@@ -168,6 +169,7 @@ async def init_db(retries: int = 5, delay: float = 5.0) -> None:
                         for stmt in (
                             "CREATE INDEX IF NOT EXISTS ix_tracks_title_trgm ON tracks USING gin (title gin_trgm_ops)",
                             "CREATE INDEX IF NOT EXISTS ix_tracks_artist_trgm ON tracks USING gin (artist gin_trgm_ops)",
+                            "CREATE INDEX IF NOT EXISTS ix_tracks_search_text_trgm ON tracks USING gin (search_text gin_trgm_ops)",
                         ):
                             await _run_migration(conn, stmt)
                     # Regular btree indexes (don't need pg_trgm)
@@ -6,6 +6,13 @@ from sqlalchemy.orm import Mapped, mapped_column
 from bot.models.base import Base
 
 
+def _default_search_text(context) -> str:
+    from bot.services.search_engine import track_search_text
+
+    params = context.get_current_parameters()
+    return track_search_text(params.get("artist"), params.get("title"))
+
+
 class Track(Base):
     """Единая таблица треков — полная метадата как у Spotify / Яндекс Музыка."""
     __tablename__ = "tracks"
@@ -29,6 +36,9 @@ class Track(Base):
     file_id: Mapped[str | None] = mapped_column(String(255))
     cover_url: Mapped[str | None] = mapped_column(String(500))
     downloads: Mapped[int] = mapped_column(Integer, default=0)
+    # normalize_query("artist title"), precomputed so catalog strings are never
+    # re-normalized at query time (see search_engine.track_search_text)
+    search_text: Mapped[str | None] = mapped_column(String(800), default=_default_search_text)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         default=lambda: datetime.now(timezone.utc),
@@ -94,6 +94,10 @@ class RateLimitedRedis:
         await self._throttle()
         return await self._client.lrange(*args, **kwargs)
 
+    async def mget(self, *args, **kwargs):
+        await self._throttle()
+        return await self._client.mget(*args, **kwargs)
+
     async def delete(self, *args, **kwargs):
         await self._throttle()
         return await self._client.delete(*args, **kwargs)
@@ -149,6 +153,20 @@ class Cache:
             self._record_get_metric(hit=False, started_at=start)
             return None
 
+    async def get_file_ids(self, source_ids: list[str], bitrate: int = 192) -> dict[str, str]:
+        """Batch variant of get_file_id: one MGET round trip for many tracks."""
+        if not source_ids:
+            return {}
+        start = time.perf_counter()
+        try:
+            values = await self.redis.mget([f"fid:{sid}:{bitrate}" for sid in source_ids])
+        except Exception:
+            self._record_get_metric(hit=False, started_at=start)
+            return {}
+        found = {sid: v for sid, v in zip(source_ids, values) if v}
+        self._record_get_metric(hit=bool(found), started_at=start)
+        return found
+
     async def set_file_id(
         self, source_id: str, file_id: str, bitrate: int = 192
     ) -> None:
@@ -237,6 +255,24 @@ class Cache:
             "avg_latency_ms": avg_latency_ms,
         }
 
+    async def get_query_cache_many(self, queries: list[str], source: str = "youtube") -> dict[str, list[dict]]:
+        """Cached results for many queries in one MGET; misses are absent."""
+        if not queries:
+            return {}
+        try:
+            values = await self.redis.mget([f"qcache:{source}:{q.lower().strip()}" for q in queries])
+        except Exception:
+            logger.debug("get_query_cache_many failed", exc_info=True)
+            return {}
+        out: dict[str, list[dict]] = {}
+        for query, data in zip(queries, values):
+            if data:
+                try:
+                    out[query] = json.loads(data)
+                except ValueError:
+                    continue
+        return out
+
     async def set_query_cache(self, query: str, results: list[dict], source: str = "youtube") -> None:
         """Cache search results for a query (settings.QCACHE_TTL)."""
         try:
@@ -251,14 +287,20 @@ class Cache:
     # A RAM miss falls through to disk and re-warms RAM, so LRU eviction or a
     # Redis restart never loses a cached search.
 
-    async def get_result_cache(self, norm_query: str) -> list[dict] | None:
-        """Return the cached final ranked results for a normalized query, or None."""
+    async def get_result_cache(self, norm_query: str, disk: bool = True) -> list[dict] | None:
+        """Return the cached final ranked results for a normalized query, or None.
+
+        ``disk=False`` checks only the RAM tier (latency-critical callers such as
+        inline mode must not wait on Postgres).
+        """
         try:
             data = await self.redis.get(f"rcache:{norm_query}")
             if data:
                 return json.loads(data)
         except Exception:
             pass
+        if not disk:
+            return None
         # Disk tier (Postgres) — survives RAM eviction / Redis restarts.
         try:
             results = await self._disk_get_results(norm_query)
@@ -351,6 +393,26 @@ class Cache:
             await session.execute(stmt)
             await session.commit()
 
+    # ── Inline-mode result cache ─────────────────────────────────────────
+    # Full (deduplicated) inline results per normalized query, written by the
+    # background warm-up so the next identical keystroke answers from RAM.
+
+    async def get_inline_cache(self, norm_query: str) -> list[dict] | None:
+        try:
+            data = await self.redis.get(f"inline:{norm_query}")
+            return json.loads(data) if data else None
+        except Exception:
+            return None
+
+    async def set_inline_cache(self, norm_query: str, results: list[dict]) -> None:
+        try:
+            await self.redis.setex(
+                f"inline:{norm_query}", settings.INLINE_CACHE_TTL,
+                json.dumps(results, ensure_ascii=False),
+            )
+        except Exception:
+            logger.debug("set_inline_cache failed query=%s", norm_query, exc_info=True)
+
     # ── Rate limiting ────────────────────────────────────────────────────────
 
     async def check_rate_limit(
@@ -256,13 +256,26 @@ async def _warm_cycle() -> tuple[int, int]:
     except Exception:
         done = set()
 
-    warmed = tried = 0
+    batch: list[tuple[str, str]] = []
     for q in await _candidates():
-        if tried >= _WARM_BATCH:
+        if len(batch) >= _WARM_BATCH:
             break
         key = q.lower().strip()[:300]
-        if key in done:
-            continue
+        if key not in done:
+            batch.append((q, key))
+    if not batch:
+        return 0, 0
+
+    # Pre-resolve the iTunes/Deezer canonical too, so the live search's
+    # resolve_canonical for these queries is a memo hit instead of two API calls
+    try:
+        from bot.services.canonical_resolver import resolve_canonical_many
+        await resolve_canonical_many([q for q, _ in batch])
+    except Exception:
+        logger.debug("warmer: canonical pre-resolve failed", exc_info=True)
+
+    warmed = tried = 0
+    for q, key in batch:
         tried += 1
         try:
             if await _resolve_and_cache(q):
@@ -12,6 +12,10 @@ caller leaves search untouched — so this can only help, never regress.
 
 Pure/soft: returns a query STRING (or None); any error/timeout -> None. Lyric
 fragments are out of scope (need a keyed web/lyrics API).
+
+Both resolvers sit behind a ResolveMemo (process LRU + Redis, single-flight):
+agreements and "no agreement" answers are kept with different TTLs, and a
+lookup where an API failed is only remembered for a few minutes.
 """
 from __future__ import annotations
 
@@ -22,8 +26,8 @@ import re
 import urllib.parse
 
 from bot.config import settings
-from bot.services.cache import cache
 from bot.services.http_session import get_session
+from bot.services.resolve_memo import ERROR, HIT, MISS, ResolveMemo
 
 logger = logging.getLogger(__name__)
 
@@ -44,8 +48,11 @@ _GENIUS_JUNK_RE = re.compile(
     re.IGNORECASE,
 )
 
-_CACHE_TTL = 7 * 24 * 3600  # 7 days
 _CACHE_PREFIX = "canon:"
+_TTL_HIT = 30 * 24 * 3600      # catalogs agreed: a canonical does not change
+_TTL_MISS = 3 * 24 * 3600      # both answered, no agreement: catalogs grow, retry in days
+_TTL_ERROR = 10 * 60           # an API failed: retry soon, but not on every search
+_BULK_CONCURRENCY = 4
 _TIMEOUT = 4
 _UA = "Mozilla/5.0 (compatible; BlackRoomBot/1.0)"
 _BRACKETS = re.compile(r"[\(\[\{].*?[\)\]\}]")
@@ -71,7 +78,7 @@ async def _itunes(query: str) -> list[tuple[str, str]]:
     url = "https://itunes.apple.com/search?media=music&limit=3&term=" + urllib.parse.quote(query)
     async with get_session().get(url, headers={"User-Agent": _UA}, timeout=_TIMEOUT) as resp:
         if resp.status != 200:
-            return []
+            raise RuntimeError(f"itunes status {resp.status}")
         data = json.loads(await resp.text())  # iTunes serves JSON as text/javascript
     return [(r.get("artistName") or "", r.get("trackName") or "") for r in data.get("results", []) if r.get("artistName") and r.get("trackName")]
 
@@ -80,7 +87,7 @@ async def _deezer(query: str) -> list[tuple[str, str]]:
     url = "https://api.deezer.com/search?limit=3&q=" + urllib.parse.quote(query)
     async with get_session().get(url, headers={"User-Agent": _UA}, timeout=_TIMEOUT) as resp:
         if resp.status != 200:
-            return []
+            raise RuntimeError(f"deezer status {resp.status}")
         data = await resp.json(content_type=None)
     return [((r.get("artist") or {}).get("name") or "", r.get("title") or "") for r in data.get("data", []) if (r.get("artist") or {}).get("name") and r.get("title")]
 
@@ -97,37 +104,56 @@ def _confident(itunes: list[tuple[str, str]], deezer: list[tuple[str, str]]) ->
     return None
 
 
-async def resolve_canonical(query: str) -> str | None:
-    """Confident canonical 'Artist Title' for a raw query, or None. Cached 7d."""
+_canon_memo = ResolveMemo(_CACHE_PREFIX, ttl_hit=_TTL_HIT, ttl_miss=_TTL_MISS, ttl_error=_TTL_ERROR)
+_lyric_memo = ResolveMemo(_GENIUS_CACHE_PREFIX, ttl_hit=_TTL_HIT, ttl_miss=_TTL_MISS, ttl_error=_TTL_ERROR)
+
+
+def _canon_key(query: str) -> str | None:
     q = _norm(query)
     if not q or len(q) < 2 or len(q.split()) > 8:
         return None
+    return q
 
-    cache_key = _CACHE_PREFIX + q
-    try:
-        cached = await cache.redis.get(cache_key)
-        if cached is not None:
-            return cached or None  # "" sentinel = resolved-but-no-canonical
-    except Exception:
-        logger.debug("canon cache read failed", exc_info=True)
-
-    itunes: list[tuple[str, str]] = []
-    deezer: list[tuple[str, str]] = []
-    try:
-        res = await asyncio.gather(_itunes(query), _deezer(query), return_exceptions=True)
-        itunes = res[0] if isinstance(res[0], list) else []
-        deezer = res[1] if isinstance(res[1], list) else []
-    except Exception:
-        logger.debug("canon resolve failed for %r", query, exc_info=True)
 
+async def _lookup_canonical(query: str) -> tuple[str, str]:
+    res = await asyncio.gather(_itunes(query), _deezer(query), return_exceptions=True)
+    itunes = res[0] if isinstance(res[0], list) else []
+    deezer = res[1] if isinstance(res[1], list) else []
     canon = _confident(itunes, deezer)
+    if canon:
+        return canon, HIT
+    failed = [r for r in res if isinstance(r, BaseException)]
+    if failed:
+        logger.debug("canon resolve for %r: %d source(s) failed: %s", query, len(failed), failed[0])
+        return "", ERROR
+    return "", MISS
+
+
+async def resolve_canonical(query: str) -> str | None:
+    """Confident canonical 'Artist Title' for a raw query, or None. Memoized."""
+    key = _canon_key(query)
+    if key is None:
+        return None
+    return await _canon_memo.resolve(key, lambda: _lookup_canonical(query)) or None
 
-    try:
-        await cache.redis.set(cache_key, canon or "", ex=_CACHE_TTL)
-    except Exception:
-        logger.debug("canon cache write failed", exc_info=True)
 
-    return canon
+async def resolve_canonical_many(
+    queries: list[str], *, concurrency: int = _BULK_CONCURRENCY,
+) -> dict[str, str | None]:
+    """Bulk resolve_canonical for warmers: one MGET for everything memoized,
+    then the misses through the APIs, at most *concurrency* at a time."""
+    keys = {q: _canon_key(q) for q in queries}
+    known = await _canon_memo.get_many([k for k in keys.values() if k])
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def _one(query: str, key: str) -> str:
+        async with sem:
+            return await _canon_memo.resolve(key, lambda: _lookup_canonical(query))
+
+    todo = {q: k for q, k in keys.items() if k and k not in known}
+    resolved = await asyncio.gather(*(_one(q, k) for q, k in todo.items()))
+    known.update(zip(todo.values(), resolved))
+    return {q: (known.get(k) or None) if k else None for q, k in keys.items()}
 
 
 def canonical_match_index(results: list[dict], canon: str) -> int | None:
@@ -158,7 +184,7 @@ def canonical_match_index(results: list[dict], canon: str) -> int | None:
 async def resolve_lyric_song(query: str) -> tuple[str, str] | None:
     """Resolve a lyric fragment ("words from a song") to (artist, title) via the
     Genius API. Returns None when no token is configured, on error, or no hit.
-    Cached 7d. The title is the reliable signal; the artist may be a cover, so
+    Memoized. The title is the reliable signal; the artist may be a cover, so
     callers should also search the title alone and boost by title.
     """
     token = (settings.GENIUS_ACCESS_TOKEN or "").strip()
@@ -168,56 +194,38 @@ async def resolve_lyric_song(query: str) -> tuple[str, str] | None:
     if not q or len(q.split()) < 3:  # too short to be a distinctive lyric line
         return None
 
-    cache_key = _GENIUS_CACHE_PREFIX + q
-    try:
-        cached = await cache.redis.get(cache_key)
-        if cached is not None:
-            if not cached:
-                return None
-            artist, _, title = cached.partition("\t")
-            return (artist, title) if title else None
-    except Exception:
-        logger.debug("lyric cache read failed", exc_info=True)
-
-    result: tuple[str, str] | None = None
-    try:
-        url = "https://api.genius.com/search?q=" + urllib.parse.quote(query)
-        headers = {"Authorization": "Bearer " + token, "User-Agent": _GENIUS_UA}
-        async with get_session().get(url, headers=headers, timeout=_TIMEOUT + 2) as resp:
-            if resp.status == 200:
-                data = await resp.json(content_type=None)
-                hits = data.get("response", {}).get("hits", [])
-                for h in hits:
-                    r = h.get("result", {})
-                    artist = (r.get("primary_artist") or {}).get("name") or ""
-                    title = r.get("title") or ""
-                    if not (artist and title):
-                        continue
-                    # Skip rap-battle / interview / meta junk that Genius ranks high
-                    # for RU lyric fragments — it used to pollute the resolve.
-                    if _GENIUS_JUNK_RE.search(f"{artist} {title}"):
-                        continue
-                    # Genius appends a parenthetical transliteration/translation to
-                    # BOTH fields — "Любэ (Lubeh)", "Конь (Horse)". Strip it so the
-                    # artist+title matches the provider catalog (unstripped names
-                    # break canonical_match_index / the direct fetch).
-                    artist = re.sub(r"\s*[\(\[].*$", "", artist).strip() or artist
-                    title = re.sub(r"\s*[\(\[].*$", "", title).strip() or title
-                    result = (artist, title)
-                    break
-            else:
-                logger.debug("genius search status %s", resp.status)
-    except Exception:
-        logger.debug("genius lyric resolve failed for %r", query, exc_info=True)
-
-    try:
-        await cache.redis.set(
-            cache_key, f"{result[0]}\t{result[1]}" if result else "", ex=_CACHE_TTL
-        )
-    except Exception:
-        logger.debug("lyric cache write failed", exc_info=True)
-
-    return result
+    raw = await _lyric_memo.resolve(q, lambda: _lookup_lyric_song(query, token))
+    artist, _, title = raw.partition("\t")
+    return (artist, title) if title else None
+
+
+async def _lookup_lyric_song(query: str, token: str) -> tuple[str, str]:
+    url = "https://api.genius.com/search?q=" + urllib.parse.quote(query)
+    headers = {"Authorization": "Bearer " + token, "User-Agent": _GENIUS_UA}
+    async with get_session().get(url, headers=headers, timeout=_TIMEOUT + 2) as resp:
+        if resp.status != 200:
+            logger.debug("genius search status %s", resp.status)
+            return "", ERROR
+        data = await resp.json(content_type=None)
+    hits = data.get("response", {}).get("hits", [])
+    for h in hits:
+        r = h.get("result", {})
+        artist = (r.get("primary_artist") or {}).get("name") or ""
+        title = r.get("title") or ""
+        if not (artist and title):
+            continue
+        # Skip rap-battle / interview / meta junk that Genius ranks high
+        # for RU lyric fragments — it used to pollute the resolve.
+        if _GENIUS_JUNK_RE.search(f"{artist} {title}"):
+            continue
+        # Genius appends a parenthetical transliteration/translation to
+        # BOTH fields — "Любэ (Lubeh)", "Конь (Horse)". Strip it so the
+        # artist+title matches the provider catalog (unstripped names
+        # break canonical_match_index / the direct fetch).
+        artist = re.sub(r"\s*[\(\[].*$", "", artist).strip() or artist
+        title = re.sub(r"\s*[\(\[].*$", "", title).strip() or title
+        return f"{artist}\t{title}", HIT
+    return "", MISS
 
 
 def title_match_index(results: list[dict], title: str) -> int | None:
@@ -21,6 +21,8 @@ logger = logging.getLogger(__name__)
 
 # How many tracks to download in parallel
 _PREFETCH_CONCURRENCY = 3
+# Prefetched mp3s wait on disk until the upload queue drains them; cap the backlog
+_PREFETCH_UPLOAD_BACKLOG = 30
 
 # Interval between full prefetch runs. Now that warming is Yandex-first (never
 # rate-limited), it no longer competes with organic YouTube downloads, so we can
@@ -97,21 +99,26 @@ async def prefetch_chart_tracks(
         pass
 
     async def _upload_and_cleanup(video_id: str, path: Path, artist=None, title=None, duration=None) -> None:
-        """Upload to the CDN cache channel (AWAITED), then DELETE the local mp3.
-        The track lives on Telegram's CDN now (file_id): the bot delivers by file_id
-        and /api/stream restores it from the CDN on demand, so keeping it on disk
-        only fills the 38 GB shared volume. Metadata is passed so upload_to_cache
-        never skips on 'no title/artist' (Yandex mp3s often lack ID3 tags)."""
+        """Queue the CDN upload at prefetch priority; the queue worker DELETES the
+        local mp3 once it is on the channel. The track lives on Telegram's CDN then
+        (file_id): the bot delivers by file_id and /api/stream restores it from the
+        CDN on demand, so keeping it on disk only fills the 38 GB shared volume.
+        Metadata is passed so upload_to_cache never skips on 'no title/artist'
+        (Yandex mp3s often lack ID3 tags). Waits while the prefetch backlog is full
+        so downloads can't outrun the upload rate limit."""
         try:
-            from bot.services.telegram_cache import get_file_id as _gf, upload_to_cache
+            from bot.services.telegram_cache import get_file_id as _gf
+            from bot.services.upload_queue import PRIORITY_PREFETCH, enqueue_upload, upload_queue
             if not path.exists():
                 return
             if await _gf(video_id):
                 path.unlink(missing_ok=True)  # already on CDN → drop the local copy
                 return
-            fid = await upload_to_cache(path, video_id, title=title, artist=artist, duration=duration)
-            if fid:
-                path.unlink(missing_ok=True)
+            await enqueue_upload(
+                path, video_id, title=title, artist=artist, duration=duration,
+                priority=PRIORITY_PREFETCH, cleanup=True,
+            )
+            await upload_queue.wait_for_capacity(PRIORITY_PREFETCH, _PREFETCH_UPLOAD_BACKLOG)
         except Exception:
             logger.debug("upload/cleanup failed for %s", video_id, exc_info=True)
 
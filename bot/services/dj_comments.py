@@ -3,10 +3,16 @@ dj_comments.py — Voice AI DJ comment templates.
 
 Generates human-like DJ phrases between tracks in Daily Mix.
 50+ templates per language with personalization ({name}, time-of-day).
+
+Voice clips are prepared ahead of playback: ``plan_dj_script`` fixes the
+phrases for a mix up front and ``prepare_dj_script`` queues them for
+background synthesis, while ``start_dj_presynth`` warms the clip store with
+every template that has no per-user or per-track placeholder.
 """
 import random
 import logging
 from datetime import datetime, timezone
+from typing import NamedTuple
 
 logger = logging.getLogger(__name__)
 
@@ -32,14 +38,18 @@ def _time_of_day(lang: str = "ru") -> str:
     return "ночь"
 
 
+_GREETINGS = {
+    "en": {"morning": "Good morning", "afternoon": "Good afternoon",
+           "evening": "Good evening", "night": "Late night vibes"},
+    "ru": {"утро": "Доброе утро", "день": "Добрый день",
+           "вечер": "Добрый вечер", "ночь": "Ночной вайб"},
+}
+
+
 def _time_greeting(lang: str = "ru") -> str:
     """Full greeting phrase based on time of day."""
     tod = _time_of_day(lang)
-    if lang == "en":
-        return {"morning": "Good morning", "afternoon": "Good afternoon",
-                "evening": "Good evening", "night": "Late night vibes"}[tod]
-    return {"утро": "Доброе утро", "день": "Добрый день",
-            "вечер": "Добрый вечер", "ночь": "Ночной вайб"}[tod]
+    return _GREETINGS["en" if lang == "en" else "ru"][tod]
 
 
 # ── Comment templates per language (50+ total) ────────────────────────────
@@ -192,3 +202,53 @@ async def generate_dj_voice(text: str, lang: str = "ru") -> bytes | None:
     """Generate a DJ voice clip for the given text."""
     from bot.services.tts_engine import synthesize
     return await synthesize(text, lang)
+
+
+# ── Pre-synthesis ─────────────────────────────────────────────────────────
+
+class DjScript(NamedTuple):
+    intro: str
+    comments: list[tuple[int, str]]     # (track index, phrase) — after every 3rd track
+
+
+def plan_dj_script(tracks: list[dict], lang: str = "ru", name: str = "") -> DjScript:
+    """Pick every phrase of a DJ mix up front, so all of them can be synthesized early."""
+    comments = []
+    for i in range(2, min(len(tracks), 10), 3):
+        tr = tracks[i]
+        # Alternate between transition and energy comments
+        if i % 6 == 2:
+            text = get_transition(tr.get("uploader", "?"), tr.get("title", "?"), lang, name=name)
+        else:
+            text = get_energy(lang, name=name)
+        comments.append((i, text))
+    return DjScript(get_intro(lang, name=name), comments)
+
+
+def prepare_dj_script(script: DjScript, lang: str = "ru") -> None:
+    """Queue the script's comments for background synthesis (the intro is synthesized on demand)."""
+    from bot.services.tts_engine import presynthesize
+    presynthesize([text for _, text in script.comments], lang)
+
+
+def static_phrases(lang: str = "ru") -> list[str]:
+    """All phrases that need no user name, artist or title (greetings expanded)."""
+    greetings = _GREETINGS["en" if lang == "en" else "ru"].values()
+    phrases: list[str] = []
+    for kind in ("intro", "energy", "outro"):
+        for template in _TEMPLATES.get(lang, _TEMPLATES["ru"])[kind]:
+            if any(p in template for p in ("{name}", "{artist}", "{title}")):
+                continue
+            if "{greeting}" in template:
+                phrases.extend(template.format(greeting=g) for g in greetings)
+            else:
+                phrases.append(template)
+    return phrases
+
+
+async def start_dj_presynth() -> None:
+    """Start the TTS pre-synthesis workers and queue the static template warm-up."""
+    from bot.services.tts_engine import PRIORITY_WARM, presynthesize, start_tts_presynth
+    await start_tts_presynth()
+    for lang in _TEMPLATES:
+        presynthesize(static_phrases(lang), lang, priority=PRIORITY_WARM)
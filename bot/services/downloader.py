@@ -1,4 +1,5 @@
 import asyncio
+import contextlib
 import logging
 import re
 import shutil
@@ -234,13 +235,41 @@ def log_runtime_info() -> None:
             )
 
 
+_YOUTUBE_HOST = "www.youtube.com"
+
+
 def _youtube_proxy() -> str | None:
-    """Proxy for YouTube requests (YOUTUBE_PROXY wins, else PROXY_POOL round-robin)."""
+    """Proxy for YouTube requests (YOUTUBE_PROXY wins, else the PROXY_POOL pick sticky to YouTube)."""
     direct = (getattr(settings, "YOUTUBE_PROXY", None) or "").strip()
     if direct:
         return direct
     from bot.services.proxy_pool import proxy_pool
-    return proxy_pool.get_next()
+    return proxy_pool.get_next(_YOUTUBE_HOST)
+
+
+def _is_proxy_fault(error: BaseException) -> bool:
+    """Failures that say something about the proxy (not the video): connectivity, timeouts, IP throttling."""
+    return (
+        _yt_cookies.is_youtube_proxy_error(error)
+        or _yt_cookies.is_youtube_rate_limit_error(error)
+        or "timed out" in str(error).lower()
+    )
+
+
+@contextlib.contextmanager
+def _youtube_proxy_lease():
+    """Lease a PROXY_POOL proxy for one yt-dlp call so its latency/outcome feed the pool's scoring.
+
+    Yields the lease (``lease.url`` may be None); with YOUTUBE_PROXY set the
+    pool is bypassed and a detached lease carrying that URL is yielded.
+    """
+    from bot.services.proxy_pool import ProxyLease, proxy_pool
+    direct = (getattr(settings, "YOUTUBE_PROXY", None) or "").strip()
+    if direct or not proxy_pool.size:
+        yield ProxyLease(direct or None)
+        return
+    with proxy_pool.lease(_YOUTUBE_HOST, is_failure=_is_proxy_fault) as lease:
+        yield lease
 
 
 def _youtube_player_clients(*, has_auth_cookies: bool) -> list[str]:
@@ -261,14 +290,14 @@ def _youtube_player_clients(*, has_auth_cookies: bool) -> list[str]:
     return ["android_vr", "web_embedded", "tv_simply", "mweb", "web", "ios"]
 
 
-def _youtube_extractor_args(*, has_auth_cookies: bool) -> dict:
+def _youtube_extractor_args(*, has_auth_cookies: bool, proxy: str | None = None) -> dict:
     youtube_args = {
         "player_client": _youtube_player_clients(has_auth_cookies=has_auth_cookies),
     }
     # yt-dlp forwards its proxy to the bgutil PO-token plugin. With local
     # Cloudflare WARP this makes the provider fail fetching BotGuard JS, while
     # the selected clients work through WARP without PO tokens.
-    proxy = _youtube_proxy() or ""
+    proxy = proxy or ""
     if proxy.startswith(("socks5://172.17.0.1:", "socks5h://172.17.0.1:", "socks5://127.0.0.1:", "socks5h://127.0.0.1:")):
         return {"youtube": youtube_args}
     pot_url = (settings.BGUTIL_POT_BASE_URL or "").strip().rstrip("/")
@@ -278,16 +307,19 @@ def _youtube_extractor_args(*, has_auth_cookies: bool) -> dict:
     }
 
 
-def _base_opts(*, has_auth_cookies: bool | None = None) -> dict:
-    """Return base yt-dlp options: cookies + remote EJS components + proxy."""
+def _base_opts(*, has_auth_cookies: bool | None = None, proxy: str | None = None) -> dict:
+    """Return base yt-dlp options: cookies + remote EJS components + proxy.
+
+    *proxy* is normally a leased pool proxy; by default one is picked here.
+    """
     if has_auth_cookies is None:
         has_auth_cookies = _COOKIES_PATH.exists() and bool(
             _yt_cookies.validate_cookie_file().get("auth_cookies")
         )
     opts: dict = {"remote_components": {"ejs:github"}}
     opts["js_runtimes"] = {"deno": {"path": "/usr/local/bin/deno"}, "node": {}}
-    opts["extractor_args"] = _youtube_extractor_args(has_auth_cookies=has_auth_cookies)
-    proxy = _youtube_proxy()
+    proxy = proxy or _youtube_proxy()
+    opts["extractor_args"] = _youtube_extractor_args(has_auth_cookies=has_auth_cookies, proxy=proxy)
     if proxy:
         opts["proxy"] = proxy
     return opts
@@ -500,6 +532,11 @@ def _search_sync(query: str, max_results: int, source: str = "youtube") -> list[
     else:
         search_prefix = f"ytsearch{fetch_count}"
 
+    with _youtube_proxy_lease() as lease:
+        return _search_with_proxy(query, max_results, source, search_prefix, lease)
+
+
+def _search_with_proxy(query: str, max_results: int, source: str, search_prefix: str, lease) -> list[dict]:
     cookiefile, temp_cookie = _prepare_cookiefile()
     ydl_opts = {
         "format": "bestaudio/best",
@@ -509,7 +546,7 @@ def _search_sync(query: str, max_results: int, source: str = "youtube") -> list[
         "logger": _ytdlp_logger,
         "socket_timeout": 15,
         "ignore_no_formats_error": True,
-        **_base_opts(),
+        **_base_opts(proxy=lease.url),
     }
     if cookiefile:
         ydl_opts["cookiefile"] = cookiefile
@@ -547,6 +584,8 @@ def _search_sync(query: str, max_results: int, source: str = "youtube") -> list[
             tracks.append(_t)
         return tracks[:max_results]
     except Exception as e:
+        if _is_proxy_fault(e):
+            lease.fail()
         _maybe_notify_youtube_auth_error(e, context="search")
         logger.error("Search error: %s", e)
         return []
@@ -596,10 +635,19 @@ def _download_sync(video_id: str, output_dir: Path, bitrate: int, progress_cb=No
     # own URL instead of a constructed youtube.com/watch?v=<id> (which fails).
     url = url or f"https://www.youtube.com/watch?v={video_id}"
     file_stem = f"{video_id}_{dl_id}" if dl_id else video_id
+    with _youtube_proxy_lease() as lease:
+        return _download_with_proxy(video_id, url, output_dir, file_stem, bitrate, progress_cb, dl_id, lease)
+
+
+def _download_with_proxy(
+    video_id: str, url: str, output_dir: Path, file_stem: str, bitrate: int, progress_cb, dl_id: str | None, lease,
+) -> Path:
     output_template = str(output_dir / f"{file_stem}.%(ext)s")
     cookiefile, temp_cookie = _prepare_cookiefile()
 
     def _hook(d: dict) -> None:
+        if d.get("status") == "downloading":
+            lease.first_byte()      # proxy latency = time to first byte, not transfer time
         if progress_cb and d.get("status") == "downloading":
             total = d.get("total_bytes") or d.get("total_bytes_estimate") or 0
             downloaded = d.get("downloaded_bytes", 0)
@@ -625,7 +673,7 @@ def _download_sync(video_id: str, output_dir: Path, bitrate: int, progress_cb=No
         "socket_timeout": 30,
         "concurrent_fragment_downloads": settings.YTDL_CONCURRENT_FRAGMENTS,
         "progress_hooks": [_hook],
-        **_base_opts(),
+        **_base_opts(proxy=lease.url),
         "match_filter": yt_dlp.utils.match_filter_func(
             f"duration <= {settings.MAX_DURATION}"
         ),
@@ -0,0 +1,161 @@
+"""
+latency_sketch.py — Mergeable, time-decayed latency quantile sketch.
+
+A DDSketch (Masson et al., VLDB 2019): values go into logarithmic buckets
+``ceil(log_gamma(x))`` with ``gamma = (1 + alpha) / (1 - alpha)``, so every
+quantile is answered within relative error ``alpha`` using a few dozen
+buckets, whatever the number of samples. Two sketches with the same alpha
+merge by adding bucket counts, which is what lets fleet nodes combine their
+provider latencies through Redis.
+
+Time decay: all weights halve every ``half_life`` seconds (applied lazily,
+on the next add), so the sketch describes the recent past instead of the
+whole uptime. Quantiles and the mean are ratios and are not changed by the
+decay itself. The decay clock is wall time, so sketches serialized by
+different processes line up when merged.
+"""
+from __future__ import annotations
+
+import math
+import time
+
+_MIN_VALUE = 1e-4       # values at or below this (0.1 ms) count as zero
+_PRUNE_WEIGHT = 1e-3    # buckets decayed below this weight are dropped
+
+
+class LatencySketch:
+    """DDSketch of non-negative values (seconds) with exponential time decay."""
+
+    __slots__ = ("alpha", "half_life", "max_buckets", "bins", "zero", "count", "sum",
+                 "_gamma", "_log_gamma", "_t", "_keys")
+
+    def __init__(self, alpha: float = 0.02, half_life: float = 3600.0, max_buckets: int = 512) -> None:
+        self.alpha = alpha
+        self.half_life = half_life
+        self.max_buckets = max_buckets
+        self._gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self._gamma)
+        self.bins: dict[int, float] = {}
+        self.zero = 0.0
+        self.count = 0.0
+        self.sum = 0.0
+        self._t = time.time()
+        self._keys: list[int] | None = None   # sorted bucket keys, None = stale
+
+    # ── Updates ─────────────────────────────────────────────────────────
+
+    def _decay_to(self, now: float) -> None:
+        # Rescaling every bucket is O(buckets): do it at most every 1/32 of
+        # a half-life; in between, new samples are up to ~2% overweighted.
+        if not self.count:
+            self._t = now
+            return
+        elapsed = now - self._t
+        if elapsed < self.half_life / 32:
+            return
+        factor = 0.5 ** (elapsed / self.half_life)
+        self._t = now
+        for key in list(self.bins):
+            weight = self.bins[key] * factor
+            if weight < _PRUNE_WEIGHT:
+                del self.bins[key]
+                self._keys = None
+            else:
+                self.bins[key] = weight
+        self.zero *= factor
+        self.count *= factor
+        self.sum *= factor
+
+    def add(self, value: float, weight: float = 1.0, now: float | None = None) -> None:
+        self._decay_to(time.time() if now is None else now)
+        if value <= _MIN_VALUE:
+            self.zero += weight
+        else:
+            key = math.ceil(math.log(value) / self._log_gamma)
+            if key not in self.bins:
+                self.bins[key] = 0.0
+                self._keys = None
+            self.bins[key] += weight
+            if len(self.bins) > self.max_buckets:
+                self._collapse()
+        self.count += weight
+        self.sum += value * weight
+
+    def _collapse(self) -> None:
+        """Fold the lowest buckets into one (keeps the upper quantiles exact)."""
+        keys = sorted(self.bins)
+        excess = len(keys) - self.max_buckets
+        target = keys[excess]
+        self.bins[target] += sum(self.bins.pop(k) for k in keys[:excess])
+        self._keys = None
+
+    def merge(self, other: "LatencySketch") -> None:
+        """Add *other* into this sketch (both decayed to the later clock)."""
+        if not math.isclose(other.alpha, self.alpha):
+            raise ValueError("cannot merge sketches with different alpha")
+        now = max(self._t, other._t)
+        self._decay_to(now)
+        factor = 0.5 ** ((now - other._t) / self.half_life) if other._t < now else 1.0
+        for key, weight in other.bins.items():
+            if key not in self.bins:
+                self.bins[key] = 0.0
+                self._keys = None
+            self.bins[key] += weight * factor
+        self.zero += other.zero * factor
+        self.count += other.count * factor
+        self.sum += other.sum * factor
+        while len(self.bins) > self.max_buckets:
+            self._collapse()
+
+    # ── Queries ─────────────────────────────────────────────────────────
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Value at quantile *q* (0..1), within relative error alpha; 0.0 if empty."""
+        if self.count <= 0:
+            return 0.0
+        rank = q * self.count
+        seen = self.zero
+        if seen >= rank and seen > 0:
+            return 0.0
+        if self._keys is None:
+            self._keys = sorted(self.bins)
+        key = None
+        for key in self._keys:
+            seen += self.bins[key]
+            if seen >= rank:
+                break
+        if key is None:
+            return 0.0
+        return 2 * self._gamma ** key / (self._gamma + 1)
+
+    def __len__(self) -> int:
+        return len(self.bins)
+
+    # ── Serialization ───────────────────────────────────────────────────
+
+    def to_dict(self) -> dict:
+        """Compact form: dense counts from the lowest bucket ``o`` upwards."""
+        out = {
+            "a": self.alpha, "t": round(self._t, 1),
+            "n": round(self.count, 3), "s": round(self.sum, 3), "z": round(self.zero, 3),
+        }
+        if self.bins:
+            lo, hi = min(self.bins), max(self.bins)
+            out["o"] = lo
+            out["c"] = [round(self.bins.get(k, 0.0), 3) for k in range(lo, hi + 1)]
+        return out
+
+    @classmethod
+    def from_dict(cls, data: dict, half_life: float = 3600.0, max_buckets: int = 512) -> "LatencySketch":
+        sketch = cls(float(data.get("a", 0.02)), half_life=half_life, max_buckets=max_buckets)
+        sketch._t = float(data.get("t", sketch._t))
+        sketch.count = float(data.get("n", 0.0))
+        sketch.sum = float(data.get("s", 0.0))
+        sketch.zero = float(data.get("z", 0.0))
+        offset = int(data.get("o", 0))
+        sketch.bins = {offset + i: float(c) for i, c in enumerate(data.get("c") or []) if c}
+        return sketch
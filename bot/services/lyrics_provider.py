@@ -15,6 +15,7 @@ import aiohttp
 
 from bot.config import settings
 from bot.services.http_session import get_session
+from bot.services.resolve_memo import ResolveMemo
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +26,10 @@ _GENIUS_RETRY_AFTER = 15 * 60
 _genius_disabled_until = 0.0
 _LRCLIB_GET_URL = "https://lrclib.net/api/get"
 _MUSIXMATCH_DEFAULT_KEY = "68abb93fbe3a11298b12092e27e6e56f"
+# Lyric-fragment -> song hints (search_by_lyrics); same Redis keys as before
+_lyric_hint_memo = ResolveMemo(
+    "lyrics:search:", ttl_hit=_LYRICS_CACHE_TTL, ttl_miss=12 * 3600, ttl_error=10 * 60,
+)
 
 
 def _lyrics_proxy() -> str | None:
@@ -197,25 +202,26 @@ async def search_by_lyrics(query: str, limit: int = 3) -> list[dict]:
 
     Tries Musixmatch q_lyrics first (best for lyric fragments), then Genius API /
     public endpoint. Multiple query variants are tried for typo / stop-word tails.
-    Results are cached in Redis for 24h.
+    Memoized in process + Redis: hits for 7d, empty answers for 12h.
     """
     query = query.strip()
     if not query:
         return []
 
-    from bot.services.cache import cache
-    from bot.services.search_engine import lyric_search_variants, normalize_query
+    from bot.services.search_engine import normalize_query
 
     norm = normalize_query(query)
-    cache_key = f"lyrics:search:{norm[:120]}"
+    raw = await _lyric_hint_memo.resolve(norm[:120], lambda: _lookup_lyric_hints(query, limit))
     try:
-        cached = await cache.redis.get(cache_key)
-        if cached:
-            data = json.loads(cached)
-            if isinstance(data, list):
-                return data[:limit]
-    except Exception:
-        logger.debug("lyrics search cache get failed", exc_info=True)
+        data = json.loads(raw)
+    except ValueError:
+        return []
+    return data[:limit] if isinstance(data, list) else []
+
+
+async def _lookup_lyric_hints(query: str, limit: int) -> tuple[str, str]:
+    from bot.services.resolve_memo import HIT, MISS
+    from bot.services.search_engine import lyric_search_variants
 
     seen: set[tuple[str, str]] = set()
     merged: list[dict] = []
@@ -237,17 +243,7 @@ async def search_by_lyrics(query: str, limit: int = 3) -> list[dict]:
             break
 
     results = _rank_lyric_hints(merged, query)[:limit]
-
-    try:
-        await cache.redis.setex(
-            cache_key,
-            24 * 3600,
-            json.dumps(results, ensure_ascii=False),
-        )
-    except Exception:
-        logger.debug("lyrics search cache set failed", exc_info=True)
-
-    return results
+    return json.dumps(results, ensure_ascii=False), (HIT if results else MISS)
 
 
 def _rank_lyric_hints(hints: list[dict], query: str) -> list[dict]:
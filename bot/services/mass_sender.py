@@ -0,0 +1,354 @@
+"""
+mass_sender.py — Rate-governed mass messaging for broadcasts and recaps.
+
+The welcome / version broadcasts, the weekly recap and the blocked-users scan
+used to walk their users one by one with a fixed sleep, open a DB session per
+user and treat flood-waits like any other error. They now share one engine:
+
+  - a token bucket at Telegram's global limit (~30 msg/s per bot, we keep
+    MASS_SEND_RATE below it) plus per-chat spacing (~1 msg/s per chat), both
+    applied to every ``send_*`` call the campaign makes
+  - a pool of MASS_SEND_WORKERS senders
+  - TelegramRetryAfter pauses the whole bucket for retry_after and the
+    failed call is retried (flood-waits never count as attempts); transient
+    errors are retried with backoff. Retries are per message, so a recipient
+    who gets several messages never receives the earlier ones twice
+  - recipients are processed in ascending id batches; after each batch the
+    blocked / delivered flags are written with one UPDATE each and the cursor
+    is checkpointed in Redis, so an interrupted campaign resumes after it
+    (a finished one drops its cursor: the next run starts from scratch)
+  - throughput and ETA are logged and kept in the checkpoint hash
+
+Storage:
+  HASH  mass:<campaign>   cursor, total, delivered, blocked, failed, rate, eta_sec,
+                          updated_at, finished_at
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Iterable
+
+from bot.config import settings
+
+logger = logging.getLogger(__name__)
+
+_KEY = "mass:"
+_CHECKPOINT_TTL = 14 * 24 * 3600
+_PROGRESS_EVERY_SEC = 30.0
+_BACKOFF_BASE = 1.0
+_MAX_ATTEMPTS = 3
+_BURST_SEC = 0.2
+
+SendFn = Callable[[Any, int], Awaitable[Any]]
+BatchFn = Callable[["BatchResult"], Awaitable[None]]
+
+
+class TokenBucket:
+    """Async token bucket; ``pause`` empties it until a flood-wait is over.
+
+    The default burst is a fifth of a second's worth, so burst + one second of
+    refill stays under a limit counted over any 1 s window.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None) -> None:
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate * _BURST_SEC)
+        self._tokens = self.capacity
+        self._stamp = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+        self._stamp = self._paused_until  # nothing accrues while paused
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + max(0.0, now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+
+
+class _GovernedBot:
+    """Bot proxy: every ``send_*`` call waits for its chat slot and a global token.
+
+    Flood-waits and transient errors retry that one call; anything else (or a
+    transient error past _MAX_ATTEMPTS) is raised to the campaign's ``send``.
+    """
+
+    def __init__(self, bot, bucket: TokenBucket, per_chat_interval: float) -> None:
+        self._bot = bot
+        self._bucket = bucket
+        self._interval = per_chat_interval
+        self._chat_next: dict[int, float] = {}
+
+    async def _wait_chat(self, chat_id: int) -> None:
+        delay = self._chat_next.get(chat_id, 0.0) - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def forget(self, chat_ids: Iterable[int]) -> None:
+        for chat_id in chat_ids:
+            self._chat_next.pop(chat_id, None)
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._bot, name)
+        if not name.startswith("send_") or not callable(attr):
+            return attr
+
+        async def governed(chat_id, *args, **kwargs):
+            from aiogram.exceptions import TelegramRetryAfter
+
+            attempts = 0
+            while True:
+                await self._wait_chat(chat_id)
+                await self._bucket.acquire()
+                # Spacing counts from the actual send, after any wait for a token
+                self._chat_next[chat_id] = time.monotonic() + self._interval
+                try:
+                    return await attr(chat_id, *args, **kwargs)
+                except TelegramRetryAfter as e:
+                    # Global flood-wait: every worker stops, this message goes again
+                    self._bucket.pause(e.retry_after)
+                    logger.warning("mass send flood-wait %ss", e.retry_after)
+                except Exception as e:
+                    attempts += 1
+                    if not _is_transient(e) or attempts >= _MAX_ATTEMPTS:
+                        raise
+                    await asyncio.sleep(_BACKOFF_BASE * 2 ** (attempts - 1) * random.uniform(1.0, 1.25))
+
+        return governed
+
+
+@dataclass
+class BatchResult:
+    """Recipients of one finished batch, by outcome."""
+    delivered: list[int] = field(default_factory=list)
+    blocked: list[int] = field(default_factory=list)
+    failed: list[int] = field(default_factory=list)
+
+
+@dataclass
+class SendReport:
+    campaign: str
+    total: int = 0
+    delivered: int = 0
+    blocked: int = 0
+    failed: int = 0
+    resumed_from: int | None = None
+    elapsed: float = 0.0
+
+    @property
+    def processed(self) -> int:
+        return self.delivered + self.blocked + self.failed
+
+    @property
+    def rate(self) -> float:
+        """Recipients per second over this run."""
+        return self.processed / self.elapsed if self.elapsed > 0 else 0.0
+
+
+async def mark_users_blocked(user_ids: list[int]) -> None:
+    """Set users.blocked_bot for a whole batch in one UPDATE."""
+    if not user_ids:
+        return
+    from sqlalchemy import update
+
+    from bot.models.base import async_session
+    from bot.models.user import User
+
+    async with async_session() as session:
+        await session.execute(update(User).where(User.id.in_(user_ids)).values(blocked_bot=True))
+        await session.commit()
+
+
+def _is_blocked(exc: Exception) -> bool:
+    from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+    if isinstance(exc, TelegramForbiddenError):
+        return True
+    # A deleted account answers 400 "user is deactivated"; "chat not found"
+    # (never started the bot) is a plain failure
+    return isinstance(exc, TelegramBadRequest) and "user is deactivated" in str(exc).lower()
+
+
+def _is_transient(exc: Exception) -> bool:
+    from aiogram.exceptions import TelegramNetworkError, TelegramServerError
+
+    return isinstance(exc, (TelegramNetworkError, TelegramServerError, asyncio.TimeoutError))
+
+
+class MassSender:
+    """Runs campaigns: ``await MassSender(bot).run("welcome", user_ids, send)``."""
+
+    def __init__(
+        self,
+        bot,
+        *,
+        rate: float | None = None,
+        per_chat_interval: float | None = None,
+        workers: int | None = None,
+        batch_size: int | None = None,
+        redis_factory: Callable | None = None,
+        blocked_handler: Callable[[list[int]], Awaitable[None]] | None = mark_users_blocked,
+    ) -> None:
+        self.bucket = TokenBucket(rate or settings.MASS_SEND_RATE)
+        self.bot = _GovernedBot(
+            bot, self.bucket,
+            settings.MASS_SEND_PER_CHAT_INTERVAL if per_chat_interval is None else per_chat_interval,
+        )
+        self.workers = workers or settings.MASS_SEND_WORKERS
+        self.batch_size = batch_size or settings.MASS_SEND_BATCH
+        self._redis_factory = redis_factory
+        self._blocked_handler = blocked_handler
+
+    @property
+    def redis(self):
+        if self._redis_factory is not None:
+            return self._redis_factory()
+        from bot.services.cache import cache
+        return cache.redis
+
+    # ── Checkpoints ─────────────────────────────────────────────────────
+
+    async def checkpoint(self, campaign: str) -> dict[str, str]:
+        try:
+            return await self.redis.hgetall(_KEY + campaign) or {}
+        except Exception:
+            logger.warning("mass send %s: checkpoint unavailable", campaign, exc_info=True)
+            return {}
+
+    async def _save_checkpoint(self, report: SendReport, cursor: int, remaining: int) -> None:
+        rate = report.rate
+        try:
+            key = _KEY + report.campaign
+            await self.redis.hset(key, mapping={
+                "cursor": cursor,
+                "total": report.total,
+                "delivered": report.delivered,
+                "blocked": report.blocked,
+                "failed": report.failed,
+                "rate": f"{rate:.2f}",
+                "eta_sec": int(remaining / rate) if rate > 0 else -1,
+                "updated_at": int(time.time()),
+            })
+            await self.redis.expire(key, _CHECKPOINT_TTL)
+        except Exception:
+            logger.debug("mass send %s: checkpoint write failed", report.campaign, exc_info=True)
+
+    async def _finish(self, campaign: str) -> None:
+        try:
+            await self.redis.hdel(_KEY + campaign, "cursor")
+            await self.redis.hset(_KEY + campaign, "finished_at", int(time.time()))
+        except Exception:
+            logger.debug("mass send %s: checkpoint finish failed", campaign, exc_info=True)
+
+    # ── Sending ─────────────────────────────────────────────────────────
+
+    async def _deliver(self, send: SendFn, user_id: int) -> str:
+        # Retries happen per message inside the governed bot: retrying the
+        # whole send here would repeat messages the recipient already got
+        try:
+            await send(self.bot, user_id)
+            return "delivered"
+        except Exception as e:
+            if _is_blocked(e):
+                return "blocked"
+            logger.debug("mass send to %s failed: %s", user_id, e)
+            return "failed"
+
+    async def _run_batch(self, send: SendFn, batch: list[int]) -> BatchResult:
+        result = BatchResult()
+        queue: asyncio.Queue[int] = asyncio.Queue()
+        for user_id in batch:
+            queue.put_nowait(user_id)
+
+        async def worker() -> None:
+            while True:
+                try:
+                    user_id = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                outcome = await self._deliver(send, user_id)
+                getattr(result, outcome).append(user_id)
+
+        await asyncio.gather(*(worker() for _ in range(min(self.workers, len(batch)))))
+        self.bot.forget(batch)
+        return result
+
+    async def run(
+        self,
+        campaign: str,
+        recipients: Iterable[int],
+        send: SendFn,
+        *,
+        on_batch: BatchFn | None = None,
+    ) -> SendReport:
+        """Send to every recipient not yet covered by *campaign*'s checkpoint.
+
+        *send(bot, user_id)* performs the messages for one user through the
+        governed bot, which retries each message on its own; *send* must let
+        the bot's exceptions propagate (or at least TelegramRetryAfter, so
+        the pause reaches the bucket). *on_batch* persists per-batch outcomes (e.g. one UPDATE
+        of a "sent" flag). Blocked users are marked by ``blocked_handler``.
+        """
+        user_ids = sorted(set(recipients))
+        report = SendReport(campaign=campaign)
+        state = await self.checkpoint(campaign)
+        if state.get("cursor"):
+            cursor = int(state["cursor"])
+            report.resumed_from = cursor
+            user_ids = [uid for uid in user_ids if uid > cursor]
+            logger.info("mass send %s: resuming after user %d (%d left)", campaign, cursor, len(user_ids))
+        report.total = len(user_ids)
+        if not user_ids:
+            return report
+
+        started = time.monotonic()
+        last_log = started
+        for start in range(0, len(user_ids), self.batch_size):
+            batch = user_ids[start:start + self.batch_size]
+            result = await self._run_batch(send, batch)
+            report.delivered += len(result.delivered)
+            report.blocked += len(result.blocked)
+            report.failed += len(result.failed)
+            report.elapsed = time.monotonic() - started
+
+            try:
+                if result.blocked and self._blocked_handler is not None:
+                    await self._blocked_handler(result.blocked)
+                if on_batch is not None:
+                    await on_batch(result)
+            except Exception:
+                logger.warning("mass send %s: batch flag update failed", campaign, exc_info=True)
+
+            remaining = report.total - report.processed
+            await self._save_checkpoint(report, batch[-1], remaining)
+            now = time.monotonic()
+            if remaining and now - last_log >= _PROGRESS_EVERY_SEC:
+                last_log = now
+                logger.info(
+                    "mass send %s: %d/%d (%.1f/s, ETA %.0fs)",
+                    campaign, report.processed, report.total, report.rate,
+                    remaining / report.rate if report.rate else -1,
+                )
+
+        await self._finish(campaign)
+        logger.info(
+            "mass send %s done: delivered=%d blocked=%d failed=%d in %.0fs (%.1f/s)",
+            campaign, report.delivered, report.blocked, report.failed, report.elapsed, report.rate,
+        )
+        return report
@@ -8,7 +8,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 try:
-    from prometheus_client import Counter, Histogram, start_http_server
+    from prometheus_client import Counter, Gauge, Histogram, start_http_server
     _ENABLED = True
 except ImportError:
     logger.debug("prometheus_client not installed — metrics disabled")
@@ -33,12 +33,81 @@ if _ENABLED:
     )
     cache_hits = Counter("bot_cache_hits_total", "Telegram file_id cache hits")
     cache_misses = Counter("bot_cache_misses_total", "Telegram file_id cache misses")
+    cdn_upload_queue_depth = Gauge(
+        "bot_cdn_upload_queue_depth",
+        "CDN upload queue jobs",
+        ["state"],   # user / prefetch / delayed / inflight
+    )
+    cdn_uploads_total = Counter(
+        "bot_cdn_uploads_total",
+        "CDN upload attempts by outcome",
+        ["outcome"],   # uploaded / skipped / retry / flood_wait / failed
+    )
+    cdn_time_to_cdn = Histogram(
+        "bot_cdn_time_to_cdn_seconds",
+        "Enqueue-to-channel latency of CDN uploads",
+        ["priority"],
+        buckets=(1, 5, 15, 30, 60, 120, 300, 900, 3600),
+    )
+    ml_model_version = Gauge(
+        "bot_ml_model_version",
+        "Recommender model version served by this process",
+        ["model"],
+    )
+    voice_chat_gap = Histogram(
+        "bot_voice_chat_gap_seconds",
+        "Silence between tracks in voice chats (stream end to next play)",
+        ["source"],   # local (prefetched file) / remote (file_id)
+        buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+    )
+    search_phase_seconds = Histogram(
+        "bot_search_phase_seconds",
+        "Per-request time spent in each search phase (sampled searches only)",
+        ["phase"],   # tier0.* / provider.* / enrich.* / dedup / relevance_score / total
+        buckets=(0.001, 0.005, 0.025, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30),
+    )
+    search_trace_sample_rate = Gauge(
+        "bot_search_trace_sample_rate",
+        "Share of searches recorded in bot_search_phase_seconds",
+    )
+    provider_latency_quantile = Gauge(
+        "bot_provider_latency_quantile_seconds",
+        "Provider latency quantiles from the decayed sketches in provider_health",
+        ["provider", "operation", "window", "quantile"],   # window: 15m / 6h
+    )
+    story_card_renders = Counter(
+        "bot_story_card_renders_total",
+        "Story card requests by outcome",
+        ["kind", "result"],   # kind: track / recap; result: cached / joined / rendered / failed
+    )
+    proxy_requests = Counter(
+        "bot_proxy_requests_total",
+        "Requests through PROXY_POOL proxies by outcome",
+        ["proxy", "outcome"],   # proxy: host:port; outcome: ok / failed
+    )
+    proxy_latency = Histogram(
+        "bot_proxy_latency_seconds",
+        "Observed request latency (time to first byte for downloads) per proxy",
+        ["proxy"],
+        buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30),
+    )
+    proxy_inflight = Gauge(
+        "bot_proxy_inflight",
+        "Requests currently leased on each proxy",
+        ["proxy"],
+    )
+    proxy_score = Gauge(
+        "bot_proxy_score",
+        "Selection cost of each proxy (EWMA latency x load / success^2; lower is preferred)",
+        ["proxy"],
+    )
 
 else:
     class _Stub:
         def labels(self, **_): return self
         def inc(self, *_, **__): pass
         def observe(self, *_, **__): pass
+        def set(self, *_, **__): pass
         def time(self):
             import contextlib
             return contextlib.nullcontext()
@@ -49,6 +118,19 @@ else:
     provider_errors = _stub
     cache_hits = _stub
     cache_misses = _stub
+    cdn_upload_queue_depth = _stub
+    cdn_uploads_total = _stub
+    cdn_time_to_cdn = _stub
+    ml_model_version = _stub
+    voice_chat_gap = _stub
+    search_phase_seconds = _stub
+    search_trace_sample_rate = _stub
+    provider_latency_quantile = _stub
+    story_card_renders = _stub
+    proxy_requests = _stub
+    proxy_latency = _stub
+    proxy_inflight = _stub
+    proxy_score = _stub
 
 
 def start_metrics_server(port: int) -> None:
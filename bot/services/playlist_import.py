@@ -1,13 +1,15 @@
 """
 playlist_import.py — Import playlists from Spotify, Yandex Music, and Apple Music.
 
-Fetches track list from external services, searches each track
-via search_tracks, and creates a Playlist with found tracks.
+Fetches track list from external services, resolves each track (local
+catalog, then the query cache, then providers) and creates a Playlist with
+found tracks.
 """
 import asyncio
 import logging
 import re
-from typing import Callable, Optional
+import time
+from typing import AsyncIterator, Callable, Optional
 
 from bot.config import settings
 from bot.services.downloader import search_tracks
@@ -35,7 +37,7 @@ def _fetch_spotify_playlist_sync(playlist_id: str) -> tuple[str, list[dict]]:
         return ("", [])
 
     try:
-        pl = sp.playlist(playlist_id, fields="name,tracks.total,tracks.items(track(id,name,artists,duration_ms)),tracks.next")
+        pl = sp.playlist(playlist_id, fields="name,tracks.total,tracks.items(track(id,name,artists,duration_ms,external_ids)),tracks.next")
         name = pl.get("name", "Imported")
         tracks_data = pl.get("tracks", {})
         items = tracks_data.get("items", [])
@@ -335,6 +337,214 @@ def detect_playlist_url(text: str) -> Optional[str]:
     return None
 
 
+# ── Track resolution pipeline ───────────────────────────────────────────
+#
+# 1. bulk-match every row against the local catalog (ISRC, then normalized
+#    "artist title" == Track.search_text) — one query per 500 rows
+# 2. bulk-read the provider query cache (one MGET per provider)
+# 3. resolve the rest on Yandex → YouTube under an adaptive concurrency limit
+# Tracks are yielded as soon as they resolve, so progress streams to the user.
+
+_LOCAL_CHUNK = 500
+_CACHE_SOURCES = ("yandex", "youtube")
+_PROGRESS_INTERVAL = 1.0    # seconds between progress callbacks (Telegram edit limits)
+_PROVIDER_TIMEOUT = 8
+
+
+class _AdaptiveLimit:
+    """AIMD concurrency limit for provider lookups.
+
+    Grows by one slot per ``limit`` on-time calls (i.e. per "round trip") and
+    halves on a timeout / error or a call slower than *slow_after*, so a
+    healthy provider is driven hard and a struggling one is backed off.
+    """
+
+    def __init__(self, start: int = 8, low: int = 2, high: int = 32, slow_after: float = 4.0) -> None:
+        self.limit = float(start)
+        self.low = low
+        self.high = high
+        self.slow_after = slow_after
+        self.active = 0
+        self.peak = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.active < int(self.limit))
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+
+    async def release(self, ok: bool, latency: float) -> None:
+        async with self._cond:
+            self.active -= 1
+            if ok and latency <= self.slow_after:
+                self.limit = min(self.high, self.limit + 1 / self.limit)
+            else:
+                self.limit = max(self.low, self.limit / 2)
+            self._cond.notify_all()
+
+
+def _row_query(tr: dict) -> str:
+    return (tr.get("yt_query") or f"{tr.get('uploader', '')} - {tr.get('title', '')}").strip()
+
+
+def _row_keys(tr: dict) -> list[str]:
+    """Normalized catalog keys for a row: full artist credit, then the first artist."""
+    from bot.services.search_engine import track_search_text
+
+    title = tr.get("title", "")
+    artist = tr.get("uploader", "")
+    keys = [track_search_text(artist, title)]
+    first = re.split(r",|&| feat\.? | ft\.? ", artist, maxsplit=1)[0].strip()
+    if first and first != artist:
+        keys.append(track_search_text(first, title))
+    return [k for k in keys if k]
+
+
+def _catalog_track_to_dict(track) -> dict:
+    from bot.utils import fmt_duration
+
+    return {
+        "video_id": track.source_id,
+        "title": track.title or "Unknown",
+        "uploader": track.artist or "Unknown",
+        "duration": track.duration or 0,
+        "duration_fmt": fmt_duration(track.duration),
+        "source": track.source or "channel",
+        "file_id": track.file_id,
+    }
+
+
+async def match_local_catalog(ext_tracks: list[dict]) -> dict[int, dict]:
+    """Rows already in the ``tracks`` table, by position: ISRC first, then
+    normalized artist+title. The most downloaded row wins a tie."""
+    from sqlalchemy import select
+
+    from bot.models.base import async_session
+    from bot.models.track import Track
+
+    by_isrc: dict[str, list[int]] = {}
+    by_key: dict[str, list[int]] = {}
+    for pos, tr in enumerate(ext_tracks):
+        isrc = (tr.get("isrc") or "").strip().upper()
+        if isrc:
+            by_isrc.setdefault(isrc, []).append(pos)
+        for key in _row_keys(tr):
+            by_key.setdefault(key, []).append(pos)
+
+    matched: dict[int, dict] = {}
+
+    async def _lookup(column, index: dict[str, list[int]]) -> None:
+        values = list(index)
+        for i in range(0, len(values), _LOCAL_CHUNK):
+            chunk = values[i:i + _LOCAL_CHUNK]
+            async with async_session() as session:
+                rows = (await session.execute(
+                    select(Track).where(column.in_(chunk)).order_by(Track.downloads.desc())
+                )).scalars().all()
+            for track in rows:
+                value = track.isrc.upper() if column is Track.isrc else track.search_text
+                for pos in index.get(value, ()):
+                    matched.setdefault(pos, _catalog_track_to_dict(track))
+
+    try:
+        if by_isrc:
+            await _lookup(Track.isrc, by_isrc)
+        if by_key:
+            await _lookup(Track.search_text, by_key)
+    except Exception:
+        logger.warning("playlist import: local catalog match failed", exc_info=True)
+    return matched
+
+
+async def _match_query_cache(ext_tracks: list[dict], positions: list[int]) -> dict[int, dict]:
+    """Rows whose provider search is already in the query cache (first hit wins)."""
+    from bot.services.cache import cache
+
+    matched: dict[int, dict] = {}
+    for source in _CACHE_SOURCES:
+        todo = [p for p in positions if p not in matched]
+        if not todo:
+            break
+        cached = await cache.get_query_cache_many([_row_query(ext_tracks[p]) for p in todo], source)
+        for pos in todo:
+            hit = cached.get(_row_query(ext_tracks[pos]))
+            if hit:
+                matched[pos] = hit[0]
+    return matched
+
+
+async def _search_provider(query: str) -> list[dict]:
+    """Yandex first (fast, downloads reliably), YouTube fallback. Raises if both fail."""
+    from bot.services.cache import cache
+    from bot.services.yandex_provider import search_yandex
+
+    error: Exception | None = None
+    try:
+        ya = await asyncio.wait_for(search_yandex(query, limit=1), timeout=_PROVIDER_TIMEOUT)
+        if ya:
+            await cache.set_query_cache(query, ya, "yandex")
+            return ya
+    except Exception as e:
+        error = e
+    try:
+        yt = await asyncio.wait_for(
+            search_tracks(query, max_results=1, source="youtube"), timeout=_PROVIDER_TIMEOUT,
+        )
+    except Exception as e:
+        raise e from error
+    if yt:
+        await cache.set_query_cache(query, yt, "youtube")
+    return yt or []
+
+
+async def iter_resolved_tracks(
+    ext_tracks: list[dict],
+    limiter: _AdaptiveLimit | None = None,
+) -> AsyncIterator[tuple[int, dict | None, str]]:
+    """Resolve playlist rows, yielding ``(position, track_or_None, stage)`` as
+    each one finishes — local catalog and cache hits first, then provider
+    lookups in completion order. *stage* is "local", "cache" or "provider"."""
+    local = await match_local_catalog(ext_tracks)
+    for pos in sorted(local):
+        yield pos, local[pos], "local"
+
+    rest = [p for p in range(len(ext_tracks)) if p not in local]
+    cached = await _match_query_cache(ext_tracks, rest)
+    for pos in sorted(cached):
+        yield pos, cached[pos], "cache"
+
+    misses = [p for p in rest if p not in cached]
+    if not misses:
+        return
+    limiter = limiter or _AdaptiveLimit()
+    done: asyncio.Queue[tuple[int, dict | None]] = asyncio.Queue()
+
+    async def _resolve(pos: int) -> None:
+        await limiter.acquire()
+        t0 = time.monotonic()
+        ok = False
+        track = None
+        try:
+            res = await _search_provider(_row_query(ext_tracks[pos]))
+            ok = True
+            track = res[0] if res else None
+        except Exception:
+            logger.debug("playlist import: lookup failed for row %d", pos, exc_info=True)
+        finally:
+            await limiter.release(ok, time.monotonic() - t0)
+            done.put_nowait((pos, track))
+
+    tasks = [asyncio.create_task(_resolve(p)) for p in misses]
+    try:
+        for _ in misses:
+            pos, track = await done.get()
+            yield pos, track, "provider"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
 async def import_playlist_tracks(
     url: str,
     source: str,
@@ -343,8 +553,9 @@ async def import_playlist_tracks(
     """Import tracks from external playlist.
 
     Returns (playlist_name, found_tracks, total_count).
-    found_tracks are search_tracks-compatible dicts.
-    progress_cb is called with (found_so_far, total) periodically.
+    found_tracks are search_tracks-compatible dicts in playlist order.
+    progress_cb is called with (found_so_far, total) at most once per
+    _PROGRESS_INTERVAL while tracks resolve, and once at the end.
     """
     if source == "spotify":
         name, ext_tracks = await fetch_spotify_playlist(url)
@@ -361,51 +572,38 @@ async def import_playlist_tracks(
         return (name or "Imported", [], 0)
 
     total = len(ext_tracks)
+    resolved: dict[int, dict] = {}
+    stages: dict[str, int] = {}
+    t0 = last_report = time.monotonic()
 
-    # Search tracks in parallel batches of 5.
-    # Yandex-first: it's the fast, WORKING provider (~0.6s) and its tracks
-    # download reliably; YouTube (rate-limited via WARP) is only the fallback.
-    async def _resolve_one(query: str) -> list[dict]:
-        try:
-            from bot.services.yandex_provider import search_yandex
-            ya = await asyncio.wait_for(search_yandex(query, limit=1), timeout=8)
-            if ya:
-                return ya
-        except Exception:
-            pass
+    async def _report() -> None:
+        if not progress_cb:
+            return
         try:
-            return await search_tracks(query, max_results=1, source="youtube")
+            result = progress_cb(len(resolved), total)
+            if asyncio.iscoroutine(result):
+                await result
         except Exception:
-            return []
+            logger.debug("import progress callback failed", exc_info=True)
+
+    async for pos, track, stage in iter_resolved_tracks(ext_tracks):
+        if track:
+            resolved[pos] = track
+            stages[stage] = stages.get(stage, 0) + 1
+        if time.monotonic() - last_report >= _PROGRESS_INTERVAL:
+            last_report = time.monotonic()
+            await _report()
+    await _report()
 
     found: list[dict] = []
     seen_ids: set[str] = set()
-    batch_size = 5
-
-    for i in range(0, len(ext_tracks), batch_size):
-        batch = ext_tracks[i:i + batch_size]
-        tasks = []
-        for tr in batch:
-            query = tr.get("yt_query") or f"{tr.get('uploader', '')} - {tr.get('title', '')}"
-            tasks.append(_resolve_one(query.strip()))
-
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        for res in results:
-            if isinstance(res, list) and res:
-                vid = res[0].get("video_id", "")
-                if vid and vid not in seen_ids:
-                    seen_ids.add(vid)
-                    found.append(res[0])
-
-        # Progress callback
-        if progress_cb:
-            try:
-                result = progress_cb(len(found), total)
-                if asyncio.iscoroutine(result):
-                    await result
-            except Exception:
-                logger.debug("import progress callback failed", exc_info=True)
-
-        await asyncio.sleep(0.2)
-
+    for pos in sorted(resolved):
+        vid = resolved[pos].get("video_id", "")
+        if vid and vid not in seen_ids:
+            seen_ids.add(vid)
+            found.append(resolved[pos])
+    logger.info(
+        "playlist import: %d/%d resolved in %.1fs %s",
+        len(found), total, time.monotonic() - t0, stages,
+    )
     return (name, found, total)
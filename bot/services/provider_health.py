@@ -3,27 +3,51 @@ provider_health.py — Track provider latency and reliability.
 
 Records search/download timings and success rates per provider.
 Provides health scores and admin-visible stats.
+
+Latencies go into two time-decayed quantile sketches per provider:operation
+(see latency_sketch): a 15-minute half-life one that drives health scores and
+auto-disable, and a 6-hour one for the longer view. Each node persists its
+stats (stamped with updated_at) as one field of a Redis hash, and
+get_fleet_stats() merges the sketches of every node that wrote recently into
+fleet-wide p50/p95/p99; fields of dead or redeployed nodes are dropped.
 """
 import asyncio
 import json
 import logging
+import os
+import socket
 import time
 from collections import defaultdict
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 
+from bot.config import settings
+from bot.services.latency_sketch import LatencySketch
+
 logger = logging.getLogger(__name__)
 
-_WINDOW = 100  # keep last N events per provider
-_REDIS_KEY = "provider_health:v1"
+_RECENT_HALF_LIFE = 15 * 60   # health score / auto-disable window
+_LONG_HALF_LIFE = 6 * 3600    # admin summary / dashboards
+_REDIS_KEY = "provider_health:v2"     # hash: node id -> this node's stats
+_LEGACY_REDIS_KEY = "provider_health:v1"
 _REDIS_TTL = 7 * 24 * 3600  # 7 days
+_NODE_STALE_SEC = _LONG_HALF_LIFE   # a node silent this long is left out of the fleet
 _persist_task: asyncio.Task | None = None
 
 
+def _recent_sketch() -> LatencySketch:
+    return LatencySketch(half_life=_RECENT_HALF_LIFE)
+
+
+def _long_sketch() -> LatencySketch:
+    return LatencySketch(half_life=_LONG_HALF_LIFE)
+
+
 @dataclass
 class _ProviderStat:
-    """Rolling window stats for a single provider."""
-    latencies: list[float] = field(default_factory=list)
+    """Success counters and decayed latency sketches for a single provider."""
+    latency: LatencySketch = field(default_factory=_recent_sketch)
+    latency_long: LatencySketch = field(default_factory=_long_sketch)
     successes: int = 0
     failures: int = 0
     last_error: str | None = None
@@ -41,17 +65,19 @@ class _ProviderStat:
 
     @property
     def avg_latency(self) -> float:
-        if not self.latencies:
-            return 0.0
-        return sum(self.latencies) / len(self.latencies)
+        return self.latency.mean
+
+    @property
+    def p50_latency(self) -> float:
+        return self.latency.quantile(0.50)
 
     @property
     def p95_latency(self) -> float:
-        if not self.latencies:
-            return 0.0
-        sorted_l = sorted(self.latencies)
-        idx = int(len(sorted_l) * 0.95)
-        return sorted_l[min(idx, len(sorted_l) - 1)]
+        return self.latency.quantile(0.95)
+
+    @property
+    def p99_latency(self) -> float:
+        return self.latency.quantile(0.99)
 
     @property
     def health_score(self) -> float:
@@ -63,20 +89,29 @@ class _ProviderStat:
         latency_penalty = min(self.avg_latency / 10.0, 1.0) * 0.3
         return max(0.0, sr - latency_penalty)
 
+    def _add_latency(self, latency: float) -> None:
+        now = time.time()
+        self.latency.add(latency, now=now)
+        self.latency_long.add(latency, now=now)
+
     def record_success(self, latency: float) -> None:
         self.successes += 1
-        self.latencies.append(latency)
-        if len(self.latencies) > _WINDOW:
-            self.latencies.pop(0)
+        self._add_latency(latency)
 
     def record_failure(self, latency: float, error: str = "") -> None:
         self.failures += 1
-        self.latencies.append(latency)
-        if len(self.latencies) > _WINDOW:
-            self.latencies.pop(0)
+        self._add_latency(latency)
         self.last_error = error[:200] if error else None
         self.last_error_at = datetime.now(timezone.utc)
 
+    def merge(self, other: "_ProviderStat") -> None:
+        self.successes += other.successes
+        self.failures += other.failures
+        self.latency.merge(other.latency)
+        self.latency_long.merge(other.latency_long)
+        if other.last_error_at and (self.last_error_at is None or other.last_error_at > self.last_error_at):
+            self.last_error, self.last_error_at = other.last_error, other.last_error_at
+
 
 # Global provider stats registry
 _stats: dict[str, _ProviderStat] = defaultdict(_ProviderStat)
@@ -140,22 +175,52 @@ def _serialize_stats() -> dict:
         out[key] = {
             "successes": stat.successes,
             "failures": stat.failures,
-            "latencies": stat.latencies[-_WINDOW:],
+            "latency": stat.latency.to_dict(),
+            "latency_long": stat.latency_long.to_dict(),
             "last_error": stat.last_error,
             "last_error_at": stat.last_error_at.isoformat() if stat.last_error_at else None,
         }
     return out
 
 
+def _stat_from_raw(raw: dict) -> _ProviderStat:
+    stat = _ProviderStat()
+    stat.successes = int(raw.get("successes", 0))
+    stat.failures = int(raw.get("failures", 0))
+    if raw.get("latency"):
+        stat.latency = LatencySketch.from_dict(raw["latency"], half_life=_RECENT_HALF_LIFE)
+    if raw.get("latency_long"):
+        stat.latency_long = LatencySketch.from_dict(raw["latency_long"], half_life=_LONG_HALF_LIFE)
+    for latency in raw.get("latencies") or []:   # v1 payload: raw rolling window
+        stat._add_latency(float(latency))
+    stat.last_error = raw.get("last_error")
+    ts = raw.get("last_error_at")
+    stat.last_error_at = datetime.fromisoformat(ts) if ts else None
+    return stat
+
+
 def _deserialize_stats(data: dict) -> None:
     for key, raw in data.items():
-        stat = _stats[key]
-        stat.successes = int(raw.get("successes", 0))
-        stat.failures = int(raw.get("failures", 0))
-        stat.latencies = list(raw.get("latencies") or [])[-_WINDOW:]
-        stat.last_error = raw.get("last_error")
-        ts = raw.get("last_error_at")
-        stat.last_error_at = datetime.fromisoformat(ts) if ts else None
+        _stats[key] = _stat_from_raw(raw)
+
+
+def _node_field() -> str:
+    # Without NODE_ID, worker processes on one host each need their own field
+    return settings.NODE_ID or f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _parse_node_field(raw: str | None) -> tuple[float, dict] | None:
+    """``(updated_at, stats)`` of a node's hash field; updated_at is 0 for
+    fields written before it was stored."""
+    try:
+        data = json.loads(raw) if raw else None
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(data, dict):
+        return None
+    if "stats" in data:
+        return float(data.get("updated_at") or 0), data["stats"]
+    return 0.0, data
 
 
 def _schedule_persist() -> None:
@@ -173,14 +238,31 @@ async def _persist_stats_to_redis() -> None:
     payload = _serialize_stats()
     if not payload:
         return
+    _export_quantiles()
     try:
         from bot.services.cache import cache
 
-        await cache.redis.setex(_REDIS_KEY, _REDIS_TTL, json.dumps(payload))
+        field_value = json.dumps({"updated_at": time.time(), "stats": payload})
+        await cache.redis.hset(_REDIS_KEY, _node_field(), field_value)
+        await cache.redis.expire(_REDIS_KEY, _REDIS_TTL)
     except Exception:
         logger.debug("provider_health persist failed", exc_info=True)
 
 
+def _export_quantiles() -> None:
+    from bot.services.metrics import provider_latency_quantile
+
+    for key, stat in _stats.items():
+        if stat.total == 0:
+            continue
+        provider, _, operation = key.partition(":")
+        for window, sketch in (("15m", stat.latency), ("6h", stat.latency_long)):
+            for q in ("0.5", "0.95", "0.99"):
+                provider_latency_quantile.labels(
+                    provider=provider, operation=operation, window=window, quantile=q,
+                ).set(sketch.quantile(float(q)))
+
+
 async def ensure_stats_loaded() -> None:
     """Load persisted stats from Redis when in-memory window is empty."""
     if _has_any_data():
@@ -188,16 +270,54 @@ async def ensure_stats_loaded() -> None:
     try:
         from bot.services.cache import cache
 
-        raw = await cache.redis.get(_REDIS_KEY)
+        raw = await cache.redis.hget(_REDIS_KEY, _node_field())
         if not raw:
-            return
-        data = json.loads(raw)
-        if isinstance(data, dict):
-            _deserialize_stats(data)
+            raw = await cache.redis.get(_LEGACY_REDIS_KEY)
+        parsed = _parse_node_field(raw)
+        if parsed:
+            _deserialize_stats(parsed[1])
     except Exception:
         logger.debug("provider_health load failed", exc_info=True)
 
 
+async def get_fleet_stats() -> dict[str, _ProviderStat]:
+    """Stats of every node (this one live, the others from Redis), merged per key.
+
+    Fields not refreshed for _NODE_STALE_SEC (dead nodes, old hostnames after
+    a redeploy) are skipped and deleted.
+    """
+    merged: dict[str, _ProviderStat] = {}
+    for key, stat in _stats.items():
+        if stat.total:
+            merged[key] = _ProviderStat()
+            merged[key].merge(stat)
+    try:
+        from bot.services.cache import cache
+
+        nodes = await cache.redis.hgetall(_REDIS_KEY)
+    except Exception:
+        logger.debug("provider_health fleet load failed", exc_info=True)
+        return merged
+    own = _node_field()
+    cutoff = time.time() - _NODE_STALE_SEC
+    stale: list[str] = []
+    for node, raw in (nodes or {}).items():
+        if node == own:
+            continue
+        parsed = _parse_node_field(raw)
+        if parsed is None or parsed[0] < cutoff:
+            stale.append(node)
+            continue
+        for key, item in parsed[1].items():
+            merged.setdefault(key, _ProviderStat()).merge(_stat_from_raw(item))
+    if stale:
+        try:
+            await cache.redis.hdel(_REDIS_KEY, *stale)
+        except Exception:
+            logger.debug("provider_health stale node cleanup failed", exc_info=True)
+    return merged
+
+
 def _check_auto_disable(provider: str) -> None:
     """Disable provider if aggregate health across all operations < threshold."""
     scores = []
@@ -243,9 +363,14 @@ def get_provider_health(provider: str | None = None) -> dict:
     return {key: _stat_to_dict(stat) for key, stat in _stats.items()}
 
 
-def get_health_summary() -> str:
-    """Format a human-readable health summary for admin panel."""
-    if not _has_any_data():
+def get_health_summary(stats: dict[str, _ProviderStat] | None = None) -> str:
+    """Format a human-readable health summary for admin panel.
+
+    *stats* defaults to this node's; pass get_fleet_stats() for the whole fleet.
+    """
+    if stats is None:
+        stats = _stats
+    if not any(stat.total > 0 for stat in stats.values()):
         return (
             "<b>🩺 Здоровье провайдеров</b>\n\n"
             "Пока нет статистики — она появится после первых поисков и скачиваний.\n"
@@ -253,8 +378,8 @@ def get_health_summary() -> str:
         )
 
     lines = ["<b>🩺 Здоровье провайдеров</b>\n"]
-    for key in sorted(_stats.keys()):
-        stat = _stats[key]
+    for key in sorted(stats.keys()):
+        stat = stats[key]
         if stat.total == 0:
             continue
         emoji = "🟢" if stat.health_score > 0.7 else "🟡" if stat.health_score > 0.4 else "🔴"
@@ -262,7 +387,8 @@ def get_health_summary() -> str:
             f"{emoji} <b>{key}</b>: "
             f"{stat.success_rate:.0%} OK | "
             f"avg {stat.avg_latency:.1f}s | "
-            f"p95 {stat.p95_latency:.1f}s | "
+            f"p50/p95/p99 {stat.p50_latency:.1f}/{stat.p95_latency:.1f}/{stat.p99_latency:.1f}s | "
+            f"p95 6ч {stat.latency_long.quantile(0.95):.1f}s | "
             f"n={stat.total}"
         )
         if stat.last_error:
@@ -284,7 +410,9 @@ def _stat_to_dict(stat: _ProviderStat) -> dict:
         "failures": stat.failures,
         "success_rate": round(stat.success_rate, 3),
         "avg_latency": round(stat.avg_latency, 3),
+        "p50_latency": round(stat.p50_latency, 3),
         "p95_latency": round(stat.p95_latency, 3),
+        "p99_latency": round(stat.p99_latency, 3),
         "health_score": round(stat.health_score, 3),
         "last_error": stat.last_error,
     }
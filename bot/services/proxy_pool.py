@@ -1,23 +1,64 @@
 """
 proxy_pool.py — Proxy rotation for yt-dlp and HTTP providers.
 
-Parses PROXY_POOL env var (comma-separated socks5/http proxies),
-round-robin selection with health tracking, auto-disable bad proxies.
+Parses PROXY_POOL env var (comma-separated socks5/http proxies) and picks a
+proxy per request by observed health instead of plain round-robin:
+
+  * every latency sample is first divided by the median of recent samples
+    for the same upstream host — YouTube search takes seconds, Yandex calls
+    a fraction of one — so a proxy is judged by how it compares on the hosts
+    it serves, not by which hosts it serves;
+  * every proxy keeps a peak-EWMA of that relative latency (jumps up on a
+    slow sample, decays with time constant PROXY_EWMA_TAU) and an EWMA
+    success rate;
+  * its score is ``latency × (in-flight + 1) / success²`` — lower is better;
+    while a proxy sits idle its penalty fades back to the pool prior, so a
+    recovered proxy gets traffic again;
+  * selection is power-of-two-choices over available proxies below
+    PROXY_MAX_INFLIGHT, with a sticky proxy per upstream host (keep-alive
+    reuse) that is kept while it scores within 2× of the alternative;
+  * after _MAX_CONSECUTIVE_FAILURES failures a proxy is benched for
+    _BAN_COOLDOWN seconds.
+
+Callers that can report the outcome use ``lease()`` (or acquire/release);
+``get_next()`` only picks.
 """
 import asyncio
+import contextlib
 import logging
+import math
+import random
+import statistics
+import threading
 import time
-from dataclasses import dataclass, field
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Iterator
+from urllib.parse import urlsplit
 
 import aiohttp
 
 from bot.config import settings
+from bot.services.metrics import proxy_inflight, proxy_latency, proxy_requests, proxy_score
 
 logger = logging.getLogger(__name__)
 
 _HEALTH_CHECK_INTERVAL = 120  # seconds
 _BAN_COOLDOWN = 60  # seconds after failure before retry
 _MAX_CONSECUTIVE_FAILURES = 3
+_MIN_ALPHA = 0.1        # every sample moves the EWMAs at least this much, even in a burst
+_STICKY_SLACK = 2.0     # keep a host's proxy while its score is within this factor of the pick
+_DEFAULT_LATENCY = 1.0  # prior (relative latency) before any proxy has been measured
+_HOST_WINDOW = 64       # recent samples per upstream host behind its median
+
+
+def _label(url: str) -> str:
+    """host:port of a proxy URL — never export credentials as a metric label."""
+    try:
+        parts = urlsplit(url)
+        return f"{parts.hostname}:{parts.port}" if parts.hostname else url.split("@")[-1]
+    except ValueError:
+        return url.split("@")[-1]
 
 
 @dataclass
@@ -28,37 +69,105 @@ class _ProxyEntry:
     consecutive_failures: int = 0
     disabled_until: float = 0.0
     last_used: float = 0.0
+    latency: float | None = None    # peak-EWMA of latency / host median, None until measured
+    success_rate: float = 1.0       # EWMA of 1 (ok) / 0 (failed)
+    inflight: int = 0
+    last_seen: float = 0.0          # monotonic time of the last observation
 
     @property
     def is_available(self) -> bool:
         return time.monotonic() >= self.disabled_until
 
-    def record_success(self) -> None:
+    def _observe(self, ok: bool, latency: float | None, now: float | None) -> None:
+        now = time.monotonic() if now is None else now
+        if self.last_seen:
+            w = min(math.exp(-(now - self.last_seen) / settings.PROXY_EWMA_TAU), 1 - _MIN_ALPHA)
+        else:
+            w = 0.0
+        if latency is not None:
+            if self.latency is None or latency > self.latency:
+                self.latency = latency      # peak: react to a slowdown at once
+            else:
+                self.latency = self.latency * w + latency * (1 - w)
+        self.success_rate = self.success_rate * w + (1.0 if ok else 0.0) * (1 - w)
+        self.last_seen = now
+
+    def score(self, prior: float, now: float | None = None) -> float:
+        """Expected cost of sending one more request here (lower is better)."""
+        now = time.monotonic() if now is None else now
+        latency = self.latency if self.latency is not None else prior
+        success = self.success_rate
+        if self.last_seen:
+            # Idle proxies drift back to the prior, so a benched one gets retried.
+            r = math.exp(-(now - self.last_seen) / settings.PROXY_RECOVERY_SEC)
+            latency = r * latency + (1 - r) * prior
+            success = r * success + (1 - r)
+        return latency * (self.inflight + 1) / max(success, 0.05) ** 2
+
+    def record_success(self, latency: float | None = None, now: float | None = None) -> None:
         self.successes += 1
         self.consecutive_failures = 0
+        self._observe(True, latency, now)
 
-    def record_failure(self) -> None:
+    def record_failure(self, latency: float | None = None, now: float | None = None) -> None:
         self.failures += 1
         self.consecutive_failures += 1
+        self._observe(False, latency, now)
         if self.consecutive_failures >= _MAX_CONSECUTIVE_FAILURES:
             self.disabled_until = time.monotonic() + _BAN_COOLDOWN
             logger.warning("Proxy %s disabled for %ds after %d failures",
-                           self.url, _BAN_COOLDOWN, self.consecutive_failures)
+                           _label(self.url), _BAN_COOLDOWN, self.consecutive_failures)
+
+
+class ProxyLease:
+    """One request through a proxy; see ``ProxyPool.lease``."""
+
+    __slots__ = ("url", "failed", "_t0", "_latency")
+
+    def __init__(self, url: str | None) -> None:
+        self.url = url
+        self.failed = False
+        self._t0 = time.monotonic()
+        self._latency: float | None = None
+
+    def first_byte(self) -> None:
+        """Mark the response start: long transfers then report TTFB as the latency."""
+        if self._latency is None:
+            self._latency = time.monotonic() - self._t0
+
+    def fail(self) -> None:
+        """Count this request as a proxy failure even though no exception escaped."""
+        self.failed = True
+
+    @property
+    def latency(self) -> float:
+        return self._latency if self._latency is not None else time.monotonic() - self._t0
 
 
 class ProxyPool:
     def __init__(self) -> None:
         self._proxies: list[_ProxyEntry] = []
-        self._index: int = 0
+        self._by_url: dict[str, _ProxyEntry] = {}
+        self._sticky: dict[str, str] = {}   # upstream host → proxy URL
+        self._host_samples: dict[str, deque[float]] = {}  # upstream host → recent latencies
+        self._lock = threading.Lock()       # yt-dlp picks proxies from worker threads
+        self._rng = random.Random()
 
     def load_from_config(self) -> None:
         raw = getattr(settings, "PROXY_POOL", None) or ""
         if not raw:
             return
         urls = [u.strip() for u in raw.split(",") if u.strip()]
-        self._proxies = [_ProxyEntry(url=u) for u in urls]
+        self.set_proxies(urls)
         logger.info("Proxy pool loaded: %d proxies", len(self._proxies))
 
+    def set_proxies(self, urls: list[str]) -> None:
+        with self._lock:
+            self._proxies = [_ProxyEntry(url=u) for u in dict.fromkeys(urls)]
+            self._by_url = {p.url: p for p in self._proxies}
+            self._sticky.clear()
+            self._host_samples.clear()
+
     @property
     def size(self) -> int:
         return len(self._proxies)
@@ -67,30 +176,130 @@ class ProxyPool:
     def available_count(self) -> int:
         return sum(1 for p in self._proxies if p.is_available)
 
-    def get_next(self) -> str | None:
-        """Get next available proxy URL (round-robin). Returns None if no proxies."""
+    # ── Selection ────────────────────────────────────────────────────────
+
+    def _prior(self) -> float:
+        measured = [p.latency for p in self._proxies if p.latency is not None]
+        return statistics.median(measured) if measured else _DEFAULT_LATENCY
+
+    def _pick(self, host: str | None, now: float) -> _ProxyEntry | None:
+        available = [p for p in self._proxies if p.is_available]
+        if not available:
+            return None
+        cap = settings.PROXY_MAX_INFLIGHT
+        candidates = [p for p in available if p.inflight < cap] or available
+        prior = self._prior()
+
+        if len(candidates) == 1:
+            pick = candidates[0]
+        else:
+            a, b = self._rng.sample(candidates, 2)
+            sa, sb = a.score(prior, now), b.score(prior, now)
+            pick = a if (sa, a.last_used) <= (sb, b.last_used) else b
+
+        if host:
+            sticky = self._by_url.get(self._sticky.get(host, ""))
+            if (sticky is not None and sticky in candidates
+                    and sticky.score(prior, now) <= _STICKY_SLACK * pick.score(prior, now)):
+                pick = sticky
+            self._sticky[host] = pick.url
+        pick.last_used = now
+        return pick
+
+    def get_next(self, host: str | None = None) -> str | None:
+        """Pick a proxy URL (health-weighted, sticky per *host*). Returns None if none is available."""
         if not self._proxies:
             return None
-        # Try all proxies starting from current index
-        for _ in range(len(self._proxies)):
-            proxy = self._proxies[self._index % len(self._proxies)]
-            self._index += 1
-            if proxy.is_available:
-                proxy.last_used = time.monotonic()
-                return proxy.url
-        return None
-
-    def record_success(self, proxy_url: str) -> None:
-        for p in self._proxies:
-            if p.url == proxy_url:
-                p.record_success()
-                return
+        with self._lock:
+            proxy = self._pick(host, time.monotonic())
+        return proxy.url if proxy else None
 
-    def record_failure(self, proxy_url: str) -> None:
-        for p in self._proxies:
-            if p.url == proxy_url:
-                p.record_failure()
+    def acquire(self, host: str | None = None) -> str | None:
+        """Like ``get_next`` but counts the request in flight until ``release``."""
+        if not self._proxies:
+            return None
+        with self._lock:
+            proxy = self._pick(host, time.monotonic())
+            if proxy is None:
+                return None
+            proxy.inflight += 1
+        proxy_inflight.labels(proxy=_label(proxy.url)).set(proxy.inflight)
+        return proxy.url
+
+    def release(
+        self, proxy_url: str, ok: bool, latency: float | None = None, host: str | None = None,
+    ) -> None:
+        """Finish a request started with ``acquire`` and record its outcome.
+
+        Pass the same *host* as to ``acquire``: the latency is judged against
+        that host's median.
+        """
+        with self._lock:
+            proxy = self._by_url.get(proxy_url)
+            if proxy is None:
                 return
+            proxy.inflight = max(0, proxy.inflight - 1)
+            self._record(proxy, ok, latency, host)
+        proxy_inflight.labels(proxy=_label(proxy_url)).set(proxy.inflight)
+
+    @contextlib.contextmanager
+    def lease(
+        self,
+        host: str | None = None,
+        is_failure: Callable[[BaseException], bool] | None = None,
+    ) -> Iterator[ProxyLease]:
+        """``with proxy_pool.lease("youtube.com") as lease: ... lease.url ...``
+
+        An exception escaping the block counts as a proxy failure unless
+        *is_failure* says it was not the proxy's fault (e.g. video unavailable).
+        """
+        handle = ProxyLease(self.acquire(host))
+        ok = True
+        try:
+            yield handle
+        except BaseException as e:
+            ok = is_failure is not None and not is_failure(e)
+            raise
+        finally:
+            if handle.url:
+                self.release(handle.url, ok and not handle.failed, handle.latency, host)
+
+    # ── Outcomes ─────────────────────────────────────────────────────────
+
+    def _relative(self, host: str | None, latency: float | None) -> float | None:
+        """*latency* as a multiple of the median of *host*'s recent samples."""
+        if latency is None:
+            return None
+        samples = self._host_samples.get(host or "")
+        if samples is None:
+            samples = self._host_samples[host or ""] = deque(maxlen=_HOST_WINDOW)
+        samples.append(latency)
+        baseline = statistics.median(samples)
+        return latency / baseline if baseline > 0 else _DEFAULT_LATENCY
+
+    def _record(self, proxy: _ProxyEntry, ok: bool, latency: float | None, host: str | None = None) -> None:
+        relative = self._relative(host, latency)
+        if ok:
+            proxy.record_success(relative)
+        else:
+            proxy.record_failure(relative)
+        label = _label(proxy.url)
+        proxy_requests.labels(proxy=label, outcome="ok" if ok else "failed").inc()
+        if latency is not None:
+            proxy_latency.labels(proxy=label).observe(latency)
+        proxy_score.labels(proxy=label).set(proxy.score(self._prior()))
+
+    def record_success(self, proxy_url: str, latency: float | None = None, host: str | None = None) -> None:
+        with self._lock:
+            proxy = self._by_url.get(proxy_url)
+            if proxy is not None:
+                self._record(proxy, True, latency, host)
+
+    def record_failure(self, proxy_url: str, latency: float | None = None, host: str | None = None) -> None:
+        with self._lock:
+            proxy = self._by_url.get(proxy_url)
+            if proxy is not None:
+                self._record(proxy, False, latency, host)
 
     def get_status(self) -> str:
         if not self._proxies:
@@ -100,16 +309,20 @@ class ProxyPool:
             total = p.successes + p.failures
             rate = f"{p.successes / total:.0%}" if total else "—"
             status = "🟢" if p.is_available else "🔴"
+            latency = f"{p.latency:.2f}× median" if p.latency is not None else "—"
             lines.append(
                 f"{status} <code>{p.url[:40]}</code>\n"
-                f"   OK: {p.successes} | Fail: {p.failures} | Rate: {rate}"
+                f"   OK: {p.successes} | Fail: {p.failures} | Rate: {rate}\n"
+                f"   Latency: {latency} | Recent OK: {p.success_rate:.0%} | In flight: {p.inflight}"
             )
         lines.append(f"\nAvailable: {self.available_count}/{self.size}")
         return "\n".join(lines)
 
     async def health_check(self) -> None:
         """Check all proxies by making a test HTTP request."""
+        host = "www.google.com"
         for proxy in self._proxies:
+            t0 = time.monotonic()
             try:
                 async with aiohttp.ClientSession() as session:
                     async with session.get(
@@ -118,11 +331,11 @@ class ProxyPool:
                         timeout=aiohttp.ClientTimeout(total=10),
                     ) as resp:
                         if resp.status < 400:
-                            proxy.record_success()
+                            self.record_success(proxy.url, time.monotonic() - t0, host)
                         else:
-                            proxy.record_failure()
+                            self.record_failure(proxy.url, time.monotonic() - t0, host)
             except Exception:
-                proxy.record_failure()
+                self.record_failure(proxy.url, time.monotonic() - t0, host)
 
 
 # Singleton
@@ -0,0 +1,172 @@
+"""
+resolve_memo.py — Two-tier memo for slow external resolvers.
+
+canonical_resolver (iTunes + Deezer, Genius) and lyrics_provider.search_by_lyrics
+answer from third-party APIs that take hundreds of milliseconds and rate-limit
+us. ResolveMemo sits in front of such a resolver:
+
+  - L1: a bounded in-process LRU with per-entry expiry (hot queries never leave
+    the process)
+  - L2: Redis, shared by every node, written with a TTL chosen by the outcome:
+    a confident answer lives long, a clean "no answer" shorter, and a failed
+    lookup (timeout / 5xx) only a few minutes, so an API outage is neither
+    cached for days nor retried on every search
+  - single-flight: concurrent lookups of the same key share one resolver call
+  - ``get_many`` reads L1 then one Redis MGET, for bulk (warmer) resolves
+
+Values are strings; "" is the negative sentinel (the format the Redis keys
+already used before the memo existed).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+HIT = "hit"
+MISS = "miss"
+ERROR = "error"
+
+ResolveFn = Callable[[], Awaitable[tuple[str, str]]]
+
+
+class ResolveMemo:
+    """L1 LRU + Redis memo with outcome TTLs and single-flight resolves."""
+
+    def __init__(
+        self,
+        prefix: str,
+        *,
+        ttl_hit: int,
+        ttl_miss: int,
+        ttl_error: int = 600,
+        local_size: int = 4096,
+        local_ttl: int = 3600,
+        redis_factory: Callable | None = None,
+    ) -> None:
+        self.prefix = prefix
+        self._ttl = {HIT: ttl_hit, MISS: ttl_miss, ERROR: ttl_error}
+        self.local_size = local_size
+        self.local_ttl = local_ttl
+        self._redis_factory = redis_factory
+        self._local: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.stats = {"local": 0, "redis": 0, "resolved": 0, "coalesced": 0}
+
+    @property
+    def redis(self):
+        if self._redis_factory is not None:
+            return self._redis_factory()
+        from bot.services.cache import cache
+        return cache.redis
+
+    # ── L1 ──────────────────────────────────────────────────────────────
+
+    def _local_get(self, key: str) -> str | None:
+        item = self._local.get(key)
+        if item is None:
+            return None
+        expires, raw = item
+        if expires < time.monotonic():
+            del self._local[key]
+            return None
+        self._local.move_to_end(key)
+        return raw
+
+    def _local_put(self, key: str, raw: str, ttl: int) -> None:
+        self._local[key] = (time.monotonic() + min(ttl, self.local_ttl), raw)
+        self._local.move_to_end(key)
+        while len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+    def _redis_ttl(self, raw: str) -> int:
+        """L1 lifetime for a value read back from Redis, whose TTL is unknown.
+
+        MISS and ERROR share the "" sentinel, so a negative may be a short-lived
+        ERROR: keep it no longer than ttl_error.
+        """
+        return self.local_ttl if raw else self._ttl[ERROR]
+
+    def clear_local(self) -> None:
+        self._local.clear()
+
+    # ── Lookups ─────────────────────────────────────────────────────────
+
+    async def get(self, key: str) -> str | None:
+        """Memoized value ("" = known negative), or None if unknown."""
+        raw = self._local_get(key)
+        if raw is not None:
+            self.stats["local"] += 1
+            return raw
+        try:
+            raw = await self.redis.get(self.prefix + key)
+        except Exception:
+            logger.debug("memo %s read failed", self.prefix, exc_info=True)
+            return None
+        if raw is None:
+            return None
+        self.stats["redis"] += 1
+        self._local_put(key, raw, self._redis_ttl(raw))
+        return raw
+
+    async def get_many(self, keys: list[str]) -> dict[str, str]:
+        """Known values for *keys* (unknown keys are absent): L1, then one MGET."""
+        out: dict[str, str] = {}
+        missing: list[str] = []
+        for key in dict.fromkeys(keys):
+            raw = self._local_get(key)
+            if raw is None:
+                missing.append(key)
+            else:
+                out[key] = raw
+        if missing:
+            try:
+                values = await self.redis.mget([self.prefix + k for k in missing])
+            except Exception:
+                logger.debug("memo %s mget failed", self.prefix, exc_info=True)
+                values = [None] * len(missing)
+            for key, raw in zip(missing, values):
+                if raw is not None:
+                    out[key] = raw
+                    self._local_put(key, raw, self._redis_ttl(raw))
+        return out
+
+    async def put(self, key: str, raw: str, outcome: str) -> None:
+        ttl = self._ttl[outcome]
+        self._local_put(key, raw, ttl)
+        try:
+            await self.redis.set(self.prefix + key, raw, ex=ttl)
+        except Exception:
+            logger.debug("memo %s write failed", self.prefix, exc_info=True)
+
+    async def resolve(self, key: str, fn: ResolveFn) -> str:
+        """Memoized value for *key*; on a miss, ``fn() -> (raw, outcome)`` runs
+        once however many callers ask concurrently."""
+        task = self._inflight.get(key)
+        if task is None:
+            raw = await self.get(key)
+            if raw is not None:
+                return raw
+            task = self._inflight.get(key)  # another caller may have started it meanwhile
+        if task is None:
+            task = asyncio.create_task(self._fill(key, fn))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t: self._inflight.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+        # shield: a cancelled caller must not cancel the lookup others wait on
+        return await asyncio.shield(task)
+
+    async def _fill(self, key: str, fn: ResolveFn) -> str:
+        self.stats["resolved"] += 1
+        try:
+            raw, outcome = await fn()
+        except Exception:
+            logger.debug("memo %s resolve failed for %r", self.prefix, key, exc_info=True)
+            raw, outcome = "", ERROR
+        await self.put(key, raw, outcome)
+        return raw
@@ -4,9 +4,16 @@ TASK-001: Fuzzy search + dedup + multi-language support (TASK-023).
 """
 
 import asyncio
+import heapq
 import logging
 import re
 import unicodedata
+from array import array
+from collections import Counter
+from functools import lru_cache
+from typing import Iterable
+
+from bot.services.search_trace import traced
 
 try:
     from rapidfuzz import fuzz as _rf_fuzz
@@ -37,24 +44,33 @@ _LAT_DIGRAPHS_TO_CYR = [
     ("yu", "ю"), ("yo", "ё"),
 ]
 
+# Precompiled kernels: one C-level translate pass per direction instead of
+# building per-character lists. The digraph regex replaces ten sequential
+# str.replace passes with a single scan; "ts" must not steal the "s" of a
+# following "sh" ("tsh" → "тш"), which is what the old replace order produced.
+_CYR_TO_LAT_TABLE = str.maketrans(_CYR_TO_LAT)
+_LAT_TO_CYR_TABLE = str.maketrans(_LAT_TO_CYR)
+_LAT_DIGRAPH_MAP = dict(_LAT_DIGRAPHS_TO_CYR)
+_LAT_DIGRAPH_RE = re.compile(
+    "|".join("ts(?!h)" if lat == "ts" else lat for lat, _ in _LAT_DIGRAPHS_TO_CYR)
+)
+
+# Bounded memo size for the pure string helpers below. Candidate artist/title
+# strings repeat heavily across providers, dedup and re-ranking passes.
+_TEXT_MEMO_SIZE = 16384
+
 
+@lru_cache(maxsize=_TEXT_MEMO_SIZE)
 def transliterate_cyr_to_lat(text: str) -> str:
     """Convert Cyrillic text to Latin transliteration."""
-    result = []
-    for ch in text.lower():
-        result.append(_CYR_TO_LAT.get(ch, ch))
-    return "".join(result)
+    return text.lower().translate(_CYR_TO_LAT_TABLE)
 
 
+@lru_cache(maxsize=_TEXT_MEMO_SIZE)
 def transliterate_lat_to_cyr(text: str) -> str:
     """Convert Latin text to Cyrillic transliteration."""
-    text = text.lower()
-    for lat, cyr in _LAT_DIGRAPHS_TO_CYR:
-        text = text.replace(lat, cyr)
-    result = []
-    for ch in text:
-        result.append(_LAT_TO_CYR.get(ch, ch))
-    return "".join(result)
+    text = _LAT_DIGRAPH_RE.sub(lambda m: _LAT_DIGRAPH_MAP[m.group(0)], text.lower())
+    return text.translate(_LAT_TO_CYR_TABLE)
 
 
 # ── Query normalization ───────────────────────────────────────────────────
@@ -108,16 +124,25 @@ _NON_ORIGINAL_MARKERS: tuple[tuple[str, float], ...] = (
 )
 
 
+_BRACKETED_RE = re.compile(r"\s*[\(\[][^\)\]]{0,50}[\)\]]\s*")
+
+
+@lru_cache(maxsize=_TEXT_MEMO_SIZE)
 def normalize_query(query: str) -> str:
     """Normalize a search query: strip junk, normalize whitespace, lowercase."""
     q = query.strip().lower()
     q = q.replace("‘", "").replace("’", "").replace("`", "")
-    q = re.sub(r'\s*[\(\[][^\)\]]{0,50}[\)\]]\s*', ' ', q)
+    q = _BRACKETED_RE.sub(" ", q)
     q = _JUNK_RE.sub(" ", q)
     q = _MULTI_SPACE.sub(" ", q)
     return q.strip()
 
 
+def track_search_text(artist: str | None, title: str | None) -> str:
+    """Catalog-side normalized ``artist title`` blob stored in ``Track.search_text``."""
+    return normalize_query(f"{artist or ''} {title or ''}")
+
+
 # ── Smart query parsing ──────────────────────────────────────────────────
 
 # Stop-words users add but that hurt search accuracy
@@ -964,6 +989,7 @@ def _translit_match_bonus(query_norm: str, artist_lower: str, title_lower: str)
     return min(0.75, best * 0.75)
 
 
+@lru_cache(maxsize=_TEXT_MEMO_SIZE)
 def detect_script(text: str) -> str:
     """Detect dominant script: 'cyrillic', 'latin', or 'mixed'."""
     cyr = 0
@@ -1020,6 +1046,7 @@ def _jaccard_similarity(a: str, b: str) -> float:
     return len(intersection) / len(union)
 
 
+@traced("relevance_score")
 def _relevance_score(query_norm: str, artist: str, title: str, position: int = 0, parsed: dict | None = None) -> float:
     """Score how relevant a track is to the search query (0.0 - 3.0+).
 
@@ -1160,6 +1187,7 @@ def _relevance_score(query_norm: str, artist: str, title: str, position: int = 0
     return base
 
 
+@traced("dedup")
 def deduplicate_results(results: list[dict], threshold: float = 0.7, lang_hint: str = "mixed", query: str = "") -> list[dict]:
     """Remove duplicate tracks, keeping the one from the best source.
     Then re-rank by relevance to the original query."""
@@ -1264,44 +1292,126 @@ def deduplicate_results(results: list[dict], threshold: float = 0.7, lang_hint:
 
 # ── "Did you mean?" suggestions ──────────────────────────────────────────
 
+# Trigram index: only the rarest grams of the query are looked up, and from
+# each posting list only the first entries (the corpus is ordered by
+# popularity), so a lookup touches a bounded number of entries however big
+# the corpus gets. Candidates are ranked by trigram Dice overlap and only the
+# best few get the exact (rapidfuzz) score.
+_SUGGEST_QUERY_GRAMS = 10
+_SUGGEST_POSTINGS_SCAN = 1024
+_SUGGEST_CANDIDATES = 12
+_SUGGEST_OVERLAP_SLACK = 2
+_SUGGEST_MIN_SCORE = 0.3
+
+
+def _bigram_sim(a: str, b: str) -> float:
+    """Character bigram similarity (Dice coefficient)."""
+    if len(a) < 2 or len(b) < 2:
+        return 1.0 if a == b else 0.0
+    bg_a = {a[i:i + 2] for i in range(len(a) - 1)}
+    bg_b = {b[i:i + 2] for i in range(len(b) - 1)}
+    if not bg_a or not bg_b:
+        return 0.0
+    return 2 * len(bg_a & bg_b) / (len(bg_a) + len(bg_b))
+
+
+def _suggest_score(norm: str, entry_norm: str) -> float:
+    """Word-level Jaccard + character bigram (+ rapidfuzz token-set) similarity."""
+    jac = _jaccard_similarity(norm, entry_norm)
+    big = _bigram_sim(norm, entry_norm)
+    if _rf_fuzz is not None:
+        rf = float(_rf_fuzz.token_set_ratio(norm, entry_norm)) / 100.0
+        return jac * 0.25 + big * 0.35 + rf * 0.40
+    return jac * 0.4 + big * 0.6
+
+
+def _trigrams(norm: str) -> set[str]:
+    padded = f"  {norm} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SuggestIndex:
+    """Character-trigram inverted index over a "did you mean" corpus.
+
+    Build once (e.g. from popular titles + learned queries), then call
+    ``suggest`` per failed search; entries earlier in *corpus* win ties.
+    """
+
+    def __init__(self, corpus: Iterable[str] = ()) -> None:
+        self.entries: list[str] = []
+        self._norms: list[str] = []
+        self._gram_counts = array("H")
+        postings: dict[str, list[int]] = {}
+        seen: set[str] = set()
+        for entry in corpus:
+            norm = normalize_query(entry) if entry else ""
+            if not norm or norm in seen:
+                continue
+            seen.add(norm)
+            idx = len(self.entries)
+            self.entries.append(entry)
+            self._norms.append(norm)
+            grams = _trigrams(norm)
+            self._gram_counts.append(min(len(grams), 0xFFFF))
+            for gram in grams:
+                postings.setdefault(gram, []).append(idx)
+        self._postings = {gram: array("i", ids) for gram, ids in postings.items()}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def suggest(self, query: str, max_suggestions: int = 1) -> list[str]:
+        norm = normalize_query(query or "")
+        if not norm or not self.entries:
+            return []
+        grams = _trigrams(norm)
+        lists = sorted(
+            (p for p in (self._postings.get(g) for g in grams) if p),
+            key=len,
+        )[:_SUGGEST_QUERY_GRAMS]
+        overlap: Counter[int] = Counter()
+        for ids in lists:
+            overlap.update(ids[:_SUGGEST_POSTINGS_SCAN])
+
+        if not overlap:
+            return []
+        # Entries sharing far fewer grams than the best one cannot win
+        top = max(overlap.values())
+        floor = max(top - _SUGGEST_OVERLAP_SLACK, (top + 1) // 2)
+        counts = self._gram_counts
+        n = len(grams)
+        best = heapq.nlargest(
+            _SUGGEST_CANDIDATES,
+            (idx for idx, hits in overlap.items() if hits >= floor),
+            key=lambda idx: overlap[idx] / (n + counts[idx]),
+        )
+        scored: list[tuple[float, int]] = []
+        for idx in best:
+            score = _suggest_score(norm, self._norms[idx])
+            if score > _SUGGEST_MIN_SCORE:
+                scored.append((score, -idx))
+        scored.sort(reverse=True)
+        return [self.entries[-neg_idx] for _, neg_idx in scored[:max_suggestions]]
+
+
 def suggest_query(query: str, corpus: list[str], max_suggestions: int = 1) -> list[str]:
     """Find closest matches from corpus for a failed query.
 
     Uses word-level Jaccard + character bigram similarity.
-    Returns up to *max_suggestions* candidates.
+    Returns up to *max_suggestions* candidates. Scans *corpus* linearly —
+    for the bot's full suggestion corpus use a prebuilt ``SuggestIndex``.
     """
     norm = normalize_query(query)
     if not norm:
         return []
 
-    def _bigram_sim(a: str, b: str) -> float:
-        """Character bigram similarity (Dice coefficient)."""
-        if len(a) < 2 or len(b) < 2:
-            return 1.0 if a == b else 0.0
-        bg_a = {a[i:i + 2] for i in range(len(a) - 1)}
-        bg_b = {b[i:i + 2] for i in range(len(b) - 1)}
-        if not bg_a or not bg_b:
-            return 0.0
-        return 2 * len(bg_a & bg_b) / (len(bg_a) + len(bg_b))
-
-    def _rapidfuzz_sim(a: str, b: str) -> float:
-        if _rf_fuzz is None:
-            return 0.0
-        return float(_rf_fuzz.token_set_ratio(a, b)) / 100.0
-
     scored: list[tuple[float, str]] = []
     for entry in corpus:
         entry_norm = normalize_query(entry)
         if not entry_norm:
             continue
-        jac = _jaccard_similarity(norm, entry_norm)
-        big = _bigram_sim(norm, entry_norm)
-        rf = _rapidfuzz_sim(norm, entry_norm)
-        if _rf_fuzz is not None:
-            score = jac * 0.25 + big * 0.35 + rf * 0.40
-        else:
-            score = jac * 0.4 + big * 0.6
-        if score > 0.3:
+        score = _suggest_score(norm, entry_norm)
+        if score > _SUGGEST_MIN_SCORE:
             scored.append((score, entry))
 
     scored.sort(key=lambda x: x[0], reverse=True)
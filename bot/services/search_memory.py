@@ -98,3 +98,27 @@ async def get_learned_track(query: str, *, min_confirmations: int = _MIN_CONFIRM
     except Exception:
         logger.debug("search_memory get failed", exc_info=True)
     return None
+
+
+async def learned_queries(*, min_confirmations: int = _MIN_CONFIRMATIONS, limit: int = 20000) -> list[str]:
+    """Normalized queries whose learned track is trusted (for "did you mean")."""
+    from bot.services.cache import cache
+
+    out: list[str] = []
+    try:
+        cursor = 0
+        while len(out) < limit:
+            cursor, keys = await cache.redis.scan(cursor, match=f"{_KEY_PREFIX}*", count=500)
+            if keys:
+                for raw in await cache.redis.mget(keys):
+                    try:
+                        payload = json.loads(raw) if raw else None
+                    except ValueError:
+                        continue
+                    if payload and payload.get("q") and int(payload.get("count", 0)) >= min_confirmations:
+                        out.append(payload["q"])
+            if not cursor:
+                break
+    except Exception:
+        logger.debug("search_memory learned_queries failed", exc_info=True)
+    return out[:limit]
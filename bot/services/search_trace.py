@@ -0,0 +1,151 @@
+"""
+search_trace.py — Per-phase latency tracing for the search pipeline.
+
+``_do_search`` starts a SearchTrace per text search and marks its phases:
+tier-0 lookups, every provider call, each enrichment wave, dedup and
+relevance scoring. A trace lives in a ContextVar, so provider tasks spawned
+by ``asyncio.gather`` record into the trace of the search that started them,
+and library code (search_engine) can time itself with ``@traced`` without
+knowing about the handler.
+
+Sampling: only SEARCH_TRACE_SAMPLE_RATE of the searches record anything; the
+rest pay one ContextVar lookup per instrumented call. A finished sampled trace
+observes one value per phase in the ``bot_search_phase_seconds`` histogram
+(per request, repeated phases summed). Quantiles are unaffected by uniform
+sampling; scale counts by ``bot_search_trace_sample_rate``.
+
+Dump: searches slower than SEARCH_TRACE_DUMP_MS (0 = off) are logged with
+their full span list and pushed to the Redis ring ``search:trace``.
+
+Settings are read when a trace starts / finishes, not at import: search_engine
+imports ``traced`` and must stay importable without the bot config (the
+normalisation benchmarks run without BOT_TOKEN).
+"""
+from __future__ import annotations
+
+import contextlib
+import functools
+import json
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+_RING = "search:trace"
+_RING_SIZE = 1000
+
+_current: ContextVar["SearchTrace | None"] = ContextVar("search_trace", default=None)
+
+
+class SearchTrace:
+    """Spans of one search, in milliseconds from the start of the trace."""
+
+    def __init__(self, query: str = "", *, sampled: bool = True) -> None:
+        self.query = query
+        self.sampled = sampled
+        self.t0 = time.perf_counter()
+        self._lap = self.t0
+        self.spans: list[tuple[str, float, float]] = []   # (name, start_ms, duration_ms)
+        self.totals: dict[str, float] = {}                 # name -> seconds, summed
+
+    def add(self, name: str, seconds: float, started: float | None = None) -> None:
+        if not self.sampled:
+            return
+        self.totals[name] = self.totals.get(name, 0.0) + seconds
+        if started is not None:
+            self.spans.append((name, (started - self.t0) * 1000, seconds * 1000))
+
+    def lap(self, name: str) -> None:
+        """Close a sequential phase: everything since the previous lap."""
+        now = time.perf_counter()
+        self.add(name, now - self._lap, self._lap)
+        self._lap = now
+
+    @contextlib.contextmanager
+    def span(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started, started)
+
+    @property
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.t0) * 1000
+
+    def as_dict(self) -> dict:
+        return {
+            "q": self.query[:200],
+            "ms": round(self.elapsed_ms, 1),
+            "spans": [[name, round(start, 1), round(dur, 2)] for name, start, dur in self.spans],
+            "totals_ms": {name: round(sec * 1000, 2) for name, sec in self.totals.items()},
+        }
+
+    async def finish(self, **extra) -> None:
+        """Export the trace: histogram per phase, and the dump for slow searches."""
+        if _current.get() is self:
+            _current.set(None)
+        if not self.sampled:
+            return
+        from bot.config import settings
+        from bot.services.metrics import search_phase_seconds, search_trace_sample_rate
+
+        search_trace_sample_rate.set(min(1.0, settings.SEARCH_TRACE_SAMPLE_RATE))
+        for name, seconds in self.totals.items():
+            search_phase_seconds.labels(phase=name).observe(seconds)
+        search_phase_seconds.labels(phase="total").observe(self.elapsed_ms / 1000)
+
+        dump_ms = settings.SEARCH_TRACE_DUMP_MS
+        if dump_ms and self.elapsed_ms >= dump_ms:
+            payload = json.dumps({**self.as_dict(), **extra, "ts": int(time.time())}, ensure_ascii=False)
+            logger.info("search trace: %s", payload)
+            try:
+                from bot.services.cache import cache
+                await cache.redis.lpush(_RING, payload)
+                await cache.redis.ltrim(_RING, 0, _RING_SIZE - 1)
+            except Exception:
+                logger.debug("search trace dump failed", exc_info=True)
+
+
+def start_trace(query: str = "") -> SearchTrace:
+    """Start (and make current) the trace of one search; sampled per settings."""
+    from bot.config import settings
+
+    rate = settings.SEARCH_TRACE_SAMPLE_RATE
+    trace = SearchTrace(query, sampled=rate >= 1.0 or random.random() < rate)
+    _current.set(trace)
+    return trace
+
+
+def current_trace() -> SearchTrace | None:
+    return _current.get()
+
+
+@contextlib.contextmanager
+def span(name: str):
+    """Time a block into the current trace (no-op outside a sampled search)."""
+    trace = _current.get()
+    if trace is None or not trace.sampled:
+        yield
+        return
+    with trace.span(name):
+        yield
+
+
+def traced(name: str):
+    """Decorator: sum the time of every call into phase *name* of the current trace."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            trace = _current.get()
+            if trace is None or not trace.sampled:
+                return fn(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                trace.add(name, time.perf_counter() - started)
+        return wrapper
+    return decorator
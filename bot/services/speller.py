@@ -1,46 +1,337 @@
-"""Yandex Speller integration for typo correction in search queries.
+"""Typo correction for search queries.
 
-Free API: https://yandex.ru/dev/speller/
-No auth needed, no rate limits for reasonable usage.
+The primary engine is local: a symmetric-delete (SymSpell) index over the
+words of our own catalog (Track.search_text: artist + title) and of popular
+user queries. A lookup only generates the deletes of the query word and
+probes a dict, so a correction costs microseconds instead of a Yandex Speller
+round trip, and it knows artist names no general-purpose dictionary has.
+Words in either script are indexed as-is; a word with no close match in its
+own script is retried in its transliteration ("skriptonit" -> "скриптонит").
+
+The index is built at startup and then grows incrementally: every refresh
+only reads tracks and search-history rows newer than the last ones seen.
+
+Yandex Speller (free API: https://yandex.ru/dev/speller/) is kept as an
+optional fallback (SPELLER_REMOTE_FALLBACK) for queries the local index
+cannot correct.
 """
 
+import asyncio
 import logging
-from urllib.parse import quote
+import re
+from collections import Counter
 
 try:
     import aiohttp
 except ImportError:
     aiohttp = None  # type: ignore
 
+try:
+    from rapidfuzz.distance import OSA as _rf_osa
+except Exception:
+    _rf_osa = None
+
+from bot.config import settings
+
 logger = logging.getLogger(__name__)
 
 _SPELLER_URL = "https://speller.yandex.net/services/spellservice.json/checkText"
 _TIMEOUT = 2.0  # seconds — speller should be fast, don't block search
 
+_WORD_RE = re.compile(r"[^\W\d_]+")
+_MIN_WORD_LEN = 3          # shorter words are neither indexed nor corrected
+_PREFIX_LEN = 7            # SymSpell prefix: deletes are generated for word[:7] only
+_REFRESH_CHUNK = 5000      # DB rows per incremental read
+
+
+def _max_edits(word: str, max_distance: int) -> int:
+    # One typo in a 4-letter word is already a lot; two would match anything
+    return min(max_distance, 1 if len(word) <= 5 else 2)
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal-string-alignment distance, or ``limit + 1`` if above *limit*."""
+    if _rf_osa is not None:
+        return _rf_osa.distance(a, b, score_cutoff=limit)
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2: list[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1] if prev[-1] <= limit else limit + 1
+
+
+def _deletes(key: str, depth: int) -> set[str]:
+    """*key* and every string reachable from it by up to *depth* deletions."""
+    out = {key}
+    frontier = [key]
+    for _ in range(depth):
+        nxt = []
+        for s in frontier:
+            if len(s) <= 1:
+                continue
+            for i in range(len(s)):
+                d = s[:i] + s[i + 1:]
+                if d not in out:
+                    out.add(d)
+                    nxt.append(d)
+        frontier = nxt
+    return out
+
+
+class SymSpellIndex:
+    """Symmetric-delete dictionary: word frequencies plus a delete -> words map."""
+
+    def __init__(self, max_distance: int = 2, prefix_length: int = _PREFIX_LEN) -> None:
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self._words: dict[str, int] = {}
+        self._deletes: dict[str, list[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self._words
+
+    def frequency(self, word: str) -> int:
+        return self._words.get(word, 0)
+
+    def add(self, word: str, count: int = 1) -> bool:
+        """Add *count* occurrences of *word*; True if the word is new."""
+        if word in self._words:
+            self._words[word] += count
+            return False
+        self._words[word] = count
+        for d in _deletes(word[:self.prefix_length], self.max_distance):
+            self._deletes.setdefault(d, []).append(word)
+        return True
+
+    def lookup(self, word: str, max_distance: int | None = None) -> str | None:
+        """Closest known word (ties: most frequent), or None past *max_distance*."""
+        if word in self._words:
+            return word
+        limit = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        prefix = word[:self.prefix_length]
+        best, best_d, best_f = None, limit + 1, 0
+        checked: set[str] = set()
+        candidates = [prefix]
+        seen = {prefix}
+        i = 0
+        while i < len(candidates):
+            cand = candidates[i]
+            i += 1
+            # Candidates come in deletion order: once they are further from the
+            # prefix than the best match, nothing closer can follow
+            removed = len(prefix) - len(cand)
+            if removed > best_d:
+                break
+            for sugg in self._deletes.get(cand, ()):
+                if sugg in checked:
+                    continue
+                checked.add(sugg)
+                if abs(len(sugg) - len(word)) > best_d:
+                    continue
+                dist = _edit_distance(word, sugg, best_d)
+                freq = self._words[sugg]
+                if dist < best_d or (dist == best_d and dist <= limit and freq > best_f):
+                    best, best_d, best_f = sugg, dist, freq
+            if removed < limit and len(cand) > 1:
+                for j in range(len(cand)):
+                    d = cand[:j] + cand[j + 1:]
+                    if d not in seen:
+                        seen.add(d)
+                        candidates.append(d)
+        return best if best_d <= limit else None
+
+
+class CatalogSpeller:
+    """SymSpell index over catalog words and popular queries, refreshed incrementally."""
+
+    def __init__(self, *, max_distance: int = 2, query_min_count: int = 3) -> None:
+        self.index = SymSpellIndex(max_distance=max_distance)
+        self.query_min_count = query_min_count
+        self._pending: Counter[str] = Counter()   # query words not yet frequent enough
+        self._last_track_id = 0
+        self._last_history_id = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return len(self.index) > 0
+
+    def add_text(self, text: str | None, count: int = 1) -> int:
+        """Index the words of a catalog string; returns the number of new words."""
+        added = 0
+        for word in _WORD_RE.findall((text or "").lower()):
+            if len(word) >= _MIN_WORD_LEN and self.index.add(word, count):
+                added += 1
+        return added
+
+    def add_query(self, query: str | None, count: int = 1) -> None:
+        """Count a user query: known words gain weight, unknown words are only
+        indexed once seen in query_min_count queries (users' typos are not)."""
+        for word in set(_WORD_RE.findall((query or "").lower())):
+            if len(word) < _MIN_WORD_LEN:
+                continue
+            if word in self.index:
+                self.index.add(word, count)
+                continue
+            self._pending[word] += count
+            if self._pending[word] >= self.query_min_count:
+                self.index.add(word, self._pending.pop(word))
+
+    def correct_word(self, word: str) -> str | None:
+        lw = word.lower()
+        if len(lw) < _MIN_WORD_LEN or lw in self.index:
+            return None
+        limit = _max_edits(lw, self.index.max_distance)
+        hit = self.index.lookup(lw, limit)
+        if hit is None:
+            from bot.services.search_engine import (
+                detect_script, transliterate_cyr_to_lat, transliterate_lat_to_cyr,
+            )
+            script = detect_script(lw)
+            alt = (
+                transliterate_lat_to_cyr(lw) if script == "latin"
+                else transliterate_cyr_to_lat(lw) if script == "cyrillic"
+                else None
+            )
+            if alt and alt != lw:
+                hit = self.index.lookup(alt, limit)
+        return hit
+
+    def correct(self, query: str) -> str | None:
+        """Query with every unknown word replaced by its closest catalog word,
+        or None if nothing changed."""
+        if not query or not self.ready:
+            return None
+        corrected = _WORD_RE.sub(lambda m: self.correct_word(m.group(0)) or m.group(0), query)
+        if corrected.lower().strip() != query.lower().strip():
+            return corrected
+        return None
+
+    async def refresh(self) -> int:
+        """Index tracks and search queries added since the last refresh.
+
+        Returns the number of new words. Safe to call concurrently.
+        """
+        from sqlalchemy import select
+
+        from bot.models.base import async_session
+        from bot.models.track import ListeningHistory, Track
+
+        async with self._lock:
+            before = len(self.index)
+            async with async_session() as session:
+                while True:
+                    rows = (await session.execute(
+                        select(Track.id, Track.search_text, Track.artist, Track.title)
+                        .where(Track.id > self._last_track_id)
+                        .order_by(Track.id)
+                        .limit(_REFRESH_CHUNK)
+                    )).all()
+                    if not rows:
+                        break
+                    await asyncio.to_thread(self._index_tracks, rows)
+                    self._last_track_id = rows[-1][0]
+
+                while True:
+                    rows = (await session.execute(
+                        select(ListeningHistory.id, ListeningHistory.query)
+                        .where(
+                            ListeningHistory.id > self._last_history_id,
+                            ListeningHistory.action == "search",
+                            ListeningHistory.query.is_not(None),
+                        )
+                        .order_by(ListeningHistory.id)
+                        .limit(_REFRESH_CHUNK)
+                    )).all()
+                    if not rows:
+                        break
+                    for _, query in rows:
+                        self.add_query(query)
+                    self._last_history_id = rows[-1][0]
+            return len(self.index) - before
+
+    def _index_tracks(self, rows) -> None:
+        from bot.services.search_engine import track_search_text
+
+        for _, search_text, artist, title in rows:
+            self.add_text(search_text or track_search_text(artist, title))
+
+
+local_speller = CatalogSpeller(
+    max_distance=settings.SPELLER_MAX_DISTANCE,
+    query_min_count=settings.SPELLER_QUERY_MIN_COUNT,
+)
+
+
+async def _refresh_loop() -> None:
+    while True:
+        try:
+            t0 = asyncio.get_running_loop().time()
+            added = await local_speller.refresh()
+            if added:
+                logger.info(
+                    "speller: +%d words (%d total) in %.1fs",
+                    added, len(local_speller.index), asyncio.get_running_loop().time() - t0,
+                )
+        except Exception as e:
+            logger.warning("speller: index refresh failed: %s", e)
+        await asyncio.sleep(settings.SPELLER_REFRESH_SEC)
+
+
+async def start_speller_indexer() -> None:
+    asyncio.create_task(_refresh_loop())
+    logger.info("speller: catalog indexer started (every %ds)", settings.SPELLER_REFRESH_SEC)
+
 
 async def correct_query(query: str) -> str | None:
-    """Return corrected query if Yandex Speller suggests fixes, else None.
+    """Return corrected query if the local index (or, if enabled, Yandex
+    Speller) suggests fixes, else None.
 
     Returns None if:
     - No corrections needed
-    - API is unavailable
+    - Remote fallback disabled / unavailable
     - Timeout exceeded
     """
-    if aiohttp is None:
-        return None
     if not query or len(query) > 200:
         return None
 
+    corrected = local_speller.correct(query)
+    if corrected:
+        logger.info("speller: %r -> %r (local)", query, corrected)
+        return corrected
+    if not settings.SPELLER_REMOTE_FALLBACK:
+        return None
+    return await _correct_remote(query)
+
+
+async def _correct_remote(query: str) -> str | None:
+    if aiohttp is None:
+        return None
+
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                _SPELLER_URL,
-                params={"text": query, "lang": "ru,en"},
-                timeout=aiohttp.ClientTimeout(total=_TIMEOUT),
-            ) as resp:
-                if resp.status != 200:
-                    return None
-                data = await resp.json()
+        from bot.services.http_session import get_session
+
+        async with get_session().get(
+            _SPELLER_URL,
+            params={"text": query, "lang": "ru,en"},
+            timeout=aiohttp.ClientTimeout(total=_TIMEOUT),
+        ) as resp:
+            if resp.status != 200:
+                return None
+            data = await resp.json()
 
         if not data:
             return None
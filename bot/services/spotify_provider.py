@@ -111,6 +111,7 @@ def _track_to_dict(track: dict) -> dict | None:
             "duration_fmt": _fmt_dur(dur_ms),
             "source": "spotify",
             "cover_url": cover_url,
+            "isrc": (track.get("external_ids") or {}).get("isrc"),
             "yt_query": f"{artist} - {title}",
         }
     except Exception:
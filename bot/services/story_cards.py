@@ -3,13 +3,42 @@ story_cards.py — Generate shareable story cards (1080×1920).
 
 Creates branded images with track info, blurred cover background,
 bokeh effects, and QR code deep-link.
+
+Rendering is CPU-bound (~0.5 s of blur/numpy plus PNG encoding), so the
+async entry points ``render_track_card`` / ``render_recap_card``:
+
+  * look track cards up in a content-addressed disk cache first — the key is
+    the card fields, the SHA-1 of the cover bytes and ``TEMPLATE_VERSION``
+    (recap cards are unique per user and week, so they skip the cache rather
+    than evict every reusable track card);
+  * otherwise render it in a small process pool (``STORY_RENDER_WORKERS``),
+    so a burst of share requests neither holds the GIL nor eats the event
+    loop's default thread pool. Concurrent requests for one card share a
+    single render.
+
+Inside a worker, the blurred background / dominant colour / resized cover
+of recent covers are kept in an LRU (album tracks share a cover, recap
+cards share one background) and fonts are loaded once per size.
 """
+import asyncio
+import functools
 import hashlib
 import io
+import json
 import logging
 import math
+import multiprocessing
+import os
 import random
-from typing import Optional
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from bot.config import settings
+from bot.services.metrics import story_card_renders
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +56,10 @@ _ACCENT = (200, 160, 255)
 _WHITE = (255, 255, 255)
 _GREY = (180, 180, 180)
 _BOT_USERNAME = "TSmymusicbot_bot"
+_COVER_SIZE = 640
+
+# Bump whenever the layout changes: it is part of every render-cache key.
+TEMPLATE_VERSION = 2
 
 
 def _dominant_color(cover_bytes: bytes) -> tuple[int, int, int]:
@@ -46,6 +79,27 @@ def _dominant_color(cover_bytes: bytes) -> tuple[int, int, int]:
         return (100, 60, 180)
 
 
+@functools.lru_cache(maxsize=1)
+def _gradient_overlay() -> "Image.Image":
+    """Black overlay, darker at top and bottom — built via numpy for a smooth result."""
+    import numpy as np
+
+    alpha_arr = np.zeros((_HEIGHT, _WIDTH), dtype=np.float64)
+    for y in range(_HEIGHT):
+        ratio = y / _HEIGHT
+        if ratio < 0.15:
+            alpha_arr[y, :] = 220 - ratio / 0.15 * 60
+        elif ratio > 0.75:
+            alpha_arr[y, :] = 160 + (ratio - 0.75) / 0.25 * 80
+        else:
+            alpha_arr[y, :] = 160
+    # Add ±2 noise to break banding
+    noise = np.random.default_rng(seed=7).uniform(-2.0, 2.0, alpha_arr.shape)
+    alpha_arr = np.clip(alpha_arr + noise, 0, 255).astype(np.uint8)
+    black = Image.new("RGB", (_WIDTH, _HEIGHT), (0, 0, 0))
+    return Image.merge("RGBA", (*black.split(), Image.fromarray(alpha_arr, mode="L")))
+
+
 def _build_background(cover_bytes: bytes | None, dominant: tuple[int, int, int] | None) -> "Image.Image":
     """Build a premium background: blurred cover + dark overlay + bokeh circles + dither."""
     import numpy as np
@@ -62,25 +116,8 @@ def _build_background(cover_bytes: bytes | None, dominant: tuple[int, int, int]
         except Exception:
             pass
 
-    # Layer 2: Dark gradient overlay — built via numpy for smooth result
-    alpha_arr = np.zeros((_HEIGHT, _WIDTH), dtype=np.float64)
-    for y in range(_HEIGHT):
-        ratio = y / _HEIGHT
-        if ratio < 0.15:
-            alpha_arr[y, :] = 220 - ratio / 0.15 * 60
-        elif ratio > 0.75:
-            alpha_arr[y, :] = 160 + (ratio - 0.75) / 0.25 * 80
-        else:
-            alpha_arr[y, :] = 160
-    # Add ±2 noise to break banding
-    noise = np.random.default_rng(seed=7).uniform(-2.0, 2.0, alpha_arr.shape)
-    alpha_arr = np.clip(alpha_arr + noise, 0, 255).astype(np.uint8)
-    overlay = Image.new("RGBA", (_WIDTH, _HEIGHT), (0, 0, 0, 0))
-    overlay.putalpha(Image.fromarray(alpha_arr, mode="L"))
-    # Set RGB channels to black
-    black = Image.new("RGB", (_WIDTH, _HEIGHT), (0, 0, 0))
-    overlay = Image.merge("RGBA", (*black.split(), overlay.split()[3]))
-    img = Image.alpha_composite(img, overlay)
+    # Layer 2: Dark gradient overlay (identical for every card)
+    img = Image.alpha_composite(img, _gradient_overlay())
 
     # Layer 3: Radial glow behind cover area — numpy for smooth gradient
     if dominant:
@@ -122,8 +159,9 @@ def _build_background(cover_bytes: bytes | None, dominant: tuple[int, int, int]
     return Image.fromarray(arr, "RGB")
 
 
+@functools.lru_cache(maxsize=32)
 def _get_font(size: int, bold: bool = False) -> "ImageFont.FreeTypeFont":
-    """Load font with fallback to system DejaVu."""
+    """Load font with fallback to system DejaVu (cached per size/weight)."""
     # 1) Custom bundled fonts
     try:
         from pathlib import Path
@@ -154,15 +192,57 @@ def _make_qr(url: str, size: int = 200) -> "Image.Image":
     qr = qrcode.QRCode(version=1, box_size=20, border=2, error_correction=qrcode.constants.ERROR_CORRECT_H)
     qr.add_data(url)
     qr.make(fit=True)
-    qr_img = qr.make_image(fill_color="white", back_color="black").convert("RGBA")
-    # Make black pixels transparent
-    data = qr_img.getdata()
-    new_data = [(r, g, b, a) if r > 128 else (0, 0, 0, 0) for r, g, b, a in data]
-    qr_img.putdata(new_data)
+    modules = qr.make_image(fill_color="white", back_color="black").convert("L")
+    # White modules on a transparent background
+    alpha = modules.point(lambda v: 255 if v > 128 else 0)
+    qr_img = Image.new("RGBA", modules.size, (0, 0, 0, 0))
+    qr_img.paste((255, 255, 255, 255), (0, 0), alpha)
     # Resize with NEAREST to keep crisp pixels
     return qr_img.resize((size, size), Image.NEAREST)
 
 
+class _CoverLayers(NamedTuple):
+    dominant: tuple[int, int, int] | None
+    background: "Image.Image"           # full-card RGB background, copy before drawing
+    cover: Optional["Image.Image"]      # RGBA cover at _COVER_SIZE, None if undecodable
+
+
+_layers: "OrderedDict[str, _CoverLayers]" = OrderedDict()
+_layers_lock = threading.Lock()
+
+
+def _cover_layers(cover_bytes: bytes | None) -> _CoverLayers:
+    """Per-cover layers (dominant colour, background, resized cover), LRU-cached by content hash."""
+    key = hashlib.sha1(cover_bytes).hexdigest() if cover_bytes else ""
+    with _layers_lock:
+        hit = _layers.get(key)
+        if hit is not None:
+            _layers.move_to_end(key)
+            return hit
+    dominant = _dominant_color(cover_bytes) if cover_bytes else None
+    cover = None
+    if cover_bytes:
+        try:
+            cover = Image.open(io.BytesIO(cover_bytes)).convert("RGBA")
+            cover = cover.resize((_COVER_SIZE, _COVER_SIZE), Image.LANCZOS)
+        except Exception:
+            cover = None
+    layers = _CoverLayers(dominant, _build_background(cover_bytes, dominant), cover)
+    with _layers_lock:
+        _layers[key] = layers
+        while len(_layers) > max(1, settings.STORY_BG_CACHE_SIZE):
+            _layers.popitem(last=False)
+    return layers
+
+
+def _encode_png(img: "Image.Image") -> bytes:
+    # zlib level 3 instead of the default 6: ~4x faster encode for ~10% more
+    # bytes on these noise-dithered images (the result is cached anyway).
+    buf = io.BytesIO()
+    img.save(buf, "PNG", compress_level=3)
+    return buf.getvalue()
+
+
 def generate_track_card(
     artist: str,
     title: str,
@@ -175,8 +255,9 @@ def generate_track_card(
         logger.warning("Pillow not installed, cannot generate story card")
         return None
 
-    dominant = _dominant_color(cover_bytes) if cover_bytes else None
-    img = _build_background(cover_bytes, dominant)
+    layers = _cover_layers(cover_bytes)
+    dominant = layers.dominant
+    img = layers.background.copy()
     draw = ImageDraw.Draw(img)
 
     # Accent colour from cover
@@ -187,14 +268,13 @@ def generate_track_card(
         accent = _ACCENT
 
     # ── Cover image (640×640) with glow ring ──
-    cover_size = 640
+    cover_size = _COVER_SIZE
     cover_x = (_WIDTH - cover_size) // 2
     cover_y = 320
 
-    if cover_bytes:
+    if layers.cover is not None:
         try:
-            cover = Image.open(io.BytesIO(cover_bytes)).convert("RGBA")
-            cover = cover.resize((cover_size, cover_size), Image.LANCZOS)
+            cover = layers.cover
 
             # Rounded corners
             mask = Image.new("L", (cover_size, cover_size), 0)
@@ -299,9 +379,7 @@ def generate_track_card(
     draw.text((_WIDTH // 2, _HEIGHT - 100), "Слушай в", fill=_GREY, font=font_footer, anchor="mm")
     draw.text((_WIDTH // 2, _HEIGHT - 55), f"@{_BOT_USERNAME}", fill=accent, font=font_bot, anchor="mm")
 
-    buf = io.BytesIO()
-    img.save(buf, "PNG", quality=95)
-    return buf.getvalue()
+    return _encode_png(img)
 
 
 def generate_recap_card(
@@ -314,7 +392,7 @@ def generate_recap_card(
     if not _PIL_AVAILABLE:
         return None
 
-    img = _build_background(None, None)
+    img = _cover_layers(None).background.copy()
     draw = ImageDraw.Draw(img)
 
     font_brand = _get_font(48, bold=True)
@@ -350,9 +428,7 @@ def generate_recap_card(
     font_footer = _get_font(28)
     draw.text((_WIDTH // 2, _HEIGHT - 70), f"@{_BOT_USERNAME}", fill=_ACCENT, font=font_footer, anchor="mm")
 
-    buf = io.BytesIO()
-    img.save(buf, "PNG", quality=95)
-    return buf.getvalue()
+    return _encode_png(img)
 
 
 def _draw_placeholder(draw: "ImageDraw.ImageDraw", y: int, size: int) -> None:
@@ -362,3 +438,190 @@ def _draw_placeholder(draw: "ImageDraw.ImageDraw", y: int, size: int) -> None:
     draw.ellipse([(cx - r, cy - r), (cx + r, cy + r)], outline=_ACCENT, width=3)
     font = _get_font(80, bold=True)
     draw.text((cx, cy), "♪", fill=_ACCENT, font=font, anchor="mm")
+
+
+# ── Render cache + worker pool ───────────────────────────────────────────
+
+_RENDERERS = {"track": generate_track_card, "recap": generate_recap_card}
+_pool: ProcessPoolExecutor | None = None
+_inflight: dict[str, asyncio.Future] = {}
+
+
+def _card_key(kind: str, fields: dict) -> str:
+    """Content address of a card: template version + card fields (cover as its hash)."""
+    blob = json.dumps([TEMPLATE_VERSION, kind, fields], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode()).hexdigest()
+
+
+def _cache_path(key: str) -> Path:
+    return settings.STORY_CARD_CACHE_DIR / f"{key}.png"
+
+
+def _load_cached(key: str) -> bytes | None:
+    path = _cache_path(key)
+    try:
+        data = path.read_bytes()
+    except OSError:
+        return None
+    try:
+        os.utime(path)          # mtime = last use, for LRU eviction
+    except OSError:
+        pass
+    return data
+
+
+def _store_cached(path: Path, png: bytes) -> None:
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(png)
+        tmp.replace(path)
+    except OSError as e:
+        logger.warning("Story card cache write failed for %s: %s", path.name, e)
+        return
+    _evict_cached(path.parent)
+
+
+def _evict_cached(directory: Path) -> None:
+    """LRU by mtime: drop the oldest cards beyond STORY_CARD_CACHE_MAX_FILES."""
+    try:
+        with os.scandir(directory) as it:
+            files = [e for e in it if e.name.endswith(".png")]
+        if len(files) <= settings.STORY_CARD_CACHE_MAX_FILES:
+            return
+        files.sort(key=lambda e: e.stat().st_mtime)
+    except OSError:
+        return
+    for old in files[:len(files) - settings.STORY_CARD_CACHE_MAX_FILES]:
+        Path(old.path).unlink(missing_ok=True)
+
+
+def _render_job(kind: str, path: str | None, kwargs: dict) -> bytes | None:
+    """Worker entry point: render one card and, given a *path*, write it to the disk cache."""
+    png = _RENDERERS[kind](**kwargs)
+    if png and path:
+        _store_cached(Path(path), png)
+    return png
+
+
+def _init_worker() -> None:
+    # Fonts every template uses; the first card of each worker then only
+    # pays for its background.
+    if not _PIL_AVAILABLE:
+        return
+    for size, bold in ((28, False), (30, False), (32, True), (36, False), (44, False),
+                       (44, True), (48, True), (58, True), (80, True)):
+        _get_font(size, bold)
+
+
+def _get_pool() -> ProcessPoolExecutor | None:
+    global _pool
+    if settings.STORY_RENDER_WORKERS <= 0:
+        return None
+    if _pool is None:
+        # spawn, not fork: the bot process runs threads and an event loop.
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.STORY_RENDER_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+    return _pool
+
+
+def shutdown_render_pool() -> None:
+    """Stop the render workers (call on shutdown)."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def _run_render(kind: str, key: str, kwargs: dict, cache: bool) -> bytes | None:
+    path = str(_cache_path(key)) if cache else None
+    global _pool
+    pool = _get_pool()
+    if pool is not None:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(pool, _render_job, kind, path, kwargs)
+        except BrokenProcessPool:
+            logger.warning("Story card worker died, rendering %s card in-process", kind)
+            if _pool is pool:
+                _pool = None
+                pool.shutdown(wait=False, cancel_futures=True)
+    return await asyncio.to_thread(_render_job, kind, path, kwargs)
+
+
+async def _render(kind: str, fields: dict, kwargs: dict, *, cache: bool = True) -> bytes | None:
+    if not _PIL_AVAILABLE:
+        logger.warning("Pillow not installed, cannot generate story card")
+        return None
+    key = _card_key(kind, fields)
+    png = _load_cached(key) if cache else None
+    if png is not None:
+        story_card_renders.labels(kind=kind, result="cached").inc()
+        return png
+    pending = _inflight.get(key)
+    if pending is not None:
+        story_card_renders.labels(kind=kind, result="joined").inc()
+        return await asyncio.shield(pending)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    png = None
+    try:
+        png = await _run_render(kind, key, kwargs, cache)
+    except Exception as e:
+        logger.warning("Story card render failed (%s): %s", kind, e)
+    finally:
+        _inflight.pop(key, None)
+        future.set_result(png)      # also on cancellation: joined callers get None
+    story_card_renders.labels(kind=kind, result="rendered" if png else "failed").inc()
+    return png
+
+
+async def render_track_card(
+    artist: str,
+    title: str,
+    track_id: int | str,
+    duration: str = "",
+    cover_bytes: bytes | None = None,
+) -> bytes | None:
+    """Async, cached ``generate_track_card``. Returns PNG bytes or None."""
+    kwargs = {"artist": artist, "title": title, "track_id": track_id,
+              "duration": duration, "cover_bytes": cover_bytes}
+    fields = {**kwargs, "cover_bytes": hashlib.sha1(cover_bytes).hexdigest() if cover_bytes else ""}
+    return await _render("track", fields, kwargs)
+
+
+async def render_recap_card(
+    user_name: str,
+    play_count: int,
+    top_artists: list[str],
+    top_track: str = "",
+) -> bytes | None:
+    """Async ``generate_recap_card`` (rendered in the pool, not disk-cached).
+
+    Returns PNG bytes or None.
+    """
+    kwargs = {"user_name": user_name, "play_count": play_count,
+              "top_artists": list(top_artists), "top_track": top_track}
+    return await _render("recap", kwargs, kwargs, cache=False)
+
+
+async def fetch_cover(cover_url: str | None, timeout: float = 8) -> bytes | None:
+    """Download cover art through the shared HTTP session; None on any failure."""
+    if not cover_url:
+        return None
+    try:
+        from bot.services.http_session import get_session
+
+        async with get_session().get(cover_url, timeout=timeout) as resp:
+            if resp.status != 200:
+                return None
+            if "image" not in resp.headers.get("content-type", ""):
+                return None
+            return await resp.read()
+    except Exception:
+        logger.debug("cover fetch failed url=%s", cover_url, exc_info=True)
+        return None
@@ -0,0 +1,84 @@
+"""
+suggest_index.py — Prebuilt "did you mean?" index for zero-result searches.
+
+A hard miss used to fetch the 500 most downloaded titles from Postgres and
+score every one of them with rapidfuzz, so the cost of a miss grew with the
+corpus (and the corpus had to stay tiny). Now a ``SuggestIndex`` (character
+trigram inverted index, see search_engine) is built in the background from
+the SUGGEST_CORPUS_SIZE most popular titles plus trusted learned queries,
+swapped in atomically, and a miss only probes it in well under a millisecond.
+
+A miss before the first build returns no suggestion and starts the build in
+the background instead of making the user wait for it.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+from bot.config import settings
+from bot.services.search_engine import SuggestIndex
+
+logger = logging.getLogger(__name__)
+
+_index: SuggestIndex | None = None
+_build_lock = asyncio.Lock()
+_pending_build: asyncio.Task | None = None
+
+
+async def _load_corpus() -> list[str]:
+    from bot.db import get_popular_titles
+    from bot.services.search_memory import learned_queries
+
+    titles = await get_popular_titles(limit=settings.SUGGEST_CORPUS_SIZE)
+    return titles + await learned_queries()
+
+
+async def rebuild_suggest_index(force: bool = True) -> SuggestIndex:
+    """Build a fresh index from the DB / Redis and make it the live one.
+
+    With ``force=False`` an index built while waiting for the lock is reused.
+    """
+    global _index
+    async with _build_lock:
+        if not force and _index is not None:
+            return _index
+        t0 = time.monotonic()
+        corpus = await _load_corpus()
+        index = await asyncio.to_thread(SuggestIndex, corpus)
+        _index = index
+        logger.info("suggest index: %d entries built in %.1fs", len(index), time.monotonic() - t0)
+        return index
+
+
+async def _build_once() -> None:
+    try:
+        await rebuild_suggest_index(force=False)
+    except Exception as e:
+        logger.warning("suggest index build failed: %s", e)
+
+
+async def did_you_mean(query: str, max_suggestions: int = 1) -> list[str]:
+    """Closest corpus entries for a failed query (empty list if none or not built yet)."""
+    global _pending_build
+    index = _index
+    if index is None:
+        if _pending_build is None or _pending_build.done():
+            _pending_build = asyncio.create_task(_build_once())
+        return []
+    return index.suggest(query, max_suggestions=max_suggestions)
+
+
+async def _rebuild_loop() -> None:
+    while True:
+        try:
+            await rebuild_suggest_index()
+        except Exception as e:
+            logger.warning("suggest index rebuild failed: %s", e)
+        await asyncio.sleep(settings.SUGGEST_REBUILD_SEC)
+
+
+async def start_suggest_index_scheduler() -> None:
+    asyncio.create_task(_rebuild_loop())
+    logger.info("suggest index: scheduler started (every %ds)", settings.SUGGEST_REBUILD_SEC)
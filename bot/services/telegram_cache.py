@@ -19,8 +19,6 @@ from bot.config import settings
 logger = logging.getLogger(__name__)
 
 _bot: Bot | None = None
-_upload_semaphore = asyncio.Semaphore(3)  # max 3 concurrent uploads
-_inflight: set[str] = set()  # source_ids currently being uploaded (dedup)
 
 
 def _get_bot() -> Bot | None:
@@ -80,8 +78,14 @@ async def upload_to_cache(
     title: str | None = None,
     artist: str | None = None,
     duration: int | None = None,
+    raise_errors: bool = False,
 ) -> str | None:
-    """Upload MP3 to cache channel, return file_id. Returns None on failure."""
+    """Upload MP3 to cache channel, return file_id. Returns None on failure.
+
+    Concurrency, rate and retries are governed by the upload queue
+    (bot.services.upload_queue), which passes raise_errors=True to see
+    Telegram errors such as flood-wait.
+    """
     if not settings.CACHE_CHANNEL_ID:
         return None
     bot = _get_bot()
@@ -108,43 +112,44 @@ async def upload_to_cache(
         logger.debug("Skipping %s — no metadata (title/artist unknown)", source_id)
         return None
 
-    async with _upload_semaphore:
+    try:
+        caption = f"{artist} — {title}" if artist and title else (title or artist or source_id)
+        msg = await bot.send_audio(
+            chat_id=settings.CACHE_CHANNEL_ID,
+            audio=FSInputFile(mp3_path),
+            title=title or "Unknown",
+            performer=artist or "Unknown",
+            duration=duration,
+            caption=caption[:200],
+        )
+        file_id = msg.audio.file_id if msg.audio else None
+        # The channel message_id is the PERMANENT delivery handle (copy_message).
         try:
-            caption = f"{artist} — {title}" if artist and title else (title or artist or source_id)
-            msg = await bot.send_audio(
-                chat_id=settings.CACHE_CHANNEL_ID,
-                audio=FSInputFile(mp3_path),
-                title=title or "Unknown",
-                performer=artist or "Unknown",
-                duration=duration,
-                caption=caption[:200],
-            )
-            file_id = msg.audio.file_id if msg.audio else None
-            # The channel message_id is the PERMANENT delivery handle (copy_message).
+            from bot.services.cache import cache as _cm
+            await _cm.set_cdn_msgid(source_id, msg.message_id)
+        except Exception:
+            logger.debug("set_cdn_msgid failed for %s", source_id, exc_info=True)
+        if file_id:
+            # Save file_id + enriched metadata to DB
+            await _save_file_id(source_id, file_id, title=title, artist=artist, duration=duration)
+            # Save to Redis cache too
             try:
-                from bot.services.cache import cache as _cm
-                await _cm.set_cdn_msgid(source_id, msg.message_id)
+                from bot.services.cache import cache
+                await cache.set_file_id(source_id, file_id)
             except Exception:
-                logger.debug("set_cdn_msgid failed for %s", source_id, exc_info=True)
-            if file_id:
-                # Save file_id + enriched metadata to DB
-                await _save_file_id(source_id, file_id, title=title, artist=artist, duration=duration)
-                # Save to Redis cache too
-                try:
-                    from bot.services.cache import cache
-                    await cache.set_file_id(source_id, file_id)
-                except Exception:
-                    logger.debug("Redis cache set failed for %s", source_id, exc_info=True)
-                logger.info("Cached %s to Telegram CDN (file_id=%s...)", source_id, file_id[:20])
-                try:
-                    from bot.services.cache import cache
-                    await cache.redis.sadd("cdn:posted", source_id)
-                except Exception:
-                    pass
-            return file_id
-        except Exception as e:
-            logger.debug("Cache upload failed for %s: %s", source_id, e)
-            return None
+                logger.debug("Redis cache set failed for %s", source_id, exc_info=True)
+            logger.info("Cached %s to Telegram CDN (file_id=%s...)", source_id, file_id[:20])
+            try:
+                from bot.services.cache import cache
+                await cache.redis.sadd("cdn:posted", source_id)
+            except Exception:
+                pass
+        return file_id
+    except Exception as e:
+        if raise_errors:
+            raise
+        logger.debug("Cache upload failed for %s: %s", source_id, e)
+        return None
 
 
 async def mirror_to_channel(
@@ -335,22 +340,14 @@ async def deliver_from_channel(
 
 def schedule_upload(mp3_path: Path, source_id: str, title: str | None = None,
                     artist: str | None = None, duration: int | None = None) -> None:
-    """Fire-and-forget upload to cache channel with dedup guard."""
+    """Queue a user-priority upload to the cache channel (durable, deduped by source_id)."""
     if not settings.CACHE_CHANNEL_ID:
         return
-    if source_id in _inflight:
-        logger.debug("Skipping schedule_upload for %s — already in-flight", source_id)
-        return
-    _inflight.add(source_id)
-
-    async def _upload_and_release() -> None:
-        try:
-            await upload_to_cache(mp3_path, source_id, title, artist, duration)
-        finally:
-            _inflight.discard(source_id)
+    from bot.services.upload_queue import enqueue_upload
 
     try:
-        loop = asyncio.get_running_loop()
-        loop.create_task(_upload_and_release())
+        asyncio.get_running_loop().create_task(
+            enqueue_upload(mp3_path, source_id, title, artist, duration)
+        )
     except RuntimeError:
-        _inflight.discard(source_id)
+        pass  # no running loop (e.g. during tests)
@@ -2,11 +2,30 @@
 tts_engine.py — Text-to-Speech via edge-tts with gTTS fallback.
 
 Generates MP3 voice clips for DJ comments between tracks.
-Caches generated audio in Redis (tts:{hash} → file bytes, TTL 30 days).
+
+Clips live in a content-addressed store on each node's local disk
+(TTS_CLIP_DIR, ``{sha1 of the MP3}.mp3``), trimmed LRU by mtime to
+TTS_CLIP_MAX_MB, so identical audio is stored once per node. Redis only
+holds the shared index ``tts:idx:{phrase hash}`` → clip hash (TTL 30 days);
+a node whose disk lacks the indexed clip synthesizes the phrase again.
+Disk reads, writes and eviction run in a thread, off the event loop. Legacy
+``tts:{phrase hash}`` keys (MP3 bytes in Redis) are deleted when the phrase
+is indexed again.
+
+``presynthesize`` queues phrases for a background worker pool
+(``start_tts_presynth``) so callers can request clips ahead of time;
+``synthesize`` joins a synthesis already in flight for the same phrase.
 """
+import asyncio
 import hashlib
 import io
+import itertools
 import logging
+import os
+import threading
+from pathlib import Path
+
+from bot.config import settings
 
 logger = logging.getLogger(__name__)
 
@@ -22,27 +41,132 @@ _LANG_VOICES = {
 _GTTS_LANG = {"ru": "ru", "en": "en", "kg": "ru"}
 
 _CACHE_TTL = 30 * 24 * 3600  # 30 days
+_INDEX_PREFIX = "tts:idx:"
+_LEGACY_PREFIX = "tts:"       # tts:{phrase hash} -> MP3 bytes (before the disk store)
+
+# Background pre-synthesis priorities (lower runs first)
+PRIORITY_SOON = 0      # phrases a user is about to hear
+PRIORITY_WARM = 1      # template warm-up
+
+_inflight: dict[str, asyncio.Future] = {}
+_store_bytes: int | None = None     # running estimate of the clip store size
+_store_lock = threading.Lock()      # clip writes run in worker threads
+_queue: asyncio.PriorityQueue | None = None
+_seq = itertools.count()
+_workers: list[asyncio.Task] = []
+
+
+# ── Clip store (disk) ────────────────────────────────────────────────────
+
+def _clip_path(digest: str) -> Path:
+    return settings.TTS_CLIP_DIR / f"{digest}.mp3"
+
+
+def _read_clip(digest: str) -> bytes | None:
+    """Blocking file I/O: ``_get_cached`` runs it in a thread."""
+    path = _clip_path(digest)
+    try:
+        data = path.read_bytes()
+    except OSError:
+        return None
+    try:
+        os.utime(path)          # mtime = last use, for LRU eviction
+    except OSError:
+        pass
+    return data or None
+
+
+def _write_clip(data: bytes) -> str | None:
+    """Store *data* under its SHA-1; returns the digest, None if the write failed.
+
+    Blocking file I/O: ``_set_cached`` runs it in a thread.
+    """
+    global _store_bytes
+    digest = hashlib.sha1(data).hexdigest()
+    path = _clip_path(digest)
+    try:
+        if path.exists():
+            os.utime(path)
+            return digest
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        tmp.replace(path)
+    except OSError as e:
+        logger.warning("TTS clip write failed for %s: %s", path.name, e)
+        return None
+    with _store_lock:
+        if _store_bytes is not None:
+            _store_bytes += len(data)
+        if _store_bytes is None or _store_bytes > settings.TTS_CLIP_MAX_MB * 1024 * 1024:
+            _evict_clips()
+    return digest
+
+
+def _evict_clips() -> None:
+    """LRU by mtime: delete the oldest clips until the store is under 90% of its budget.
+
+    Blocking (scandir + unlinks): call it from a thread.
+    """
+    global _store_bytes
+    budget = settings.TTS_CLIP_MAX_MB * 1024 * 1024
+    try:
+        with os.scandir(settings.TTS_CLIP_DIR) as it:
+            files = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in it if e.name.endswith(".mp3")]
+    except OSError:
+        return
+    total = sum(size for _, size, _ in files)
+    if total > budget:
+        files.sort()
+        for _, size, path in files:
+            if total <= budget * 0.9:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except OSError:
+                pass
+    _store_bytes = total
 
 
 async def _get_cached(cache_key: str) -> bytes | None:
-    """Try to get TTS audio from Redis cache."""
+    """Look the phrase up in the Redis index and read its clip from disk."""
     try:
         from bot.services.cache import cache
-        data = await cache.redis.get(cache_key)
-        return data
+        digest = await cache.redis.get(f"{_INDEX_PREFIX}{cache_key}")
     except Exception:
         return None
+    return await asyncio.to_thread(_read_clip, digest) if digest else None
 
 
 async def _set_cached(cache_key: str, data: bytes) -> None:
-    """Store TTS audio in Redis cache."""
+    """Store the clip on disk and index it in Redis."""
+    digest = await asyncio.to_thread(_write_clip, data)
+    if not digest:
+        return
     try:
         from bot.services.cache import cache
-        await cache.redis.set(cache_key, data, ex=_CACHE_TTL)
+        async with cache.redis.pipeline(transaction=False) as pipe:
+            pipe.set(f"{_INDEX_PREFIX}{cache_key}", digest, ex=_CACHE_TTL)
+            pipe.delete(f"{_LEGACY_PREFIX}{cache_key}")
+            await pipe.execute()
     except Exception:
         logger.debug("tts cache set failed", exc_info=True)
 
 
+async def _is_cached(cache_key: str) -> bool:
+    try:
+        from bot.services.cache import cache
+        digest = await cache.redis.get(f"{_INDEX_PREFIX}{cache_key}")
+    except Exception:
+        return False
+    return bool(digest) and _clip_path(digest).exists()
+
+
+def _phrase_key(text: str, lang: str) -> str:
+    return hashlib.md5(f"{lang}:{text}".encode()).hexdigest()
+
+
 async def _synthesize_edge(text: str, voice: str) -> bytes | None:
     """Generate MP3 using edge-tts."""
     try:
@@ -83,15 +207,7 @@ def _synthesize_gtts_sync(text: str, lang: str) -> bytes | None:
         return None
 
 
-async def synthesize(text: str, lang: str = "ru") -> bytes | None:
-    """Generate MP3 bytes from text. Checks cache, tries edge-tts, falls back to gTTS."""
-    # Check cache first
-    text_hash = hashlib.md5(f"{lang}:{text}".encode()).hexdigest()
-    cache_key = f"tts:{text_hash}"
-    cached = await _get_cached(cache_key)
-    if cached:
-        return cached
-
+async def _synthesize_uncached(text: str, lang: str) -> bytes | None:
     voice = _LANG_VOICES.get(lang, _VOICE_RU)
 
     # Try edge-tts first
@@ -99,13 +215,80 @@ async def synthesize(text: str, lang: str = "ru") -> bytes | None:
 
     # Fallback to gTTS
     if not data:
-        import asyncio
         gtts_lang = _GTTS_LANG.get(lang, "en")
         loop = asyncio.get_event_loop()
         data = await loop.run_in_executor(None, _synthesize_gtts_sync, text, gtts_lang)
+    return data
 
-    # Cache result
-    if data:
-        await _set_cached(cache_key, data)
 
+async def synthesize(text: str, lang: str = "ru") -> bytes | None:
+    """Generate MP3 bytes from text. Checks the clip store, tries edge-tts, falls back to gTTS."""
+    cache_key = _phrase_key(text, lang)
+    cached = await _get_cached(cache_key)
+    if cached:
+        return cached
+
+    pending = _inflight.get(cache_key)
+    if pending is not None:
+        return await asyncio.shield(pending)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[cache_key] = future
+    data = None
+    try:
+        data = await _synthesize_uncached(text, lang)
+        if data:
+            await _set_cached(cache_key, data)
+    finally:
+        _inflight.pop(cache_key, None)
+        future.set_result(data)
     return data
+
+
+# ── Background pre-synthesis ─────────────────────────────────────────────
+
+def presynthesize(texts: list[str], lang: str = "ru", priority: int = PRIORITY_SOON) -> int:
+    """Queue phrases for background synthesis. Returns how many were queued
+    (0 if the workers are not running or the queue is full)."""
+    if _queue is None:
+        return 0
+    queued = 0
+    for text in texts:
+        if not text:
+            continue
+        try:
+            _queue.put_nowait((priority, next(_seq), text, lang))
+        except asyncio.QueueFull:
+            logger.debug("TTS pre-synthesis queue full, dropping %d phrases", len(texts) - queued)
+            break
+        queued += 1
+    return queued
+
+
+async def _presynth_worker() -> None:
+    while True:
+        _prio, _n, text, lang = await _queue.get()
+        try:
+            if not await _is_cached(_phrase_key(text, lang)):
+                await synthesize(text, lang)
+        except Exception:
+            logger.debug("tts pre-synthesis failed", exc_info=True)
+        finally:
+            _queue.task_done()
+
+
+async def start_tts_presynth() -> None:
+    global _queue, _workers
+    if _queue is None:
+        _queue = asyncio.PriorityQueue(maxsize=settings.TTS_PRESYNTH_QUEUE)
+    _workers = [w for w in _workers if not w.done()]
+    while len(_workers) < settings.TTS_PRESYNTH_CONCURRENCY:
+        _workers.append(asyncio.create_task(_presynth_worker()))
+
+
+async def stop_tts_presynth() -> None:
+    global _queue, _workers
+    for w in _workers:
+        w.cancel()
+    _workers = []
+    _queue = None
@@ -0,0 +1,398 @@
+"""
+upload_queue.py — Durable, prioritized Telegram CDN upload queue.
+
+Uploads to the cache channel used to run as fire-and-forget tasks behind an
+in-process semaphore: a restart dropped everything pending, a user-requested
+track waited behind a bulk chart prefetch, and nothing backed off when
+Telegram answered with a flood-wait. Jobs now live in Redis and are drained by
+one or more workers (the bot process, or ``python -m bot.services.upload_queue``):
+
+  - priority bands: user-requested tracks (PRIORITY_USER) always go before
+    prefetch (PRIORITY_PREFETCH); FIFO inside a band
+  - dedup by source_id (a re-enqueue can only raise a job's priority)
+  - a global rate governor shared by all workers: uploads per minute to the
+    channel + a flood-wait barrier set from TelegramRetryAfter
+  - retry with exponential backoff; a claimed job is leased (and the lease is
+    renewed while it waits on the governor), so a crashed worker's uploads
+    return to the queue
+
+Storage:
+  ZSET   cdnq:pending      source_id -> priority * 1e13 + enqueued_ms
+  ZSET   cdnq:delayed      source_id -> retry-at ms
+  ZSET   cdnq:inflight     source_id -> lease deadline ms
+  STRING cdnq:job:<id>     JSON {path, title, artist, duration, priority, attempts, enqueued_at, cleanup}
+  STRING cdnq:flood        flood-wait barrier, ms timestamp
+  STRING cdnq:rate:<min>   uploads started in that minute
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import random
+import time
+from pathlib import Path
+from typing import Callable
+
+from redis.exceptions import WatchError
+
+from bot.config import settings
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_USER = 0
+PRIORITY_PREFETCH = 1
+_PRIORITY_NAMES = {PRIORITY_USER: "user", PRIORITY_PREFETCH: "prefetch"}
+
+_PENDING = "cdnq:pending"
+_DELAYED = "cdnq:delayed"
+_INFLIGHT = "cdnq:inflight"
+_JOB = "cdnq:job:"
+_FLOOD = "cdnq:flood"
+_RATE = "cdnq:rate:"
+
+_BAND = 10 ** 13                  # > any epoch-ms, so bands never overlap
+_JOB_TTL = 3 * 24 * 3600
+_LEASE_MS = 10 * 60 * 1000
+_LEASE_RENEW_MS = _LEASE_MS // 3   # longest governor sleep between lease renewals
+_BACKOFF_BASE = 30.0
+_BACKOFF_MAX = 900.0
+_IDLE_SLEEP = 1.0
+
+_fallback_semaphore = asyncio.Semaphore(3)
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _score(priority: int, enqueued_ms: int) -> int:
+    return priority * _BAND + enqueued_ms
+
+
+class UploadQueue:
+    """Redis-backed CDN upload queue; any number of processes may run ``run()``."""
+
+    def __init__(
+        self,
+        redis_factory: Callable | None = None,
+        uploader: Callable | None = None,
+        per_minute: int | None = None,
+        concurrency: int | None = None,
+        max_attempts: int | None = None,
+    ) -> None:
+        self._redis_factory = redis_factory
+        self._uploader = uploader
+        self._per_minute = per_minute
+        self._concurrency = concurrency
+        self._max_attempts = max_attempts
+
+    @property
+    def redis(self):
+        if self._redis_factory is not None:
+            return self._redis_factory()
+        from bot.services.cache import cache
+        return cache.redis
+
+    @property
+    def per_minute(self) -> int:
+        return self._per_minute or settings.CDN_UPLOAD_PER_MINUTE
+
+    @property
+    def concurrency(self) -> int:
+        return self._concurrency or settings.CDN_UPLOAD_CONCURRENCY
+
+    @property
+    def max_attempts(self) -> int:
+        return self._max_attempts or settings.CDN_UPLOAD_MAX_ATTEMPTS
+
+    async def _upload(self, path: Path, source_id: str, job: dict) -> str | None:
+        if self._uploader is not None:
+            return await self._uploader(path, source_id, job)
+        from bot.services.telegram_cache import upload_to_cache
+        return await upload_to_cache(
+            path, source_id,
+            title=job.get("title"), artist=job.get("artist"), duration=job.get("duration"),
+            raise_errors=True,
+        )
+
+    # ── Producer side ───────────────────────────────────────────────────
+
+    async def enqueue(
+        self,
+        mp3_path: Path,
+        source_id: str,
+        *,
+        title: str | None = None,
+        artist: str | None = None,
+        duration: int | None = None,
+        priority: int = PRIORITY_USER,
+        cleanup: bool = False,
+    ) -> bool:
+        """Queue an upload. Returns False if the track is already queued (dedup)."""
+        now = _now_ms()
+        job = {
+            "path": str(mp3_path),
+            "title": title,
+            "artist": artist,
+            "duration": duration,
+            "priority": priority,
+            "attempts": 0,
+            "enqueued_at": now,
+            "cleanup": cleanup,
+        }
+        r = self.redis
+        key = _JOB + source_id
+        if await r.set(key, json.dumps(job, ensure_ascii=False), nx=True, ex=_JOB_TTL):
+            await r.zadd(_PENDING, {source_id: _score(priority, now)})
+            return True
+
+        # Already queued: a user request promotes a pending prefetch job
+        raw = await r.get(key)
+        existing = json.loads(raw) if raw else None
+        if existing and priority < existing.get("priority", PRIORITY_PREFETCH):
+            existing["priority"] = priority
+            existing["cleanup"] = existing.get("cleanup", False) and cleanup
+            await r.set(key, json.dumps(existing, ensure_ascii=False), ex=_JOB_TTL)
+            await r.zadd(_PENDING, {source_id: _score(priority, existing["enqueued_at"])}, xx=True)
+        return False
+
+    async def depth(self) -> dict[str, int]:
+        r = self.redis
+        out = {}
+        for priority, name in _PRIORITY_NAMES.items():
+            out[name] = int(await r.zcount(_PENDING, priority * _BAND, (priority + 1) * _BAND - 1))
+        out["delayed"] = int(await r.zcard(_DELAYED))
+        out["inflight"] = int(await r.zcard(_INFLIGHT))
+        return out
+
+    async def wait_for_capacity(self, priority: int, limit: int, timeout: float = 300.0) -> bool:
+        """Backpressure for bulk producers: wait until the band has < *limit* jobs."""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                pending = int(await self.redis.zcount(_PENDING, priority * _BAND, (priority + 1) * _BAND - 1))
+            except Exception:
+                return False
+            if pending < limit:
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(2.0)
+
+    # ── Worker side ─────────────────────────────────────────────────────
+
+    async def _move(self, src: str, source_id: str, dst: str, score: int, *, due_by: int | None = None) -> bool:
+        """Atomically move *source_id* from ZSET *src* to *dst* (WATCH/MULTI).
+
+        With *due_by*, only moves it if its score in *src* is still <= due_by.
+        Returns False if another worker moved it first.
+        """
+        async with self.redis.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(src)
+                    current = await pipe.zscore(src, source_id)
+                    if current is None or (due_by is not None and current > due_by):
+                        return False
+                    pipe.multi()
+                    pipe.zrem(src, source_id)
+                    pipe.zadd(dst, {source_id: score})
+                    await pipe.execute()
+                    return True
+                except WatchError:
+                    continue
+
+    async def _move_due(self, src: str, now: int) -> None:
+        """Return due delayed jobs / expired leases to the pending set."""
+        r = self.redis
+        for source_id in await r.zrangebyscore(src, "-inf", now, start=0, num=100):
+            raw = await r.get(_JOB + source_id)
+            if not raw:
+                await r.zrem(src, source_id)
+                continue
+            job = json.loads(raw)
+            score = _score(job.get("priority", PRIORITY_PREFETCH), job["enqueued_at"])
+            await self._move(src, source_id, _PENDING, score, due_by=now)
+
+    async def claim(self) -> tuple[str, dict] | None:
+        r = self.redis
+        now = _now_ms()
+        await self._move_due(_DELAYED, now)
+        await self._move_due(_INFLIGHT, now)
+        while True:
+            head = await r.zrange(_PENDING, 0, 0)
+            if not head:
+                return None
+            source_id = head[0]
+            # pending -> inflight in one transaction: a crash can't drop the job
+            if not await self._move(_PENDING, source_id, _INFLIGHT, now + _LEASE_MS):
+                continue  # another worker claimed it
+            raw = await r.get(_JOB + source_id)
+            if raw:
+                return source_id, json.loads(raw)
+            await r.zrem(_INFLIGHT, source_id)  # job expired
+
+    async def _governor_wait(self, source_id: str | None = None) -> None:
+        """Block until the shared flood-wait barrier and per-minute budget allow an upload.
+
+        While a claimed *source_id* waits, its lease is renewed so a long
+        flood-wait can't hand the job to another worker.
+        """
+        r = self.redis
+        while True:
+            if source_id is not None:
+                await r.zadd(_INFLIGHT, {source_id: _now_ms() + _LEASE_MS}, xx=True)
+            flood_until = int(await r.get(_FLOOD) or 0)
+            now = _now_ms()
+            if flood_until > now:
+                await asyncio.sleep(min(flood_until - now, _LEASE_RENEW_MS) / 1000)
+                continue
+            window = now // 60000
+            used = int(await r.incr(f"{_RATE}{window}"))
+            if used == 1:
+                await r.expire(f"{_RATE}{window}", 120)
+            if used <= self.per_minute:
+                return
+            await asyncio.sleep((window + 1) * 60000 / 1000 - now / 1000 + random.uniform(0, 0.5))
+
+    async def _ack(self, source_id: str) -> None:
+        r = self.redis
+        await r.zrem(_INFLIGHT, source_id)
+        await r.delete(_JOB + source_id)
+
+    async def _retry(self, source_id: str, job: dict, retry_at_ms: int) -> None:
+        r = self.redis
+        await r.set(_JOB + source_id, json.dumps(job, ensure_ascii=False), ex=_JOB_TTL)
+        await r.zrem(_INFLIGHT, source_id)
+        await r.zadd(_DELAYED, {source_id: retry_at_ms})
+
+    async def process(self, source_id: str, job: dict) -> str:
+        """Upload one claimed job. Returns the outcome label."""
+        from aiogram.exceptions import TelegramRetryAfter
+        from bot.services import metrics
+
+        band = _PRIORITY_NAMES.get(job.get("priority"), "prefetch")
+        path = Path(job["path"])
+        await self._governor_wait(source_id)
+        try:
+            file_id = await self._upload(path, source_id, job)
+        except TelegramRetryAfter as e:
+            # Flood-wait is global: every worker pauses, the job keeps its attempts
+            until = _now_ms() + int(e.retry_after * 1000)
+            await self.redis.set(_FLOOD, until, px=int(e.retry_after * 1000) + 1000)
+            await self._retry(source_id, job, until)
+            logger.warning("CDN upload flood-wait %ss (job %s requeued)", e.retry_after, source_id)
+            outcome = "flood_wait"
+        except Exception as e:
+            job["attempts"] = int(job.get("attempts", 0)) + 1
+            if job["attempts"] >= self.max_attempts:
+                await self._ack(source_id)
+                logger.warning("CDN upload gave up on %s after %d attempts: %s", source_id, job["attempts"], e)
+                outcome = "failed"
+            else:
+                delay = min(_BACKOFF_BASE * 2 ** (job["attempts"] - 1), _BACKOFF_MAX)
+                await self._retry(source_id, job, _now_ms() + int(delay * random.uniform(1.0, 1.25) * 1000))
+                logger.debug("CDN upload %s failed (attempt %d), retry in %.0fs", source_id, job["attempts"], delay)
+                outcome = "retry"
+        else:
+            await self._ack(source_id)
+            if file_id:
+                metrics.cdn_time_to_cdn.labels(priority=band).observe((_now_ms() - job["enqueued_at"]) / 1000)
+                if job.get("cleanup"):
+                    path.unlink(missing_ok=True)
+                outcome = "uploaded"
+            else:
+                outcome = "skipped"  # gone from disk / no metadata / cached meanwhile
+        metrics.cdn_uploads_total.labels(outcome=outcome).inc()
+        return outcome
+
+    async def _update_depth_gauge(self) -> None:
+        from bot.services import metrics
+        try:
+            for name, value in (await self.depth()).items():
+                metrics.cdn_upload_queue_depth.labels(state=name).set(value)
+        except Exception:
+            logger.debug("upload queue depth probe failed", exc_info=True)
+
+    async def _drain_loop(self) -> None:
+        while True:
+            try:
+                claimed = await self.claim()
+                if claimed is None:
+                    await self._update_depth_gauge()
+                    await asyncio.sleep(_IDLE_SLEEP)
+                    continue
+                await self.process(*claimed)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("upload queue worker error", exc_info=True)
+                await asyncio.sleep(5)
+
+    async def run(self) -> None:
+        """Drain the queue forever with ``concurrency`` parallel uploaders."""
+        await asyncio.gather(*(self._drain_loop() for _ in range(self.concurrency)))
+
+
+upload_queue = UploadQueue()
+
+
+async def enqueue_upload(
+    mp3_path: Path,
+    source_id: str,
+    title: str | None = None,
+    artist: str | None = None,
+    duration: int | None = None,
+    *,
+    priority: int = PRIORITY_USER,
+    cleanup: bool = False,
+) -> bool:
+    """Queue a CDN upload; falls back to a direct in-process upload if Redis is down."""
+    if not settings.CACHE_CHANNEL_ID:
+        return False
+    try:
+        return await upload_queue.enqueue(
+            mp3_path, source_id,
+            title=title, artist=artist, duration=duration,
+            priority=priority, cleanup=cleanup,
+        )
+    except Exception:
+        logger.warning("upload queue unavailable — uploading %s directly", source_id, exc_info=True)
+
+    from bot.services.telegram_cache import upload_to_cache
+    async with _fallback_semaphore:
+        file_id = await upload_to_cache(mp3_path, source_id, title, artist, duration)
+    if file_id and cleanup:
+        mp3_path.unlink(missing_ok=True)
+    return bool(file_id)
+
+
+_worker_task: asyncio.Task | None = None
+
+
+async def start_upload_worker() -> None:
+    global _worker_task
+    if not settings.CACHE_CHANNEL_ID or not settings.CDN_UPLOAD_WORKER:
+        return
+    if _worker_task is None or _worker_task.done():
+        _worker_task = asyncio.create_task(upload_queue.run())
+        logger.info(
+            "CDN upload worker started (concurrency=%d, %d/min)",
+            upload_queue.concurrency, upload_queue.per_minute,
+        )
+
+
+async def stop_upload_worker() -> None:
+    global _worker_task
+    if _worker_task is not None:
+        _worker_task.cancel()
+        _worker_task = None
+
+
+if __name__ == "__main__":
+    # Standalone drain worker: python -m bot.services.upload_queue
+    from bot.logging_config import configure_logging
+
+    configure_logging()
+    asyncio.run(upload_queue.run())
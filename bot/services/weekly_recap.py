@@ -12,6 +12,7 @@ import asyncio
 import logging
 from datetime import datetime, timedelta, timezone
 
+from aiogram.exceptions import TelegramRetryAfter
 from sqlalchemy import func, select
 
 logger = logging.getLogger(__name__)
@@ -163,60 +164,59 @@ async def _send_recaps(bot) -> None:
                 user_top_genres[row[0]].append((row[1], row[2]))
 
     # Build and send recaps
-    sent = 0
-    for user_id in user_ids:
-        try:
-            lang = user_langs.get(user_id, "ru")
-            play_count = active_users[user_id]
+    async def _send_one(bot, user_id: int) -> None:
+        lang = user_langs.get(user_id, "ru")
+        play_count = active_users[user_id]
+
+        lines = [t(lang, "recap_header")]
+        lines.append(t(lang, "recap_total", count=play_count))
+        lines.append("")
 
-            lines = [t(lang, "recap_header")]
-            lines.append(t(lang, "recap_total", count=play_count))
+        top_track = user_top_track.get(user_id)
+        if top_track:
+            lines.append(t(lang, "recap_top_track", artist=top_track[0] or "?", title=top_track[1] or "?", count=top_track[2]))
+
+        artists = user_top_artists.get(user_id, [])
+        if artists:
             lines.append("")
+            lines.append(t(lang, "recap_top_artists"))
+            for i, (artist, cnt) in enumerate(artists, 1):
+                lines.append(f"  {i}. {artist} ({cnt})")
 
-            top_track = user_top_track.get(user_id)
-            if top_track:
-                lines.append(t(lang, "recap_top_track", artist=top_track[0] or "?", title=top_track[1] or "?", count=top_track[2]))
+        genres = user_top_genres.get(user_id, [])
+        if genres:
+            lines.append("")
+            lines.append(t(lang, "recap_top_genres"))
+            for genre, cnt in genres:
+                lines.append(f"  ▸ {genre} ({cnt})")
 
-            artists = user_top_artists.get(user_id, [])
-            if artists:
-                lines.append("")
-                lines.append(t(lang, "recap_top_artists"))
-                for i, (artist, cnt) in enumerate(artists, 1):
-                    lines.append(f"  {i}. {artist} ({cnt})")
+        lines.append("")
+        lines.append(t(lang, "recap_footer"))
 
-            genres = user_top_genres.get(user_id, [])
-            if genres:
-                lines.append("")
-                lines.append(t(lang, "recap_top_genres"))
-                for genre, cnt in genres:
-                    lines.append(f"  ▸ {genre} ({cnt})")
+        await bot.send_message(user_id, "\n".join(lines), parse_mode="HTML")
 
-            lines.append("")
-            lines.append(t(lang, "recap_footer"))
-
-            await bot.send_message(user_id, "\n".join(lines), parse_mode="HTML")
-
-            # Send visual story card
-            try:
-                from bot.services.story_cards import generate_recap_card
-                top_artist_names = [a for a, _ in artists]
-                top_track_str = f"{top_track[0]} — {top_track[1]}" if top_track else ""
-                card_bytes = generate_recap_card(
-                    user_name=user_names.get(user_id, f"User #{user_id}"),
-                    play_count=play_count,
-                    top_artists=top_artist_names,
-                    top_track=top_track_str,
-                )
-                if card_bytes:
-                    from aiogram.types import BufferedInputFile
-                    photo = BufferedInputFile(card_bytes, filename="recap.png")
-                    await bot.send_photo(user_id, photo)
-            except Exception as e:
-                logger.debug("Story card send failed for %s: %s", user_id, e)
-
-            sent += 1
+        # Send visual story card
+        try:
+            from bot.services.story_cards import render_recap_card
+            top_artist_names = [a for a, _ in artists]
+            top_track_str = f"{top_track[0]} — {top_track[1]}" if top_track else ""
+            card_bytes = await render_recap_card(
+                user_name=user_names.get(user_id, f"User #{user_id}"),
+                play_count=play_count,
+                top_artists=top_artist_names,
+                top_track=top_track_str,
+            )
+            if card_bytes:
+                from aiogram.types import BufferedInputFile
+                photo = BufferedInputFile(card_bytes, filename="recap.png")
+                await bot.send_photo(user_id, photo)
+        except TelegramRetryAfter:
+            raise
         except Exception as e:
-            logger.debug("Recap send failed for %s: %s", user_id, e)
-        await asyncio.sleep(0.05)
+            logger.debug("Story card send failed for %s: %s", user_id, e)
+
+    from bot.services.mass_sender import MassSender
 
-    logger.info("Weekly recap done: sent=%d", sent)
+    year, week, _ = now.isocalendar()
+    report = await MassSender(bot).run(f"recap:{year}-W{week:02d}", user_ids, _send_one)
+    logger.info("Weekly recap done: sent=%d", report.delivered)
@@ -210,10 +210,10 @@ async def _get_client(token: str):
 
 
 def _get_proxy_url() -> str | None:
-    """Get next proxy URL from pool for Yandex HTTP requests."""
+    """Proxy URL from the pool for Yandex HTTP requests (sticky to the Yandex API host)."""
     try:
         from bot.services.proxy_pool import proxy_pool
-        return proxy_pool.get_next()
+        return proxy_pool.get_next("api.music.yandex.net")
     except Exception:
         return None
 
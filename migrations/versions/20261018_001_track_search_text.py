@@ -0,0 +1,47 @@
+"""add search_text to tracks
+
+Revision ID: 004_track_search_text
+Revises: 003_promo_expires_at
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "004_track_search_text"
+down_revision: Union[str, None] = "003_promo_expires_at"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _table_exists(name: str) -> bool:
+    bind = op.get_bind()
+    return name in sa.inspect(bind).get_table_names()
+
+
+def _column_exists(table: str, column: str) -> bool:
+    bind = op.get_bind()
+    cols = [c["name"] for c in sa.inspect(bind).get_columns(table)]
+    return column in cols
+
+
+def upgrade() -> None:
+    if not _table_exists("tracks"):
+        return
+    if not _column_exists("tracks", "search_text"):
+        op.add_column(
+            "tracks",
+            sa.Column("search_text", sa.String(800), nullable=True),
+        )
+    # Rows are backfilled at startup by bot.db.backfill_track_search_text, which
+    # applies the same normalize_query() the search path uses.
+
+
+def downgrade() -> None:
+    if not _table_exists("tracks"):
+        return
+    if _column_exists("tracks", "search_text"):
+        op.drop_column("tracks", "search_text")
@@ -1,49 +1,217 @@
 """
-automix.py — AUTO MIX: crossfade миксинг треков из TEQUILA + FULLMOON (v1.3).
+automix.py — AUTO MIX: crossfade миксинг треков из TEQUILA + FULLMOON (v1.4).
 
 Алгоритм:
-  1. Берёт 3 трека из TEQUILA + 3 из FULLMOON (по очереди)
-  2. Анализирует BPM через librosa
+  1. Берёт до 6 треков (скачиваются параллельно, см. handlers/radio.py)
+  2. Анализирует каждый трек один раз и кэширует результат (sidecar JSON
+     по source_id): громкость (LUFS, EBU R128), intro/outro cue-точки,
+     длительность, BPM и тональность (если установлена librosa)
   3. Сортирует по BPM для плавного перехода
-  4. Делает crossfade 5-10 сек через pydub
-  5. Нормализует громкость (-14 LUFS)
-  6. Отдаёт готовый MP3 файл
+  4. Рендерит потоково одним ffmpeg: atrim по cue-точкам → volume до
+     -14 LUFS → цепочка acrossfade → alimiter → MP3 192k. Память не
+     зависит от длины микса — треки не декодируются целиком в Python
+  5. Без ffmpeg — прежний путь через pydub (всё в памяти)
 """
 import asyncio
+import json
 import logging
+import re
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import NamedTuple, Sequence
+
+from bot.config import settings
 
 logger = logging.getLogger(__name__)
 
+ANALYSIS_VERSION = 2           # v1 мог закэшировать нулевой анализ (framelog=verbose)
+_ANALYSIS_WORKERS = 4          # параллельных ffmpeg-анализов на микс
+_ANALYSIS_TIMEOUT_SEC = 120
+_RENDER_TIMEOUT_SEC = 600
+_LIBROSA_WINDOW_SEC = 60       # окно для BPM / тональности (от intro)
+_CUE_WINDOW_SEC = 0.4          # окно momentary loudness в ebur128
+_CUE_BELOW_LU = 20.0           # intro/outro: громкость в пределах 20 LU от integrated
+_MAX_GAIN_DB = 12.0
+_SILENCE_LUFS = -70.0
+
+_PITCHES = ("C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B")
+# Krumhansl–Kessler key profiles
+_MAJOR_PROFILE = (6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88)
+_MINOR_PROFILE = (6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17)
+
+_FRAME_RE = re.compile(r"t:\s*([\d.]+)\s+TARGET:\S+\s+LUFS\s+M:\s*(\S+)")
+_INTEGRATED_RE = re.compile(r"I:\s*(\S+)\s+LUFS")
+
+
+class TrackAnalysis(NamedTuple):
+    """Результат анализа трека (времена в секундах)."""
+    duration: float
+    lufs: float | None
+    intro: float               # начало звучащей части
+    outro: float               # конец звучащей части
+    bpm: float | None = None
+    key: str | None = None     # "A", "F#m", ...
+
+
+# ── Публичный API ────────────────────────────────────────────────────────
 
 async def create_mix(
     track_paths: list[Path],
     output_path: Path,
     crossfade_ms: int = 7000,
+    keys: Sequence[str] | None = None,
 ) -> Path:
     """
     Создаёт микс из списка MP3 файлов с crossfade.
     Запускает тяжёлую обработку в executor.
+    *keys* — ключи кэша анализа (source_id), по умолчанию имя файла.
     """
     loop = asyncio.get_event_loop()
     return await loop.run_in_executor(
-        None, _create_mix_sync, track_paths, output_path, crossfade_ms
+        None, _create_mix_sync, track_paths, output_path, crossfade_ms, keys
     )
 
 
+def analyze_track(path: Path, key: str | None = None) -> TrackAnalysis:
+    """Анализ трека с кэшем: повторный вызов для того же ключа не читает аудио."""
+    cache_file = _analysis_path(key or Path(path).stem)
+    cached = _load_analysis(cache_file)
+    if cached is not None:
+        return cached
+    analysis = _analyze_uncached(Path(path))
+    _store_analysis(cache_file, analysis)
+    return analysis
+
+
+def analyze_tracks(paths: Sequence[Path], keys: Sequence[str] | None = None) -> list[TrackAnalysis]:
+    """Параллельный analyze_track для всех треков микса."""
+    keys = list(keys) if keys else [Path(p).stem for p in paths]
+    with ThreadPoolExecutor(max_workers=min(_ANALYSIS_WORKERS, max(len(paths), 1))) as pool:
+        return list(pool.map(analyze_track, paths, keys))
+
+
+# ── Рендер ───────────────────────────────────────────────────────────────
+
 def _create_mix_sync(
     track_paths: list[Path],
     output_path: Path,
     crossfade_ms: int,
+    keys: Sequence[str] | None = None,
+) -> Path:
+    if not track_paths:
+        raise ValueError("Нет треков для микса")
+
+    if _ffmpeg_available():
+        return _render_streaming(track_paths, output_path, crossfade_ms, keys)
+    return _create_mix_pydub(track_paths, output_path, crossfade_ms)
+
+
+def _render_streaming(
+    track_paths: list[Path],
+    output_path: Path,
+    crossfade_ms: int,
+    keys: Sequence[str] | None,
+) -> Path:
+    try:
+        analyses = analyze_tracks(track_paths, keys)
+    except (RuntimeError, subprocess.SubprocessError) as e:
+        # Без анализа нет cue-точек и громкости — склеиваем треки как есть
+        logger.warning("Mix analysis failed, plain concat: %s", e)
+        paths = list(track_paths)
+        graph, label, duration = _build_concat_graph(len(paths))
+    else:
+        order = _bpm_order(analyses)
+        paths = [track_paths[i] for i in order]
+        analyses = [analyses[i] for i in order]
+        graph, label, duration = _build_filter_graph(
+            analyses, crossfade_ms / 1000, settings.AUTOMIX_TARGET_LUFS
+        )
+    cmd = ["ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-y"]
+    for p in paths:
+        cmd += ["-i", str(p)]
+    cmd += [
+        "-filter_complex", graph, "-map", f"[{label}]",
+        "-c:a", "libmp3lame", "-b:a", "192k", "-ar", "44100",
+        str(output_path),
+    ]
+    proc = subprocess.run(
+        cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=_RENDER_TIMEOUT_SEC
+    )
+    if proc.returncode != 0:
+        err = proc.stderr.decode("utf-8", "replace").strip().splitlines()[-3:]
+        raise RuntimeError(f"ffmpeg mix failed: {' | '.join(err)}")
+    if duration:
+        logger.info("Mix created: %s (%.1f min, %d tracks)", output_path, duration / 60, len(paths))
+    else:
+        logger.info("Mix created: %s (%d tracks, plain concat)", output_path, len(paths))
+    return output_path
+
+
+def _build_filter_graph(
+    analyses: Sequence[TrackAnalysis],
+    crossfade_s: float,
+    target_lufs: float,
+) -> tuple[str, str, float]:
+    """filter_complex для входов 0..n-1 → (граф, метка выхода, длительность микса).
+
+    Каждый трек обрезается по cue-точкам и приводится к target_lufs; длина
+    crossfade ограничена половиной самого короткого из двух соседних треков.
+    """
+    parts = []
+    lengths = []
+    for i, a in enumerate(analyses):
+        intro, outro = a.intro, a.outro if a.outro > a.intro else a.duration
+        lengths.append(max(outro - intro, 0.0))
+        chain = [f"atrim=start={intro:.3f}:end={outro:.3f}", "asetpts=PTS-STARTPTS"]
+        if a.lufs is not None and a.lufs > _SILENCE_LUFS:
+            gain = max(-_MAX_GAIN_DB, min(_MAX_GAIN_DB, target_lufs - a.lufs))
+            chain.append(f"volume={gain:.2f}dB")
+        chain.append("aformat=sample_fmts=fltp:sample_rates=44100:channel_layouts=stereo")
+        parts.append(f"[{i}:a]{','.join(chain)}[t{i}]")
+
+    prev = "t0"
+    total = lengths[0] if lengths else 0.0
+    for i in range(1, len(analyses)):
+        fade = max(0.0, min(crossfade_s, lengths[i - 1] / 2, lengths[i] / 2))
+        parts.append(f"[{prev}][t{i}]acrossfade=d={fade:.3f}:c1=tri:c2=tri[x{i}]")
+        prev = f"x{i}"
+        total += lengths[i] - fade
+    parts.append(f"[{prev}]alimiter=limit=0.95:level=disabled[mix]")
+    return ";".join(parts), "mix", total
+
+
+def _build_concat_graph(n: int) -> tuple[str, str, float]:
+    """Запасной граф без анализа: треки подряд, без обрезки и crossfade.
+
+    Длительность микса неизвестна — возвращается 0.
+    """
+    fmt = "aformat=sample_fmts=fltp:sample_rates=44100:channel_layouts=stereo"
+    parts = [f"[{i}:a]{fmt}[t{i}]" for i in range(n)]
+    inputs = "".join(f"[t{i}]" for i in range(n))
+    parts.append(f"{inputs}concat=n={n}:v=0:a=1,alimiter=limit=0.95:level=disabled[mix]")
+    return ";".join(parts), "mix", 0.0
+
+
+def _bpm_order(analyses: Sequence[TrackAnalysis]) -> list[int]:
+    """Индексы треков по возрастанию BPM (без BPM — в конце, в исходном порядке)."""
+    return sorted(
+        range(len(analyses)),
+        key=lambda i: (analyses[i].bpm is None, analyses[i].bpm or 0.0),
+    )
+
+
+def _create_mix_pydub(
+    track_paths: list[Path],
+    output_path: Path,
+    crossfade_ms: int,
 ) -> Path:
     try:
         from pydub import AudioSegment
     except ImportError:
         raise RuntimeError("pydub не установлен")
 
-    if not track_paths:
-        raise ValueError("Нет треков для микса")
-
     segments = [AudioSegment.from_mp3(str(p)) for p in track_paths]
 
     # Сортировка по BPM (если доступна librosa)
@@ -85,3 +253,125 @@ def _normalize(segment, target_dbfs: float = -14.0):
     """Нормализация громкости до target_dbfs."""
     diff = target_dbfs - segment.dBFS
     return segment.apply_gain(diff)
+
+
+# ── Анализ ───────────────────────────────────────────────────────────────
+
+def _ffmpeg_available() -> bool:
+    return shutil.which("ffmpeg") is not None
+
+
+def _analyze_uncached(path: Path) -> TrackAnalysis:
+    """Громкость и cue-точки — один проход ffmpeg ebur128; BPM/тональность — librosa."""
+    if not _ffmpeg_available():
+        raise RuntimeError("ffmpeg не найден")
+    proc = subprocess.run(
+        [
+            "ffmpeg", "-nostdin", "-hide_banner", "-nostats", "-i", str(path),
+            # framelog=info: покадровые строки видны на уровне лога ffmpeg по умолчанию
+            "-map", "0:a:0", "-af", "ebur128=framelog=info", "-f", "null", "-",
+        ],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=_ANALYSIS_TIMEOUT_SEC,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg analysis failed for {path.name}")
+    analysis = _parse_ebur128(proc.stderr.decode("utf-8", "replace"))
+    if analysis.duration <= 0:
+        # Нет покадровых строк — не кэшируем, иначе микс обрежется в ноль
+        raise RuntimeError(f"ffmpeg analysis of {path.name} returned no loudness frames")
+    bpm, key = _tempo_and_key(path, analysis.intro)
+    return analysis._replace(bpm=bpm, key=key)
+
+
+def _parse_ebur128(log: str) -> TrackAnalysis:
+    """Разбор вывода ebur128: integrated LUFS и cue-точки по momentary loudness."""
+    times: list[float] = []
+    momentary: list[float] = []
+    for m in _FRAME_RE.finditer(log):
+        times.append(float(m.group(1)))
+        try:
+            momentary.append(float(m.group(2)))
+        except ValueError:
+            momentary.append(float("-inf"))
+    duration = times[-1] if times else 0.0
+
+    lufs = None
+    summary = log.rfind("Summary:")
+    if summary >= 0:
+        m = _INTEGRATED_RE.search(log, summary)
+        if m:
+            try:
+                lufs = float(m.group(1))
+            except ValueError:
+                lufs = None
+
+    intro, outro = 0.0, duration
+    if lufs is not None and lufs > _SILENCE_LUFS:
+        loud = [t for t, v in zip(times, momentary) if v >= lufs - _CUE_BELOW_LU]
+        if loud:
+            intro = max(0.0, loud[0] - _CUE_WINDOW_SEC)
+            outro = loud[-1]
+    return TrackAnalysis(duration=duration, lufs=lufs, intro=intro, outro=outro)
+
+
+def _tempo_and_key(path: Path, offset: float) -> tuple[float | None, str | None]:
+    try:
+        import librosa
+    except ImportError:
+        return None, None
+    try:
+        y, sr = librosa.load(
+            str(path), sr=22050, mono=True, offset=offset, duration=_LIBROSA_WINDOW_SEC
+        )
+        tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
+        chroma = librosa.feature.chroma_cqt(y=y, sr=sr).mean(axis=1)
+        return round(float(tempo), 1), _estimate_key(chroma)
+    except Exception as e:
+        logger.warning("BPM/key analysis skipped for %s: %s", path.name, e)
+        return None, None
+
+
+def _estimate_key(chroma) -> str | None:
+    """Тональность по среднему chroma-вектору (корреляция с профилями Krumhansl)."""
+    import numpy as np
+
+    chroma = np.asarray(chroma, dtype=np.float64)
+    if chroma.shape != (12,) or not chroma.any():
+        return None
+    best, best_corr = None, -np.inf
+    for suffix, profile in (("", _MAJOR_PROFILE), ("m", _MINOR_PROFILE)):
+        for tonic in range(12):
+            corr = np.corrcoef(chroma, np.roll(profile, tonic))[0, 1]
+            if corr > best_corr:
+                best, best_corr = f"{_PITCHES[tonic]}{suffix}", corr
+    return best
+
+
+# ── Кэш анализа (sidecar JSON) ───────────────────────────────────────────
+
+def _analysis_path(key: str) -> Path:
+    safe = re.sub(r"[^\w.-]", "_", key)
+    return settings.AUTOMIX_ANALYSIS_DIR / f"{safe}.json"
+
+
+def _load_analysis(path: Path) -> TrackAnalysis | None:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data.pop("version", None) != ANALYSIS_VERSION:
+            return None
+        analysis = TrackAnalysis(**data)
+        return analysis if analysis.duration > 0 else None
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def _store_analysis(path: Path, analysis: TrackAnalysis) -> None:
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps({"version": ANALYSIS_VERSION, **analysis._asdict()}), encoding="utf-8"
+        )
+        tmp.replace(path)
+    except OSError as e:
+        logger.warning("Analysis cache write failed for %s: %s", path.name, e)
@@ -16,6 +16,7 @@ import json
 import logging
 from collections import Counter
 from datetime import datetime, timedelta, timezone
+from typing import Iterable
 
 from sqlalchemy import func, select, and_
 
@@ -493,6 +494,7 @@ async def _ml_recommendations(user_id: int, limit: int) -> list[dict]:
     from bot.models.base import async_session
     from bot.models.track import ListeningHistory, Track
     from bot.models.user import User
+    from recommender.model_store import FOLD_IN_MIN_PLAYS
     from recommender.scorer import HybridScorer, ScoringContext
 
     async with async_session() as session:
@@ -521,8 +523,10 @@ async def _ml_recommendations(user_id: int, limit: int) -> list[dict]:
         listened_ids = {row[0] for row in history}
         # Extract source_ids for embedding lookup (most recent first)
         recent_source_ids = [row[1] for row in history[:50] if row[1]]
+        recent_track_ids = [row[0] for row in history[:50]]
 
-        if len(listened_ids) < _MIN_PLAYS_FOR_COLLAB:
+        # Users the nightly model hasn't seen are folded in from a few recent plays
+        if len(listened_ids) < FOLD_IN_MIN_PLAYS:
             return []
 
         # Get candidate pool: all tracks with file_id, include metadata
@@ -557,6 +561,8 @@ async def _ml_recommendations(user_id: int, limit: int) -> list[dict]:
         ctx = ScoringContext(
             current_hour_utc=datetime.now(timezone.utc).hour,
             recent_source_ids=recent_source_ids,
+            recent_track_ids=recent_track_ids,
+            last_play_at=history[0][2].timestamp() if history[0][2] else None,
             listened_ids=listened_ids,
             preferred_hours=preferred_hours,
         )
@@ -579,15 +585,19 @@ async def _ml_recommendations(user_id: int, limit: int) -> list[dict]:
         return [_track_to_dict(track_map[tid]) for tid in ranked_ids if tid in track_map][:limit]
 
 
-async def get_similar_tracks(track_id: int, limit: int = 10) -> list[dict]:
+async def get_similar_tracks(
+    track_id: int, limit: int = 10, exclude_source_ids: Iterable[str] = ()
+) -> list[dict]:
     """
     Get tracks similar to a given track using embeddings.
     
-    Used by mini app "Similar Tracks" feature.
+    Used by mini app "Similar Tracks" feature and radio / flow mode.
     
     Args:
         track_id: source track ID (database ID)
         limit: max results
+        exclude_source_ids: tracks to leave out (e.g. already played in the
+            flow); excluded before ranking, so the result is still *limit* long
         
     Returns:
         List of similar track dicts
@@ -596,16 +606,20 @@ async def get_similar_tracks(track_id: int, limit: int = 10) -> list[dict]:
     from bot.models.track import Track
     from bot.services.cache import cache
 
-    # Check cache first
+    exclude_source_ids = set(exclude_source_ids)
+
+    # Check cache first (results with exclusions are per request)
     cache_key = f"similar:{track_id}"
-    try:
-        cached = await cache.redis.get(cache_key)
-        if cached:
-            return json.loads(cached)[:limit]
-    except Exception:
-        pass
+    if not exclude_source_ids:
+        try:
+            cached = await cache.redis.get(cache_key)
+            if cached:
+                return json.loads(cached)[:limit]
+        except Exception:
+            pass
 
     result: list[dict] = []
+    exclude_ids: list[int] = []
 
     # Get source track to find its source_id
     async with async_session() as session:
@@ -614,15 +628,38 @@ async def get_similar_tracks(track_id: int, limit: int = 10) -> list[dict]:
             return []
         
         source_id = source_track.source_id
+        if exclude_source_ids and config.ML_ENABLED:
+            exclude_r = await session.execute(
+                select(Track.id).where(Track.source_id.in_(exclude_source_ids))
+            )
+            exclude_ids = list(exclude_r.scalars().all())
 
     # ── Try ML embeddings first ──────────────────────────────────────────
-    if config.ML_ENABLED and source_id:
+    if config.ML_ENABLED:
+        try:
+            from recommender.model_store import model_store
+
+            # Batched index keyed by track_id; popular seeds are precomputed
+            similar = model_store.similar_track_ids([track_id], topn=limit * 2, exclude=[exclude_ids])[0]
+            similar_ids = [tid for tid, _score in similar]
+            if similar_ids:
+                async with async_session() as session:
+                    tracks_r = await session.execute(
+                        select(Track).where(Track.id.in_(similar_ids))
+                    )
+                    track_map = {t.id: t for t in tracks_r.scalars().all()}
+                result = [_track_to_dict(track_map[tid]) for tid in similar_ids if tid in track_map]
+        except Exception as e:
+            logger.warning("ML similar tracks failed: %s", e)
+
+    if config.ML_ENABLED and source_id and not result:
         try:
             from recommender.embeddings import TrackEmbeddings
             embeddings = TrackEmbeddings()
             
-            # get_similar_tracks returns [(source_id, score), ...]
+            # Vectors keyed by source_id: [(source_id, score), ...]
             similar_pairs = embeddings.get_similar_tracks(source_id, topn=limit * 2)
+            similar_pairs = [(sid, score) for sid, score in similar_pairs if sid not in exclude_source_ids]
             
             if similar_pairs:
                 similar_source_ids = [sid for sid, score in similar_pairs]
@@ -655,7 +692,7 @@ async def get_similar_tracks(track_id: int, limit: int = 10) -> list[dict]:
 
             if conditions:
                 from sqlalchemy import or_
-                tracks_r = await session.execute(
+                stmt = (
                     select(Track)
                     .where(
                         or_(*conditions),
@@ -665,10 +702,13 @@ async def get_similar_tracks(track_id: int, limit: int = 10) -> list[dict]:
                     .order_by(Track.downloads.desc())
                     .limit(limit)
                 )
+                if exclude_source_ids:
+                    stmt = stmt.where(~Track.source_id.in_(exclude_source_ids))
+                tracks_r = await session.execute(stmt)
                 result = [_track_to_dict(t) for t in tracks_r.scalars().all()]
 
     # Cache result
-    if result:
+    if result and not exclude_source_ids:
         try:
             await cache.redis.setex(cache_key, 3600, json.dumps(result, ensure_ascii=False))
         except Exception:
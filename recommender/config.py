@@ -120,6 +120,14 @@ class MLConfig:
     def cache_ttl(self) -> int:
         return self._settings.ML_RECO_CACHE_TTL
     
+    @property
+    def export_chunk_rows(self) -> int:
+        return self._settings.ML_EXPORT_CHUNK_ROWS
+    
+    @property
+    def export_max_bytes(self) -> int:
+        return self._settings.ML_EXPORT_MAX_MB * 1024 * 1024
+    
     @property
     def scorer_weights(self) -> ScorerWeights:
         """Returns scorer weights from settings."""
@@ -15,8 +15,9 @@ Supports weighted implicit feedback:
 
 import logging
 from collections import defaultdict
+from contextlib import aclosing
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import Any, AsyncIterator, Sequence
 
 try:
     import numpy as np
@@ -40,7 +41,139 @@ from recommender.config import (
 logger = logging.getLogger(__name__)
 
 
-async def extract_interactions() -> tuple[
+# ── Chunked, vectorized export ──────────────────────────────────────────────
+#
+# History rows are streamed from a server-side cursor in chunks and turned into
+# NumPy columns right away; (user, track) pairs are aggregated with np.unique +
+# bincount instead of per-row dicts. Exports read newest-first, so when the
+# configured memory ceiling is reached the oldest history is what gets dropped.
+
+
+async def iter_row_chunks(stmt, chunk_rows: int) -> AsyncIterator[Sequence[Any]]:
+    """Yield the rows of *stmt* in chunks of at most *chunk_rows*."""
+    async with async_session() as session:
+        result = await session.stream(stmt.execution_options(yield_per=chunk_rows))
+        async for chunk in result.partitions(chunk_rows):
+            yield chunk
+
+
+def int_column(values: Sequence[Any]) -> np.ndarray:
+    return np.fromiter(values, dtype=np.int64, count=len(values))
+
+
+def interaction_weights(
+    actions: Sequence[Any],
+    listen_durations: Sequence[Any],
+    track_durations: Sequence[Any],
+) -> np.ndarray:
+    """Implicit-feedback weight per row (see module docstring)."""
+    labels, codes = np.unique(np.asarray(actions, dtype=str), return_inverse=True)
+    table = np.array([ACTION_WEIGHTS.get(label, 0.5) for label in labels], dtype=np.float32)
+    weights = table[codes.reshape(-1)]
+
+    # None → NaN, which fails every comparison below
+    listen = np.asarray(listen_durations, dtype=np.float64)
+    duration = np.asarray(track_durations, dtype=np.float64)
+    valid = (listen != 0) & ~np.isnan(listen) & (duration > 0)
+    ratio = np.divide(listen, duration, out=np.zeros_like(listen), where=valid)
+    weights[valid & (ratio > 0.8)] *= FULL_LISTEN_MULTIPLIER
+    weights[valid & (ratio < 0.3)] *= PARTIAL_LISTEN_MULTIPLIER
+    return weights
+
+
+def _aggregate_pairs(
+    users: np.ndarray,
+    tracks: np.ndarray,
+    weights: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Sum weights of duplicate (user, track) pairs.
+
+    Returns sorted unique user ids, sorted unique track ids, the pair keys
+    (``user_idx * n_tracks + track_idx``, ascending) and their summed weights.
+    """
+    user_ids, user_idx = np.unique(users, return_inverse=True)
+    track_ids, track_idx = np.unique(tracks, return_inverse=True)
+    keys = user_idx.reshape(-1).astype(np.int64) * len(track_ids) + track_idx.reshape(-1)
+    pair_keys, pair_idx = np.unique(keys, return_inverse=True)
+    summed = np.bincount(pair_idx.reshape(-1), weights=weights, minlength=len(pair_keys))
+    return user_ids, track_ids, pair_keys, summed.astype(np.float32)
+
+
+def interaction_matrix(
+    users: np.ndarray,
+    tracks: np.ndarray,
+    weights: np.ndarray,
+) -> tuple[sp.csr_matrix, np.ndarray, np.ndarray]:
+    """CSR matrix (n_users × n_tracks) of summed weights + the row / column ids."""
+    if not len(users):
+        empty = np.empty(0, dtype=np.int64)
+        return sp.csr_matrix((0, 0), dtype=np.float32), empty, empty
+    user_ids, track_ids, pair_keys, summed = _aggregate_pairs(users, tracks, weights)
+    n_tracks = len(track_ids)
+    matrix = sp.csr_matrix(
+        (summed, (pair_keys // n_tracks, pair_keys % n_tracks)),
+        shape=(len(user_ids), n_tracks),
+        dtype=np.float32,
+    )
+    return matrix, user_ids, track_ids
+
+
+class InteractionAccumulator:
+    """Collects streamed (user, track, weight) chunks under a memory ceiling.
+
+    Buffered chunks are folded into unique pairs whenever they outgrow half of
+    *max_bytes* (the other half is headroom for the aggregation itself). Once
+    even the folded pairs exceed that, ``add`` returns False and the caller
+    should stop reading.
+    """
+
+    _ROW_BYTES = 8 + 8 + 4  # int64 user, int64 track, float32 weight
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.rows_read = 0
+        self._users: list[np.ndarray] = []
+        self._tracks: list[np.ndarray] = []
+        self._weights: list[np.ndarray] = []
+        self._buffered = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self._buffered * self._ROW_BYTES
+
+    def add(self, users: np.ndarray, tracks: np.ndarray, weights: np.ndarray) -> bool:
+        self._users.append(users)
+        self._tracks.append(tracks)
+        self._weights.append(weights.astype(np.float32, copy=False))
+        self._buffered += len(users)
+        self.rows_read += len(users)
+        if self.nbytes > self.max_bytes // 2:
+            self._fold()
+            return self.nbytes <= self.max_bytes // 2
+        return True
+
+    def _columns(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if not self._users:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty(0, dtype=np.float32)
+        return np.concatenate(self._users), np.concatenate(self._tracks), np.concatenate(self._weights)
+
+    def _fold(self) -> None:
+        user_ids, track_ids, pair_keys, summed = _aggregate_pairs(*self._columns())
+        n_tracks = len(track_ids)
+        self._users = [user_ids[pair_keys // n_tracks]]
+        self._tracks = [track_ids[pair_keys % n_tracks]]
+        self._weights = [summed]
+        self._buffered = len(pair_keys)
+
+    def to_csr(self) -> tuple[sp.csr_matrix, np.ndarray, np.ndarray]:
+        return interaction_matrix(*self._columns())
+
+
+async def extract_interactions(
+    chunk_rows: int | None = None,
+    max_bytes: int | None = None,
+) -> tuple[
     sp.csr_matrix,
     dict[int, int],  # user_id -> idx
     dict[int, int],  # track_id -> idx
@@ -54,86 +187,57 @@ async def extract_interactions() -> tuple[
     - track_id -> matrix index mapping
     - source_id -> track_id mapping (for W2V)
     """
-    async with async_session() as session:
-        # Get all interactions with valid tracks
-        result = await session.execute(
-            select(
-                ListeningHistory.user_id,
-                ListeningHistory.track_id,
-                ListeningHistory.action,
-                ListeningHistory.listen_duration,
-                Track.duration,
-                Track.source_id,
-                Track.file_id,
-            )
-            .join(Track, Track.id == ListeningHistory.track_id)
-            .where(
-                ListeningHistory.track_id.isnot(None),
-                Track.file_id.isnot(None),  # Only tracks we can play
-            )
+    cfg = MLConfig.get()
+    chunk_rows = chunk_rows or cfg.export_chunk_rows
+    acc = InteractionAccumulator(max_bytes or cfg.export_max_bytes)
+    source_map: dict[str, int] = {}
+
+    # Interactions with playable tracks, newest first
+    stmt = (
+        select(
+            ListeningHistory.user_id,
+            ListeningHistory.track_id,
+            ListeningHistory.action,
+            ListeningHistory.listen_duration,
+            Track.duration,
+            Track.source_id,
         )
-        
-        interactions = list(result)
-    
-    if not interactions:
+        .join(Track, Track.id == ListeningHistory.track_id)
+        .where(
+            ListeningHistory.track_id.isnot(None),
+            Track.file_id.isnot(None),  # Only tracks we can play
+        )
+        .order_by(ListeningHistory.created_at.desc())
+    )
+
+    async with aclosing(iter_row_chunks(stmt, chunk_rows)) as chunks:
+        async for chunk in chunks:
+            users, track_ids, actions, listen_durs, track_durs, source_ids = zip(*chunk)
+            tracks = int_column(track_ids)
+            # source_id is a property of the track: one lookup per distinct track
+            _, first_rows = np.unique(tracks, return_index=True)
+            for i in first_rows.tolist():
+                if source_ids[i]:
+                    source_map.setdefault(source_ids[i], track_ids[i])
+            if not acc.add(int_column(users), tracks, interaction_weights(actions, listen_durs, track_durs)):
+                logger.warning(
+                    f"Interaction export reached the {acc.max_bytes >> 20} MB ceiling "
+                    f"after {acc.rows_read} rows; older history skipped"
+                )
+                break
+
+    if not acc.rows_read:
         logger.warning("No interactions found for training")
         return sp.csr_matrix((0, 0)), {}, {}, {}
-    
-    # Build ID mappings
-    user_ids = sorted(set(row[0] for row in interactions))
-    track_ids = sorted(set(row[1] for row in interactions))
-    
-    user_map = {uid: idx for idx, uid in enumerate(user_ids)}
-    track_map = {tid: idx for idx, tid in enumerate(track_ids)}
-    
-    # Build source_id -> track_id mapping
-    source_map = {}
-    for row in interactions:
-        track_id, source_id = row[1], row[5]
-        if source_id and track_id:
-            source_map[source_id] = track_id
-    
-    # Build weighted interaction matrix
-    weights = defaultdict(float)
-    
-    for user_id, track_id, action, listen_dur, track_dur, _, _ in interactions:
-        user_idx = user_map[user_id]
-        track_idx = track_map[track_id]
-        
-        # Base weight from action
-        weight = ACTION_WEIGHTS.get(action, 0.5)
-        
-        # Apply listen ratio multiplier
-        if listen_dur and track_dur and track_dur > 0:
-            ratio = listen_dur / track_dur
-            if ratio > 0.8:
-                weight *= FULL_LISTEN_MULTIPLIER
-            elif ratio < 0.3:
-                weight *= PARTIAL_LISTEN_MULTIPLIER
-        
-        # Accumulate weights (same user-track pair can have multiple interactions)
-        weights[(user_idx, track_idx)] += weight
-    
-    # Convert to COO format
-    rows = []
-    cols = []
-    data = []
-    
-    for (user_idx, track_idx), weight in weights.items():
-        rows.append(user_idx)
-        cols.append(track_idx)
-        data.append(weight)
-    
-    # Create CSR matrix
-    matrix = sp.csr_matrix(
-        (data, (rows, cols)),
-        shape=(len(user_ids), len(track_ids)),
-        dtype=np.float32,
-    )
-    
+
+    matrix, user_ids, track_ids = acc.to_csr()
+    user_map = {uid: idx for idx, uid in enumerate(user_ids.tolist())}
+    track_map = {tid: idx for idx, tid in enumerate(track_ids.tolist())}
+
     logger.info(
         f"Extracted interactions: {len(user_ids)} users, "
-        f"{len(track_ids)} tracks, {len(data)} interactions"
+        f"{len(track_ids)} tracks, {matrix.nnz} interactions "
+        f"from {acc.rows_read} rows"
     )
     
     return matrix, user_map, track_map, source_map
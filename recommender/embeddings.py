@@ -59,6 +59,35 @@ def build_sessions(plays: list[tuple[int, int, object]]) -> list[list[str]]:
     return sessions
 
 
+def build_sessions_from_columns(
+    user_ids: np.ndarray,
+    track_ids: np.ndarray,
+    timestamps: np.ndarray,
+) -> list[list[str]]:
+    """
+    Vectorized build_sessions() over exported play columns (any row order).
+
+    Args:
+        user_ids, track_ids: int arrays; timestamps: epoch seconds
+    """
+    if len(user_ids) < 2:
+        return []
+    order = np.lexsort((timestamps, user_ids))
+    users = user_ids[order]
+    ts = timestamps[order]
+    breaks = np.flatnonzero(
+        (users[1:] != users[:-1]) | (np.diff(ts) > _SESSION_GAP.total_seconds())
+    ) + 1
+    starts = np.concatenate(([0], breaks))
+    lengths = np.diff(np.concatenate((starts, [len(users)])))
+    tokens = track_ids[order].astype(str)
+    return [
+        tokens[start:start + length].tolist()
+        for start, length in zip(starts.tolist(), lengths.tolist())
+        if length >= 2
+    ]
+
+
 def train_embeddings(sessions: list[list[str]]) -> tuple[np.ndarray, list[int]] | None:
     """
     Train Word2Vec on listening sessions.
@@ -0,0 +1,231 @@
+"""
+evaluation.py — Offline evaluation of the recommender.
+
+Building blocks for scripts/eval_recommender.py:
+  1. Interaction data: a synthetic generator with latent taste structure
+     (artists / genres / skewed popularity) or an anonymized CSV fixture
+  2. Time-based train/test split (train on the past, score the future)
+  3. Ranking metrics: recall@k, NDCG@k, catalog coverage, novelty
+  4. Latency summaries (p50 / p99)
+
+Everything here is pure NumPy — no DB, no network.
+"""
+import csv
+import math
+import time
+from pathlib import Path
+from typing import Iterable, NamedTuple, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore[assignment]
+
+from recommender.train import PlayColumns
+
+_GENRES = (
+    "pop", "rock", "hip-hop", "electronic", "indie", "jazz",
+    "classical", "metal", "r&b", "folk", "latin", "k-pop",
+)
+_TRACKS_PER_ARTIST = 8
+
+
+class Catalog(NamedTuple):
+    """Track metadata as parallel arrays (row i describes track_ids[i])."""
+    track_ids: "np.ndarray"    # int64
+    artists: list[str]
+    genres: list[str]
+    created_at: "np.ndarray"   # float64 epoch seconds
+
+
+class Split(NamedTuple):
+    """Time-based split: train plays and each user's future, unseen tracks."""
+    train: PlayColumns
+    test: dict[int, set[int]]
+    cutoff: float
+
+
+# ── Data ─────────────────────────────────────────────────────────────────────
+
+def synthetic_interactions(
+    users: int,
+    tracks: int,
+    plays_per_user: int = 40,
+    days: int = 60,
+    seed: int = 0,
+    now: float | None = None,
+) -> tuple[Catalog, PlayColumns]:
+    """Generate a catalog and plays whose tastes are learnable.
+
+    Each artist has a style vector and a genre; users prefer a few styles and
+    popular tracks (Zipf). Plays are spread over the last *days* days in
+    listening sessions, newest first like the training export.
+    """
+    rng = np.random.default_rng(seed)
+    now = time.time() if now is None else now
+    dim = 12
+
+    n_artists = max(1, tracks // _TRACKS_PER_ARTIST)
+    artist_of = rng.integers(0, n_artists, size=tracks)
+    artist_style = rng.normal(size=(n_artists, dim))
+    artist_genre = rng.integers(0, len(_GENRES), size=n_artists)
+    style = artist_style[artist_of] + 0.5 * rng.normal(size=(tracks, dim))
+    log_pop = np.log(rng.zipf(1.6, size=tracks).clip(max=100).astype(np.float64))
+
+    track_ids = np.arange(1, tracks + 1, dtype=np.int64)
+    catalog = Catalog(
+        track_ids=track_ids,
+        artists=[f"artist {a}" for a in artist_of.tolist()],
+        genres=[_GENRES[g] for g in artist_genre[artist_of].tolist()],
+        created_at=now - rng.uniform(0, 2 * days, size=tracks) * 86400,
+    )
+
+    u_col, t_col, ts_col = [], [], []
+    for u in range(users):
+        taste = rng.normal(size=dim)
+        logits = style @ taste + log_pop
+        p = np.exp(logits - logits.max())
+        picks = rng.choice(tracks, size=plays_per_user, p=p / p.sum())
+        # Sessions of ~8 plays a few minutes apart
+        starts = now - rng.uniform(0, days, size=math.ceil(plays_per_user / 8)) * 86400
+        stamps = np.repeat(starts, 8)[:plays_per_user] + np.tile(np.arange(8) * 210.0, len(starts))[:plays_per_user]
+        u_col.append(np.full(plays_per_user, u + 1, dtype=np.int64))
+        t_col.append(track_ids[picks])
+        ts_col.append(np.minimum(stamps, now))
+
+    return catalog, _newest_first(np.concatenate(u_col), np.concatenate(t_col), np.concatenate(ts_col))
+
+
+def load_fixture(path: str | Path, now: float | None = None) -> tuple[Catalog, PlayColumns]:
+    """Load anonymized plays from CSV (user_id, track_id, timestamp[, artist, genre]).
+
+    Timestamps are epoch seconds; they are shifted so the newest play is *now*,
+    which keeps the fixture inside the training export window.
+    """
+    users, tracks, stamps = [], [], []
+    meta: dict[int, tuple[str, str]] = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            tid = int(row["track_id"])
+            users.append(int(row["user_id"]))
+            tracks.append(tid)
+            stamps.append(float(row["timestamp"]))
+            if tid not in meta:
+                meta[tid] = (row.get("artist") or f"artist {tid}", row.get("genre") or "")
+    if not users:
+        raise ValueError(f"{path}: no plays")
+
+    ts = np.asarray(stamps, dtype=np.float64)
+    ts += (time.time() if now is None else now) - ts.max()
+    track_ids = np.asarray(sorted(meta), dtype=np.int64)
+    first_seen = dict(zip(*_first_play(np.asarray(tracks, dtype=np.int64), ts)))
+    catalog = Catalog(
+        track_ids=track_ids,
+        artists=[meta[t][0] for t in track_ids.tolist()],
+        genres=[meta[t][1] for t in track_ids.tolist()],
+        created_at=np.asarray([first_seen[t] for t in track_ids.tolist()], dtype=np.float64),
+    )
+    return catalog, _newest_first(np.asarray(users, dtype=np.int64), np.asarray(tracks, dtype=np.int64), ts)
+
+
+def _first_play(track_ids: "np.ndarray", ts: "np.ndarray") -> tuple[list[int], list[float]]:
+    order = np.argsort(ts, kind="stable")
+    uniq, first = np.unique(track_ids[order], return_index=True)
+    return uniq.tolist(), ts[order][first].tolist()
+
+
+def _newest_first(users: "np.ndarray", tracks: "np.ndarray", ts: "np.ndarray") -> PlayColumns:
+    order = np.argsort(-ts, kind="stable")
+    return PlayColumns(users[order], tracks[order], ts[order])
+
+
+def time_split(plays: PlayColumns, test_fraction: float = 0.2) -> Split:
+    """Train on plays before a global cutoff; test on what users played after it.
+
+    Only users with train history are evaluated, and only tracks they had not
+    played before the cutoff count as relevant (the recommender excludes
+    already-listened tracks, so those could never be hit).
+    """
+    cutoff = float(np.quantile(plays.timestamps, 1.0 - test_fraction))
+    is_train = plays.timestamps < cutoff
+    train = PlayColumns(plays.user_ids[is_train], plays.track_ids[is_train], plays.timestamps[is_train])
+
+    seen: dict[int, set[int]] = {}
+    for u, t in zip(train.user_ids.tolist(), train.track_ids.tolist()):
+        seen.setdefault(u, set()).add(t)
+    test: dict[int, set[int]] = {}
+    for u, t in zip(plays.user_ids[~is_train].tolist(), plays.track_ids[~is_train].tolist()):
+        if u in seen and t not in seen[u]:
+            test.setdefault(u, set()).add(t)
+    return Split(train, test, cutoff)
+
+
+# ── Metrics ──────────────────────────────────────────────────────────────────
+
+def recall_at_k(recommended: Sequence[int], relevant: set[int], k: int) -> float:
+    """Share of the relevant tracks (capped at k) found in the top k."""
+    if not relevant:
+        return 0.0
+    hits = sum(1 for t in recommended[:k] if t in relevant)
+    return hits / min(len(relevant), k)
+
+
+def ndcg_at_k(recommended: Sequence[int], relevant: set[int], k: int) -> float:
+    """Binary-relevance NDCG of the top k."""
+    if not relevant:
+        return 0.0
+    dcg = sum(1.0 / math.log2(i + 2) for i, t in enumerate(recommended[:k]) if t in relevant)
+    ideal = sum(1.0 / math.log2(i + 2) for i in range(min(len(relevant), k)))
+    return dcg / ideal
+
+
+def catalog_coverage(rec_lists: Iterable[Sequence[int]], catalog_size: int) -> float:
+    """Share of the catalog that appears in at least one recommendation list."""
+    shown: set[int] = set()
+    for recs in rec_lists:
+        shown.update(recs)
+    return len(shown) / catalog_size if catalog_size else 0.0
+
+
+def novelty(rec_lists: Iterable[Sequence[int]], train: PlayColumns) -> float:
+    """Mean self-information −log2 p(track) of recommended tracks.
+
+    p is the share of train users who played the track; unseen tracks count
+    as played by one user. Higher means less obvious recommendations.
+    """
+    pairs = np.unique(np.stack([train.user_ids, train.track_ids]), axis=1)
+    track_ids, listeners = np.unique(pairs[1], return_counts=True)
+    n_users = max(len(np.unique(train.user_ids)), 1)
+    reach = dict(zip(track_ids.tolist(), listeners.tolist()))
+    bits = [-math.log2(reach.get(t, 1) / n_users) for recs in rec_lists for t in recs]
+    return float(np.mean(bits)) if bits else 0.0
+
+
+def ranking_report(
+    recs: dict[int, list[int]],
+    split: Split,
+    catalog_size: int,
+    k: int,
+) -> dict[str, float]:
+    """recall@k, NDCG@k, coverage and novelty for recommendations of test users."""
+    users = [u for u in split.test if u in recs]
+    lists = [recs[u][:k] for u in users]
+    return {
+        f"recall@{k}": float(np.mean([recall_at_k(recs[u], split.test[u], k) for u in users])) if users else 0.0,
+        f"ndcg@{k}": float(np.mean([ndcg_at_k(recs[u], split.test[u], k) for u in users])) if users else 0.0,
+        "coverage": catalog_coverage(lists, catalog_size),
+        "novelty": novelty(lists, split.train),
+        "users": float(len(users)),
+    }
+
+
+def latency_summary(samples: Sequence[float]) -> dict[str, float]:
+    """p50 / p99 in milliseconds of per-call wall times given in seconds."""
+    if not samples:
+        return {"p50_ms": 0.0, "p99_ms": 0.0, "n": 0.0}
+    ms = np.asarray(samples, dtype=np.float64) * 1000
+    return {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "n": float(len(ms)),
+    }
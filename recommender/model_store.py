@@ -6,19 +6,51 @@ Handles loading, storing, and atomic swapping of trained models
 Models are stored on disk with versioning:
     data/models/
       als/
-        model_v001.npz     # ALS model (numpy arrays)
-        mappings_v001.json  # user_id -> idx, track_id -> idx
-        latest.txt          # "001" -- pointer to current version
+        v001/
+          user_factors.npy    # row i belongs to user_ids[i]
+          item_factors.npy    # row i belongs to track_ids[i]
+          user_ids.npy        # sorted int64
+          track_ids.npy       # sorted int64
+          source_keys.npy     # sorted source_ids ...
+          source_track_ids.npy  # ... and their track_ids
+          meta.json           # regularization, trained_at (newest play seen)
+        latest.txt            # "001" -- pointer to current version
       w2v/
-        model_v001.bin      # Word2Vec model (gensim format)
+        v001/
+          vectors.npy         # float32 (n, dim)
+          index_to_key.npy    # key of each vector row
+          keys.npy            # sorted keys ...
+          key_rows.npy        # ... and their vector rows
+          norms.npy
+          neighbour_seeds.npy # popular track_ids (sorted) ...
+          neighbour_ids.npy   # ... their top-k neighbours (-1 padded)
+          neighbour_sims.npy  # ... and cosines, computed at training time
         latest.txt
+
+Every array is a raw .npy loaded with ``mmap_mode="r"``: all bot / webapp
+workers share the page cache instead of holding private copies, and a cold
+load only maps files. Ids are looked up by binary search over the sorted
+arrays instead of per-process dicts. A new version always goes to a new
+directory, so files mapped by running workers are never rewritten.
+
+Word2Vec keys are track_ids as strings (the training session tokens); a
+``SimilarityIndex`` over them (recommender/retrieval.py) answers similarity
+queries in batches; neighbour lists of the most popular tracks are computed
+when a version is saved and mapped alongside its vectors.
+
+Older artifacts (model_vNNN.npz + mappings_vNNN.json, gensim model_vNNN.bin)
+are still readable.
 """
 
 import asyncio
 import json
 import logging
+import os
+import shutil
+import time
 from pathlib import Path
-from typing import Any
+from types import SimpleNamespace
+from typing import Any, Callable, Iterable, NamedTuple
 
 try:
     import numpy as np
@@ -26,12 +58,194 @@ except ImportError:
     np = None  # type: ignore[assignment]
 
 from bot.config import settings
+from recommender.retrieval import SimilarityIndex
 
 logger = logging.getLogger(__name__)
 
 # Backward-compatible module-level model directory (tests patch this symbol).
 _MODEL_DIR = Path(settings.ML_MODEL_DIR)
 
+_KEEP_VERSIONS = 3
+
+# Training publishes new versions here; every process reloads in the background
+_VERSION_CHANNEL = "ml:model_version"
+_RELOAD_POLL_SECONDS = 60.0  # also re-check latest.txt in case a bump was missed
+# Most popular tracks whose neighbour lists are precomputed per w2v version
+_PRECOMPUTE_POPULAR = 2000
+_NEIGHBOUR_ARRAYS = ("neighbour_seeds", "neighbour_ids", "neighbour_sims")
+
+# Regularization of versions saved without metadata (train.py's historical value)
+_DEFAULT_REGULARIZATION = 0.1
+# Plays needed before a user unknown to the model is folded in
+FOLD_IN_MIN_PLAYS = 3
+
+
+def _lookup(sorted_keys: np.ndarray | None, key: Any) -> int | None:
+    """Position of *key* in a sorted array, or None."""
+    if sorted_keys is None or not len(sorted_keys):
+        return None
+    pos = int(np.searchsorted(sorted_keys, key))
+    if pos < len(sorted_keys) and sorted_keys[pos] == key:
+        return pos
+    return None
+
+
+def lookup_many(sorted_keys: np.ndarray | None, keys: Iterable[Any]) -> np.ndarray:
+    """Positions of *keys* in a sorted array; -1 where missing."""
+    keys = np.asarray(list(keys))
+    if sorted_keys is None or not len(sorted_keys) or not len(keys):
+        return np.full(len(keys), -1, dtype=np.int64)
+    pos = np.searchsorted(sorted_keys, keys)
+    clipped = np.minimum(pos, len(sorted_keys) - 1)
+    return np.where(sorted_keys[clipped] == keys, clipped, -1)
+
+
+def _sorted_by_id(mapping: dict, factors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Turn an ``id -> row`` mapping into (sorted ids, factors reordered to match)."""
+    ids = np.fromiter((int(k) for k in mapping), dtype=np.int64, count=len(mapping))
+    rows = np.fromiter((int(v) for v in mapping.values()), dtype=np.int64, count=len(mapping))
+    order = np.argsort(ids, kind="stable")
+    return ids[order], np.ascontiguousarray(factors[rows[order]])
+
+
+def _sorted_strings(mapping: dict[str, int]) -> tuple[np.ndarray, np.ndarray]:
+    keys = np.array(list(mapping), dtype=str)
+    values = np.fromiter(mapping.values(), dtype=np.int64, count=len(mapping))
+    order = np.argsort(keys, kind="stable")
+    return keys[order], values[order]
+
+
+def _save_arrays(version_dir: Path, arrays: dict[str, np.ndarray], meta: dict | None = None) -> None:
+    """Write raw .npy files into a fresh version directory (atomic rename)."""
+    tmp_dir = version_dir.with_name(version_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    for name, array in arrays.items():
+        np.save(tmp_dir / f"{name}.npy", np.ascontiguousarray(array))
+    if meta is not None:
+        (tmp_dir / "meta.json").write_text(json.dumps(meta))
+    shutil.rmtree(version_dir, ignore_errors=True)
+    os.replace(tmp_dir, version_dir)
+
+
+def _load_arrays(version_dir: Path, names: Iterable[str]) -> dict[str, np.ndarray]:
+    return {name: np.load(version_dir / f"{name}.npy", mmap_mode="r") for name in names}
+
+
+def _load_meta(version_dir: Path) -> dict:
+    meta_file = version_dir / "meta.json"
+    return json.loads(meta_file.read_text()) if meta_file.exists() else {}
+
+
+def _write_pointer(latest_file: Path, version_str: str) -> None:
+    tmp = latest_file.with_suffix(".tmp")
+    tmp.write_text(version_str)
+    os.replace(tmp, latest_file)
+
+
+def _prune_versions(model_dir: Path, keep: int = _KEEP_VERSIONS) -> None:
+    """Drop old version directories (mapped files stay valid for their readers)."""
+    versions = sorted(p for p in model_dir.glob("v[0-9]*") if p.is_dir() and p.name[1:].isdigit())
+    for old in versions[:-keep]:
+        try:
+            shutil.rmtree(old)
+        except OSError:
+            logger.debug("ModelStore: could not remove %s", old, exc_info=True)
+
+
+class MmapVectors:
+    """Read-only word vectors over memory-mapped arrays.
+
+    Provides the subset of gensim ``KeyedVectors`` the recommender uses
+    (``key in kv``, ``len(kv)``, ``kv[key]``, ``most_similar``).
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        index_to_key: np.ndarray,
+        keys: np.ndarray,
+        key_rows: np.ndarray,
+        norms: np.ndarray,
+    ) -> None:
+        self.vectors = vectors
+        self.index_to_key = index_to_key
+        self._keys = keys
+        self._key_rows = key_rows
+        self._norms = norms
+
+    @classmethod
+    def load(cls, version_dir: Path) -> "MmapVectors":
+        arrays = _load_arrays(version_dir, ("vectors", "index_to_key", "keys", "key_rows", "norms"))
+        return cls(**arrays)
+
+    @staticmethod
+    def save(
+        version_dir: Path,
+        vectors: np.ndarray,
+        index_to_key: list[str],
+        extra: dict[str, np.ndarray] | None = None,
+    ) -> None:
+        """Write the vector arrays, plus *extra* arrays (e.g. neighbour lists)."""
+        keys = np.array(index_to_key, dtype=str)
+        order = np.argsort(keys, kind="stable")
+        vectors = np.asarray(vectors, dtype=np.float32)
+        _save_arrays(version_dir, {
+            "vectors": vectors,
+            "index_to_key": keys,
+            "keys": keys[order],
+            "key_rows": order.astype(np.int64),
+            "norms": np.linalg.norm(vectors, axis=1).astype(np.float32),
+            **(extra or {}),
+        })
+
+    def _row(self, key: str) -> int | None:
+        pos = _lookup(self._keys, key)
+        return None if pos is None else int(self._key_rows[pos])
+
+    def __contains__(self, key: str) -> bool:
+        return self._row(key) is not None
+
+    def __len__(self) -> int:
+        return len(self.index_to_key)
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        row = self._row(key)
+        if row is None:
+            raise KeyError(key)
+        return self.vectors[row]
+
+    def most_similar(self, key: str, topn: int = 10) -> list[tuple[str, float]]:
+        row = self._row(key)
+        if row is None:
+            raise KeyError(key)
+        norm = float(self._norms[row]) or 1.0
+        sims = (self.vectors @ self.vectors[row]) / (np.maximum(self._norms, 1e-12) * norm)
+        sims[row] = -np.inf
+        topn = min(topn, len(sims) - 1)
+        if topn <= 0:
+            return []
+        best = np.argpartition(-sims, topn - 1)[:topn]
+        best = best[np.argsort(-sims[best])]
+        return [(str(self.index_to_key[i]), float(sims[i])) for i in best]
+
+
+class _AlsModel(NamedTuple):
+    """One immutable ALS version; swapped as a single reference."""
+    user_factors: np.ndarray    # row i belongs to user_ids[i]
+    item_factors: np.ndarray    # row i belongs to track_ids[i]
+    user_ids: np.ndarray        # sorted
+    track_ids: np.ndarray       # sorted
+    source_keys: np.ndarray     # sorted source_ids ...
+    source_track_ids: np.ndarray  # ... and their track_ids
+    version: int
+    regularization: float = _DEFAULT_REGULARIZATION
+    trained_at: float | None = None  # epoch of the newest play in the training data
+
+
+def _empty_sources() -> tuple[np.ndarray, np.ndarray]:
+    return np.array([], dtype=str), np.array([], dtype=np.int64)
+
 
 class ModelStore:
     """Thread-safe singleton for managing ML model lifecycle.
@@ -47,25 +261,25 @@ class ModelStore:
     _instance: "ModelStore | None" = None
     _lock: asyncio.Lock | None = None
     
-    def __init__(self, base_dir: Path):
+    def __init__(self, base_dir: Path, redis_factory: Callable | None = None):
         self._base_dir = base_dir
+        self._redis_factory = redis_factory
         self._als_dir = base_dir / "als"
         self._w2v_dir = base_dir / "w2v"
         
-        # ALS model components
-        self._user_factors: np.ndarray | None = None
-        self._item_factors: np.ndarray | None = None
+        # Served ALS version. Readers take one reference to the snapshot, so
+        # a reload swapping in the next version never mixes two models.
+        self._als: _AlsModel | None = None
         
-        # Word2Vec model (gensim KeyedVectors)
+        # Word2Vec model (MmapVectors or gensim KeyedVectors)
         self._w2v_model: Any = None
+        self._w2v_pointer: str | None = None
+        # Batched similarity over the same vectors (None if no track_id keys)
+        self._similarity: SimilarityIndex | None = None
         
-        # Mappings
-        self._user_map: dict[int, int] = {}     # user_id -> matrix idx
-        self._track_map: dict[int, int] = {}    # track_id -> matrix idx
-        self._track_reverse: dict[int, int] = {}  # matrix idx -> track_id
-        self._source_map: dict[str, int] = {}   # source_id -> track_id (for w2v)
-        
-        self._version: int = 0
+        self._reloader: asyncio.Task | None = None
+        # (snapshot, YᵀY of its item factors) for fold-in
+        self._gram: tuple[_AlsModel, np.ndarray] | None = None
         
         # Ensure directories exist
         self._als_dir.mkdir(parents=True, exist_ok=True)
@@ -79,10 +293,17 @@ class ModelStore:
             cls._lock = asyncio.Lock()
         return cls._instance
     
+    @property
+    def redis(self):
+        if self._redis_factory is not None:
+            return self._redis_factory()
+        from bot.services.cache import cache
+        return cache.redis
+    
     @property
     def is_ready(self) -> bool:
         """Check if models are loaded and ready for inference."""
-        return self._user_factors is not None and self._item_factors is not None
+        return self._als is not None
     
     @property
     def w2v_ready(self) -> bool:
@@ -92,36 +313,58 @@ class ModelStore:
     @property
     def version(self) -> int:
         """Current model version."""
-        return self._version
+        als = self._als
+        return 0 if als is None else als.version
     
     @property
     def n_users(self) -> int:
         """Number of users in ALS model."""
-        return len(self._user_map)
+        als = self._als
+        return 0 if als is None else len(als.user_ids)
     
     @property
     def n_tracks(self) -> int:
         """Number of tracks in ALS model."""
-        return len(self._track_map)
+        als = self._als
+        return 0 if als is None else len(als.track_ids)
     
-    async def load_latest(self) -> bool:
-        """Load latest models from disk. Returns True if loaded."""
+    @staticmethod
+    def _read_pointer(model_dir: Path) -> str | None:
         try:
-            als_loaded = await self._load_als()
-            w2v_loaded = await self._load_w2v()
+            return (model_dir / "latest.txt").read_text().strip() or None
+        except OSError:
+            return None
+    
+    async def load_latest(self, force: bool = True) -> bool:
+        """Load latest models from disk. Returns True if an ALS model is served.
+        
+        With ``force=False`` a model whose version is already served is not
+        reloaded (cheap enough to call on every version bump / poll).
+        """
+        try:
+            als_pointer = self._read_pointer(self._als_dir)
+            als_current = (
+                self._als is not None and als_pointer is not None
+                and int(als_pointer) == self._als.version
+            )
+            w2v_current = self._w2v_model is not None and self._read_pointer(self._w2v_dir) == self._w2v_pointer
+            
+            als_loaded = False if not force and als_current else await self._load_als()
+            w2v_loaded = False if not force and w2v_current else await self._load_w2v()
             
             if als_loaded:
+                self._report_version()
                 logger.info(
-                    f"ModelStore: loaded ALS v{self._version} "
+                    f"ModelStore: loaded ALS v{self.version} "
                     f"({self.n_users} users, {self.n_tracks} tracks)"
                 )
             if w2v_loaded:
                 logger.info(
                     f"ModelStore: loaded Word2Vec "
-                    f"({len(self._w2v_model.key_to_index) if self._w2v_model else 0} tracks)"
+                    f"({len(self._w2v_model) if self._w2v_model is not None else 0} tracks)"
                 )
             
-            return als_loaded
+            return self.is_ready
             
         except Exception as e:
             logger.error(f"ModelStore: failed to load models: {e}")
@@ -137,6 +380,26 @@ class ModelStore:
         version_str = latest_file.read_text().strip()
         version = int(version_str)
         
+        version_dir = self._als_dir / f"v{version_str}"
+        if version_dir.is_dir():
+            def _load():
+                arrays = _load_arrays(
+                    version_dir,
+                    ("user_factors", "item_factors", "user_ids", "track_ids", "source_keys", "source_track_ids"),
+                )
+                meta = _load_meta(version_dir)
+                return _AlsModel(
+                    **arrays, version=version,
+                    regularization=meta.get("regularization", _DEFAULT_REGULARIZATION),
+                    trained_at=meta.get("trained_at"),
+                )
+            
+            loaded = await asyncio.to_thread(_load)
+            async with self._lock:
+                self._als = loaded
+            return True
+        
+        # Pre-mmap format: compressed npz + JSON mappings
         model_file = self._als_dir / f"model_v{version_str}.npz"
         mappings_file = self._als_dir / f"mappings_v{version_str}.json"
         
@@ -148,18 +411,17 @@ class ModelStore:
             data = np.load(model_file)
             with open(mappings_file, "r") as f:
                 mappings = json.load(f)
-            return data, mappings
+            user_ids, user_factors = _sorted_by_id(mappings["user_map"], data["user_factors"])
+            track_ids, item_factors = _sorted_by_id(mappings["track_map"], data["item_factors"])
+            source_keys, source_track_ids = _sorted_strings(mappings.get("source_map", {}))
+            return _AlsModel(
+                user_factors, item_factors, user_ids, track_ids, source_keys, source_track_ids, version
+            )
         
-        data, mappings = await asyncio.to_thread(_load)
+        loaded = await asyncio.to_thread(_load)
         
         async with self._lock:
-            self._user_factors = data["user_factors"]
-            self._item_factors = data["item_factors"]
-            self._user_map = {int(k): v for k, v in mappings["user_map"].items()}
-            self._track_map = {int(k): v for k, v in mappings["track_map"].items()}
-            self._track_reverse = {v: k for k, v in self._track_map.items()}
-            self._source_map = mappings.get("source_map", {})
-            self._version = version
+            self._als = loaded
         
         return True
     
@@ -176,21 +438,16 @@ class ModelStore:
             return False
         
         def _load():
-            user_factors = np.load(paths[0])
-            item_factors = np.load(paths[1])
             user_id_map = json.loads(paths[2].read_text(encoding="utf-8"))
             track_id_map = json.loads(paths[3].read_text(encoding="utf-8"))
-            return user_factors, item_factors, user_id_map, track_id_map
+            user_ids, user_factors = _sorted_by_id(user_id_map, np.load(paths[0]))
+            track_ids, item_factors = _sorted_by_id(track_id_map, np.load(paths[1]))
+            return _AlsModel(user_factors, item_factors, user_ids, track_ids, *_empty_sources(), 0)
         
-        user_factors, item_factors, user_id_map, track_id_map = await asyncio.to_thread(_load)
+        loaded = await asyncio.to_thread(_load)
         
         async with self._lock:
-            self._user_factors = user_factors
-            self._item_factors = item_factors
-            self._user_map = {int(k): v for k, v in user_id_map.items()}
-            self._track_map = {int(k): v for k, v in track_id_map.items()}
-            self._track_reverse = {v: k for k, v in self._track_map.items()}
-            self._version = 0
+            self._als = loaded
         
         logger.info("ModelStore: loaded legacy ALS format")
         return True
@@ -203,19 +460,28 @@ class ModelStore:
             return await self._load_w2v_legacy()
         
         version_str = latest_file.read_text().strip()
+        version_dir = self._w2v_dir / f"v{version_str}"
         model_file = self._w2v_dir / f"model_v{version_str}.bin"
         
-        if not model_file.exists():
+        if version_dir.is_dir():
+            def _load():
+                return MmapVectors.load(version_dir)
+        elif model_file.exists():
+            def _load():
+                from gensim.models import KeyedVectors
+                return KeyedVectors.load(str(model_file), mmap="r")
+        else:
             return False
         
-        def _load():
-            from gensim.models import KeyedVectors
-            return KeyedVectors.load(str(model_file))
-        
         try:
             model = await asyncio.to_thread(_load)
+            index = await asyncio.to_thread(
+                self._build_similarity, model, version_dir if version_dir.is_dir() else None
+            )
             async with self._lock:
                 self._w2v_model = model
+                self._similarity = index
+                self._w2v_pointer = version_str
             return True
         except Exception as e:
             logger.error(f"ModelStore: failed to load Word2Vec: {e}")
@@ -240,41 +506,196 @@ class ModelStore:
         source_map: dict[str, int],
         version: int,
         w2v_model: Any = None,
+        trained_at: float | None = None,
     ) -> None:
         """Atomically swap current models with new ones."""
+        user_ids, user_factors = _sorted_by_id(user_map, user_factors)
+        track_ids, item_factors = _sorted_by_id(track_map, item_factors)
+        source_keys, source_track_ids = _sorted_strings(source_map)
         async with self._lock:
-            self._user_factors = user_factors
-            self._item_factors = item_factors
-            self._user_map = user_map
-            self._track_map = track_map
-            self._track_reverse = {v: k for k, v in track_map.items()}
-            self._source_map = source_map
-            self._version = version
+            self._als = _AlsModel(
+                user_factors, item_factors, user_ids, track_ids, source_keys, source_track_ids, version,
+                trained_at=trained_at,
+            )
             
             if w2v_model is not None:
                 self._w2v_model = w2v_model
+                self._similarity = self._build_similarity(w2v_model)
         
+        self._report_version()
         logger.info(f"ModelStore: swapped to v{version}")
     
+    # ─── Cross-process hot reload ────────────────────────────────────────
+    
+    def _report_version(self) -> None:
+        from bot.services import metrics
+        metrics.ml_model_version.labels(model="als").set(self.version)
+    
+    async def publish_version(self, version: int) -> None:
+        """Announce a newly saved version to every process (call after save_*)."""
+        try:
+            await self.redis.publish(_VERSION_CHANNEL, version)
+        except Exception:
+            # Other processes still pick it up on their next latest.txt poll
+            logger.warning("ModelStore: could not publish v%s", version, exc_info=True)
+    
+    def start_reloader(self) -> None:
+        """Reload new versions in the background as they are published."""
+        if self._reloader is None or self._reloader.done():
+            self._reloader = asyncio.create_task(self._reload_loop())
+    
+    async def stop_reloader(self) -> None:
+        task, self._reloader = self._reloader, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+    
+    async def _reload_loop(self) -> None:
+        pubsub = None
+        next_poll = 0.0
+        while True:
+            try:
+                if pubsub is None:
+                    pubsub = self.redis.pubsub()
+                    await pubsub.subscribe(_VERSION_CHANNEL)
+                msg = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if msg is None and time.monotonic() < next_poll:
+                    continue
+            except asyncio.CancelledError:
+                if pubsub is not None:
+                    await pubsub.aclose()
+                raise
+            except Exception:
+                logger.debug("ModelStore: version channel unavailable", exc_info=True)
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+                pubsub = None
+                await asyncio.sleep(5)
+            next_poll = time.monotonic() + _RELOAD_POLL_SECONDS
+            # Files are mapped in a worker thread; requests keep using the old
+            # snapshot until the new one is swapped in
+            await self.load_latest(force=False)
+    
     # ─── ALS Methods ─────────────────────────────────────────────────────
     
     def get_user_idx(self, user_id: int) -> int | None:
         """Get matrix index for user_id."""
-        return self._user_map.get(user_id)
+        als = self._als
+        return None if als is None else _lookup(als.user_ids, user_id)
     
     def get_track_idx(self, track_id: int) -> int | None:
         """Get matrix index for track_id."""
-        return self._track_map.get(track_id)
+        als = self._als
+        return None if als is None else _lookup(als.track_ids, track_id)
+    
+    def get_track_indices(self, track_ids: Iterable[int]) -> np.ndarray:
+        """Matrix indices for many track_ids at once (-1 where unknown)."""
+        als = self._als
+        return lookup_many(None if als is None else als.track_ids, track_ids)
+    
+    def get_user_indices(self, user_ids: Iterable[int]) -> np.ndarray:
+        """Matrix indices for many user_ids at once (-1 where unknown)."""
+        als = self._als
+        return lookup_many(None if als is None else als.user_ids, user_ids)
+    
+    def snapshot(self) -> _AlsModel | None:
+        """The served ALS version (immutable; e.g. to warm-start training)."""
+        return self._als
     
     def get_track_id(self, idx: int) -> int | None:
         """Get track_id from matrix index."""
-        return self._track_reverse.get(idx)
+        als = self._als
+        if als is None or not 0 <= idx < len(als.track_ids):
+            return None
+        return int(als.track_ids[idx])
+    
+    def get_source_track_id(self, source_id: str) -> int | None:
+        """Get track_id for a source_id known to the model."""
+        als = self._als
+        pos = None if als is None else _lookup(als.source_keys, source_id)
+        return None if pos is None else int(als.source_track_ids[pos])
     
     def get_user_factors(self) -> np.ndarray | None:
-        return self._user_factors
+        als = self._als
+        return None if als is None else als.user_factors
     
     def get_item_factors(self) -> np.ndarray | None:
-        return self._item_factors
+        als = self._als
+        return None if als is None else als.item_factors
+    
+    def _item_gram(self, als: _AlsModel) -> np.ndarray:
+        cached = self._gram
+        if cached is not None and cached[0] is als:
+            return cached[1]
+        items = np.asarray(als.item_factors, dtype=np.float64)
+        gram = items.T @ items
+        self._gram = (als, gram)
+        return gram
+    
+    def fold_in_user(
+        self, track_ids: Iterable[int], weights: Iterable[float] | None = None
+    ) -> np.ndarray | None:
+        """Solve a user's factor vector from their plays against the fixed item factors.
+        
+        One user step of implicit ALS (confidence = summed play weight):
+        (YᵀY + Yᵤᵀ(Cᵤ − I)Yᵤ + λI) x = YᵤᵀCᵤ1. Returns None if no play
+        is on a track the model knows.
+        """
+        als = self._als
+        if als is None:
+            return None
+        track_ids = list(track_ids)
+        rows = lookup_many(als.track_ids, track_ids)
+        conf = (
+            np.ones(len(rows)) if weights is None
+            else np.asarray(list(weights), dtype=np.float64)
+        )
+        known = rows >= 0
+        if not known.any():
+            return None
+        rows, inverse = np.unique(rows[known], return_inverse=True)
+        conf = np.bincount(inverse.reshape(-1), weights=conf[known])
+        
+        y = np.asarray(als.item_factors[rows], dtype=np.float64)
+        a = self._item_gram(als) + (y.T * (conf - 1.0)) @ y
+        a[np.diag_indices_from(a)] += als.regularization
+        return np.linalg.solve(a, y.T @ conf).astype(np.float32)
+    
+    def user_vector(
+        self,
+        user_id: int,
+        recent_track_ids: Iterable[int] = (),
+        last_play_at: float | None = None,
+    ) -> np.ndarray | None:
+        """User factors from the model, or folded in from recent plays.
+
+        New users are always folded in; known users are when *last_play_at*
+        (epoch seconds) is newer than the snapshot's training data. If the
+        fold-in has too little to go on, a known user keeps the trained row.
+        """
+        als = self._als
+        if als is None:
+            return None
+        idx = _lookup(als.user_ids, user_id)
+        stale = (
+            idx is not None
+            and last_play_at is not None
+            and als.trained_at is not None
+            and last_play_at > als.trained_at
+        )
+        if idx is not None and not stale:
+            return als.user_factors[idx]
+        recent = list(recent_track_ids)
+        folded = self.fold_in_user(recent) if len(recent) >= FOLD_IN_MIN_PLAYS else None
+        if folded is None and idx is not None:
+            return als.user_factors[idx]
+        return folded
     
     def recommend_for_user(
         self, user_idx: int, n: int = 50
@@ -283,22 +704,19 @@ class ModelStore:
         
         Returns list of (track_idx, score) sorted by score descending.
         """
-        if not self.is_ready or user_idx >= len(self._user_factors):
+        als = self._als
+        if als is None or user_idx >= len(als.user_factors):
             return []
         
-        user_vec = self._user_factors[user_idx]
-        scores = np.dot(self._item_factors, user_vec)
-        top_indices = np.argsort(scores)[::-1][:n * 2]
-        
-        result = []
-        for idx in top_indices:
-            track_id = self.get_track_id(int(idx))
-            if track_id is not None:
-                result.append((int(idx), float(scores[idx])))
-            if len(result) >= n:
-                break
-        
-        return result
+        user_vec = als.user_factors[user_idx]
+        scores = np.dot(als.item_factors, user_vec)
+        n = min(n, len(scores))
+        if n <= 0:
+            return []
+        # Every row has a track_id, so the top-n rows are the answer
+        top_indices = np.argpartition(-scores, n - 1)[:n]
+        top_indices = top_indices[np.argsort(-scores[top_indices])]
+        return [(int(idx), float(scores[idx])) for idx in top_indices]
     
     # ─── Word2Vec Methods ────────────────────────────────────────────────
     
@@ -311,7 +729,7 @@ class ModelStore:
         """Get similar tracks by source_id using Word2Vec."""
         if not self.w2v_ready:
             return []
-        if source_id not in self._w2v_model.key_to_index:
+        if source_id not in self._w2v_model:
             return []
         try:
             return self._w2v_model.most_similar(source_id, topn=topn)
@@ -322,7 +740,7 @@ class ModelStore:
         """Get embedding vector for track."""
         if not self.w2v_ready:
             return None
-        if source_id not in self._w2v_model.key_to_index:
+        if source_id not in self._w2v_model:
             return None
         return self._w2v_model[source_id]
     
@@ -335,6 +753,66 @@ class ModelStore:
             return None
         return np.mean(vectors, axis=0)
     
+    # ─── Batched Similarity ──────────────────────────────────────────────
+    
+    @property
+    def similarity(self) -> SimilarityIndex | None:
+        """Similarity index over the served word vectors (track_id keys)."""
+        return self._similarity
+    
+    def _build_similarity(self, model: Any, version_dir: Path | None = None) -> SimilarityIndex | None:
+        """Index *model* with neighbours of the most popular tracks (blocking).
+
+        Versions saved with neighbour lists map them; older ones compute them here.
+        """
+        kv = getattr(model, "wv", model)
+        index = SimilarityIndex.from_keyed_vectors(kv)
+        if index is None:
+            return None
+        if version_dir is not None and (version_dir / "neighbour_seeds.npy").exists():
+            n = index.set_neighbours(**_load_arrays(version_dir, _NEIGHBOUR_ARRAYS))
+            logger.info("ModelStore: similarity index %d tracks, %d precomputed neighbour lists", len(index), n)
+            return index
+        popular = self._popular_track_ids(_PRECOMPUTE_POPULAR)
+        t0 = time.perf_counter()
+        n = index.precompute_neighbours(popular)
+        logger.info(
+            "ModelStore: similarity index %d tracks, %d neighbour lists in %.2fs",
+            len(index), n, time.perf_counter() - t0,
+        )
+        return index
+    
+    def _popular_track_ids(self, limit: int) -> list[int]:
+        path = self._base_dir / "popularity_scores.json"
+        try:
+            scores = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return []
+        return [int(tid) for tid, _ in sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:limit]]
+    
+    def similar_track_ids(
+        self,
+        track_ids: list[int],
+        topn: int = 20,
+        exclude: list[Iterable[int]] | None = None,
+        exclude_mask: np.ndarray | None = None,
+    ) -> list[list[tuple[int, float]]]:
+        """Nearest (track_id, cosine) per seed track, all seeds in one pass."""
+        index = self._similarity
+        if index is None:
+            return [[] for _ in track_ids]
+        return index.similar(track_ids, topn, exclude, exclude_mask)
+    
+    def session_scores(self, recent_track_ids: list[int], track_ids: list[int]) -> dict[int, float]:
+        """Cosine of candidate tracks against the mean vector of recent plays."""
+        index = self._similarity
+        if index is None or not recent_track_ids:
+            return {}
+        query, ok = index.session_vectors([recent_track_ids])
+        if not ok[0]:
+            return {}
+        return index.score(query[0], track_ids)
+    
     # ─── Save Methods ────────────────────────────────────────────────────
     
     async def save_als(
@@ -345,42 +823,55 @@ class ModelStore:
         track_map: dict[int, int],
         source_map: dict[str, int],
         version: int,
+        regularization: float = _DEFAULT_REGULARIZATION,
+        trained_at: float | None = None,
     ) -> Path:
-        """Save ALS model to disk."""
+        """Save ALS model to disk (mmap-able .npy arrays, rows sorted by id)."""
         version_str = f"{version:03d}"
-        model_file = self._als_dir / f"model_v{version_str}.npz"
-        mappings_file = self._als_dir / f"mappings_v{version_str}.json"
-        latest_file = self._als_dir / "latest.txt"
+        version_dir = self._als_dir / f"v{version_str}"
         
         def _save():
-            np.savez_compressed(
-                model_file,
-                user_factors=user_factors,
-                item_factors=item_factors,
-            )
-            with open(mappings_file, "w") as f:
-                json.dump({
-                    "user_map": {str(k): v for k, v in user_map.items()},
-                    "track_map": {str(k): v for k, v in track_map.items()},
-                    "source_map": source_map,
-                }, f)
-            latest_file.write_text(version_str)
+            user_ids, uf = _sorted_by_id(user_map, np.asarray(user_factors, dtype=np.float32))
+            track_ids, itf = _sorted_by_id(track_map, np.asarray(item_factors, dtype=np.float32))
+            source_keys, source_track_ids = _sorted_strings(source_map)
+            _save_arrays(version_dir, {
+                "user_factors": uf,
+                "item_factors": itf,
+                "user_ids": user_ids,
+                "track_ids": track_ids,
+                "source_keys": source_keys,
+                "source_track_ids": source_track_ids,
+            }, meta={"regularization": regularization, "trained_at": trained_at})
+            _write_pointer(self._als_dir / "latest.txt", version_str)
+            _prune_versions(self._als_dir)
         
         await asyncio.to_thread(_save)
-        return model_file
+        return version_dir
     
     async def save_w2v(self, model: Any, version: int) -> Path:
-        """Save Word2Vec model to disk."""
+        """Save word vectors (gensim Word2Vec / KeyedVectors) as mmap-able arrays."""
+        kv = getattr(model, "wv", model)
+        return await self.save_w2v_vectors(kv.vectors, list(kv.index_to_key), version)
+    
+    async def save_w2v_vectors(self, vectors: np.ndarray, keys: list[str], version: int) -> Path:
+        """Save a vector matrix and the key of each row as a new w2v version."""
         version_str = f"{version:03d}"
-        model_file = self._w2v_dir / f"model_v{version_str}.bin"
-        latest_file = self._w2v_dir / "latest.txt"
+        version_dir = self._w2v_dir / f"v{version_str}"
         
         def _save():
-            model.save(str(model_file))
-            latest_file.write_text(version_str)
+            # Neighbour lists are computed once here rather than in every process on load
+            index = SimilarityIndex.from_keyed_vectors(
+                SimpleNamespace(vectors=np.asarray(vectors, dtype=np.float32), index_to_key=keys)
+            )
+            extra = None
+            if index is not None:
+                extra = index.neighbour_arrays(self._popular_track_ids(_PRECOMPUTE_POPULAR))
+            MmapVectors.save(version_dir, vectors, keys, extra)
+            _write_pointer(self._w2v_dir / "latest.txt", version_str)
+            _prune_versions(self._w2v_dir)
         
         await asyncio.to_thread(_save)
-        return model_file
+        return version_dir
     
     def get_latest_version(self) -> int:
         """Get the latest model version from disk."""
@@ -388,6 +879,10 @@ class ModelStore:
         if latest_file.exists():
             return int(latest_file.read_text().strip())
         return 0
+    
+    def get_latest_w2v_version(self) -> int:
+        pointer = self._read_pointer(self._w2v_dir)
+        return int(pointer) if pointer else 0
 
 
 # ─── Legacy Functions (for backward compatibility) ───────────────────────
@@ -469,6 +964,15 @@ def save_popularity(scores: dict[int, float]) -> None:
     )
 
 
+async def start_model_reloader() -> None:
+    """Load the current models and follow published versions (bot + webapp)."""
+    if not settings.ML_ENABLED:
+        return
+    store = ModelStore.get()
+    await store.load_latest(force=False)
+    store.start_reloader()
+
+
 # ─── Module-level singleton ──────────────────────────────────────────────
 
 # Convenience instance for direct import:
@@ -1,23 +1,34 @@
 """Profile Auto-Updater - Automatic user profile recalculation.
 
-Computes user preferences from listening history:
+Computes user preferences from the last 90 days of listening history:
 - fav_genres: top 5 genres (weighted by recency)
 - fav_artists: top 5 artists (weighted by recency)
 - avg_bpm: average BPM of last 100 tracks
 - preferred_hours: top 4 listening hours (UTC)
 - fav_vibe: inferred from BPM/genre clusters
 
-Triggered after every 10 play events via bot/db.py
+Profiles are built in batches: plays of many users are exported into NumPy
+columns and every affinity is computed with grouped array operations, then
+written back with one bulk UPDATE per batch. A scheduler rebuilds users with
+new plays every PROFILE_BATCH_INTERVAL_MIN and everyone once per
+PROFILE_FULL_REBUILD_HOURS; single users are still refreshed after every
+10 play events via bot/db.py.
 """
 
 import asyncio
 import logging
-from collections import Counter
+import time
+from contextlib import aclosing
 from datetime import datetime, timedelta, timezone
 from math import log2
+from typing import Sequence
 
-from sqlalchemy import func, select, update
-from sqlalchemy.ext.asyncio import AsyncSession
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore[assignment]
+
+from sqlalchemy import bindparam, select, update
 
 from bot.db import async_session
 from bot.models.track import ListeningHistory, Track
@@ -25,6 +36,16 @@ from bot.models.user import User
 
 logger = logging.getLogger(__name__)
 
+_WINDOW_DAYS = 90
+_HALF_LIFE_DAYS = 30           # recent = 1.0, 30 days ago = 0.5, 60 days = 0.25
+_TOP_LABELS = 10               # genres / artists ranked (vibe uses all, profile keeps 5)
+_BPM_RECENT_PLAYS = 100
+_BATCH_USERS = 2000            # users per export + bulk UPDATE
+_EXPORT_CHUNK_ROWS = 20_000
+_LAST_RUN_KEY = "profiles:batch:last_run"
+_LAST_FULL_KEY = "profiles:batch:last_full"
+_RUN_LOCK_KEY = "profiles:batch:lock"
+
 
 async def update_user_profile_full(user_id: int) -> None:
     """Full profile recalculation based on listening history.
@@ -37,163 +58,230 @@ async def update_user_profile_full(user_id: int) -> None:
     - fav_vibe (inferred)
     """
     try:
-        async with async_session() as session:
-            # Check if user exists and is onboarded
-            user = await session.get(User, user_id)
-            if not user:
-                return
-            
-            # Get listening history data
-            top_genres = await _get_top_genres(session, user_id)
-            top_artists = await _get_top_artists(session, user_id)
-            avg_bpm = await _get_avg_bpm(session, user_id)
-            preferred_hours = await _get_preferred_hours(session, user_id)
-            fav_vibe = _infer_vibe(avg_bpm, top_genres)
-            
-            # Build update dict, only update if we have data
-            update_values = {}
-            
-            if top_genres:
-                update_values["fav_genres"] = top_genres[:5]
-            if top_artists:
-                update_values["fav_artists"] = top_artists[:5]
-            if avg_bpm:
-                update_values["avg_bpm"] = avg_bpm
-            if preferred_hours:
-                update_values["preferred_hours"] = preferred_hours[:4]
-            if fav_vibe:
-                update_values["fav_vibe"] = fav_vibe
-            
-            if update_values:
-                await session.execute(
-                    update(User).where(User.id == user_id).values(**update_values)
-                )
-                await session.commit()
-                logger.debug(f"Profile updated for user {user_id}: {list(update_values.keys())}")
-                
+        await _rebuild_profiles([user_id])
     except Exception as e:
         logger.error(f"Profile update failed for user {user_id}: {e}")
 
 
-async def _get_top_genres(session: AsyncSession, user_id: int, limit: int = 10) -> list[str]:
-    """Get top genres weighted by recency.
-    
-    More recent listens have higher weight (exponential decay).
+async def update_profiles_batch(full: bool = False) -> int:
+    """Rebuild profiles of users with plays since the last run (all active users if *full*).
+
+    The first run, or a run when the last-run marker is unavailable, is a
+    full rebuild. Returns the number of profiles rebuilt.
     """
-    # Get plays from last 90 days with genres
-    cutoff = datetime.now(timezone.utc) - timedelta(days=90)
-    
-    result = await session.execute(
-        select(Track.genre, ListeningHistory.created_at)
-        .join(Track, Track.id == ListeningHistory.track_id)
-        .where(
-            ListeningHistory.user_id == user_id,
-            ListeningHistory.action == "play",
-            ListeningHistory.track_id.isnot(None),
-            Track.genre.isnot(None),
-            ListeningHistory.created_at >= cutoff,
+    from bot.services.cache import cache
+
+    started = time.time()
+    since = None
+    if not full:
+        try:
+            last_run = await cache.redis.get(_LAST_RUN_KEY)
+            since = float(last_run) if last_run else None
+        except Exception:
+            logger.debug("profile batch marker unavailable, rebuilding everyone", exc_info=True)
+
+    window_start = datetime.now(timezone.utc) - timedelta(days=_WINDOW_DAYS)
+    changed_since = window_start if since is None else datetime.fromtimestamp(since, tz=timezone.utc)
+    async with async_session() as session:
+        result = await session.execute(
+            select(ListeningHistory.user_id)
+            .where(
+                ListeningHistory.action == "play",
+                ListeningHistory.created_at >= changed_since,
+            )
+            .distinct()
         )
-        .order_by(ListeningHistory.created_at.desc())
+        user_ids = sorted(result.scalars().all())
+
+    rebuilt = 0
+    for start in range(0, len(user_ids), _BATCH_USERS):
+        rebuilt += await _rebuild_profiles(user_ids[start:start + _BATCH_USERS])
+
+    try:
+        await cache.redis.set(_LAST_RUN_KEY, str(started))
+        if since is None:
+            await cache.redis.set(_LAST_FULL_KEY, str(started))
+    except Exception:
+        logger.debug("profile batch marker not saved", exc_info=True)
+
+    elapsed = max(time.time() - started, 1e-6)
+    logger.info(
+        "Profile batch (%s): %d users in %.1fs (%.0f users/s)",
+        "full" if since is None else "incremental", rebuilt, elapsed, rebuilt / elapsed,
     )
-    
-    # Apply recency weighting
-    genre_weights: Counter[str] = Counter()
-    now = datetime.now(timezone.utc)
-    
-    for genre, created_at in result:
-        if not genre:
-            continue
-        # Exponential decay: recent = 1.0, 30 days ago = 0.5, 60 days = 0.25
-        days_ago = (now - created_at).days
-        weight = 2 ** (-days_ago / 30)
-        genre_weights[genre] += weight
-    
-    # Return sorted by weight
-    return [g for g, _ in genre_weights.most_common(limit)]
+    return rebuilt
 
 
-async def _get_top_artists(session: AsyncSession, user_id: int, limit: int = 10) -> list[str]:
-    """Get top artists weighted by recency."""
-    cutoff = datetime.now(timezone.utc) - timedelta(days=90)
-    
-    result = await session.execute(
-        select(Track.artist, ListeningHistory.created_at)
-        .join(Track, Track.id == ListeningHistory.track_id)
+async def _rebuild_profiles(user_ids: Sequence[int]) -> int:
+    """Export the window's plays of *user_ids*, compute their profiles and write them back."""
+    from recommender.data_extractor import int_column, iter_row_chunks
+
+    if not user_ids:
+        return 0
+    cutoff = datetime.now(timezone.utc) - timedelta(days=_WINDOW_DAYS)
+    stmt = (
+        select(
+            ListeningHistory.user_id,
+            ListeningHistory.created_at,
+            Track.genre,
+            Track.artist,
+            Track.bpm,
+        )
+        .outerjoin(Track, Track.id == ListeningHistory.track_id)
         .where(
-            ListeningHistory.user_id == user_id,
+            ListeningHistory.user_id.in_(list(user_ids)),
             ListeningHistory.action == "play",
-            ListeningHistory.track_id.isnot(None),
-            Track.artist.isnot(None),
             ListeningHistory.created_at >= cutoff,
         )
-        .order_by(ListeningHistory.created_at.desc())
     )
-    
-    artist_weights: Counter[str] = Counter()
-    now = datetime.now(timezone.utc)
-    
-    for artist, created_at in result:
-        if not artist:
-            continue
-        days_ago = (now - created_at).days
-        weight = 2 ** (-days_ago / 30)
-        artist_weights[artist] += weight
-    
-    return [a for a, _ in artist_weights.most_common(limit)]
 
+    users: list = []
+    stamps: list = []
+    genres: list = []
+    artists: list = []
+    bpms: list = []
+    async with aclosing(iter_row_chunks(stmt, _EXPORT_CHUNK_ROWS)) as chunks:
+        async for chunk in chunks:
+            uid, created, genre, artist, bpm = zip(*chunk)
+            users.append(int_column(uid))
+            stamps.append(np.fromiter(map(_epoch, created), dtype=np.float64, count=len(created)))
+            genres.extend(genre)
+            artists.extend(artist)
+            bpms.append(np.asarray(bpm, dtype=np.float64))
+    if not users:
+        return 0
 
-async def _get_avg_bpm(session: AsyncSession, user_id: int) -> int | None:
-    """Get average BPM from last 100 tracks with BPM data."""
-    result = await session.execute(
-        select(Track.bpm)
-        .join(ListeningHistory, Track.id == ListeningHistory.track_id)
-        .where(
-            ListeningHistory.user_id == user_id,
-            ListeningHistory.action == "play",
-            Track.bpm.isnot(None),
-            Track.bpm > 0,
-        )
-        .order_by(ListeningHistory.created_at.desc())
-        .limit(100)
+    profiles = compute_profiles(
+        np.concatenate(users),
+        np.concatenate(stamps),
+        np.asarray(genres, dtype=object),
+        np.asarray(artists, dtype=object),
+        np.concatenate(bpms),
+        now=time.time(),
     )
-    
-    bpms = [row[0] for row in result if row[0]]
-    if not bpms:
-        return None
-    
-    return int(sum(bpms) / len(bpms))
+    await _write_profiles(profiles)
+    return len(profiles)
 
 
-async def _get_preferred_hours(session: AsyncSession, user_id: int) -> list[int]:
-    """Get preferred listening hours (UTC).
-    
-    Returns top 4 hours by play count.
+def _epoch(dt: datetime) -> float:
+    # SQLite returns naive datetimes; stored values are UTC
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+async def _write_profiles(profiles: dict[int, dict]) -> None:
+    """Bulk UPDATE by primary key; fields without data are left untouched."""
+    # Users with the same set of columns share one executemany; users
+    # deleted meanwhile just match no row
+    by_columns: dict[tuple, list[dict]] = {}
+    for user_id, values in profiles.items():
+        if values:
+            by_columns.setdefault(tuple(sorted(values)), []).append({"user_id_": user_id, **values})
+    if not by_columns:
+        return
+    users = User.__table__
+    async with async_session() as session:
+        for columns, group in by_columns.items():
+            stmt = (
+                update(users)
+                .where(users.c.id == bindparam("user_id_"))
+                .values({column: bindparam(column) for column in columns})
+            )
+            await session.execute(stmt, group)
+        await session.commit()
+
+
+def compute_profiles(
+    user_ids: "np.ndarray",
+    timestamps: "np.ndarray",
+    genres: "np.ndarray",
+    artists: "np.ndarray",
+    bpms: "np.ndarray",
+    now: float,
+) -> dict[int, dict]:
+    """Profile update values per user from parallel play columns.
+
+    *genres* / *artists* are object arrays (None when unknown), *bpms* float
+    (NaN when unknown). Only fields with data appear in a user's dict.
     """
-    # Check if we're using PostgreSQL or SQLite
-    dialect = session.get_bind().dialect.name
-    
-    if dialect == "postgresql":
-        # PostgreSQL: use EXTRACT
-        hour_expr = func.extract("hour", ListeningHistory.created_at)
-    else:
-        # SQLite: use strftime
-        hour_expr = func.cast(
-            func.strftime("%H", ListeningHistory.created_at),
-            type_=func.integer()
-        )
-    
-    result = await session.execute(
-        select(hour_expr.label("hour"), func.count().label("cnt"))
-        .where(
-            ListeningHistory.user_id == user_id,
-            ListeningHistory.action == "play",
-        )
-        .group_by("hour")
-        .order_by(func.count().desc())
-        .limit(4)
-    )
-    
-    return [int(row[0]) for row in result if row[0] is not None]
+    users, rows = np.unique(user_ids, return_inverse=True)
+    n_users = len(users)
+    days_ago = np.floor((now - timestamps) / 86400)
+    weights = 2.0 ** (-days_ago / _HALF_LIFE_DAYS)
+
+    top_genres = _top_labels(rows, genres, weights, n_users, _TOP_LABELS)
+    top_artists = _top_labels(rows, artists, weights, n_users, _TOP_LABELS)
+    avg_bpm = _recent_mean(rows, timestamps, bpms, n_users, _BPM_RECENT_PLAYS)
+    hours = _top_hours(rows, timestamps, n_users, limit=4)
+
+    profiles: dict[int, dict] = {}
+    for i, user_id in enumerate(users.tolist()):
+        values: dict = {}
+        if top_genres[i]:
+            values["fav_genres"] = top_genres[i][:5]
+        if top_artists[i]:
+            values["fav_artists"] = top_artists[i][:5]
+        if avg_bpm[i]:
+            values["avg_bpm"] = avg_bpm[i]
+        if hours[i]:
+            values["preferred_hours"] = hours[i]
+        fav_vibe = _infer_vibe(avg_bpm[i], top_genres[i])
+        if fav_vibe:
+            values["fav_vibe"] = fav_vibe
+        profiles[user_id] = values
+    return profiles
+
+
+def _top_labels(
+    rows: "np.ndarray", labels: "np.ndarray", weights: "np.ndarray", n_rows: int, limit: int
+) -> list[list[str]]:
+    """Per row, the *limit* labels with the largest summed weight."""
+    result: list[list[str]] = [[] for _ in range(n_rows)]
+    known = labels.astype(bool)
+    if not known.any():
+        return result
+    names, codes = np.unique(labels[known].astype(str), return_inverse=True)
+    pairs, pair_idx = np.unique(rows[known] * len(names) + codes, return_inverse=True)
+    totals = np.bincount(pair_idx, weights=weights[known])
+    pair_rows, pair_codes = pairs // len(names), pairs % len(names)
+
+    order = np.lexsort((pair_codes, -totals, pair_rows))
+    ranks = _rank_within(pair_rows[order])
+    for r, c in zip(pair_rows[order][ranks < limit].tolist(), pair_codes[order][ranks < limit].tolist()):
+        result[r].append(str(names[c]))
+    return result
+
+
+def _recent_mean(
+    rows: "np.ndarray", timestamps: "np.ndarray", values: "np.ndarray", n_rows: int, last: int
+) -> list[int | None]:
+    """Per row, the integer mean of its *last* most recent positive values."""
+    valid = values > 0
+    order = np.lexsort((-timestamps[valid], rows[valid]))
+    sorted_rows = rows[valid][order]
+    keep = _rank_within(sorted_rows) < last
+    sums = np.bincount(sorted_rows[keep], weights=values[valid][order][keep], minlength=n_rows)
+    counts = np.bincount(sorted_rows[keep], minlength=n_rows)
+    return [int(s / c) if c else None for s, c in zip(sums.tolist(), counts.tolist())]
+
+
+def _top_hours(rows: "np.ndarray", timestamps: "np.ndarray", n_rows: int, limit: int) -> list[list[int]]:
+    """Per row, up to *limit* UTC hours with the most plays."""
+    hours = ((timestamps // 3600) % 24).astype(np.int64)
+    counts = np.bincount(rows * 24 + hours, minlength=n_rows * 24).reshape(n_rows, 24)
+    top = np.argsort(-counts, axis=1, kind="stable")[:, :limit]
+    top_counts = np.take_along_axis(counts, top, axis=1)
+    return [[h for h, c in zip(hs, cs) if c] for hs, cs in zip(top.tolist(), top_counts.tolist())]
+
+
+def _rank_within(sorted_rows: "np.ndarray") -> "np.ndarray":
+    """0-based position of each element inside its run of equal *sorted_rows*."""
+    if not len(sorted_rows):
+        return np.empty(0, dtype=np.int64)
+    starts = np.r_[0, np.flatnonzero(np.diff(sorted_rows)) + 1]
+    run_start = np.repeat(starts, np.diff(np.r_[starts, len(sorted_rows)]))
+    return np.arange(len(sorted_rows)) - run_start
 
 
 def _infer_vibe(avg_bpm: int | None, genres: list[str]) -> str | None:
@@ -269,3 +357,50 @@ async def trigger_profile_update(user_id: int) -> None:
     Called from bot/db.py after play events.
     """
     asyncio.create_task(update_user_profile_full(user_id))
+
+
+async def _full_rebuild_due() -> bool:
+    from bot.config import settings
+    from bot.services.cache import cache
+
+    try:
+        last_full = await cache.redis.get(_LAST_FULL_KEY)
+    except Exception:
+        return False
+    return not last_full or time.time() - float(last_full) >= settings.PROFILE_FULL_REBUILD_HOURS * 3600
+
+
+async def _claim_batch_run(ttl: int) -> bool:
+    """One batch per interval across all bot processes (SET NX EX).
+
+    The lock is left to expire rather than released, so a process whose loop
+    wakes later in the same interval skips instead of repeating the run.
+    """
+    from bot.services.cache import cache
+
+    try:
+        return bool(await cache.redis.set(_RUN_LOCK_KEY, str(time.time()), nx=True, ex=ttl))
+    except Exception:
+        logger.debug("profile batch lock unavailable, running unguarded", exc_info=True)
+        return True
+
+
+async def start_profile_scheduler() -> None:
+    """Start the periodic batch profile rebuild."""
+    asyncio.create_task(_profile_loop())
+
+
+async def _profile_loop() -> None:
+    from bot.config import settings
+
+    await asyncio.sleep(60)
+    while True:
+        interval = settings.PROFILE_BATCH_INTERVAL_MIN * 60
+        try:
+            # Slightly shorter than the interval so this process's next wake-up
+            # finds the lock expired
+            if await _claim_batch_run(max(interval - 5, 1)):
+                await update_profiles_batch(full=await _full_rebuild_due())
+        except Exception as e:
+            logger.warning("Profile batch error: %s", e)
+        await asyncio.sleep(interval)
@@ -0,0 +1,209 @@
+"""
+retrieval.py — Batched embedding similarity over the served Word2Vec vectors.
+
+``SimilarityIndex`` keeps one L2-normalized float32 matrix (row i is
+track_ids[i]; the memory-mapped vectors themselves when training already
+normalized them) and answers many queries with a single matrix product and
+``argpartition`` top-k:
+
+  - similar tracks for a batch of seed tracks
+  - nearest tracks to session (taste) vectors built from recent plays
+  - cosine scores of candidate tracks against a query vector
+
+Queries can exclude track sets (already played, the seeds themselves) and a
+shared row mask (e.g. every track of a disliked artist). Neighbour lists of
+the most popular tracks are computed once per model version at training time
+and memory-mapped with the vectors (``neighbour_arrays`` / ``set_neighbours``).
+
+Queries are scored in blocks sized from a byte budget, so the q×n score
+matrix stays bounded however many tracks the model has.
+"""
+from typing import Iterable, Sequence
+
+import numpy as np
+
+_SCORE_BLOCK_BYTES = 32 << 20   # float32 q×n score block per matrix product
+NEIGHBOUR_K = 50                # precomputed neighbours per popular track
+
+
+def _query_block(n: int) -> int:
+    """Queries per matrix product so a q×n float32 score block fits the budget."""
+    return max(1, _SCORE_BLOCK_BYTES // (4 * n))
+
+
+class SimilarityIndex:
+    """Cosine top-k over unit-length track vectors, keyed by track_id."""
+
+    def __init__(self, unit_vectors: np.ndarray, track_ids: np.ndarray) -> None:
+        order = np.argsort(track_ids, kind="stable")
+        self.vectors = unit_vectors
+        self.track_ids = np.asarray(track_ids, dtype=np.int64)
+        self._sorted_ids = self.track_ids[order]
+        self._sorted_rows = order
+        # Precomputed neighbours: row i belongs to _seed_ids[i] (sorted), ids -1 padded
+        self._seed_ids = np.empty(0, dtype=np.int64)
+        self._neighbour_ids = np.empty((0, 0), dtype=np.int64)
+        self._neighbour_sims = np.empty((0, 0), dtype=np.float32)
+
+    @classmethod
+    def from_keyed_vectors(cls, kv) -> "SimilarityIndex | None":
+        """Index the numeric (track_id) keys of a KeyedVectors-like model."""
+        keys = np.asarray(kv.index_to_key, dtype=str)
+        numeric = np.char.isdigit(keys)
+        if not numeric.any():
+            return None
+        vectors = kv.vectors if numeric.all() else np.asarray(kv.vectors)[numeric]
+        norms = np.linalg.norm(vectors, axis=1)
+        if not np.allclose(norms, 1.0, atol=1e-3):
+            vectors = (vectors / np.maximum(norms, 1e-12)[:, None]).astype(np.float32)
+        return cls(vectors, keys[numeric].astype(np.int64))
+
+    def __len__(self) -> int:
+        return len(self.track_ids)
+
+    def rows(self, track_ids: Iterable[int]) -> np.ndarray:
+        """Matrix rows of *track_ids* (-1 where unknown)."""
+        ids = np.fromiter(track_ids, dtype=np.int64)
+        if not len(self._sorted_ids):
+            return np.full(len(ids), -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self._sorted_ids, ids), len(self._sorted_ids) - 1)
+        return np.where(self._sorted_ids[pos] == ids, self._sorted_rows[pos], -1)
+
+    def mask(self, track_ids: Iterable[int]) -> np.ndarray:
+        """Boolean row mask of *track_ids*, e.g. to exclude a disliked artist."""
+        mask = np.zeros(len(self), dtype=bool)
+        rows = self.rows(track_ids)
+        mask[rows[rows >= 0]] = True
+        return mask
+
+    def session_vectors(self, sessions: Sequence[Iterable[int]]) -> tuple[np.ndarray, np.ndarray]:
+        """Unit mean vector per session of track_ids, and which sessions had any known track."""
+        dim = self.vectors.shape[1] if len(self) else 0
+        out = np.zeros((len(sessions), dim), dtype=np.float32)
+        ok = np.zeros(len(sessions), dtype=bool)
+        for i, session in enumerate(sessions):
+            rows = self.rows(session)
+            rows = rows[rows >= 0]
+            if len(rows):
+                mean = self.vectors[rows].mean(axis=0)
+                norm = float(np.linalg.norm(mean))
+                if norm > 0:
+                    out[i] = mean / norm
+                    ok[i] = True
+        return out, ok
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int,
+        exclude: Sequence[Iterable[int]] | None = None,
+        exclude_mask: np.ndarray | None = None,
+    ) -> list[list[tuple[int, float]]]:
+        """Top-*k* (track_id, cosine) per unit query vector.
+
+        *exclude* holds one track_id set per query; *exclude_mask* is a row
+        mask shared by every query.
+        """
+        results: list[list[tuple[int, float]]] = []
+        n = len(self)
+        if not n or k <= 0:
+            return [[] for _ in range(len(queries))]
+        step = _query_block(n)
+        for start in range(0, len(queries), step):
+            block = np.asarray(queries[start:start + step], dtype=np.float32)
+            sims = block @ self.vectors.T
+            if exclude_mask is not None:
+                sims[:, exclude_mask] = -np.inf
+            if exclude is not None:
+                for i, ids in enumerate(exclude[start:start + len(block)]):
+                    rows = self.rows(ids)
+                    sims[i, rows[rows >= 0]] = -np.inf
+            kk = min(k, n)
+            top = np.argpartition(-sims, kk - 1, axis=1)[:, :kk]
+            top_sims = np.take_along_axis(sims, top, axis=1)
+            order = np.argsort(-top_sims, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_sims = np.take_along_axis(top_sims, order, axis=1)
+            for rows, scores in zip(top.tolist(), top_sims.tolist()):
+                results.append([
+                    (int(self.track_ids[r]), float(s)) for r, s in zip(rows, scores) if s != -np.inf
+                ])
+        return results
+
+    def similar(
+        self,
+        track_ids: Sequence[int],
+        k: int,
+        exclude: Sequence[Iterable[int]] | None = None,
+        exclude_mask: np.ndarray | None = None,
+    ) -> list[list[tuple[int, float]]]:
+        """Nearest tracks per seed track (the seed itself excluded; unknown seeds get [])."""
+        results: list[list[tuple[int, float]] | None] = [None] * len(track_ids)
+        pending: list[int] = []
+        for i, tid in enumerate(track_ids):
+            cached = self._cached_neighbours(tid)
+            if cached is not None and exclude_mask is None:
+                skip = set(exclude[i]) if exclude is not None else ()
+                hits = [pair for pair in cached if pair[0] not in skip]
+                if len(hits) >= k or len(cached) >= len(self) - 1:
+                    results[i] = hits[:k]
+                    continue
+            pending.append(i)
+
+        rows = self.rows(track_ids[i] for i in pending)
+        known = [i for i, row in zip(pending, rows.tolist()) if row >= 0]
+        if known:
+            queries = self.vectors[rows[rows >= 0]]
+            excl = [
+                [track_ids[i], *(exclude[i] if exclude is not None else ())]
+                for i in known
+            ]
+            for i, hits in zip(known, self.search(queries, k, excl, exclude_mask)):
+                results[i] = hits
+        return [r if r is not None else [] for r in results]
+
+    def score(self, query: np.ndarray, track_ids: Sequence[int]) -> dict[int, float]:
+        """Cosine of each known candidate track against one unit query vector."""
+        rows = self.rows(track_ids)
+        known = rows >= 0
+        if not known.any():
+            return {}
+        sims = self.vectors[rows[known]] @ np.asarray(query, dtype=np.float32)
+        ids = [tid for tid, ok in zip(track_ids, known.tolist()) if ok]
+        return dict(zip(ids, sims.tolist()))
+
+    def _cached_neighbours(self, track_id: int) -> list[tuple[int, float]] | None:
+        if not len(self._seed_ids):
+            return None
+        pos = int(np.searchsorted(self._seed_ids, track_id))
+        if pos >= len(self._seed_ids) or self._seed_ids[pos] != track_id:
+            return None
+        ids = self._neighbour_ids[pos]
+        valid = ids >= 0
+        return list(zip(ids[valid].tolist(), self._neighbour_sims[pos][valid].tolist()))
+
+    def neighbour_arrays(self, track_ids: Iterable[int], k: int = NEIGHBOUR_K) -> dict[str, np.ndarray]:
+        """Neighbour lists of *track_ids* as arrays to save with a model version (blocking)."""
+        seeds = np.unique(np.fromiter(track_ids, dtype=np.int64))
+        rows = self.rows(seeds)
+        seeds, rows = seeds[rows >= 0], rows[rows >= 0]
+        ids = np.full((len(seeds), k), -1, dtype=np.int64)
+        sims = np.zeros((len(seeds), k), dtype=np.float32)
+        hits = self.search(self.vectors[rows], k, [[tid] for tid in seeds.tolist()]) if len(seeds) else []
+        for i, seed_hits in enumerate(hits):
+            if seed_hits:
+                ids[i, :len(seed_hits)], sims[i, :len(seed_hits)] = zip(*seed_hits)
+        return {"neighbour_seeds": seeds, "neighbour_ids": ids, "neighbour_sims": sims}
+
+    def set_neighbours(
+        self, neighbour_seeds: np.ndarray, neighbour_ids: np.ndarray, neighbour_sims: np.ndarray
+    ) -> int:
+        """Serve precomputed neighbour lists (e.g. memory-mapped from the version directory)."""
+        self._seed_ids = neighbour_seeds
+        self._neighbour_ids = neighbour_ids
+        self._neighbour_sims = neighbour_sims
+        return len(neighbour_seeds)
+
+    def precompute_neighbours(self, track_ids: Iterable[int], k: int = NEIGHBOUR_K) -> int:
+        """Compute and serve neighbour lists of *track_ids* (popular tracks); returns how many."""
+        return self.set_neighbours(**self.neighbour_arrays(track_ids, k))
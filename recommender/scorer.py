@@ -54,6 +54,8 @@ class ScoringContext:
     """Context for scoring session."""
     current_hour_utc: int = field(default_factory=lambda: datetime.now(timezone.utc).hour)
     recent_source_ids: list[str] = field(default_factory=list)  # for embedding (source_id strings)
+    recent_track_ids: list[int] = field(default_factory=list)    # recent plays, for ALS fold-in
+    last_play_at: float | None = None                            # epoch of the newest play
     listened_ids: set[int] = field(default_factory=set)          # all-time history (track_ids)
     preferred_hours: list[int] | None = None                     # user's active hours
     skip_track_ids: set[int] = field(default_factory=set)        # tracks skipped in last 30 days
@@ -74,7 +76,7 @@ class HybridScorer:
 
     def __init__(self, embeddings: TrackEmbeddings | None = None):
         self.config = ml_config
-        self.weights = self.config.scorer
+        self.weights = self.config.scorer_weights
         self.diversity = self.config.diversity
         self._embeddings = embeddings
 
@@ -119,10 +121,12 @@ class HybridScorer:
         results: list[ScoredTrack] = []
 
         # Get ALS scores for all candidates in batch
-        als_scores = self._get_als_scores(user_id, [c["id"] for c in candidates])
+        als_scores = self._get_als_scores(
+            user_id, [c["id"] for c in candidates], ctx.recent_track_ids, ctx.last_play_at
+        )
         
-        # Get embedding similarity if available (using source_ids)
-        embed_scores = self._get_embedding_scores(ctx.recent_source_ids, candidates)
+        # Get embedding similarity if available (batched by track_id, else source_ids)
+        embed_scores = self._get_embedding_scores(ctx.recent_source_ids, candidates, ctx.recent_track_ids)
 
         # Normalize play counts for popularity
         max_plays = max((c.get("play_count", 0) for c in candidates), default=1) or 1
@@ -151,6 +155,9 @@ class HybridScorer:
             # ── Freshness (decay over 30 days) ───────────────────────────
             added_at = c.get("added_at")
             if added_at:
+                if added_at.tzinfo is None:
+                    # SQLite returns naive datetimes; stored values are UTC
+                    added_at = added_at.replace(tzinfo=timezone.utc)
                 days_old = (datetime.now(timezone.utc) - added_at).days
                 freshness = max(0, 1 - days_old / 30)
             else:
@@ -177,9 +184,9 @@ class HybridScorer:
             # ── Weighted sum ─────────────────────────────────────────────
             final_score = (
                 self.weights.als * components["als"]
-                + self.weights.embedding * components["embed"]
-                + self.weights.popularity * components["popularity"]
-                + self.weights.freshness * components["freshness"]
+                + self.weights.emb * components["embed"]
+                + self.weights.pop * components["popularity"]
+                + self.weights.fresh * components["freshness"]
                 + self.weights.time * components["time"]
                 + penalty
             )
@@ -198,33 +205,35 @@ class HybridScorer:
         results.sort(key=lambda x: x.score, reverse=True)
         return results
 
-    def _get_als_scores(self, user_id: int, track_ids: list[int]) -> dict[int, float]:
-        """Get ALS scores for tracks from ModelStore."""
+    def _get_als_scores(
+        self,
+        user_id: int,
+        track_ids: list[int],
+        recent_track_ids: list[int] | None = None,
+        last_play_at: float | None = None,
+    ) -> dict[int, float]:
+        """Get ALS scores for tracks from ModelStore (new / stale users are folded in)."""
         scores: dict[int, float] = {}
         
         if not model_store.is_ready:
             return scores
 
         try:
-            # Get user's matrix index
-            user_idx = model_store.get_user_idx(user_id)
-            if user_idx is None:
-                return scores
-            
-            # Get user vector and compute dot product with all item factors
-            user_factors = model_store.get_user_factors()
+            # Trained user vector, or solved from recent plays for users the
+            # nightly model hasn't seen yet (or whose plays are newer than it)
+            user_vec = model_store.user_vector(user_id, recent_track_ids or (), last_play_at)
             item_factors = model_store.get_item_factors()
             
-            if user_factors is None or item_factors is None:
+            if user_vec is None or item_factors is None:
                 return scores
             
-            user_vec = user_factors[user_idx]
-            
-            # Score each candidate track
-            for tid in track_ids:
-                track_idx = model_store.get_track_idx(tid)
-                if track_idx is not None:
-                    score = float(np.dot(user_vec, item_factors[track_idx]))
+            # Score all known candidates in one matrix-vector product
+            track_idx = model_store.get_track_indices(track_ids)
+            known = track_idx >= 0
+            if known.any():
+                dots = item_factors[track_idx[known]] @ user_vec
+                known_ids = [tid for tid, ok in zip(track_ids, known.tolist()) if ok]
+                for tid, score in zip(known_ids, dots.tolist()):
                     scores[tid] = max(0, score)  # clamp negative
         except Exception as e:
             logger.warning(f"ALS scoring failed: {e}")
@@ -232,11 +241,20 @@ class HybridScorer:
         return scores
 
     def _get_embedding_scores(
-        self, recent_source_ids: list[str], candidates: list[dict]
+        self,
+        recent_source_ids: list[str],
+        candidates: list[dict],
+        recent_track_ids: list[int] | None = None,
     ) -> dict[int, float]:
         """Get embedding similarity scores using user's recent listening."""
         scores: dict[int, float] = {}
         
+        if recent_track_ids and model_store.similarity is not None:
+            # One matrix-vector product over every candidate
+            sims = model_store.session_scores(recent_track_ids[:50], [c["id"] for c in candidates])
+            if sims:
+                return {tid: max(0, sim) for tid, sim in sims.items()}
+
         if not self.embeddings or not recent_source_ids:
             return scores
 
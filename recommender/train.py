@@ -3,27 +3,30 @@ train.py — Nightly ML training pipeline.
 
 Steps:
   1. Export user×track play matrix from DB
-  2. Train ALS (implicit library) — collaborative filtering
-  3. Train Word2Vec embeddings from listening sessions
-  4. Compute popularity scores
+  2. Train ALS (implicit library) — collaborative filtering. Most nights
+     warm-start from the served factors and run a few iterations; every
+     _ALS_FULL_RETRAIN_EVERY-th version retrains from scratch.
+  3. Compute popularity scores
+  4. Train Word2Vec embeddings from listening sessions
   5. Save all artifacts to disk
 
 Scheduled to run daily at ML_RETRAIN_HOUR (default: 4 AM UTC).
 """
 import asyncio
 import logging
-from collections import Counter
+from contextlib import aclosing
 from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
 
 try:
     import numpy as np
 except ImportError:
     np = None  # type: ignore[assignment]
 
-from recommender.embeddings import build_sessions, train_embeddings
+from recommender.embeddings import build_sessions_from_columns, train_embeddings
 from recommender.model_store import (
     ModelStore,
-    save_als,
+    start_model_reloader,
     save_embeddings,
     save_popularity,
     ensure_model_dir,
@@ -32,125 +35,231 @@ from recommender.model_store import (
 logger = logging.getLogger(__name__)
 
 
+class PlayColumns(NamedTuple):
+    """Exported play events as parallel arrays (newest first)."""
+    user_ids: "np.ndarray"    # int64
+    track_ids: "np.ndarray"   # int64
+    timestamps: "np.ndarray"  # float64 epoch seconds
+
+
+_PLAY_ROW_BYTES = 8 + 8 + 8
+
+_ALS_FACTORS = 64
+_ALS_REGULARIZATION = 0.1
+_ALS_ITERATIONS = 15
+_ALS_WARM_ITERATIONS = 4
+_ALS_FULL_RETRAIN_EVERY = 7        # versions; bounds drift from repeated warm starts
+_ALS_WARM_MIN_ITEM_OVERLAP = 0.5   # share of today's tracks the previous model knows
+
+
 async def run_training() -> None:
     """Full training pipeline: ALS + embeddings + popularity."""
     logger.info("ML training pipeline started")
     ensure_model_dir()
 
-    plays, track_set, user_set = await _export_plays()
-    if not plays:
+    plays = await _export_plays()
+    if not len(plays.user_ids):
         logger.info("No play data, skipping ML training")
         return
 
-    logger.info("Exported %d plays, %d users, %d tracks", len(plays), len(user_set), len(track_set))
+    logger.info(
+        "Exported %d plays, %d users, %d tracks",
+        len(plays.user_ids), len(np.unique(plays.user_ids)), len(np.unique(plays.track_ids)),
+    )
 
     # ── 1. ALS ────────────────────────────────────────────────────────────
-    await _train_als(plays, user_set, track_set)
-
-    # ── 2. Embeddings ─────────────────────────────────────────────────────
-    await _train_embeddings(plays)
+    await _train_als(plays)
 
-    # ── 3. Popularity ─────────────────────────────────────────────────────
+    # ── 2. Popularity (before embeddings: popular tracks get precomputed
+    #       neighbour lists when the new vectors are loaded) ───────────────
     await _compute_popularity(plays)
 
+    # ── 3. Embeddings ─────────────────────────────────────────────────────
+    await _train_embeddings(plays)
+
     logger.info("ML training pipeline finished")
 
 
-async def _export_plays() -> tuple[list, set[int], set[int]]:
-    """Export (user_id, track_id, created_at) from ListeningHistory."""
+async def _export_plays(chunk_rows: int | None = None, max_bytes: int | None = None) -> PlayColumns:
+    """Export (user_id, track_id, created_at) of the last 90 days of plays.
+
+    Rows are streamed newest-first in chunks straight into NumPy columns; if
+    the columns would exceed the memory ceiling, the older remainder is skipped.
+    """
     from sqlalchemy import select
-    from bot.models.base import async_session
     from bot.models.track import ListeningHistory
+    from recommender.config import MLConfig
+    from recommender.data_extractor import int_column, iter_row_chunks
+
+    cfg = MLConfig.get()
+    chunk_rows = chunk_rows or cfg.export_chunk_rows
+    max_bytes = max_bytes or cfg.export_max_bytes
+
+    # Last 90 days of play data
+    cutoff = datetime.now(timezone.utc) - timedelta(days=90)
+    stmt = (
+        select(
+            ListeningHistory.user_id,
+            ListeningHistory.track_id,
+            ListeningHistory.created_at,
+        )
+        .where(
+            ListeningHistory.action == "play",
+            ListeningHistory.track_id.is_not(None),
+            ListeningHistory.created_at >= cutoff,
+        )
+        .order_by(ListeningHistory.created_at.desc())
+    )
 
+    users: list = []
+    tracks: list = []
+    stamps: list = []
+    n_rows = 0
+    async with aclosing(iter_row_chunks(stmt, chunk_rows)) as chunks:
+        async for chunk in chunks:
+            if (n_rows + len(chunk)) * _PLAY_ROW_BYTES > max_bytes:
+                logger.warning(
+                    "Play export reached the %d MB ceiling after %d rows; older plays skipped",
+                    max_bytes >> 20, n_rows,
+                )
+                break
+            user_ids, track_ids, created = zip(*chunk)
+            users.append(int_column(user_ids))
+            tracks.append(int_column(track_ids))
+            stamps.append(np.fromiter((c.timestamp() for c in created), dtype=np.float64, count=len(created)))
+            n_rows += len(chunk)
+
+    if not n_rows:
+        empty = np.empty(0, dtype=np.int64)
+        return PlayColumns(empty, empty, np.empty(0, dtype=np.float64))
+    return PlayColumns(np.concatenate(users), np.concatenate(tracks), np.concatenate(stamps))
+
+
+async def _export_source_map(track_ids: "np.ndarray", chunk: int = 500) -> dict[str, int]:
+    """source_id -> track_id for the trained tracks (client ids resolve to model rows)."""
+    from sqlalchemy import select
+    from bot.models.base import async_session
+    from bot.models.track import Track
+
+    source_map: dict[str, int] = {}
+    ids = track_ids.tolist()
     async with async_session() as session:
-        # Last 90 days of play data
-        cutoff = datetime.now(timezone.utc) - timedelta(days=90)
-        result = await session.execute(
-            select(
-                ListeningHistory.user_id,
-                ListeningHistory.track_id,
-                ListeningHistory.created_at,
-            )
-            .where(
-                ListeningHistory.action == "play",
-                ListeningHistory.track_id.is_not(None),
-                ListeningHistory.created_at >= cutoff,
+        # Bounded IN lists: SQLite caps the number of bound parameters
+        for start in range(0, len(ids), chunk):
+            rows = await session.execute(
+                select(Track.source_id, Track.id).where(
+                    Track.id.in_(ids[start:start + chunk]),
+                    Track.source_id.is_not(None),
+                )
             )
-            .order_by(ListeningHistory.user_id, ListeningHistory.created_at)
-        )
-        rows = result.all()
-
-    plays = [(r[0], r[1], r[2]) for r in rows]
-    user_set = {r[0] for r in rows}
-    track_set = {r[1] for r in rows}
-    return plays, track_set, user_set
+            source_map.update((source_id, track_id) for source_id, track_id in rows.all())
+    return source_map
+
+
+def warm_start_factors(
+    previous,
+    user_ids: "np.ndarray",
+    track_ids: "np.ndarray",
+    factors: int = _ALS_FACTORS,
+    seed: int = 0,
+) -> tuple["np.ndarray", "np.ndarray"] | None:
+    """Initial ALS factors for the new (sorted) id sets from a previous model.
+
+    Known users / tracks keep their previous vectors; new ones get the small
+    random init implicit would use. Returns None when a cold start is better
+    (no previous model, other dimensionality, too little track overlap).
+    """
+    if previous is None or previous.item_factors.shape[1] != factors or not len(track_ids):
+        return None
+    from recommender.model_store import lookup_many
+
+    item_rows = lookup_many(previous.track_ids, track_ids)
+    known_items = item_rows >= 0
+    if known_items.mean() < _ALS_WARM_MIN_ITEM_OVERLAP:
+        return None
+    user_rows = lookup_many(previous.user_ids, user_ids)
+    known_users = user_rows >= 0
+
+    rng = np.random.default_rng(seed)
+    user_factors = rng.random((len(user_ids), factors), dtype=np.float32) * 0.01
+    item_factors = rng.random((len(track_ids), factors), dtype=np.float32) * 0.01
+    user_factors[known_users] = previous.user_factors[user_rows[known_users]]
+    item_factors[known_items] = previous.item_factors[item_rows[known_items]]
+    return user_factors, item_factors
+
+
+def fit_als(
+    matrix,
+    iterations: int = _ALS_ITERATIONS,
+    init: tuple["np.ndarray", "np.ndarray"] | None = None,
+    factors: int = _ALS_FACTORS,
+    regularization: float = _ALS_REGULARIZATION,
+) -> tuple["np.ndarray", "np.ndarray"]:
+    """Fit implicit ALS on a user×track confidence matrix (blocking)."""
+    import implicit
+
+    model = implicit.als.AlternatingLeastSquares(
+        factors=factors,
+        regularization=regularization,
+        iterations=iterations,
+        use_gpu=False,
+    )
+    if init is not None:
+        # implicit only draws random factors when none are set
+        model.user_factors, model.item_factors = init
+    model.fit(matrix, show_progress=False)
+    return (
+        np.asarray(model.user_factors, dtype=np.float32),
+        np.asarray(model.item_factors, dtype=np.float32),
+    )
 
 
-async def _train_als(plays: list, user_set: set[int], track_set: set[int]) -> None:
+async def _train_als(plays: PlayColumns) -> None:
     """Train ALS model in thread pool (CPU-bound)."""
     try:
-        import implicit
-        from scipy.sparse import csr_matrix
+        import implicit  # noqa: F401
     except ImportError:
         logger.warning("implicit/scipy not installed, skipping ALS training")
         return
+    from recommender.data_extractor import interaction_matrix
 
-    # Build ID mappings
-    user_ids = sorted(user_set)
-    track_ids = sorted(track_set)
-    user_map = {uid: i for i, uid in enumerate(user_ids)}
-    track_map = {tid: i for i, tid in enumerate(track_ids)}
-
-    # Build sparse user×track matrix
-    row_indices = []
-    col_indices = []
-    values = []
-    play_counts: Counter = Counter()
-    for user_id, track_id, _ in plays:
-        play_counts[(user_id, track_id)] += 1
-
-    for (uid, tid), count in play_counts.items():
-        if uid in user_map and tid in track_map:
-            row_indices.append(user_map[uid])
-            col_indices.append(track_map[tid])
-            values.append(float(count))
-
-    matrix = csr_matrix(
-        (values, (row_indices, col_indices)),
-        shape=(len(user_ids), len(track_ids)),
+    # Sparse user×track play-count matrix; rows / columns are the sorted ids
+    matrix, user_ids, track_ids = interaction_matrix(
+        plays.user_ids, plays.track_ids, np.ones(len(plays.user_ids), dtype=np.float32)
     )
+    user_map = {uid: i for i, uid in enumerate(user_ids.tolist())}
+    track_map = {tid: i for i, tid in enumerate(track_ids.tolist())}
 
     logger.info("ALS matrix: %d×%d, nnz=%d", matrix.shape[0], matrix.shape[1], matrix.nnz)
 
-    # Train ALS in thread pool
-    def _fit():
-        model = implicit.als.AlternatingLeastSquares(
-            factors=64,
-            regularization=0.1,
-            iterations=15,
-            use_gpu=False,
-        )
-        model.fit(matrix)
-        return model.user_factors, model.item_factors
+    store = ModelStore.get()
+    version = store.get_latest_version() + 1
+    init = None
+    if version % _ALS_FULL_RETRAIN_EVERY:
+        await store.load_latest(force=False)
+        init = warm_start_factors(store.snapshot(), user_ids, track_ids)
+    iterations = _ALS_ITERATIONS if init is None else _ALS_WARM_ITERATIONS
+    logger.info(
+        "ALS v%d: %s, %d iterations", version, "cold start" if init is None else "warm start", iterations
+    )
 
-    loop = asyncio.get_event_loop()
-    user_factors, item_factors = await loop.run_in_executor(None, _fit)
+    # Train ALS in thread pool
+    uf, itf = await asyncio.to_thread(fit_als, matrix, iterations, init)
 
-    # Convert to numpy arrays
-    uf = np.array(user_factors, dtype=np.float32)
-    itf = np.array(item_factors, dtype=np.float32)
+    source_map = await _export_source_map(track_ids)
 
-    # Save with string keys for JSON
-    save_als(
-        uf, itf,
-        {str(uid): i for uid, i in user_map.items()},
-        {str(tid): i for tid, i in track_map.items()},
+    # New version directory of mmap-able arrays; workers pick it up on reload.
+    # trained_at lets serving fold in users who played something since.
+    await store.save_als(
+        uf, itf, user_map, track_map, source_map, version=version,
+        regularization=_ALS_REGULARIZATION, trained_at=float(plays.timestamps.max()),
     )
+    await store.publish_version(version)
 
 
-async def _train_embeddings(plays: list) -> None:
+async def _train_embeddings(plays: PlayColumns) -> None:
     """Train Word2Vec embeddings."""
-    sessions = build_sessions(plays)
+    sessions = build_sessions_from_columns(plays.user_ids, plays.track_ids, plays.timestamps)
     if not sessions:
         logger.info("No sessions for embedding training")
         return
@@ -161,22 +270,24 @@ async def _train_embeddings(plays: list) -> None:
     if result is not None:
         embeddings, track_ids = result
         save_embeddings(embeddings, track_ids)
+        # Served copy keyed by track_id; every process indexes it on reload
+        store = ModelStore.get()
+        version = store.get_latest_w2v_version() + 1
+        await store.save_w2v_vectors(embeddings, [str(tid) for tid in track_ids], version)
+        await store.publish_version(version)
 
 
-async def _compute_popularity(plays: list) -> None:
+async def _compute_popularity(plays: PlayColumns) -> None:
     """Compute normalized popularity scores from play counts."""
-    counter: Counter = Counter()
-    for _, track_id, _ in plays:
-        counter[track_id] += 1
-
-    if not counter:
+    track_ids, counts = np.unique(plays.track_ids, return_counts=True)
+    if not len(counts):
         return
 
-    max_count = max(counter.values())
+    max_count = int(counts.max())
     if max_count == 0:
         return
 
-    scores = {tid: count / max_count for tid, count in counter.items()}
+    scores = dict(zip(track_ids.tolist(), (counts / max_count).tolist()))
     save_popularity(scores)
     logger.info("Popularity scores computed: %d tracks", len(scores))
 
@@ -192,10 +303,10 @@ async def start_ml_training_scheduler() -> None:
     
     retrain_hour = settings.ML_RETRAIN_HOUR
     
-    # Load existing models on startup
+    # Load existing models on startup and follow versions published later
     try:
+        await start_model_reloader()
         store = ModelStore.get()
-        await store.load_latest()
         if store.is_ready:
             logger.info(f"Loaded existing ML models v{store.version}")
     except Exception as e:
@@ -212,10 +323,9 @@ async def start_ml_training_scheduler() -> None:
             logger.info("Next ML training at %s (in %.0f sec)", target, wait)
             await asyncio.sleep(wait)
             try:
+                # Publishes the new version; this and every other process's
+                # reloader swaps it in
                 await run_training()
-                # Reload models after training
-                store = ModelStore.get()
-                await store.load_latest()
             except Exception as e:
                 logger.error("ML training error: %s", e)
 
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""Benchmark: warm-start ALS retraining and online fold-in vs a full retrain.
+
+Generates synthetic implicit feedback with a latent structure, trains a
+"yesterday" model on part of it, then compares on "today's" data:
+
+  - full retrain (train._ALS_ITERATIONS from random init)
+  - warm start from yesterday's factors (train._ALS_WARM_ITERATIONS)
+  - fold-in of users yesterday's model never saw (ModelStore.fold_in_user)
+
+reporting wall time and recall@k on held-out plays. Needs numpy, scipy and
+implicit; no DB.
+
+    python scripts/bench_als_warm_start.py --users 20000 --tracks 8000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+
+import numpy as np  # noqa: E402
+
+from recommender.data_extractor import interaction_matrix  # noqa: E402
+from recommender.model_store import ModelStore  # noqa: E402
+from recommender.train import (  # noqa: E402
+    _ALS_ITERATIONS,
+    _ALS_WARM_ITERATIONS,
+    fit_als,
+    warm_start_factors,
+)
+
+
+def _plays(users: int, tracks: int, per_user: int, seed: int) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    taste = rng.normal(size=(users, 12))
+    style = rng.normal(size=(tracks, 12))
+    popularity = rng.zipf(1.6, size=tracks).clip(max=50).astype(np.float64)
+    u_col, t_col = [], []
+    for u in range(users):
+        logits = style @ taste[u] + np.log(popularity)
+        p = np.exp(logits - logits.max())
+        picks = rng.choice(tracks, size=per_user, p=p / p.sum())
+        u_col.append(np.full(per_user, u))
+        t_col.append(picks)
+    return np.concatenate(u_col) + 10**9, np.concatenate(t_col) + 1
+
+
+def _holdout(users: np.ndarray, tracks: np.ndarray, seed: int):
+    """One held-out (user, track) per user, only when the pair isn't also in train."""
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(users))
+    users, tracks = users[order], tracks[order]
+    _, first = np.unique(users, return_index=True)
+    test = np.zeros(len(users), dtype=bool)
+    test[first] = True
+    train_pairs = set(zip(users[~test].tolist(), tracks[~test].tolist()))
+    test_pairs = [(u, t) for u, t in zip(users[test].tolist(), tracks[test].tolist()) if (u, t) not in train_pairs]
+    return users[~test], tracks[~test], test_pairs
+
+
+def _recall(user_vec_of, item_factors, track_ids, matrix_rows, test_pairs, k: int) -> float:
+    hits = total = 0
+    for user_id, track_id in test_pairs:
+        vec, seen = user_vec_of(user_id), matrix_rows(user_id)
+        if vec is None:
+            continue
+        scores = item_factors @ vec
+        scores[seen] = -np.inf
+        top = np.argpartition(-scores, k)[:k]
+        col = np.searchsorted(track_ids, track_id)
+        hits += int(col < len(track_ids) and track_ids[col] == track_id and col in top)
+        total += 1
+    return hits / max(total, 1)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=8000)
+    ap.add_argument("--tracks", type=int, default=4000)
+    ap.add_argument("--plays", type=int, default=40, help="plays per user")
+    ap.add_argument("--new-users", type=float, default=0.1, help="share of users new today")
+    ap.add_argument("--k", type=int, default=20)
+    ap.add_argument("--seed", type=int, default=34)
+    args = ap.parse_args()
+
+    all_users, all_tracks = _plays(args.users, args.tracks, args.plays, args.seed)
+    train_u, train_t, test_pairs = _holdout(all_users, all_tracks, args.seed)
+
+    # Yesterday: older users, most of their plays
+    cutoff = 10**9 + int(args.users * (1 - args.new_users))
+    rng = np.random.default_rng(args.seed + 1)
+    old = (train_u < cutoff) & (rng.random(len(train_u)) < 0.85)
+    y_matrix, y_users, y_tracks = interaction_matrix(train_u[old], train_t[old], np.ones(old.sum(), np.float32))
+    y_uf, y_itf = fit_als(y_matrix)
+
+    store = ModelStore(Path(tempfile.mkdtemp()))
+    asyncio.run(store.swap(
+        y_uf, y_itf,
+        {uid: i for i, uid in enumerate(y_users.tolist())},
+        {tid: i for i, tid in enumerate(y_tracks.tolist())},
+        {}, version=1,
+    ))
+
+    # Today
+    matrix, user_ids, track_ids = interaction_matrix(train_u, train_t, np.ones(len(train_u), np.float32))
+    seen_cols = lambda uid: matrix[np.searchsorted(user_ids, uid)].indices  # noqa: E731
+
+    t0 = time.perf_counter()
+    full_uf, full_itf = fit_als(matrix, _ALS_ITERATIONS)
+    full_t = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    init = warm_start_factors(store.snapshot(), user_ids, track_ids)
+    warm_uf, warm_itf = fit_als(matrix, _ALS_WARM_ITERATIONS, init)
+    warm_t = time.perf_counter() - t0
+
+    def _trained(uf):
+        return lambda uid: uf[np.searchsorted(user_ids, uid)]
+
+    new_pairs = [(u, t) for u, t in test_pairs if u >= cutoff]
+    fold_times: list[float] = []
+
+    def _folded(uid):
+        plays = track_ids[seen_cols(uid)]
+        t = time.perf_counter()
+        vec = store.fold_in_user(plays.tolist(), matrix[np.searchsorted(user_ids, uid)].data.tolist())
+        fold_times.append(time.perf_counter() - t)
+        return vec
+
+    # Yesterday's item space for fold-in recall
+    y_seen = lambda uid: np.searchsorted(y_tracks, np.intersect1d(track_ids[seen_cols(uid)], y_tracks))  # noqa: E731
+    rows = [
+        ("full retrain", full_t, _recall(_trained(full_uf), full_itf, track_ids, seen_cols, test_pairs, args.k)),
+        ("warm start", warm_t, _recall(_trained(warm_uf), warm_itf, track_ids, seen_cols, test_pairs, args.k)),
+    ]
+    fold_recall = _recall(_folded, np.asarray(y_itf), y_tracks, y_seen, new_pairs, args.k)
+    full_new = _recall(_trained(full_uf), full_itf, track_ids, seen_cols, new_pairs, args.k)
+
+    print(f"users={len(user_ids)} tracks={len(track_ids)} nnz={matrix.nnz} holdout={len(test_pairs)}")
+    print(f"{'model':<14} {'seconds':>8} {f'recall@{args.k}':>10}")
+    for name, seconds, recall in rows:
+        print(f"{name:<14} {seconds:>8.2f} {recall:>10.3f}")
+    print(
+        f"fold-in of {len(new_pairs)} new users: {np.median(fold_times) * 1000:.2f} ms median, "
+        f"recall@{args.k} {fold_recall:.3f} (full retrain on the same users: {full_new:.3f})"
+    )
+
+
+if __name__ == "__main__":
+    main()
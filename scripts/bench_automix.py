@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Benchmark: automix render time and peak memory, streaming ffmpeg vs pydub.
+
+Renders one 6-track mix (synthetic tones by default, or --track files) with
+
+  - stream-cold: ffmpeg filter pipeline, per-track analysis not cached yet
+  - stream-warm: same, analysis served from the sidecar cache
+  - pydub:       the in-memory path (full decode, librosa BPM, append)
+
+Each mode runs in its own process; peak RSS is reported for the Python
+process and for its largest child (ffmpeg). Needs ffmpeg on PATH.
+
+    python scripts/bench_automix.py --seconds 240
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+
+MODES = ("stream-cold", "stream-warm", "pydub")
+
+
+def _make_tracks(out_dir: Path, n: int, seconds: int) -> list[Path]:
+    """Tones with quiet intros/outros so cue detection has work to do."""
+    paths = []
+    for i in range(n):
+        path = out_dir / f"bench{i}.mp3"
+        freq = 220 + 55 * i
+        subprocess.run(
+            [
+                "ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+                "-f", "lavfi", "-i", f"sine=frequency={freq}:duration={seconds}",
+                "-af", f"volume={-3 * i}dB,afade=t=in:d=4,afade=t=out:st={seconds - 5}:d=5",
+                "-ac", "2", "-c:a", "libmp3lame", "-b:a", "192k", str(path),
+            ],
+            check=True,
+        )
+        paths.append(path)
+    return paths
+
+
+def _worker(mode: str, tracks: list[Path], output: Path, crossfade_ms: int) -> dict:
+    from mixer import automix
+
+    t0 = time.perf_counter()
+    if mode == "pydub":
+        automix._create_mix_pydub(tracks, output, crossfade_ms)
+    else:
+        automix._render_streaming(tracks, output, crossfade_ms, None)
+    seconds = time.perf_counter() - t0
+    return {
+        "mode": mode,
+        "seconds": seconds,
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "child_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+        "mix_mb": output.stat().st_size / 2**20,
+    }
+
+
+def _run(mode: str, tracks: list[Path], output: Path, crossfade_ms: int, analysis_dir: Path) -> dict:
+    env = {**os.environ, "AUTOMIX_ANALYSIS_DIR": str(analysis_dir)}
+    proc = subprocess.run(
+        [
+            sys.executable, __file__, "--worker", mode, f"--crossfade-ms={crossfade_ms}",
+            f"--output={output}", *(f"--track={p}" for p in tracks),
+        ],
+        env=env, stdout=subprocess.PIPE, text=True,
+    )
+    if proc.returncode:
+        return {"mode": mode, "error": f"exit {proc.returncode}"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--track", action="append", default=[], help="MP3 input (repeatable); default synthetic")
+    ap.add_argument("--tracks", type=int, default=6, help="synthetic tracks")
+    ap.add_argument("--seconds", type=int, default=210, help="synthetic track length")
+    ap.add_argument("--crossfade-ms", type=int, default=7000)
+    ap.add_argument("--modes", default=",".join(MODES))
+    ap.add_argument("--output", help=argparse.SUPPRESS)
+    ap.add_argument("--worker", choices=MODES, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        result = _worker(args.worker, [Path(p) for p in args.track], Path(args.output), args.crossfade_ms)
+        print(json.dumps(result))
+        return
+
+    if not shutil.which("ffmpeg"):
+        raise SystemExit("ffmpeg not found on PATH")
+
+    with tempfile.TemporaryDirectory(prefix="automix-bench-") as tmp:
+        tmp = Path(tmp)
+        tracks = [Path(p) for p in args.track] or _make_tracks(tmp, args.tracks, args.seconds)
+        analysis_dir = tmp / "analysis"
+        print(f"{len(tracks)} tracks, crossfade {args.crossfade_ms} ms")
+        print(f"{'mode':<12}{'time s':>10}{'rss MB':>10}{'ffmpeg MB':>11}{'mix MB':>9}")
+        for mode in args.modes.split(","):
+            res = _run(mode, tracks, tmp / f"mix-{mode}.mp3", args.crossfade_ms, analysis_dir)
+            if "error" in res:
+                print(f"{mode:<12}{res['error']:>10}")
+                continue
+            print(
+                f"{mode:<12}{res['seconds']:>10.2f}{res['rss_mb']:>10.1f}"
+                f"{res['child_rss_mb']:>11.1f}{res['mix_mb']:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
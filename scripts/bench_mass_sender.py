@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Load test: bot.services.mass_sender against a simulated Telegram Bot API.
+
+The fake bot enforces Telegram-like limits: more than --global-limit
+messages in any 1 s window, or two messages to one chat within 1 s, are
+answered with TelegramRetryAfter. It also adds network latency and blocks a
+share of recipients. The run reports throughput, flood-waits and outcomes.
+There is no network or DB; Redis is fakeredis.
+
+    python scripts/bench_mass_sender.py --users 5000 --rate 25 --workers 32
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import collections
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+
+import fakeredis.aioredis  # noqa: E402
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter  # noqa: E402
+from aiogram.methods import SendMessage  # noqa: E402
+
+from bot.services.mass_sender import MassSender  # noqa: E402
+
+
+class FakeBot:
+    """Bot stand-in with Telegram-like global and per-chat flood limits."""
+
+    def __init__(self, global_limit: int, latency_ms: float, blocked_share: float, seed: int) -> None:
+        self.global_limit = global_limit
+        self.latency = latency_ms / 1000
+        self.rng = random.Random(seed)
+        self.blocked_share = blocked_share
+        self.window: collections.deque[float] = collections.deque()
+        self.last_per_chat: dict[int, float] = {}
+        self.flood_waits = 0
+        self.messages = 0
+
+    async def send_message(self, chat_id: int, text: str, **_kwargs) -> None:
+        now = time.monotonic()
+        await asyncio.sleep(self.latency * self.rng.uniform(0.5, 1.5))
+        while self.window and now - self.window[0] > 1.0:
+            self.window.popleft()
+        method = SendMessage(chat_id=chat_id, text=text)
+        if len(self.window) >= self.global_limit or now - self.last_per_chat.get(chat_id, -9.0) < 1.0:
+            self.flood_waits += 1
+            raise TelegramRetryAfter(method, "Flood control exceeded", retry_after=1)
+        self.window.append(now)
+        self.last_per_chat[chat_id] = now
+        if self.rng.random() < self.blocked_share:
+            raise TelegramForbiddenError(method, "Forbidden: bot was blocked by the user")
+        self.messages += 1
+
+
+async def _run(args) -> None:
+    bot = FakeBot(args.global_limit, args.latency_ms, args.blocked_share, args.seed)
+    redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    blocked: list[int] = []
+
+    async def mark_blocked(user_ids: list[int]) -> None:
+        blocked.extend(user_ids)
+
+    sender = MassSender(
+        bot,
+        rate=args.rate,
+        workers=args.workers,
+        batch_size=args.batch,
+        redis_factory=lambda: redis,
+        blocked_handler=mark_blocked,
+    )
+
+    async def send(b, uid: int) -> None:
+        await b.send_message(uid, "hello")
+        for _ in range(args.extra_messages):
+            await b.send_message(uid, "more")
+
+    report = await sender.run("bench", range(1, args.users + 1), send)
+    state = await redis.hgetall("mass:bench")
+    print(f"recipients   {report.total}")
+    print(f"delivered    {report.delivered}   blocked {report.blocked}   failed {report.failed}")
+    print(f"messages     {bot.messages}   flood-waits {bot.flood_waits}")
+    print(f"elapsed      {report.elapsed:.1f}s")
+    print(f"throughput   {report.rate:.1f} recipients/s, {bot.messages / max(report.elapsed, 1e-9):.1f} msg/s")
+    print(f"checkpoint   {state}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", type=int, default=2000)
+    ap.add_argument("--rate", type=float, default=25.0, help="engine token rate, msg/s")
+    ap.add_argument("--workers", type=int, default=32)
+    ap.add_argument("--batch", type=int, default=500)
+    ap.add_argument("--extra-messages", type=int, default=0, help="extra messages per recipient (e.g. recap card)")
+    ap.add_argument("--global-limit", type=int, default=30, help="simulated Telegram msg/s limit")
+    ap.add_argument("--latency-ms", type=float, default=60.0)
+    ap.add_argument("--blocked-share", type=float, default=0.05)
+    ap.add_argument("--seed", type=int, default=40)
+    asyncio.run(_run(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
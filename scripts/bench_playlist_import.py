@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""Benchmark: playlist import resolution, legacy batches vs the cache-first pipeline.
+
+Builds a synthetic playlist (default 500 tracks) of which --local are already
+in the ``tracks`` table (a throwaway SQLite DB) and --cached are in the
+provider query cache (fake Redis). The rest go to a simulated provider:
+hash-seeded log-normal latency, a share of timeouts, and a soft capacity
+above which every call slows down, as a rate-limited API does. Then it times:
+
+  legacy    the old loop: batches of 5, Yandex → YouTube per row, 0.2 s sleep
+  pipeline  iter_resolved_tracks: catalog match, query-cache MGET, provider
+            fan-out under the AIMD limit
+
+    python scripts/bench_playlist_import.py --tracks 500 --time-scale 0.1
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+_DB_PATH = Path(tempfile.gettempdir()) / f"bench_playlist_import_{os.getpid()}.db"
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_DB_PATH}"
+
+
+class _Provider:
+    """Simulated search API: deterministic per-query latency, soft capacity."""
+
+    def __init__(self, median_ms: float, timeout_share: float, capacity: int, scale: float) -> None:
+        self.median = median_ms / 1000 * scale
+        self.timeout_share = timeout_share
+        self.capacity = capacity
+        self.scale = scale
+        self.active = 0
+        self.calls = 0
+        self._dist = statistics.NormalDist(0.0, 0.5)
+
+    def _u(self, query: str) -> float:
+        h = int.from_bytes(hashlib.blake2b(query.encode(), digest_size=8).digest(), "big")
+        return (h % 1_000_000 + 0.5) / 1_000_000
+
+    async def search(self, query: str, source: str) -> list[dict]:
+        self.calls += 1
+        self.active += 1
+        try:
+            u = self._u(f"{source}:{query}")
+            if u < self.timeout_share:
+                await asyncio.sleep(30 * self.scale)       # hangs until the caller's timeout
+                return []
+            overload = max(0, self.active - self.capacity) / self.capacity
+            await asyncio.sleep(self.median * math.exp(self._dist.inv_cdf(u)) * (1 + overload))
+            return [{"video_id": f"{source}_{abs(hash(query)) % 10**9}", "title": query,
+                     "uploader": "", "source": source}]
+        finally:
+            self.active -= 1
+
+
+async def _seed(rows: list[dict], n_local: int, n_cached: int) -> None:
+    import json
+
+    import fakeredis.aioredis
+
+    from bot.models.base import Base, async_session, engine
+    from bot.models.track import Track
+    from bot.models.user import User  # noqa: F401  (listening_history FK target)
+    from bot.services.cache import cache
+
+    cache._redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_session() as session:
+        session.add_all(
+            Track(source_id=f"local_{i}", source="yandex", artist=r["uploader"], title=r["title"])
+            for i, r in enumerate(rows[:n_local])
+        )
+        await session.commit()
+    for r in rows[n_local:n_local + n_cached]:
+        q = r["yt_query"].lower().strip()
+        await cache._redis.set(f"qcache:yandex:{q}", json.dumps([{"video_id": f"c_{q}", "source": "yandex"}]))
+
+
+async def _legacy(rows: list[dict], provider: _Provider, scale: float) -> int:
+    """The pre-pipeline loop, verbatim apart from the provider calls."""
+    async def _resolve_one(query: str) -> list[dict]:
+        try:
+            ya = await asyncio.wait_for(provider.search(query, "yandex"), timeout=8 * scale)
+            if ya:
+                return ya
+        except Exception:
+            pass
+        try:
+            return await provider.search(query, "youtube")
+        except Exception:
+            return []
+
+    found = 0
+    for i in range(0, len(rows), 5):
+        results = await asyncio.gather(*(_resolve_one(r["yt_query"]) for r in rows[i:i + 5]))
+        found += sum(1 for res in results if res)
+        await asyncio.sleep(0.2 * scale)
+    return found
+
+
+async def _pipeline(rows: list[dict], provider: _Provider, scale: float) -> tuple[int, int]:
+    from bot.services import playlist_import
+
+    async def search_yandex(query, limit=1):
+        return await provider.search(query, "yandex")
+
+    async def search_tracks(query, max_results=1, source="youtube"):
+        return await provider.search(query, source)
+
+    import bot.services.yandex_provider as yandex_provider
+    yandex_provider.search_yandex = search_yandex
+    playlist_import.search_tracks = search_tracks
+    playlist_import._PROVIDER_TIMEOUT = 8 * scale
+    limiter = playlist_import._AdaptiveLimit(slow_after=4.0 * scale)
+    found = 0
+    async for _pos, track, _stage in playlist_import.iter_resolved_tracks(rows, limiter=limiter):
+        found += track is not None
+    return found, limiter.peak
+
+
+async def _main(args) -> None:
+    rows = [
+        {"title": f"song {i}", "uploader": f"artist {i % 97}", "duration": 200,
+         "yt_query": f"artist {i % 97} - song {i}"}
+        for i in range(args.tracks)
+    ]
+    n_local = int(args.tracks * args.local)
+    n_cached = int(args.tracks * args.cached)
+    print(f"{args.tracks} tracks: {n_local} in catalog, {n_cached} in query cache, "
+          f"{args.tracks - n_local - n_cached} to providers (time scale {args.time_scale})")
+
+    provider = _Provider(args.median_ms, args.timeouts, args.capacity, args.time_scale)
+    t0 = time.perf_counter()
+    found = await _legacy(rows, provider, args.time_scale)
+    wall = (time.perf_counter() - t0) / args.time_scale
+    print(f"  legacy    {wall:7.1f} s   found {found}/{args.tracks}   provider calls {provider.calls}")
+
+    await _seed(rows, n_local, n_cached)
+    provider = _Provider(args.median_ms, args.timeouts, args.capacity, args.time_scale)
+    t0 = time.perf_counter()
+    found, peak = await _pipeline(rows, provider, args.time_scale)
+    wall = (time.perf_counter() - t0) / args.time_scale
+    print(f"  pipeline  {wall:7.1f} s   found {found}/{args.tracks}   provider calls {provider.calls}"
+          f"   peak concurrency {peak}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--tracks", type=int, default=500)
+    ap.add_argument("--local", type=float, default=0.3, help="share already in the tracks table")
+    ap.add_argument("--cached", type=float, default=0.2, help="share already in the query cache")
+    ap.add_argument("--median-ms", type=float, default=600)
+    ap.add_argument("--timeouts", type=float, default=0.03, help="share of provider calls that hang")
+    ap.add_argument("--capacity", type=int, default=16, help="concurrent calls before the provider slows")
+    ap.add_argument("--time-scale", type=float, default=0.1, help="run simulated time this much faster")
+    args = ap.parse_args()
+    try:
+        asyncio.run(_main(args))
+    finally:
+        _DB_PATH.unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""Benchmark: proxy selection under one degraded proxy, round-robin vs health-weighted.
+
+Simulates a PROXY_POOL of --proxies proxies. One of them is degraded: its
+latency is --slow-factor times higher and --timeout-share of its requests
+hang until the client timeout. Latency is log-normal around --median-ms, and
+each proxy slows down once more than --capacity requests are in flight on it.
+Requests arrive open-loop (Poisson, --rps) for --duration simulated seconds
+and are sent through:
+
+  legacy    the old ProxyPool.get_next: round-robin over non-benched proxies
+  weighted  ProxyPool.acquire/release: EWMA scoring, P2C, in-flight caps
+
+    python scripts/bench_proxy_pool.py --rps 40 --duration 120 --time-scale 0.05
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+
+
+class _Legacy:
+    """The pre-scoring selection: round-robin, bench after 3 consecutive failures."""
+
+    def __init__(self, urls: list[str], scale: float) -> None:
+        self.urls = urls
+        self.index = 0
+        self.fails = dict.fromkeys(urls, 0)
+        self.banned_until = dict.fromkeys(urls, 0.0)
+        self.scale = scale
+
+    def acquire(self) -> str | None:
+        now = time.monotonic()
+        for _ in range(len(self.urls)):
+            url = self.urls[self.index % len(self.urls)]
+            self.index += 1
+            if now >= self.banned_until[url]:
+                return url
+        return None
+
+    def release(self, url: str, ok: bool, latency: float) -> None:
+        if ok:
+            self.fails[url] = 0
+            return
+        self.fails[url] += 1
+        if self.fails[url] >= 3:
+            self.banned_until[url] = time.monotonic() + 60 * self.scale
+
+
+class _Upstream:
+    def __init__(self, args, urls: list[str]) -> None:
+        self.args = args
+        self.slow = urls[0]
+        self.active = dict.fromkeys(urls, 0)
+        self.rng = random.Random(args.seed)
+
+    async def request(self, url: str) -> tuple[bool, float]:
+        a = self.args
+        self.active[url] += 1
+        try:
+            factor = a.slow_factor if url == self.slow else 1.0
+            if url == self.slow and self.rng.random() < a.timeout_share:
+                await asyncio.sleep(a.timeout_s * a.time_scale)
+                return False, a.timeout_s
+            overload = max(0, self.active[url] - a.capacity) / a.capacity
+            latency = a.median_ms / 1000 * factor * math.exp(self.rng.gauss(0, 0.4)) * (1 + overload)
+            latency = min(latency, a.timeout_s)
+            await asyncio.sleep(latency * a.time_scale)
+            return latency < a.timeout_s, latency
+        finally:
+            self.active[url] -= 1
+
+
+async def _run(name: str, pool, args, urls: list[str]) -> None:
+    upstream = _Upstream(args, urls)
+    arrivals = random.Random(args.seed + 1)
+    latencies: list[float] = []
+    served = dict.fromkeys(urls, 0)
+    failures = 0
+
+    async def one() -> None:
+        nonlocal failures
+        url = pool.acquire()
+        if url is None:
+            failures += 1
+            return
+        served[url] += 1
+        ok, latency = await upstream.request(url)
+        pool.release(url, ok, latency)
+        latencies.append(latency)
+        failures += not ok
+
+    tasks = []
+    t_end = time.monotonic() + args.duration * args.time_scale
+    while time.monotonic() < t_end:
+        tasks.append(asyncio.create_task(one()))
+        await asyncio.sleep(arrivals.expovariate(args.rps) * args.time_scale)
+    await asyncio.gather(*tasks)
+
+    q = statistics.quantiles(latencies, n=100)
+    total = sum(served.values())
+    print(f"  {name:9s} p50 {q[49]:6.2f} s  p95 {q[94]:6.2f} s  p99 {q[98]:6.2f} s   "
+          f"failed {failures / max(total, 1):5.1%}   degraded proxy share {served[urls[0]] / max(total, 1):5.1%}")
+
+
+async def _main(args) -> None:
+    from bot.config import settings
+    from bot.services.proxy_pool import ProxyPool
+
+    urls = [f"socks5://10.0.0.{i + 1}:1080" for i in range(args.proxies)]
+    print(f"{args.proxies} proxies, {urls[0]} degraded ({args.slow_factor:g}x latency, "
+          f"{args.timeout_share:.0%} timeouts), {args.rps:g} req/s for {args.duration:g} s")
+
+    await _run("legacy", _Legacy(urls, args.time_scale), args, urls)
+
+    # Pool time constants are wall-clock; scale them with the simulation.
+    settings.PROXY_EWMA_TAU *= args.time_scale
+    settings.PROXY_RECOVERY_SEC *= args.time_scale
+    weighted = ProxyPool()
+    weighted.set_proxies(urls)
+    await _run("weighted", weighted, args, urls)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--proxies", type=int, default=4)
+    ap.add_argument("--rps", type=float, default=40)
+    ap.add_argument("--duration", type=float, default=120, help="simulated seconds")
+    ap.add_argument("--median-ms", type=float, default=400)
+    ap.add_argument("--slow-factor", type=float, default=8)
+    ap.add_argument("--timeout-share", type=float, default=0.1, help="share of degraded-proxy requests that hang")
+    ap.add_argument("--timeout-s", type=float, default=15)
+    ap.add_argument("--capacity", type=int, default=12, help="in-flight requests before a proxy slows down")
+    ap.add_argument("--time-scale", type=float, default=0.05, help="run simulated time this much faster")
+    ap.add_argument("--seed", type=int, default=7)
+    asyncio.run(_main(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: normalize_query / transliteration kernels (cold vs memoized).
+
+Compares the legacy per-char / sequential-replace implementations against the
+translate()-table kernels in bot.services.search_engine, with the LRU memo
+cleared (cold) and warm. No network or DB needed.
+
+    python scripts/bench_search_normalize.py --n 20000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from bot.services.search_engine import (  # noqa: E402
+    _CYR_TO_LAT,
+    _LAT_DIGRAPHS_TO_CYR,
+    _LAT_TO_CYR,
+    normalize_query,
+    transliterate_cyr_to_lat,
+    transliterate_lat_to_cyr,
+)
+
+
+def _legacy_cyr_to_lat(text: str) -> str:
+    result = []
+    for ch in text.lower():
+        result.append(_CYR_TO_LAT.get(ch, ch))
+    return "".join(result)
+
+
+def _legacy_lat_to_cyr(text: str) -> str:
+    text = text.lower()
+    for lat, cyr in _LAT_DIGRAPHS_TO_CYR:
+        text = text.replace(lat, cyr)
+    result = []
+    for ch in text:
+        result.append(_LAT_TO_CYR.get(ch, ch))
+    return "".join(result)
+
+
+def _legacy_normalize(query: str) -> str:
+    q = query.strip().lower()
+    q = q.replace("‘", "").replace("’", "").replace("`", "")
+    q = re.sub(r'\s*[\(\[][^\)\]]{0,50}[\)\]]\s*', ' ', q)
+    q = re.sub(r"[?!.,;:'\"\(\)\[\]{}]", " ", q)
+    q = re.sub(r"\s{2,}", " ", q)
+    return q.strip()
+
+
+def _corpus(n: int, unique: int, seed: int) -> tuple[list[str], list[str]]:
+    rng = random.Random(seed)
+    lat_words = ["shadow", "tsar", "yours", "chillout", "kharkiv", "zhenya", "phantom", "the", "night", "love"]
+    cyr_words = ["макс", "корж", "мотылёк", "щука", "жизнь", "юность", "ёлка", "ночь", "любовь", "кино"]
+
+    def _line(words: list[str]) -> str:
+        s = " ".join(rng.choice(words) for _ in range(rng.randint(2, 6)))
+        if rng.random() < 0.3:
+            s += " (Official Video)"
+        return s.title()
+
+    lat_pool = [_line(lat_words) for _ in range(unique)]
+    cyr_pool = [_line(cyr_words) for _ in range(unique)]
+    return [rng.choice(lat_pool) for _ in range(n)], [rng.choice(cyr_pool) for _ in range(n)]
+
+
+def _time(fn, items: list[str]) -> float:
+    t0 = time.perf_counter()
+    for s in items:
+        fn(s)
+    return time.perf_counter() - t0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=20000, help="calls per kernel")
+    ap.add_argument("--unique", type=int, default=2000, help="distinct strings in the workload")
+    ap.add_argument("--seed", type=int, default=26)
+    args = ap.parse_args()
+
+    lat, cyr = _corpus(args.n, args.unique, args.seed)
+    rows = []
+    for name, legacy, new, items in (
+        ("normalize_query", _legacy_normalize, normalize_query, lat + cyr),
+        ("lat_to_cyr", _legacy_lat_to_cyr, transliterate_lat_to_cyr, lat),
+        ("cyr_to_lat", _legacy_cyr_to_lat, transliterate_cyr_to_lat, cyr),
+    ):
+        base = _time(legacy, items)
+        new.cache_clear()
+        # Cold kernel: every call misses the memo
+        cold = _time(new.__wrapped__, items)
+        new.cache_clear()
+        warm = _time(new, items)
+        rows.append((name, len(items), base, cold, warm))
+
+    print(f"{'kernel':<16} {'calls':>7} {'legacy µs':>10} {'kernel µs':>10} {'memo µs':>9} {'speedup':>8}")
+    for name, calls, base, cold, warm in rows:
+        per = 1e6 / calls
+        print(
+            f"{name:<16} {calls:>7} {base * per:>10.2f} {cold * per:>10.2f} "
+            f"{warm * per:>9.2f} {base / max(warm, 1e-9):>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""Benchmark: offline search replay against recorded provider fixtures.
+
+run_search_benchmark.py and _stress_search_queries.py hit live providers, so
+their timings follow the network, not our code. This harness splits that in
+two steps:
+
+  record   run the _stress_search_queries corpus once against the live
+           providers and save every provider answer (and its latency) to a
+           fixture file
+  replay   run the same corpus through the real pipeline (``_do_search`` or
+           ``perform_search``) with the providers stubbed from the fixtures,
+           fake Redis and a throwaway SQLite DB. Each stubbed call sleeps a
+           deterministic latency: the recorded one, a synthetic one drawn
+           from a hash of the call, or none. Writes throughput, p50/p99 and
+           the ranking of every query.
+  diff     compare two replay runs: latency deltas and ranking stability
+           (top-1 changes, top-k overlap)
+
+Only the provider calls are stubbed; normalization, dedup, ranking, tier-0
+lookups, the enrichment waves and the caches all run for real. The enrichment
+waves are gated by _do_search's wall-clock budget, so replay with recorded
+latencies to get the same waves as the recording; with ``--latency none``
+extra waves run and their (unrecorded) calls are served empty.
+
+    python scripts/bench_search_replay.py record --limit 300
+    python scripts/bench_search_replay.py replay --label before
+    # ... change ranking / dedup ...
+    python scripts/bench_search_replay.py replay --label after
+    python scripts/bench_search_replay.py diff before after
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextvars
+import copy
+import functools
+import hashlib
+import importlib
+import json
+import logging
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scripts"))
+OUT_DIR = ROOT / "logs" / "search_replay"
+
+_DB_PATH = Path(tempfile.gettempdir()) / f"search_replay_{os.getpid()}.db"
+os.environ.setdefault("BOT_TOKEN", "0:replay")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_DB_PATH}"
+
+# Stubbed provider entry points: name -> every "module:attr" that binds it.
+# Handler modules import providers by name, so both bindings are patched.
+_TARGETS = {
+    "yandex": ["bot.services.yandex_provider:search_yandex", "bot.handlers.search:search_yandex"],
+    "deezer": ["bot.services.deezer_provider:search_deezer", "bot.handlers.search:search_deezer"],
+    "spotify": ["bot.services.spotify_provider:search_spotify", "bot.handlers.search:search_spotify"],
+    "vk": ["bot.services.vk_provider:search_vk", "bot.handlers.search:search_vk"],
+    "tracks": ["bot.services.downloader:search_tracks", "bot.handlers.search:search_tracks"],
+    "apple": ["bot.services.apple_provider:search_apple"],
+    "lyrics": ["bot.services.lyrics_provider:search_by_lyrics"],
+    "lrclib": ["bot.services.lyrics_provider:search_lrclib_catalog"],
+    "lyric_verify": ["bot.services.lyrics_provider:resolve_lyrics_from_candidates"],
+    "canonical": ["bot.services.canonical_resolver:resolve_canonical"],
+    "lyric_song": ["bot.services.canonical_resolver:resolve_lyric_song"],
+}
+_SCALAR_DEFAULT = {"canonical", "lyric_song"}   # return None, not [], when unrecorded
+_PRIMITIVES = (str, int, float, bool, type(None))
+
+_USER_ID = 990_000_001
+_ranked: contextvars.ContextVar[list | None] = contextvars.ContextVar("replay_ranked", default=None)
+
+
+# ── Provider fixtures ────────────────────────────────────────────────────────
+
+def _call_key(name: str, args: tuple, kwargs: dict) -> str:
+    # Only scalar arguments identify a call: candidate pools and callbacks
+    # differ between runs by object identity, not by content.
+    parts = [name] + [a for a in args if isinstance(a, _PRIMITIVES)]
+    parts += [f"{k}={v}" for k, v in sorted(kwargs.items()) if isinstance(v, _PRIMITIVES)]
+    return json.dumps(parts, ensure_ascii=False)
+
+
+class Fixtures:
+    """Recorded provider answers keyed by call, plus the latency each took."""
+
+    def __init__(self, entries: dict | None = None) -> None:
+        self.entries: dict[str, dict] = entries or {}
+        self.misses: dict[str, int] = {}
+
+    @classmethod
+    def load(cls, path: Path) -> "Fixtures":
+        return cls(json.loads(path.read_text(encoding="utf-8"))["calls"])
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"recorded_at": int(time.time()), "calls": self.entries}
+        path.write_text(json.dumps(payload, ensure_ascii=False, default=str), encoding="utf-8")
+
+    def recorder(self, name: str, fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            key = _call_key(name, args, kwargs)
+            t0 = time.perf_counter()
+            try:
+                result = await fn(*args, **kwargs)
+            except asyncio.CancelledError:
+                # The caller's wait_for gave up: replay sleeps as long and times out too
+                self.entries[key] = {"timeout": True, "ms": (time.perf_counter() - t0) * 1000}
+                raise
+            except Exception as exc:
+                self.entries[key] = {"error": repr(exc)[:300], "ms": (time.perf_counter() - t0) * 1000}
+                raise
+            self.entries[key] = {"result": copy.deepcopy(result), "ms": (time.perf_counter() - t0) * 1000}
+            return result
+        return wrapper
+
+    def replayer(self, name: str, latency):
+        async def wrapper(*args, **kwargs):
+            key = _call_key(name, args, kwargs)
+            entry = self.entries.get(key)
+            delay = latency(name, key, entry)
+            if delay:
+                await asyncio.sleep(delay)
+            if entry is None:
+                self.misses[name] = self.misses.get(name, 0) + 1
+                return None if name in _SCALAR_DEFAULT else []
+            if entry.get("timeout"):
+                raise asyncio.TimeoutError()
+            if "error" in entry:
+                raise RuntimeError(entry["error"])
+            return copy.deepcopy(entry["result"])
+        return wrapper
+
+
+def _latency_model(mode: str, scale: float, synthetic_ms: float):
+    """Deterministic per-call delay in seconds: same call -> same delay."""
+    dist = statistics.NormalDist(0.0, 0.6)
+
+    def latency(name: str, key: str, entry: dict | None) -> float:
+        if mode == "none":
+            return 0.0
+        if mode == "recorded" and entry is not None:
+            return entry.get("ms", 0.0) * scale / 1000
+        # synthetic (or an unrecorded call): log-normal around synthetic_ms
+        h = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+        u = (h % 1_000_000 + 0.5) / 1_000_000
+        return synthetic_ms * scale / 1000 * math.exp(dist.inv_cdf(u))
+    return latency
+
+
+def _patch_targets(make_wrapper) -> None:
+    for name, targets in _TARGETS.items():
+        original = None
+        for target in targets:
+            module_name, attr = target.split(":")
+            module = importlib.import_module(module_name)
+            if original is None:
+                original = getattr(module, attr)
+                wrapped = make_wrapper(name, original)
+            setattr(module, attr, wrapped)
+
+
+# ── Pipeline under test ──────────────────────────────────────────────────────
+
+class _FakeStatus:
+    async def edit_text(self, *_, **__):
+        return self
+
+    async def delete(self, *_, **__):
+        return True
+
+
+class _FakeBot:
+    async def me(self):
+        return SimpleNamespace(username="replay_bot")
+
+    async def send_chat_action(self, *_, **__):
+        return True
+
+
+class _FakeMessage:
+    def __init__(self) -> None:
+        self.from_user = SimpleNamespace(id=_USER_ID, username="replay", first_name="Replay", is_bot=False)
+        self.chat = SimpleNamespace(id=_USER_ID, type="private")
+        self.bot = _FakeBot()
+
+    async def answer(self, *_, **__):
+        return _FakeStatus()
+
+
+async def _setup_env() -> None:
+    """Fake Redis for every cache user, fresh SQLite tables."""
+    import fakeredis.aioredis
+
+    from bot.config import settings
+    from bot.models.base import Base, engine
+    from bot.models.track import ListeningHistory, Track  # noqa: F401
+    from bot.models.user import User  # noqa: F401
+    from bot.services.cache import cache
+
+    cache._redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    if _USER_ID not in settings.ADMIN_IDS:
+        settings.ADMIN_IDS.append(_USER_ID)   # admins skip the rate limiter
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    original_store = cache.store_search
+
+    async def store_search(session_id: str, results: list[dict]) -> None:
+        ranked = _ranked.get()
+        if ranked is not None and not ranked:
+            ranked.extend(results)
+        await original_store(session_id, results)
+
+    cache.store_search = store_search
+
+
+async def _run_do_search(query: str) -> list[dict]:
+    from bot.handlers.search import _do_search
+
+    ranked: list[dict] = []
+    _ranked.set(ranked)
+    user = SimpleNamespace(id=_USER_ID, language="ru", is_banned=False, is_premium=True)
+    await _do_search(_FakeMessage(), query, acting_user=user)
+    return ranked
+
+
+async def _run_perform_search(query: str) -> list[dict]:
+    from bot.services.search_engine import perform_search
+
+    return await perform_search(query, limit=10)
+
+
+_PIPELINES = {"do_search": _run_do_search, "perform_search": _run_perform_search}
+
+
+def _track_id(track: dict) -> str:
+    return f"{track.get('source', '?')}:{track.get('video_id', '')}"
+
+
+async def _run_corpus(cases: list[dict], pipeline: str, concurrency: int) -> dict:
+    run = _PIPELINES[pipeline]
+    sem = asyncio.Semaphore(concurrency)
+    rows: list[dict | None] = [None] * len(cases)
+
+    async def one(i: int, case: dict) -> None:
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                ranked, err = await run(case["query"]), ""
+            except Exception as exc:
+                ranked, err = [], repr(exc)[:200]
+            rows[i] = {
+                "query": case["query"],
+                "ms": round((time.perf_counter() - t0) * 1000, 2),
+                "top": [_track_id(t) for t in ranked[:10]],
+                "top1": f"{ranked[0].get('uploader', '')} - {ranked[0].get('title', '')}" if ranked else "",
+                "err": err,
+            }
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i, c) for i, c in enumerate(cases)))
+    wall = time.perf_counter() - t0
+    times = sorted(r["ms"] for r in rows)
+    return {
+        "summary": {
+            "queries": len(rows),
+            "wall_s": round(wall, 3),
+            "qps": round(len(rows) / wall, 2) if wall else 0.0,
+            "p50_ms": round(statistics.median(times), 2) if times else 0.0,
+            "p99_ms": _pct(times, 0.99),
+            "empty": sum(1 for r in rows if not r["top"]),
+            "errors": sum(1 for r in rows if r["err"]),
+        },
+        "rows": rows,
+    }
+
+
+def _pct(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return round(sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))], 2)
+
+
+def _load_cases(limit: int) -> list[dict]:
+    import _stress_search_queries as stress
+
+    stress.QUERY_LIMIT = limit
+    return stress.build_queries()
+
+
+# ── Commands ─────────────────────────────────────────────────────────────────
+
+async def _record(args) -> None:
+    fixtures = Fixtures()
+    _patch_targets(fixtures.recorder)
+    await _setup_env()
+    cases = _load_cases(args.limit)
+    print(f"recording {len(cases)} queries against live providers (concurrency={args.concurrency})...")
+    try:
+        report = await _run_corpus(cases, args.pipeline, args.concurrency)
+    finally:
+        from bot.services.http_session import close_session
+        await close_session()
+    fixtures.save(args.fixtures)
+    print(f"{len(fixtures.entries)} provider calls -> {args.fixtures}")
+    print(f"live run: {json.dumps(report['summary'])}")
+
+
+async def _replay(args) -> None:
+    fixtures = Fixtures.load(args.fixtures)
+    latency = _latency_model(args.latency, args.latency_scale, args.synthetic_ms)
+    _patch_targets(lambda name, _fn: fixtures.replayer(name, latency))
+    await _setup_env()
+    cases = _load_cases(args.limit)
+    report = await _run_corpus(cases, args.pipeline, args.concurrency)
+    report["meta"] = {
+        "label": args.label, "pipeline": args.pipeline, "latency": args.latency,
+        "latency_scale": args.latency_scale, "concurrency": args.concurrency,
+        "fixture_misses": fixtures.misses,
+    }
+    out = OUT_DIR / f"run-{args.label}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, ensure_ascii=False, indent=1), encoding="utf-8")
+    s = report["summary"]
+    print(f"{s['queries']} queries  {s['qps']:.1f} q/s  p50 {s['p50_ms']:.1f} ms  p99 {s['p99_ms']:.1f} ms  "
+          f"empty {s['empty']}  errors {s['errors']}")
+    if fixtures.misses:
+        print(f"unrecorded calls (served empty): {fixtures.misses}")
+    print(f"run -> {out}")
+
+
+def _run_path(label: str) -> Path:
+    path = Path(label)
+    return path if path.suffix == ".json" else OUT_DIR / f"run-{label}.json"
+
+
+def diff_runs(a: dict, b: dict, k: int = 5) -> dict:
+    """Latency deltas and ranking stability between two replay runs."""
+    rows_b = {r["query"]: r for r in b["rows"]}
+    changed, overlaps = [], []
+    for ra in a["rows"]:
+        rb = rows_b.get(ra["query"])
+        if rb is None:
+            continue
+        top_a, top_b = ra["top"][:k], rb["top"][:k]
+        if top_a or top_b:
+            overlaps.append(len(set(top_a) & set(top_b)) / max(len(top_a), len(top_b)))
+        if ra["top"][:1] != rb["top"][:1]:
+            changed.append({"query": ra["query"], "a": ra["top1"], "b": rb["top1"]})
+    sa, sb = a["summary"], b["summary"]
+    return {
+        "compared": sum(1 for r in a["rows"] if r["query"] in rows_b),
+        "top1_changed": len(changed),
+        f"mean_overlap@{k}": round(statistics.fmean(overlaps), 4) if overlaps else 1.0,
+        "p50_ms": (sa["p50_ms"], sb["p50_ms"]),
+        "p99_ms": (sa["p99_ms"], sb["p99_ms"]),
+        "qps": (sa["qps"], sb["qps"]),
+        "changes": changed,
+    }
+
+
+def _diff(args) -> None:
+    a = json.loads(_run_path(args.a).read_text(encoding="utf-8"))
+    b = json.loads(_run_path(args.b).read_text(encoding="utf-8"))
+    d = diff_runs(a, b, k=args.k)
+    print(f"compared {d['compared']} queries")
+    for metric in ("qps", "p50_ms", "p99_ms"):
+        va, vb = d[metric]
+        delta = (vb - va) / va * 100 if va else 0.0
+        print(f"  {metric:7s} {va:10.2f} -> {vb:10.2f}  ({delta:+.1f}%)")
+    print(f"  top-1 changed: {d['top1_changed']}   mean overlap@{args.k}: {d[f'mean_overlap@{args.k}']:.3f}")
+    for ch in d["changes"][: args.show]:
+        print(f"    {ch['query'][:60]!r}\n      a: {ch['a'][:70]}\n      b: {ch['b'][:70]}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name in ("record", "replay"):
+        p = sub.add_parser(name)
+        p.add_argument("--limit", type=int, default=300, help="queries taken from the stress corpus")
+        p.add_argument("--pipeline", choices=sorted(_PIPELINES), default="do_search")
+        p.add_argument("--concurrency", type=int, default=4 if name == "record" else 16)
+        p.add_argument("--fixtures", type=Path, default=OUT_DIR / "fixtures.json")
+    rp = sub.choices["replay"]
+    rp.add_argument("--label", default="latest")
+    rp.add_argument("--latency", choices=("recorded", "synthetic", "none"), default="recorded")
+    rp.add_argument("--latency-scale", type=float, default=1.0)
+    rp.add_argument("--synthetic-ms", type=float, default=250.0, help="median delay for synthetic latency")
+    dp = sub.add_parser("diff")
+    dp.add_argument("a", help="run label or path")
+    dp.add_argument("b", help="run label or path")
+    dp.add_argument("-k", type=int, default=5)
+    dp.add_argument("--show", type=int, default=20)
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    try:
+        if args.cmd == "record":
+            asyncio.run(_record(args))
+        elif args.cmd == "replay":
+            asyncio.run(_replay(args))
+        else:
+            _diff(args)
+    finally:
+        _DB_PATH.unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
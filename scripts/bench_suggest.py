@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Benchmark: "did you mean" lookup latency vs corpus size.
+
+Builds synthetic "artist - title" corpora of growing size. Words are Cyrillic
+or Latin syllable strings, drawn with a Zipf distribution. It then times
+SuggestIndex.suggest against the linear suggest_query scan for typo'd
+queries. No DB or Redis is needed.
+
+    python scripts/bench_suggest.py --sizes 10000 100000 1000000 --linear-max 100000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+
+from bot.services.search_engine import SuggestIndex, suggest_query  # noqa: E402
+
+_CONS_CYR, _VOW_CYR = "бвгджзклмнпрстфхцчшщ", "аеиоуыяю"
+_CONS_LAT, _VOW_LAT = "bcdfghjklmnprstvwz", "aeiouy"
+
+
+def _vocab(rng: random.Random, size: int) -> list[str]:
+    """Random words; the list order is their popularity rank."""
+    words = []
+    for _ in range(size):
+        cons, vow = (_CONS_CYR, _VOW_CYR) if rng.random() < 0.6 else (_CONS_LAT, _VOW_LAT)
+        words.append("".join(rng.choice(cons) + rng.choice(vow) for _ in range(rng.randint(2, 4))))
+    return words
+
+
+def _pick(rng: random.Random, vocab: list[str]) -> str:
+    # Log-uniform rank: P(rank <= r) = log r / log N, a Zipf-like head
+    return vocab[int(len(vocab) ** rng.random()) - 1]
+
+
+def _entry(rng: random.Random, vocab: list[str]) -> str:
+    artist = " ".join(_pick(rng, vocab) for _ in range(rng.randint(1, 2)))
+    title = " ".join(_pick(rng, vocab) for _ in range(rng.randint(1, 4)))
+    return f"{artist} - {title}"
+
+
+def _typo(rng: random.Random, text: str) -> str:
+    chars = list(text.replace(" - ", " "))
+    for _ in range(rng.randint(1, 2)):
+        i = rng.randrange(len(chars))
+        op = rng.random()
+        if op < 0.4:
+            chars[i] = rng.choice("аоеиkmnrs")
+        elif op < 0.7:
+            del chars[i]
+        else:
+            chars.insert(i, chars[i])
+    return "".join(chars)
+
+
+def _timed(fn, queries: list[str]) -> tuple[list[float], list]:
+    times, answers = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        answers.append(fn(q))
+        times.append((time.perf_counter() - t0) * 1000)
+    return times, answers
+
+
+def _fmt(times: list[float]) -> str:
+    times = sorted(times)
+    p99 = times[min(len(times) - 1, int(len(times) * 0.99))]
+    return f"p50 {statistics.median(times):8.3f} ms   p99 {p99:8.3f} ms"
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    ap.add_argument("--queries", type=int, default=300)
+    ap.add_argument("--linear-max", type=int, default=100_000, help="skip the linear scan above this size")
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    for size in args.sizes:
+        rng = random.Random(args.seed)
+        vocab = _vocab(rng, max(1000, size // 2))
+        corpus = [_entry(rng, vocab) for _ in range(size)]
+        targets = [rng.randrange(size) for _ in range(args.queries)]
+        queries = [_typo(rng, corpus[i]) for i in targets]
+
+        t0 = time.perf_counter()
+        index = SuggestIndex(corpus)
+        build = time.perf_counter() - t0
+        times, answers = _timed(lambda q: index.suggest(q), queries)
+        hits = sum(1 for i, a in zip(targets, answers) if a and a[0] == corpus[i])
+        print(f"{size:>9,} entries  build {build:6.1f}s")
+        print(f"    index   {_fmt(times)}   hit@1 {hits / len(queries):.0%}")
+        if size <= args.linear_max:
+            sample = queries[: max(10, args.queries // 10)]
+            times, _ = _timed(lambda q: suggest_query(q, corpus), sample)
+            print(f"    linear  {_fmt(times)}   ({len(sample)} queries)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""Offline recommender evaluation: ranking quality and latency, A vs B.
+
+Builds a throwaway SQLite database from synthetic interactions (or an
+anonymized CSV fixture), splits plays by time, runs the nightly training
+pipeline on the past and scores recommendations against the future:
+
+  - recall@k, NDCG@k, catalog coverage, novelty of _build_recommendations
+  - p50/p99 latency of _build_recommendations, get_similar_tracks and
+    ModelStore.recommend_for_user
+
+Each configuration runs in its own process (fresh settings, model dir and
+singletons) on identical data. Overrides are NAME=VALUE pairs: plain names
+are settings env vars (ML_SCORER_W_ALS=0.6), dotted names patch a module
+attribute (recommender.train._ALS_ITERATIONS=30). Values are parsed as JSON
+when possible. No network; Redis is fakeredis.
+
+    python scripts/eval_recommender.py --users 2000 --tracks 3000 \\
+        --a recommender.train._ALS_FACTORS=64 --b recommender.train._ALS_FACTORS=128
+
+Fixture CSV columns: user_id,track_id,timestamp[,artist,genre].
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def _parse_overrides(pairs: list[str]) -> dict[str, str]:
+    overrides = {}
+    for pair in pairs:
+        name, sep, value = pair.partition("=")
+        if not sep or not name:
+            raise SystemExit(f"override must be NAME=VALUE: {pair!r}")
+        overrides[name] = value
+    return overrides
+
+
+def _apply_attribute_overrides(overrides: dict[str, str]) -> None:
+    for name, raw in overrides.items():
+        if "." not in name:
+            continue
+        module_name, attr = name.rsplit(".", 1)
+        module = importlib.import_module(module_name)
+        if not hasattr(module, attr):
+            raise SystemExit(f"{module_name} has no attribute {attr!r}")
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            value = raw
+        setattr(module, attr, value)
+
+
+# ── Worker (one configuration) ───────────────────────────────────────────────
+
+async def _seed_db(catalog, train) -> None:
+    from datetime import datetime, timezone
+
+    import numpy as np
+    from sqlalchemy import insert
+
+    from bot.models.base import Base, engine, async_session
+    from bot.models.track import ListeningHistory, Track
+    from bot.models.user import User
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    def _dt(ts: float) -> datetime:
+        return datetime.fromtimestamp(ts, tz=timezone.utc)
+
+    track_ids, downloads = np.unique(train.track_ids, return_counts=True)
+    plays = dict(zip(track_ids.tolist(), downloads.tolist()))
+    async with async_session() as session:
+        await session.execute(insert(User), [{"id": u} for u in np.unique(train.user_ids).tolist()])
+        await session.execute(insert(Track), [
+            {
+                "id": tid,
+                "source_id": f"eval{tid}",
+                "source": "youtube",
+                "title": f"track {tid}",
+                "artist": artist,
+                "genre": genre or None,
+                "file_id": f"file{tid}",
+                "downloads": plays.get(tid, 0),
+                "created_at": _dt(created),
+            }
+            for tid, artist, genre, created in zip(
+                catalog.track_ids.tolist(), catalog.artists, catalog.genres, catalog.created_at.tolist()
+            )
+        ])
+        rows = list(zip(train.user_ids.tolist(), train.track_ids.tolist(), train.timestamps.tolist()))
+        for start in range(0, len(rows), 20_000):
+            await session.execute(insert(ListeningHistory), [
+                {"user_id": u, "track_id": t, "action": "play", "created_at": _dt(ts)}
+                for u, t, ts in rows[start:start + 20_000]
+            ])
+        await session.commit()
+
+
+async def _timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    if asyncio.iscoroutine(result):
+        result = await result
+    return result, time.perf_counter() - t0
+
+
+async def _evaluate(args, overrides: dict[str, str]) -> dict:
+    import numpy as np
+
+    from recommender import evaluation
+
+    if args.fixture:
+        catalog, plays = evaluation.load_fixture(args.fixture)
+    else:
+        catalog, plays = evaluation.synthetic_interactions(
+            args.users, args.tracks, args.plays, args.days, seed=args.seed
+        )
+    split = evaluation.time_split(plays, args.test_fraction)
+
+    _apply_attribute_overrides(overrides)
+    from recommender.ai_dj import _build_recommendations, get_similar_tracks
+    from recommender.model_store import ModelStore
+    from recommender.train import run_training
+
+    await _seed_db(catalog, split.train)
+    t0 = time.perf_counter()
+    await run_training()
+    train_seconds = time.perf_counter() - t0
+    store = ModelStore.get()
+    await store.load_latest()
+
+    rng = np.random.default_rng(args.seed)
+    test_users = sorted(split.test)
+    if len(test_users) > args.eval_users:
+        test_users = sorted(rng.choice(test_users, size=args.eval_users, replace=False).tolist())
+
+    track_of = {f"eval{t}": t for t in catalog.track_ids.tolist()}
+    recs: dict[int, list[int]] = {}
+    build_times = []
+    for user_id in test_users:
+        result, seconds = await _timed(_build_recommendations, user_id, args.k)
+        build_times.append(seconds)
+        recs[user_id] = [track_of[r["video_id"]] for r in result if r.get("video_id") in track_of]
+
+    rfu_times = []
+    for idx in store.get_user_indices(test_users).tolist():
+        if idx >= 0:
+            rfu_times.append((await _timed(store.recommend_for_user, idx, args.k))[1])
+
+    similar_times = []
+    probe_tracks = rng.choice(np.unique(split.train.track_ids), size=min(args.eval_users, len(catalog.track_ids)), replace=False)
+    for track_id in probe_tracks.tolist():
+        similar_times.append((await _timed(get_similar_tracks, track_id, args.k))[1])
+
+    return {
+        "overrides": overrides,
+        "data": {
+            "users": int(len(np.unique(plays.user_ids))),
+            "tracks": int(len(catalog.track_ids)),
+            "train_plays": int(len(split.train.user_ids)),
+            "test_users": len(split.test),
+        },
+        "models": {"als": store.is_ready, "w2v": store.w2v_ready, "train_s": train_seconds},
+        "quality": evaluation.ranking_report(recs, split, len(catalog.track_ids), args.k),
+        "latency": {
+            "_build_recommendations": evaluation.latency_summary(build_times),
+            "get_similar_tracks": evaluation.latency_summary(similar_times),
+            "recommend_for_user": evaluation.latency_summary(rfu_times),
+        },
+    }
+
+
+def _worker(args) -> None:
+    import logging
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+    overrides = json.loads(args.worker)
+    print(json.dumps(asyncio.run(_evaluate(args, overrides))))
+
+
+# ── Driver ───────────────────────────────────────────────────────────────────
+
+def _run_config(name: str, overrides: dict[str, str], argv: list[str]) -> dict:
+    with tempfile.TemporaryDirectory(prefix=f"reco-eval-{name}-") as tmp:
+        env = {
+            **os.environ,
+            "BOT_TOKEN": os.environ.get("BOT_TOKEN", "0:eval"),
+            "DATABASE_URL": f"sqlite+aiosqlite:///{Path(tmp) / 'eval.db'}",
+            "REDIS_URL": "fakeredis://",
+            "ML_ENABLED": "true",
+            "ML_MODEL_DIR": str(Path(tmp) / "models"),
+        }
+        env.update({k: v for k, v in overrides.items() if "." not in k})
+        proc = subprocess.run(
+            [sys.executable, __file__, *argv, "--worker", json.dumps(overrides)],
+            env=env, stdout=subprocess.PIPE, text=True,
+        )
+    if proc.returncode:
+        raise SystemExit(f"configuration {name} failed (exit {proc.returncode})")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _print_report(results: dict[str, dict]) -> None:
+    names = list(results)
+    first = results[names[0]]
+    print(
+        "data: {users} users, {tracks} tracks, {train_plays} train plays, {test_users} test users".format(
+            **first["data"]
+        )
+    )
+    for name, res in results.items():
+        print(f"{name}: {' '.join(f'{k}={v}' for k, v in res['overrides'].items()) or '(defaults)'}")
+
+    rows: list[tuple[str, list[float]]] = []
+    rows.append(("als trained", [float(r["models"]["als"]) for r in results.values()]))
+    rows.append(("w2v trained", [float(r["models"]["w2v"]) for r in results.values()]))
+    rows.append(("train s", [r["models"]["train_s"] for r in results.values()]))
+    for metric in first["quality"]:
+        rows.append((metric, [r["quality"][metric] for r in results.values()]))
+    for fn in first["latency"]:
+        for stat in ("p50_ms", "p99_ms"):
+            rows.append((f"{fn} {stat}", [r["latency"][fn][stat] for r in results.values()]))
+
+    width = max(len(label) for label, _ in rows) + 2
+    header = f"{'':<{width}}" + "".join(f"{n:>12}" for n in names)
+    print(header + (f"{'Δ':>10}" if len(names) == 2 else ""))
+    for label, values in rows:
+        line = f"{label:<{width}}" + "".join(f"{v:>12.4f}" for v in values)
+        if len(values) == 2 and values[0]:
+            line += f"{(values[1] - values[0]) / abs(values[0]) * 100:>+9.1f}%"
+        print(line)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", type=int, default=1000)
+    ap.add_argument("--tracks", type=int, default=2000)
+    ap.add_argument("--plays", type=int, default=40, help="plays per synthetic user")
+    ap.add_argument("--days", type=int, default=60, help="history span of synthetic plays")
+    ap.add_argument("--fixture", help="anonymized plays CSV instead of synthetic data")
+    ap.add_argument("--test-fraction", type=float, default=0.2)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--eval-users", type=int, default=300, help="test users (and probe tracks) to query")
+    ap.add_argument("--seed", type=int, default=35)
+    ap.add_argument("--a", action="append", default=[], metavar="NAME=VALUE", help="configuration A override")
+    ap.add_argument("--b", action="append", default=[], metavar="NAME=VALUE", help="configuration B override")
+    ap.add_argument("--worker", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker is not None:
+        _worker(args)
+        return
+
+    shared = [
+        f"--users={args.users}", f"--tracks={args.tracks}", f"--plays={args.plays}",
+        f"--days={args.days}", f"--test-fraction={args.test_fraction}", f"--k={args.k}",
+        f"--eval-users={args.eval_users}", f"--seed={args.seed}",
+    ]
+    if args.fixture:
+        shared.append(f"--fixture={args.fixture}")
+
+    configs = {"A": _parse_overrides(args.a)}
+    if args.b:
+        configs["B"] = _parse_overrides(args.b)
+    _print_report({name: _run_config(name, overrides, shared) for name, overrides in configs.items()})
+
+
+if __name__ == "__main__":
+    main()
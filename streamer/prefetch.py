@@ -0,0 +1,142 @@
+"""
+prefetch.py — Упреждающая загрузка треков для voice-chat стримера.
+
+TrackPrefetcher держит следующие N записей radio:queue:{channel} скачанными
+на локальный диск, чтобы play_next стартовал AudioPiped с тёплого файла, а
+не ждал загрузку после окончания трека.
+
+Один экземпляр на процесс стримера: дисковый кэш, загрузки в полёте и
+бюджет одновременных загрузок общие для всех групп — несколько voice chat
+не устраивают давку на загрузчике и не качают один file_id дважды.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+_SUFFIX = ".audio"
+
+
+class TrackPrefetcher:
+    """Дисковый кэш следующих треков очереди с общим бюджетом загрузок."""
+
+    def __init__(
+        self,
+        app,
+        *,
+        cache_dir: Path,
+        depth: int = 3,
+        concurrency: int = 2,
+        max_files: int = 40,
+        wait_sec: float = 5.0,
+    ) -> None:
+        self._app = app
+        self.cache_dir = Path(cache_dir)
+        self.depth = depth
+        self.max_files = max_files
+        self.wait_sec = wait_sec
+        self._budget = asyncio.Semaphore(max(1, concurrency))
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    @classmethod
+    def from_settings(cls, app) -> "TrackPrefetcher":
+        from bot.config import settings
+        return cls(
+            app,
+            cache_dir=settings.STREAMER_CACHE_DIR,
+            depth=settings.STREAMER_PREFETCH_DEPTH,
+            concurrency=settings.STREAMER_DOWNLOAD_CONCURRENCY,
+            max_files=settings.STREAMER_CACHE_MAX_FILES,
+            wait_sec=settings.STREAMER_PREFETCH_WAIT_SEC,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """Prefetch работает, если клиент умеет качать по file_id (Pyrogram)."""
+        return self.depth > 0 and callable(getattr(self._app, "download_media", None))
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    def path_for(self, file_id: str) -> Path:
+        digest = hashlib.sha1(file_id.encode("utf-8")).hexdigest()[:24]
+        return self.cache_dir / f"{digest}{_SUFFIX}"
+
+    async def source_for(self, track: dict) -> tuple[str, bool]:
+        """Источник для AudioPiped: (локальный путь, True) если трек тёплый,
+        иначе (file_id, False). Загрузку в полёте ждёт не дольше wait_sec."""
+        file_id = track.get("file_id")
+        if not file_id or not self.enabled:
+            return file_id, False
+        path = self.path_for(file_id)
+        task = self._inflight.get(file_id)
+        if task is not None and not path.exists():
+            try:
+                await asyncio.wait_for(asyncio.shield(task), self.wait_sec)
+            except asyncio.TimeoutError:
+                logger.debug("Prefetch of %s still running, streaming remote", file_id[:16])
+        if path.exists():
+            _touch(path)
+            return str(path), True
+        return file_id, False
+
+    async def refill(self, upcoming: list[dict]) -> int:
+        """Запускает загрузку первых depth записей, которых ещё нет на диске.
+
+        Возвращает число запущенных загрузок.
+        """
+        if not self.enabled:
+            return 0
+        started = 0
+        for track in upcoming[:self.depth]:
+            file_id = track.get("file_id")
+            if not file_id or file_id in self._inflight:
+                continue
+            path = self.path_for(file_id)
+            if path.exists():
+                _touch(path)
+                continue
+            task = asyncio.create_task(self._download(file_id, path))
+            self._inflight[file_id] = task
+            task.add_done_callback(lambda _t, fid=file_id: self._inflight.pop(fid, None))
+            started += 1
+        return started
+
+    async def _download(self, file_id: str, path: Path) -> Path | None:
+        async with self._budget:
+            if path.exists():
+                return path
+            tmp = path.with_suffix(".part")
+            t0 = time.monotonic()
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                result = await self._app.download_media(file_id, file_name=str(tmp))
+                os.replace(result or tmp, path)
+            except Exception as e:
+                logger.warning("Voice chat prefetch failed for %s: %s", file_id[:16], e)
+                tmp.unlink(missing_ok=True)
+                return None
+            logger.debug("Prefetched %s in %.1fs", path.name, time.monotonic() - t0)
+        self._evict()
+        return path
+
+    def _evict(self) -> None:
+        """LRU по mtime: лишние файлы сверх max_files удаляются (играющий трек свежий)."""
+        try:
+            files = sorted(self.cache_dir.glob(f"*{_SUFFIX}"), key=lambda p: p.stat().st_mtime)
+        except OSError:
+            return
+        for old in files[:max(0, len(files) - self.max_files)]:
+            old.unlink(missing_ok=True)
+
+
+def _touch(path: Path) -> None:
+    try:
+        path.touch()
+    except OSError:
+        pass
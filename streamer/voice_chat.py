@@ -7,6 +7,8 @@ voice_chat.py — Pyrogram + pytgcalls стример для BLACK ROOM NIGHT CH
   - Стримит 24/7 с автоматическим переключением треков
   - Обновляет Redis ключ radio:current:{channel} для отображения текущего трека
   - Голосование 👍/👎 — при N 👎 автоматический skip
+  - Следующие треки очереди заранее качаются на диск (streamer/prefetch.py),
+    паузы между треками пишутся в гистограмму bot_voice_chat_gap_seconds
 
 Для запуска:
   1. Все Pyrogram настройки в .env
@@ -19,6 +21,9 @@ import logging
 import time
 from collections import defaultdict
 
+from bot.services.metrics import voice_chat_gap
+from streamer.prefetch import TrackPrefetcher
+
 logger = logging.getLogger(__name__)
 
 # Voting: {group_id: {"likes": set(user_ids), "dislikes": set(user_ids)}}
@@ -26,6 +31,7 @@ _votes: dict[int, dict[str, set[int]]] = defaultdict(lambda: {"likes": set(), "d
 _vote_last_seen: dict[int, float] = {}
 _SKIP_THRESHOLD = 3  # number of 👎 to auto-skip
 _VOTE_TTL_SECONDS = 60 * 60 * 6
+_PREFETCH_REFRESH_SEC = 15  # queue edits (admin / webapp) are picked up this often
 
 
 def _touch_vote_activity(group_id: int) -> None:
@@ -219,37 +225,88 @@ async def _run_radio_command_listener(
         await asyncio.sleep(delay)
 
 
-async def _run_group(app, tgcalls, group_id: int, cache, *, consume_radio_commands: bool = False) -> None:
+async def _preferred_channels(cache, channel: str = "tequila") -> list[str]:
+    """Queue channels in pop order: the live broadcast channel first."""
+    preferred_channels: list[str] = []
+    try:
+        if await cache.redis.get("broadcast:live"):
+            active_channel = await cache.redis.hget("broadcast:state", "channel")
+            if active_channel:
+                preferred_channels.append(active_channel)
+    except Exception:
+        logger.debug("Failed to resolve active broadcast channel", exc_info=True)
+
+    preferred_channels.extend((channel, "fullmoon", "tequila"))
+
+    seen: set[str] = set()
+    result: list[str] = []
+    for raw_channel in preferred_channels:
+        ch = (raw_channel or "").strip()
+        if ch and ch not in seen:
+            seen.add(ch)
+            result.append(ch)
+    return result
+
+
+async def _peek_upcoming(cache, depth: int) -> list[dict]:
+    """The next *depth* queue entries in the order get_next_track would pop them."""
+    upcoming: list[dict] = []
+    for ch in await _preferred_channels(cache):
+        if len(upcoming) >= depth:
+            break
+        for raw in await cache.redis.lrange(f"radio:queue:{ch}", 0, depth - len(upcoming) - 1):
+            try:
+                upcoming.append(json.loads(raw))
+            except (TypeError, ValueError):
+                continue
+    return upcoming
+
+
+async def _refill_prefetch(prefetcher: TrackPrefetcher, cache) -> None:
+    if not prefetcher.enabled:
+        return
+    try:
+        await prefetcher.refill(await _peek_upcoming(cache, prefetcher.depth))
+    except Exception:
+        logger.debug("Voice chat prefetch refill failed", exc_info=True)
+
+
+async def _prefetch_loop(prefetcher: TrackPrefetcher, cache) -> None:
+    while True:
+        await _refill_prefetch(prefetcher, cache)
+        await asyncio.sleep(_PREFETCH_REFRESH_SEC)
+
+
+def _observe_gap(ended_at: float | None, warm: bool) -> None:
+    if ended_at is not None:
+        voice_chat_gap.labels(source="local" if warm else "remote").observe(time.monotonic() - ended_at)
+
+
+async def _run_group(
+    app,
+    tgcalls,
+    group_id: int,
+    cache,
+    *,
+    consume_radio_commands: bool = False,
+    prefetcher: TrackPrefetcher | None = None,
+) -> None:
     """Run streaming for a single group."""
     current_channel: str | None = None
+    stream_ended_at: float | None = None
+    prefetcher = prefetcher or TrackPrefetcher.from_settings(app)
     transition_lock = asyncio.Lock()
     transition_in_progress = False
 
     async def get_next_track(channel: str = "tequila") -> dict | None:
-        preferred_channels: list[str] = []
-        try:
-            if await cache.redis.get("broadcast:live"):
-                active_channel = await cache.redis.hget("broadcast:state", "channel")
-                if active_channel:
-                    preferred_channels.append(active_channel)
-        except Exception:
-            logger.debug("Failed to resolve active broadcast channel", exc_info=True)
-
-        preferred_channels.extend((channel, "fullmoon", "tequila"))
-
-        seen: set[str] = set()
-        for raw_channel in preferred_channels:
-            ch = (raw_channel or "").strip()
-            if not ch or ch in seen:
-                continue
-            seen.add(ch)
+        for ch in await _preferred_channels(cache, channel):
             data = await cache.redis.lpop(f"radio:queue:{ch}")
             if data:
                 return json.loads(data)
         return None
 
     async def play_next() -> None:
-        nonlocal current_channel, transition_in_progress
+        nonlocal current_channel, transition_in_progress, stream_ended_at
         from pytgcalls.types import AudioPiped, AudioQuality
 
         if transition_in_progress:
@@ -273,14 +330,18 @@ async def _run_group(app, tgcalls, group_id: int, cache, *, consume_radio_comman
                     logger.info("[%s] Playing: %s — %s", group_id, track.get("artist"), track.get("title"))
                     current_channel = await _sync_current_track_state(cache, track, current_channel)
 
+                    source, warm = await prefetcher.source_for(track)
                     try:
                         await tgcalls.play(
                             group_id,
                             AudioPiped(
-                                track["file_id"],
+                                source,
                                 audio_parameters=AudioQuality.HIGH,
                             ),
                         )
+                        _observe_gap(stream_ended_at, warm)
+                        stream_ended_at = None
+                        await _refill_prefetch(prefetcher, cache)
                         return
                     except Exception as e:
                         logger.error("[%s] Playback error for %s: %s", group_id, track.get("file_id"), e)
@@ -290,7 +351,9 @@ async def _run_group(app, tgcalls, group_id: int, cache, *, consume_radio_comman
 
     @tgcalls.on_stream_end()
     async def on_stream_end(_, update):
+        nonlocal stream_ended_at
         chat_id = getattr(update, "chat_id", group_id)
+        stream_ended_at = stream_ended_at or time.monotonic()
         _reset_votes(chat_id)
         await play_next()
 
@@ -333,13 +396,30 @@ async def _run_group(app, tgcalls, group_id: int, cache, *, consume_radio_comman
             task_name=f"radio-command-listener-group-{group_id}",
         )
 
+    if prefetcher.enabled:
+        _spawn_task(_prefetch_loop(prefetcher, cache), task_name=f"voice-chat-prefetch-group-{group_id}")
+
     await play_next()
     logger.info("Streamer started for group %s", group_id)
 
 
-async def _run_groups(app, tgcalls, group_ids: list[int], cache, *, consume_radio_commands: bool = False) -> None:
-    """Run synchronized streaming across multiple groups using one shared queue consumer."""
+async def _run_groups(
+    app,
+    tgcalls,
+    group_ids: list[int],
+    cache,
+    *,
+    consume_radio_commands: bool = False,
+    prefetcher: TrackPrefetcher | None = None,
+) -> None:
+    """Run synchronized streaming across multiple groups using one shared queue consumer.
+
+    One prefetcher (and so one download budget) serves every group: each
+    track is fetched once and piped to all voice chats from the same file.
+    """
     current_channel: str | None = None
+    stream_ended_at: float | None = None
+    prefetcher = prefetcher or TrackPrefetcher.from_settings(app)
     transition_lock = asyncio.Lock()
     transition_in_progress = False
     group_id_set = set(group_ids)
@@ -349,30 +429,14 @@ async def _run_groups(app, tgcalls, group_ids: list[int], cache, *, consume_radi
             _reset_votes(gid)
 
     async def get_next_track(channel: str = "tequila") -> dict | None:
-        preferred_channels: list[str] = []
-        try:
-            if await cache.redis.get("broadcast:live"):
-                active_channel = await cache.redis.hget("broadcast:state", "channel")
-                if active_channel:
-                    preferred_channels.append(active_channel)
-        except Exception:
-            logger.debug("Failed to resolve active broadcast channel", exc_info=True)
-
-        preferred_channels.extend((channel, "fullmoon", "tequila"))
-
-        seen: set[str] = set()
-        for raw_channel in preferred_channels:
-            ch = (raw_channel or "").strip()
-            if not ch or ch in seen:
-                continue
-            seen.add(ch)
+        for ch in await _preferred_channels(cache, channel):
             data = await cache.redis.lpop(f"radio:queue:{ch}")
             if data:
                 return json.loads(data)
         return None
 
     async def play_next() -> None:
-        nonlocal current_channel, transition_in_progress
+        nonlocal current_channel, transition_in_progress, stream_ended_at
         from pytgcalls.types import AudioPiped, AudioQuality
 
         if transition_in_progress:
@@ -394,13 +458,14 @@ async def _run_groups(app, tgcalls, group_ids: list[int], cache, *, consume_radi
                     logger.info("[%s] Broadcasting to %d groups: %s — %s", group_ids[0], len(group_ids), track.get("artist"), track.get("title"))
                     current_channel = await _sync_current_track_state(cache, track, current_channel)
 
+                    source, warm = await prefetcher.source_for(track)
                     success_count = 0
                     for target_group_id in group_ids:
                         try:
                             await tgcalls.play(
                                 target_group_id,
                                 AudioPiped(
-                                    track["file_id"],
+                                    source,
                                     audio_parameters=AudioQuality.HIGH,
                                 ),
                             )
@@ -409,6 +474,9 @@ async def _run_groups(app, tgcalls, group_ids: list[int], cache, *, consume_radi
                             logger.error("[%s] Playback error for %s: %s", target_group_id, track.get("file_id"), e)
 
                     if success_count > 0:
+                        _observe_gap(stream_ended_at, warm)
+                        stream_ended_at = None
+                        await _refill_prefetch(prefetcher, cache)
                         return
 
                     current_channel = await _sync_current_track_state(cache, None, current_channel)
@@ -417,8 +485,10 @@ async def _run_groups(app, tgcalls, group_ids: list[int], cache, *, consume_radi
 
     @tgcalls.on_stream_end()
     async def on_stream_end(_, update):
+        nonlocal stream_ended_at
         chat_id = getattr(update, "chat_id", None)
         if chat_id in group_id_set:
+            stream_ended_at = stream_ended_at or time.monotonic()
             _reset_group_votes()
             await play_next()
 
@@ -473,6 +543,9 @@ async def _run_groups(app, tgcalls, group_ids: list[int], cache, *, consume_radi
             task_name=f"radio-command-listener-groups-{group_ids[0]}",
         )
 
+    if prefetcher.enabled:
+        _spawn_task(_prefetch_loop(prefetcher, cache), task_name=f"voice-chat-prefetch-groups-{group_ids[0]}")
+
     await play_next()
     logger.info("Streamer started for groups %s", group_ids)
 
@@ -507,14 +580,21 @@ async def main() -> None:
     await app.start()
     await tgcalls.start()
 
+    if settings.STREAMER_METRICS_PORT:
+        from bot.services.metrics import start_metrics_server
+        start_metrics_server(settings.STREAMER_METRICS_PORT)
+
+    # One disk cache and download budget for every voice chat of this process
+    prefetcher = TrackPrefetcher.from_settings(app)
+
     if len(group_ids) == 1:
         tasks = [
-            _run_group(app, tgcalls, gid, cache, consume_radio_commands=index == 0)
+            _run_group(app, tgcalls, gid, cache, consume_radio_commands=index == 0, prefetcher=prefetcher)
             for index, gid in enumerate(group_ids)
         ]
     else:
         tasks = [
-            _run_groups(app, tgcalls, group_ids, cache, consume_radio_commands=True)
+            _run_groups(app, tgcalls, group_ids, cache, consume_radio_commands=True, prefetcher=prefetcher)
         ]
     logger.info("Launching streamer for %d group(s): %s", len(group_ids), group_ids)
 
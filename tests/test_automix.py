@@ -1,9 +1,28 @@
 """Tests for mixer/automix.py — crossfade mix creation."""
+import re
+import shutil
+import subprocess
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 import pytest
 
+needs_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+
+
+def _tone(path: Path, seconds: int, freq: int = 440) -> Path:
+    """Tone with a 1 s fade-in and a 2 s fade-out, rendered by the real ffmpeg."""
+    subprocess.run(
+        [
+            "ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "lavfi", "-i", f"sine=frequency={freq}:duration={seconds}",
+            "-af", f"afade=t=in:d=1,afade=t=out:st={seconds - 2}:d=2",
+            "-ac", "2", "-c:a", "libmp3lame", str(path),
+        ],
+        check=True,
+    )
+    return path
+
 
 # ── _normalize ───────────────────────────────────────────────────────────
 
@@ -86,3 +105,150 @@ class TestCreateMix:
             mock_sync.return_value = Path("out.mp3")
             result = await create_mix([Path("a.mp3")], Path("out.mp3"), 7000)
             assert result == Path("out.mp3")
+
+
+# ── analysis / streaming render ──────────────────────────────────────────
+
+_EBUR128_LOG = """\
+[Parsed_ebur128_0 @ 0x1] t: 0.4        TARGET:-23 LUFS    M:-120.7 S:-120.7     I: -70.0 LUFS       LRA:   0.0 LU
+[Parsed_ebur128_0 @ 0x1] t: 1.0        TARGET:-23 LUFS    M: -45.0 S:-120.7     I: -70.0 LUFS       LRA:   0.0 LU
+[Parsed_ebur128_0 @ 0x1] t: 1.5        TARGET:-23 LUFS    M: -12.0 S: -14.0     I: -12.0 LUFS       LRA:   0.0 LU
+[Parsed_ebur128_0 @ 0x1] t: 180.0      TARGET:-23 LUFS    M: -13.0 S: -13.0     I: -12.5 LUFS       LRA:   3.0 LU
+[Parsed_ebur128_0 @ 0x1] t: 183.0      TARGET:-23 LUFS    M: -60.0 S: -40.0     I: -12.5 LUFS       LRA:   3.0 LU
+[Parsed_ebur128_0 @ 0x1] Summary:
+
+  Integrated loudness:
+    I:         -12.5 LUFS
+    Threshold: -22.6 LUFS
+"""
+
+
+class TestAnalysis:
+    def test_parse_ebur128(self):
+        from mixer.automix import _parse_ebur128
+        a = _parse_ebur128(_EBUR128_LOG)
+        assert a.lufs == -12.5
+        assert a.duration == 183.0
+        assert a.intro == pytest.approx(1.1)
+        assert a.outro == 180.0
+
+    def test_parse_silence_keeps_full_track(self):
+        from mixer.automix import _parse_ebur128
+        a = _parse_ebur128(
+            "[x] t: 2.0   TARGET:-23 LUFS    M:-120.7 S:-120.7\n[x] Summary:\n    I:  -70.0 LUFS\n"
+        )
+        assert (a.intro, a.outro) == (0.0, 2.0)
+
+    @needs_ffmpeg
+    def test_analyze_real_ffmpeg_output(self, tmp_path):
+        from mixer import automix
+        with patch.object(automix, "_tempo_and_key", return_value=(None, None)):
+            a = automix._analyze_uncached(_tone(tmp_path / "t.mp3", 6))
+        assert a.duration == pytest.approx(6.0, abs=0.2)
+        assert a.lufs is not None and a.lufs > automix._SILENCE_LUFS
+        assert 0.0 <= a.intro < 1.0 and 4.0 < a.outro <= a.duration
+
+    def test_empty_analysis_is_an_error_and_not_cached(self, tmp_path):
+        from mixer import automix
+        log = "[Parsed_ebur128_0 @ 0x1] Summary:\n\n  Integrated loudness:\n    I:  -70.0 LUFS\n"
+        with patch.object(automix.settings, "AUTOMIX_ANALYSIS_DIR", tmp_path), \
+                patch.object(automix, "_ffmpeg_available", return_value=True), \
+                patch.object(automix.subprocess, "run", return_value=MagicMock(returncode=0, stderr=log.encode())):
+            with pytest.raises(RuntimeError, match="no loudness frames"):
+                automix.analyze_track(Path("a.mp3"), "yt_empty")
+        assert not list(tmp_path.iterdir())
+
+    def test_zero_duration_cache_entry_is_ignored(self, tmp_path):
+        from mixer import automix
+        path = tmp_path / "k.json"
+        automix._store_analysis(path, automix.TrackAnalysis(duration=0.0, lufs=None, intro=0.0, outro=0.0))
+        assert automix._load_analysis(path) is None
+
+    def test_estimate_key(self):
+        import numpy as np
+        from mixer.automix import _MINOR_PROFILE, _estimate_key
+        assert _estimate_key(np.roll(_MINOR_PROFILE, 9)) == "Am"
+        assert _estimate_key(np.zeros(12)) is None
+
+    def test_analysis_cached_by_key(self, tmp_path):
+        from mixer import automix
+        analysis = automix.TrackAnalysis(duration=200.0, lufs=-9.0, intro=0.5, outro=198.0, bpm=124.0, key="Am")
+        with patch.object(automix.settings, "AUTOMIX_ANALYSIS_DIR", tmp_path), \
+                patch.object(automix, "_analyze_uncached", return_value=analysis) as uncached:
+            assert automix.analyze_track(Path("a.mp3"), "yt/abc") == analysis
+            assert automix.analyze_track(Path("other.mp3"), "yt/abc") == analysis
+        uncached.assert_called_once()
+        assert (tmp_path / "yt_abc.json").exists()
+
+
+class TestFilterGraph:
+    def _analysis(self, duration, lufs=-14.0, intro=0.0, outro=None, bpm=None):
+        from mixer.automix import TrackAnalysis
+        return TrackAnalysis(duration, lufs, intro, duration if outro is None else outro, bpm)
+
+    def test_chain_and_gain(self):
+        from mixer.automix import _build_filter_graph
+        graph, label, total = _build_filter_graph(
+            [self._analysis(200, lufs=-10.0, intro=1.5, outro=195.0), self._analysis(180, lufs=-20.0)],
+            7.0, -14.0,
+        )
+        assert label == "mix"
+        assert "[0:a]atrim=start=1.500:end=195.000" in graph
+        assert "volume=-4.00dB" in graph and "volume=6.00dB" in graph
+        assert "[t0][t1]acrossfade=d=7.000" in graph
+        assert graph.endswith("[mix]")
+        assert total == pytest.approx(193.5 + 180 - 7)
+
+    def test_crossfade_clamped_to_short_track(self):
+        from mixer.automix import _build_filter_graph
+        graph, _, _ = _build_filter_graph([self._analysis(200), self._analysis(6), self._analysis(200)], 7.0, -14.0)
+        assert graph.count("acrossfade=d=3.000") == 2
+        assert "[x1][t2]acrossfade" in graph
+
+    def test_bpm_order(self):
+        from mixer.automix import _bpm_order
+        tracks = [self._analysis(100, bpm=None), self._analysis(100, bpm=128), self._analysis(100, bpm=90)]
+        assert _bpm_order(tracks) == [2, 1, 0]
+
+    def test_streaming_render_command(self, tmp_path):
+        from mixer import automix
+        analyses = [self._analysis(200, bpm=130), self._analysis(200, bpm=100)]
+        with patch.object(automix, "_ffmpeg_available", return_value=True), \
+                patch.object(automix, "analyze_tracks", return_value=analyses), \
+                patch.object(automix.subprocess, "run") as run:
+            run.return_value = MagicMock(returncode=0)
+            out = automix._create_mix_sync([Path("a.mp3"), Path("b.mp3")], tmp_path / "m.mp3", 7000)
+        cmd = run.call_args.args[0]
+        assert out == tmp_path / "m.mp3"
+        assert cmd[0] == "ffmpeg" and "-filter_complex" in cmd
+        # BPM order: b (100) before a (130)
+        assert [cmd[i + 1] for i, arg in enumerate(cmd) if arg == "-i"] == ["b.mp3", "a.mp3"]
+
+    def test_failed_analysis_falls_back_to_plain_concat(self, tmp_path):
+        from mixer import automix
+        with patch.object(automix, "_ffmpeg_available", return_value=True), \
+                patch.object(automix, "analyze_tracks", side_effect=RuntimeError("no frames")), \
+                patch.object(automix.subprocess, "run") as run:
+            run.return_value = MagicMock(returncode=0)
+            automix._create_mix_sync([Path("a.mp3"), Path("b.mp3")], tmp_path / "m.mp3", 7000)
+        cmd = run.call_args.args[0]
+        graph = cmd[cmd.index("-filter_complex") + 1]
+        assert "[t0][t1]concat=n=2:v=0:a=1" in graph
+        assert "atrim" not in graph and "acrossfade" not in graph
+        assert [cmd[i + 1] for i, arg in enumerate(cmd) if arg == "-i"] == ["a.mp3", "b.mp3"]
+
+    @needs_ffmpeg
+    def test_streaming_render_with_real_ffmpeg(self, tmp_path):
+        from mixer import automix
+        tracks = [_tone(tmp_path / "a.mp3", 8, 440), _tone(tmp_path / "b.mp3", 8, 330)]
+        out = tmp_path / "mix.mp3"
+        with patch.object(automix.settings, "AUTOMIX_ANALYSIS_DIR", tmp_path / "analysis"), \
+                patch.object(automix, "_tempo_and_key", return_value=(None, None)):
+            automix._render_streaming(tracks, out, 2000, ["a", "b"])
+        probe = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-i", str(out), "-f", "null", "-"],
+            stderr=subprocess.PIPE, text=True,
+        )
+        # Two ~8 s tracks with their fades trimmed, overlapped by a 2 s crossfade
+        seconds = float(re.findall(r"time=(\d+):(\d+):([\d.]+)", probe.stderr)[-1][2])
+        assert 8.0 < seconds < 16.0
@@ -0,0 +1,133 @@
+"""Tests for the pure parts of scripts/bench_search_replay.py (fixtures, run diff)."""
+import asyncio
+import importlib.util
+import os
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+_SCRIPT = Path(__file__).resolve().parent.parent / "scripts" / "bench_search_replay.py"
+
+
+@pytest.fixture(scope="module")
+def replay():
+    # The script points DATABASE_URL at a throwaway DB and extends sys.path on import
+    spec = importlib.util.spec_from_file_location("bench_search_replay", _SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    with patch.dict(os.environ), patch.object(sys, "path", list(sys.path)):
+        spec.loader.exec_module(module)
+    return module
+
+
+def _no_delay(name, key, entry):
+    return 0.0
+
+
+class TestCallKey:
+    def test_only_scalar_arguments_identify_a_call(self, replay):
+        pool_a, pool_b = [{"id": 1}], [{"id": 2}]
+        assert replay._call_key("yandex", ("beatles", pool_a), {"limit": 5, "cb": print}) == \
+            replay._call_key("yandex", ("beatles", pool_b), {"limit": 5, "cb": len})
+
+    def test_kwargs_order_does_not_matter(self, replay):
+        assert replay._call_key("vk", ("q",), {"limit": 5, "offset": 0}) == \
+            replay._call_key("vk", ("q",), {"offset": 0, "limit": 5})
+
+    def test_scalars_and_provider_distinguish_calls(self, replay):
+        keys = {
+            replay._call_key("vk", ("q",), {"limit": 5}),
+            replay._call_key("vk", ("q",), {"limit": 10}),
+            replay._call_key("vk", ("other",), {"limit": 5}),
+            replay._call_key("deezer", ("q",), {"limit": 5}),
+        }
+        assert len(keys) == 4
+
+
+class TestFixtures:
+    async def test_record_save_load_replay(self, replay, tmp_path):
+        fixtures = replay.Fixtures()
+
+        async def search(query, limit=10):
+            return [{"title": query, "n": limit}]
+
+        async def broken(query):
+            raise ValueError("boom")
+
+        assert await fixtures.recorder("yandex", search)("queen", limit=3) == [{"title": "queen", "n": 3}]
+        with pytest.raises(ValueError):
+            await fixtures.recorder("vk", broken)("queen")
+        path = tmp_path / "fixtures.json"
+        fixtures.save(path)
+
+        loaded = replay.Fixtures.load(path)
+        assert loaded.entries.keys() == fixtures.entries.keys()
+        answer = await loaded.replayer("yandex", _no_delay)("queen", limit=3)
+        assert answer == [{"title": "queen", "n": 3}]
+        answer[0]["title"] = "mutated"  # callers get copies
+        assert await loaded.replayer("yandex", _no_delay)("queen", limit=3) == [{"title": "queen", "n": 3}]
+        with pytest.raises(RuntimeError, match="boom"):
+            await loaded.replayer("vk", _no_delay)("queen")
+
+    async def test_unrecorded_calls_are_served_empty_and_counted(self, replay):
+        fixtures = replay.Fixtures()
+        assert await fixtures.replayer("yandex", _no_delay)("nothing") == []
+        assert await fixtures.replayer("canonical", _no_delay)("nothing") is None
+        assert await fixtures.replayer("yandex", _no_delay)("again") == []
+        assert fixtures.misses == {"yandex": 2, "canonical": 1}
+
+    async def test_recorded_timeout_times_out_again(self, replay):
+        key = replay._call_key("spotify", ("slow",), {})
+        fixtures = replay.Fixtures({key: {"timeout": True, "ms": 1.0}})
+        with pytest.raises(asyncio.TimeoutError):
+            await fixtures.replayer("spotify", _no_delay)("slow")
+
+    def test_latency_model_is_deterministic(self, replay):
+        recorded = replay._latency_model("recorded", 2.0, 250.0)
+        assert recorded("vk", "k", {"ms": 100.0}) == pytest.approx(0.2)
+        synthetic = replay._latency_model("synthetic", 1.0, 250.0)
+        assert synthetic("vk", "k", None) == synthetic("vk", "k", None) > 0
+        assert replay._latency_model("none", 1.0, 250.0)("vk", "k", {"ms": 100.0}) == 0.0
+
+
+def _run(rows, qps=10.0, p50=100.0, p99=400.0):
+    return {
+        "summary": {"qps": qps, "p50_ms": p50, "p99_ms": p99},
+        "rows": [
+            {"query": q, "top": top, "top1": top[0] if top else ""}
+            for q, top in rows
+        ],
+    }
+
+
+class TestDiffRuns:
+    def test_ranking_stability(self, replay):
+        a = _run([
+            ("same", ["y:1", "y:2", "y:3"]),
+            ("swapped", ["y:1", "y:2"]),
+            ("only_in_a", ["y:9"]),
+            ("empty", []),
+        ])
+        b = _run([
+            ("same", ["y:1", "y:2", "y:3"]),
+            ("swapped", ["y:2", "y:4"]),
+            ("empty", []),
+        ], qps=12.0, p50=90.0, p99=300.0)
+        d = replay.diff_runs(a, b, k=2)
+        assert d["compared"] == 3
+        assert d["top1_changed"] == 1
+        assert d["changes"] == [{"query": "swapped", "a": "y:1", "b": "y:2"}]
+        # same: 2/2, swapped: 1/2; queries empty in both runs are left out
+        assert d["mean_overlap@2"] == pytest.approx(0.75)
+        assert d["qps"] == (10.0, 12.0) and d["p50_ms"] == (100.0, 90.0) and d["p99_ms"] == (400.0, 300.0)
+
+    def test_identical_runs(self, replay):
+        run = _run([("q", ["y:1"]), ("empty", [])])
+        d = replay.diff_runs(run, run)
+        assert d["top1_changed"] == 0 and d["mean_overlap@5"] == 1.0
+
+    def test_percentile(self, replay):
+        assert replay._pct([], 0.99) == 0.0
+        assert replay._pct([float(i) for i in range(100)], 0.99) == 99.0
+        assert replay._pct([1.0, 2.0], 0.5) == 2.0
@@ -27,6 +27,24 @@ class TestCacheFileId:
         ttl = await cache_with_fake_redis.redis.ttl("fid:track_ttl:128")
         assert ttl > 0
 
+    async def test_get_file_ids_batch(self, cache_with_fake_redis):
+        await cache_with_fake_redis.set_file_id("b1", "FID_1", 192)
+        await cache_with_fake_redis.set_file_id("b3", "FID_3", 192)
+        found = await cache_with_fake_redis.get_file_ids(["b1", "b2", "b3"])
+        assert found == {"b1": "FID_1", "b3": "FID_3"}
+        assert await cache_with_fake_redis.get_file_ids([]) == {}
+
+
+@pytest.mark.asyncio
+class TestCacheInline:
+    async def test_inline_cache_roundtrip(self, cache_with_fake_redis):
+        assert await cache_with_fake_redis.get_inline_cache("q") is None
+        await cache_with_fake_redis.set_inline_cache("q", [{"video_id": "x"}])
+        assert await cache_with_fake_redis.get_inline_cache("q") == [{"video_id": "x"}]
+
+    async def test_result_cache_ram_only(self, cache_with_fake_redis):
+        assert await cache_with_fake_redis.get_result_cache("nothing here", disk=False) is None
+
 
 @pytest.mark.asyncio
 class TestCacheSearch:
@@ -386,6 +386,21 @@ class TestSearchLocalTracks:
 
         assert results == []
 
+    async def test_search_text_precomputed_on_insert(self, db_session):
+        t = Track(source_id="local_search_norm", source="youtube", title="Мотылёк (Official Video)", artist="Макс Корж")
+        db_session.add(t)
+        await db_session.commit()
+        assert t.search_text == "макс корж мотылёк"
+
+        with patch("bot.db.async_session") as mock_sm:
+            mock_sm.return_value.__aenter__ = lambda s: db_session.__aenter__()
+            mock_sm.return_value.__aexit__ = lambda s, *a: db_session.__aexit__(*a)
+
+            from bot.db import search_local_tracks
+            results = await search_local_tracks("Макс Корж Мотылёк")
+
+        assert any(r.source_id == "local_search_norm" for r in results)
+
     async def test_search_respects_limit(self, db_session):
         for i in range(10):
             db_session.add(Track(
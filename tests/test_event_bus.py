@@ -0,0 +1,146 @@
+"""
+Тесты для webapp/event_bus.py (SSE fan-out через Redis Streams + pub/sub)
+"""
+import asyncio
+import json
+import time
+
+import fakeredis
+import fakeredis.aioredis
+import pytest
+
+from webapp.event_bus import SSEHub, SSESubscriber
+
+
+def _payload(event: str, **data) -> str:
+    return json.dumps({"event": event, "data": data})
+
+
+async def _connected():
+    return False
+
+
+async def _next_frame(agen, timeout: float = 2.0) -> str:
+    return await asyncio.wait_for(agen.__anext__(), timeout=timeout)
+
+
+@pytest.fixture
+async def hubs():
+    server = fakeredis.FakeServer()
+    r1 = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+    r2 = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+    a, b = SSEHub(lambda: r1), SSEHub(lambda: r2)
+    yield a, b
+    await a.close()
+    await b.close()
+
+
+class TestSubscriberMailbox:
+    async def test_coalesces_to_latest_per_event(self):
+        sub = SSESubscriber("party:X", buffer=2)
+        for i in range(5):
+            sub.push(f"1-{i}", "queue_reordered", _payload("queue_reordered", n=i))
+        sub.push("1-9", "chat", _payload("chat", m="hi"))
+        items = await sub.drain(timeout=0.1)
+        assert [e for _, e, _ in items] == ["queue_reordered", "chat", "resync"]
+        assert json.loads(items[0][2])["data"]["n"] == 4
+        assert json.loads(items[2][2])["resync"] is True
+        assert sub.coalesced == 4
+
+    async def test_dropped_content_forces_one_resync(self):
+        sub = SSESubscriber("party:X", buffer=2)
+        for i in range(3):
+            sub.push(f"1-{i}", "chat", _payload("chat", message=f"m{i}"))
+        assert [e for _, e, _ in await sub.drain(timeout=0.1)] == ["chat", "resync"]
+        sub.push("2-0", "chat", _payload("chat", message="next"))
+        assert [e for _, e, _ in await sub.drain(timeout=0.1)] == ["chat"]
+
+    async def test_drain_times_out_empty(self):
+        sub = SSESubscriber("party:X")
+        assert await sub.drain(timeout=0.01) == []
+
+
+class TestSSEHub:
+    async def test_cross_worker_delivery(self, hubs):
+        a, b = hubs
+        sub, count = await b.subscribe("party:ABC")
+        assert count == 1
+        agen = b.stream(sub, _connected)
+        event_id = await a.publish("party:ABC", "track_added", {"video_id": "v1"})
+        frame = await _next_frame(agen)
+        assert frame.startswith(f"id: {event_id}\n")
+        assert json.loads(frame.split("data: ", 1)[1])["data"]["video_id"] == "v1"
+        await agen.aclose()
+
+    async def test_cluster_count(self, hubs):
+        a, b = hubs
+        s1, _ = await a.subscribe("broadcast")
+        _, count = await b.subscribe("broadcast")
+        assert count == 2
+        assert a.local_count("broadcast") == 1
+        assert await b.count("broadcast") == 2
+        assert await a.unsubscribe(s1) == 1
+
+    async def test_dead_worker_counts_expire(self, hubs, monkeypatch):
+        import webapp.event_bus as event_bus
+
+        a, b = hubs
+        await a.subscribe("broadcast")
+        await b.subscribe("broadcast")
+        assert await b.count("broadcast") == 2
+        # Worker a dies without unsubscribing: its heartbeat goes stale
+        real_time = time.time
+        monkeypatch.setattr(event_bus.time, "time", lambda: real_time() + 2 * event_bus._WORKER_TTL)
+        await b._heartbeat(force=True)
+        assert await b.count("broadcast") == 1
+        assert list(await b.redis.hkeys("sse:subs:broadcast")) == [b._worker_id]
+
+    async def test_resume_from_last_event_id(self, hubs):
+        a, b = hubs
+        first = await a.publish("party:R", "chat", {"n": 1})
+        await a.publish("party:R", "chat", {"n": 2})
+        await a.publish("party:R", "chat", {"n": 3})
+        sub, _ = await b.subscribe("party:R")
+        agen = b.stream(sub, _connected, last_event_id=first)
+        frames = [await _next_frame(agen), await _next_frame(agen)]
+        assert [json.loads(f.split("data: ", 1)[1])["data"]["n"] for f in frames] == [2, 3]
+        await agen.aclose()
+
+    async def test_replay_from_trimmed_id_forces_resync(self, hubs, monkeypatch):
+        import webapp.event_bus as event_bus
+
+        a, b = hubs
+        first = await a.publish("party:T", "chat", {"n": 1})
+        for n in range(2, 6):
+            await a.publish("party:T", "chat", {"n": n})
+        await a.redis.xtrim("sse:party:T", maxlen=2)     # n=1..3 trimmed away
+        replayed = await b.replay("party:T", first)
+        assert [json.loads(p)["data"].get("n") for _, _, p in replayed[:-1]] == [4, 5]
+        assert replayed[-1][:2] == (None, event_bus.RESYNC_EVENT)
+
+        intact = await b.replay("party:T", replayed[0][0])
+        assert [e for _, e, _ in intact] == ["chat"]
+
+    async def test_replayed_events_not_delivered_twice(self):
+        sub = SSESubscriber("party:D")
+        hub = SSEHub(lambda: None)
+        sub.last_id = "5-0"
+        sub.push("4-0", "chat", _payload("chat", n=4))
+        sub.push("6-0", "chat", _payload("chat", n=6))
+        agen = hub.stream(sub, _connected)
+        frame = await _next_frame(agen)
+        assert frame.startswith("id: 6-0\n")
+        await agen.aclose()
+
+    async def test_redis_failure_falls_back_to_local(self):
+        class _Down:
+            def __getattr__(self, name):
+                raise ConnectionError("redis down")
+
+        hub = SSEHub(lambda: _Down())
+        sub = SSESubscriber("broadcast")
+        hub._subscribers["broadcast"] = {sub}
+        assert await hub.publish("broadcast", "stopped", {}) is None
+        items = await sub.drain(timeout=0.1)
+        assert [e for _, e, _ in items] == ["stopped"]
+        await hub.close()
@@ -14,13 +14,22 @@ def _make_inline_query(query_text="", user_id=111):
     return iq
 
 
+def _fake_cache():
+    c = MagicMock()
+    c.get_inline_cache = AsyncMock(return_value=None)
+    c.set_inline_cache = AsyncMock()
+    c.get_result_cache = AsyncMock(return_value=None)
+    c.get_file_ids = AsyncMock(return_value={})
+    return c
+
+
 def _patch_inline():
     """Patch all 3 search sources + cache for inline tests."""
     return (
         patch("bot.handlers.inline.search_local_tracks", new_callable=AsyncMock, return_value=[]),
         patch("bot.handlers.inline.search_yandex", new_callable=AsyncMock, return_value=[]),
         patch("bot.handlers.inline.search_tracks", new_callable=AsyncMock, return_value=[]),
-        patch("bot.handlers.inline.cache"),
+        patch("bot.handlers.inline.cache", _fake_cache()),
     )
 
 
@@ -53,7 +62,7 @@ class TestHandleInlineQuery:
                 "duration_fmt": "3:20",
                 "source": "youtube",
             }]
-            m_cache.get_file_id = AsyncMock(return_value="AgACAgIAA...")
+            m_cache.get_file_ids = AsyncMock(return_value={"abc": "AgACAgIAA..."})
 
             iq = _make_inline_query("test")
             await handle_inline_query(iq)
@@ -73,7 +82,7 @@ class TestHandleInlineQuery:
                 "duration_fmt": "3:20",
                 "source": "youtube",
             }]
-            m_cache.get_file_id = AsyncMock(return_value=None)
+            m_cache.get_file_ids = AsyncMock(return_value={})
 
             iq = _make_inline_query("test")
             await handle_inline_query(iq)
@@ -101,9 +110,128 @@ class TestHandleInlineQuery:
                 {"video_id": "a", "title": "Song A", "uploader": "Art1", "duration_fmt": "3:00", "source": "youtube"},
                 {"video_id": "b", "title": "Song B", "uploader": "Art2", "duration_fmt": "4:00", "source": "youtube"},
             ]
-            m_cache.get_file_id = AsyncMock(side_effect=["AgACfid", None])
+            m_cache.get_file_ids = AsyncMock(return_value={"a": "AgACfid"})
 
             iq = _make_inline_query("test")
             await handle_inline_query(iq)
             results = iq.answer.call_args[0][0]
             assert len(results) == 2
+            # file_ids resolved with a single batched lookup
+            m_cache.get_file_ids.assert_awaited_once()
+            assert sorted(m_cache.get_file_ids.call_args[0][0]) == ["a", "b"]
+
+
+class TestInlineFastPath:
+    @pytest.mark.asyncio
+    async def test_inline_cache_hit_skips_providers(self):
+        from bot.handlers.inline import handle_inline_query
+        p_local, p_ym, p_yt, p_cache = _patch_inline()
+        with p_local as m_local, p_ym as m_ym, p_yt as m_yt, p_cache as m_cache:
+            m_cache.get_inline_cache = AsyncMock(return_value=[
+                {"video_id": "c1", "title": "Cached", "uploader": "Art", "source": "yandex"},
+            ])
+            iq = _make_inline_query("cached query")
+            await handle_inline_query(iq)
+
+            m_local.assert_not_called()
+            m_ym.assert_not_called()
+            m_yt.assert_not_called()
+            assert len(iq.answer.call_args[0][0]) == 1
+            assert iq.answer.call_args.kwargs["cache_time"] == 60
+
+    @pytest.mark.asyncio
+    async def test_over_budget_answers_partial_and_keeps_warming(self):
+        import asyncio
+        from bot.handlers.inline import handle_inline_query
+
+        async def _slow_yandex(*a, **kw):
+            await asyncio.sleep(0.3)
+            return [{"video_id": "ym1", "title": "Slow", "uploader": "Art", "source": "yandex"}]
+
+        local = MagicMock(source_id="loc1", title="Local", artist="Art", duration=200, source="channel", file_id=None)
+        p_local, p_ym, p_yt, p_cache = _patch_inline()
+        with p_local as m_local, p_ym as m_ym, p_yt, p_cache as m_cache, \
+                patch("bot.handlers.inline.settings.INLINE_ANSWER_BUDGET_SEC", 0.1), \
+                patch("bot.handlers.inline.settings.INLINE_DEBOUNCE_SEC", 0.0):
+            m_local.return_value = [local]
+            m_ym.side_effect = _slow_yandex
+            iq = _make_inline_query("slow query", user_id=222)
+            await handle_inline_query(iq)
+
+            results = iq.answer.call_args[0][0]
+            assert [r.id for r in results] == ["loc1"]
+            assert iq.answer.call_args.kwargs["cache_time"] == 5
+
+            await asyncio.sleep(0.4)
+            m_cache.set_inline_cache.assert_awaited_once()
+            warmed_ids = {r["video_id"] for r in m_cache.set_inline_cache.call_args[0][1]}
+            assert {"loc1", "ym1"} <= warmed_ids
+
+    @pytest.mark.asyncio
+    async def test_longer_prefix_supersedes_in_flight_search(self):
+        import asyncio
+        from bot.handlers import inline
+
+        started = asyncio.Event()
+
+        async def _hanging(*a, **kw):
+            started.set()
+            await asyncio.sleep(10)
+            return []
+
+        p_local, p_ym, p_yt, p_cache = _patch_inline()
+        with p_local, p_ym as m_ym, p_yt, p_cache, \
+                patch("bot.handlers.inline.settings.INLINE_ANSWER_BUDGET_SEC", 5.0), \
+                patch("bot.handlers.inline.settings.INLINE_DEBOUNCE_SEC", 0.0):
+            m_ym.side_effect = _hanging
+            first = asyncio.create_task(inline.handle_inline_query(_make_inline_query("metal", user_id=333)))
+            await started.wait()
+            norm, task = inline._user_inflight[333]
+            assert norm == "metal"
+
+            m_ym.side_effect = None
+            m_ym.return_value = []
+            await inline.handle_inline_query(_make_inline_query("metallica", user_id=333))
+            await asyncio.wait_for(first, timeout=1)
+            assert task.cancelled()
+
+    @pytest.mark.asyncio
+    async def test_debounced_keystroke_skips_provider_fanout(self):
+        import asyncio
+        from bot.handlers import inline
+
+        p_local, p_ym, p_yt, p_cache = _patch_inline()
+        with p_local, p_ym as m_ym, p_yt, p_cache, \
+                patch("bot.handlers.inline.settings.INLINE_DEBOUNCE_SEC", 0.05):
+            stale = asyncio.create_task(inline.handle_inline_query(_make_inline_query("ab", user_id=444)))
+            await asyncio.sleep(0)
+            await inline.handle_inline_query(_make_inline_query("abc", user_id=444))
+            await stale
+            queries = [c.args[0] for c in m_ym.call_args_list]
+            assert queries == ["abc"]
+
+    @pytest.mark.asyncio
+    async def test_detached_fanouts_are_held_and_capped_per_user(self):
+        import asyncio
+        from bot.handlers import inline
+
+        async def _hanging(*a, **kw):
+            await asyncio.sleep(10)
+            return []
+
+        p_local, p_ym, p_yt, p_cache = _patch_inline()
+        with p_local, p_ym as m_ym, p_yt, p_cache, \
+                patch("bot.handlers.inline.settings.INLINE_ANSWER_BUDGET_SEC", 0.01), \
+                patch("bot.handlers.inline.settings.INLINE_DEBOUNCE_SEC", 0.0):
+            m_ym.side_effect = _hanging
+            # Unrelated queries: nothing supersedes them, they run detached
+            for q in ("queen", "abba", "muse", "kino"):
+                await inline.handle_inline_query(_make_inline_query(q, user_id=555))
+            running = list(inline._user_fanouts[555])
+            assert len(running) == inline._MAX_USER_FANOUTS
+            assert set(running) <= inline._fanouts
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+            assert 555 not in inline._user_fanouts
+            assert not set(running) & inline._fanouts
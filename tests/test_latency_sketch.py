@@ -0,0 +1,72 @@
+"""Tests for bot/services/latency_sketch.py (DDSketch with time decay)."""
+import json
+import random
+
+import pytest
+
+from bot.services.latency_sketch import LatencySketch
+
+
+def _exact(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(q * len(values) + 0.999999) - 1))]
+
+
+class TestLatencySketch:
+    def test_quantiles_within_relative_error(self):
+        rng = random.Random(7)
+        values = [rng.lognormvariate(0, 1) for _ in range(20_000)]
+        sketch = LatencySketch(alpha=0.02, half_life=1e9)
+        for v in values:
+            sketch.add(v, now=0)
+        for q in (0.5, 0.95, 0.99):
+            assert sketch.quantile(q) == pytest.approx(_exact(values, q), rel=0.021)
+        assert sketch.mean == pytest.approx(sum(values) / len(values))
+        assert len(sketch) < 600
+
+    def test_empty_and_zero_values(self):
+        sketch = LatencySketch()
+        assert sketch.quantile(0.95) == 0.0 and sketch.mean == 0.0
+        sketch.add(0.0)
+        assert sketch.quantile(0.5) == 0.0
+
+    def test_merge_equals_single_sketch(self):
+        a, b, both = (LatencySketch(half_life=1e9) for _ in range(3))
+        for i in range(1, 1001):
+            (a if i % 2 else b).add(i / 100, now=0)
+            both.add(i / 100, now=0)
+        a.merge(b)
+        for q in (0.5, 0.95, 0.99):
+            assert a.quantile(q) == both.quantile(q)
+        assert a.count == both.count
+
+    def test_merge_rejects_different_alpha(self):
+        with pytest.raises(ValueError):
+            LatencySketch(alpha=0.01).merge(LatencySketch(alpha=0.05))
+
+    def test_decay_forgets_old_distribution(self):
+        sketch = LatencySketch(half_life=60)
+        for _ in range(100):
+            sketch.add(10.0, now=0)
+        assert sketch.quantile(0.5) == pytest.approx(10.0, rel=0.025)
+        for _ in range(100):
+            sketch.add(0.5, now=600)          # ten half-lives later
+        assert sketch.quantile(0.95) == pytest.approx(0.5, rel=0.025)
+        assert sketch.count < 101
+
+    def test_collapse_bounds_buckets(self):
+        sketch = LatencySketch(max_buckets=16, half_life=1e9)
+        for i in range(1, 2000):
+            sketch.add(i / 1000, now=0)
+        assert len(sketch) <= 16
+        assert sketch.quantile(0.99) == pytest.approx(1.98, rel=0.03)
+
+    def test_roundtrip_is_compact(self):
+        sketch = LatencySketch(half_life=1e9)
+        for i in range(5000):
+            sketch.add(0.2 + (i % 300) / 100, now=0)
+        data = sketch.to_dict()
+        assert len(json.dumps(data)) < 2000
+        restored = LatencySketch.from_dict(data, half_life=1e9)
+        assert restored.quantile(0.95) == pytest.approx(sketch.quantile(0.95))
+        assert restored.count == pytest.approx(sketch.count)
@@ -0,0 +1,176 @@
+"""
+Тесты для bot/services/mass_sender.py (rate-governed mass messaging)
+"""
+import asyncio
+import time
+
+import fakeredis.aioredis
+import pytest
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+)
+from aiogram.methods import SendMessage
+
+from bot.services.mass_sender import MassSender, TokenBucket
+
+
+def _method(chat_id=1):
+    return SendMessage(chat_id=chat_id, text="x")
+
+
+class _FakeBot:
+    """Records sends; per-user scripted failures (lists are consumed in order)."""
+
+    def __init__(self, script=None, latency=0.0):
+        self.script = {uid: list(errs) for uid, errs in (script or {}).items()}
+        self.latency = latency
+        self.sent: list[tuple[int, float]] = []
+        self.active = 0
+        self.max_active = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.latency)
+            errors = self.script.get(chat_id)
+            if errors and (error := errors.pop(0)) is not None:
+                raise error
+            self.sent.append((chat_id, time.monotonic()))
+        finally:
+            self.active -= 1
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.aioredis.FakeRedis(decode_responses=True)
+
+
+class _Blocked:
+    def __init__(self):
+        self.batches = []
+
+    async def __call__(self, user_ids):
+        self.batches.append(sorted(user_ids))
+
+
+def _sender(bot, redis, **kw):
+    kw.setdefault("rate", 1000)
+    kw.setdefault("per_chat_interval", 0)
+    kw.setdefault("workers", 4)
+    kw.setdefault("batch_size", 10)
+    kw.setdefault("blocked_handler", _Blocked())
+    return MassSender(bot, redis_factory=lambda: redis, **kw)
+
+
+def _send(b, uid):
+    return b.send_message(uid, "hello")
+
+
+class TestTokenBucket:
+    async def test_rate_is_enforced(self):
+        bucket = TokenBucket(rate=100, capacity=1)
+        t0 = time.monotonic()
+        for _ in range(11):
+            await bucket.acquire()
+        assert time.monotonic() - t0 >= 0.09
+
+    async def test_pause_blocks_until_flood_wait_is_over(self):
+        bucket = TokenBucket(rate=1000)
+        bucket.pause(0.05)
+        t0 = time.monotonic()
+        await bucket.acquire()
+        assert time.monotonic() - t0 >= 0.045
+
+
+class TestMassSender:
+    async def test_outcomes_and_batched_flags(self, redis):
+        bot = _FakeBot(script={
+            3: [TelegramForbiddenError(_method(3), "Forbidden: bot was blocked by the user")],
+            5: [TelegramBadRequest(_method(5), "Bad Request: user is deactivated")],
+            7: [TelegramBadRequest(_method(7), "Bad Request: chat not found")],
+        })
+        batches = []
+
+        async def on_batch(result):
+            batches.append(result)
+
+        sender = _sender(bot, redis)
+        report = await sender.run("t1", range(1, 13), _send, on_batch=on_batch)
+
+        assert (report.delivered, report.blocked, report.failed) == (9, 2, 1)
+        assert sorted(uid for uid, _ in bot.sent) == [1, 2, 4, 6, 8, 9, 10, 11, 12]
+        assert sender._blocked_handler.batches == [[3, 5]]
+        assert len(batches) == 2 and sorted(batches[0].failed) == [7]
+        assert bot.max_active <= 4
+
+    async def test_retry_after_pauses_and_retries(self, redis):
+        bot = _FakeBot(script={2: [TelegramRetryAfter(_method(2), "Flood", retry_after=0)]})
+        sender = _sender(bot, redis)
+        paused = []
+        original = sender.bucket.pause
+        sender.bucket.pause = lambda s: (paused.append(s), original(s))
+        report = await sender.run("t2", [1, 2, 3], _send)
+        assert report.delivered == 3 and paused == [0]
+
+    async def test_retry_after_repeats_only_the_failed_message(self, redis):
+        bot = _FakeBot(script={2: [None, TelegramRetryAfter(_method(2), "Flood", retry_after=0)]})
+
+        async def send_two(b, uid):
+            await b.send_message(uid, "recap")
+            await b.send_message(uid, "card")
+
+        report = await _sender(bot, redis).run("t2b", [1, 2], send_two)
+        assert report.delivered == 2
+        assert [uid for uid, _ in bot.sent].count(2) == 2
+
+    async def test_transient_errors_retry_then_fail(self, redis, monkeypatch):
+        from bot.services import mass_sender
+        monkeypatch.setattr(mass_sender, "_BACKOFF_BASE", 0.001)
+        bot = _FakeBot(script={
+            1: [TelegramNetworkError(_method(1), "timeout")],
+            2: [TelegramNetworkError(_method(2), "timeout")] * 3,
+        })
+        report = await _sender(bot, redis).run("t3", [1, 2], _send)
+        assert (report.delivered, report.failed) == (1, 1)
+
+    async def test_resumes_after_checkpoint(self, redis):
+        bot = _FakeBot()
+        sender = _sender(bot, redis, batch_size=5)
+
+        async def send(b, uid):
+            if uid == 8:
+                raise asyncio.CancelledError  # process killed mid-batch
+            await b.send_message(uid, "hi")
+
+        with pytest.raises(asyncio.CancelledError):
+            await sender.run("t4", range(1, 13), send)
+        assert (await redis.hgetall("mass:t4"))["cursor"] == "5"
+
+        bot.sent.clear()
+        report = await sender.run("t4", range(1, 13), _send)
+        assert report.resumed_from == 5
+        assert sorted(uid for uid, _ in bot.sent) == list(range(6, 13))
+        state = await redis.hgetall("mass:t4")
+        assert "cursor" not in state and "finished_at" in state
+
+    async def test_per_chat_spacing(self, redis):
+        bot = _FakeBot()
+        sender = _sender(bot, redis, per_chat_interval=0.05)
+
+        async def send_twice(b, uid):
+            await b.send_message(uid, "text")
+            await b.send_message(uid, "card")
+
+        await sender.run("t5", [1], send_twice)
+        (_, first), (_, second) = bot.sent
+        assert second - first >= 0.045
+
+    async def test_progress_checkpoint_reports_rate(self, redis):
+        await _sender(_FakeBot(), redis, batch_size=3).run("t6", range(1, 8), _send)
+        state = await redis.hgetall("mass:t6")
+        assert state["delivered"] == "7" and state["total"] == "7"
+        assert float(state["rate"]) > 0
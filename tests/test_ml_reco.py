@@ -69,6 +69,180 @@ class TestModelStore:
             assert model_exists()
 
 
+class TestMmapModelStore:
+    async def test_save_and_load_mmap_als(self, tmp_path):
+        from recommender.model_store import ModelStore
+        uf = np.arange(6, dtype=np.float32).reshape(3, 2)
+        itf = np.array([[1, 0], [0, 1], [1, 1]], dtype=np.float32)
+        writer = ModelStore(tmp_path)
+        # Rows in arbitrary id order: the store re-sorts them by id
+        await writer.save_als(uf, itf, {30: 0, 10: 1, 20: 2}, {300: 0, 100: 1, 200: 2}, {"yt_a": 100}, version=1,
+                              trained_at=1234.5)
+
+        reader = ModelStore(tmp_path)
+        assert await reader.load_latest()
+        assert reader.snapshot().trained_at == 1234.5
+        assert reader.version == 1 and reader.n_users == 3 and reader.n_tracks == 3
+        assert isinstance(reader.get_item_factors(), np.memmap)
+        for user_id, row in ((30, 0), (10, 1), (20, 2)):
+            assert reader.get_user_factors()[reader.get_user_idx(user_id)].tolist() == uf[row].tolist()
+        assert reader.get_user_idx(99) is None
+        assert reader.get_track_indices([200, 5, 300]).tolist() == [1, -1, 2]
+        assert reader.get_track_id(reader.get_track_idx(300)) == 300
+        assert reader.get_source_track_id("yt_a") == 100
+        assert reader.get_source_track_id("yt_b") is None
+        top = reader.recommend_for_user(reader.get_user_idx(20), n=1)
+        assert reader.get_track_id(top[0][0]) == 200  # user [4, 5] · item [0, 1] wins
+
+    async def test_new_version_keeps_old_files_and_prunes(self, tmp_path):
+        from recommender.model_store import ModelStore
+        store = ModelStore(tmp_path)
+        f = np.ones((1, 2), dtype=np.float32)
+        for version in range(1, 6):
+            await store.save_als(f, f, {1: 0}, {2: 0}, {}, version=version)
+        assert sorted(p.name for p in (tmp_path / "als").glob("v*")) == ["v003", "v004", "v005"]
+        assert store.get_latest_version() == 5
+
+    async def test_loads_pre_mmap_npz_format(self, tmp_path):
+        from recommender.model_store import ModelStore
+        als_dir = tmp_path / "als"
+        als_dir.mkdir()
+        np.savez_compressed(
+            als_dir / "model_v002.npz",
+            user_factors=np.array([[1.0], [2.0]], dtype=np.float32),
+            item_factors=np.array([[3.0], [4.0]], dtype=np.float32),
+        )
+        (als_dir / "mappings_v002.json").write_text(json.dumps({
+            "user_map": {"9": 0, "5": 1}, "track_map": {"7": 1, "8": 0}, "source_map": {"s": 7},
+        }))
+        (als_dir / "latest.txt").write_text("002")
+
+        store = ModelStore(tmp_path)
+        assert await store.load_latest()
+        assert store.get_user_factors()[store.get_user_idx(5)].tolist() == [2.0]
+        assert store.get_item_factors()[store.get_track_idx(7)].tolist() == [4.0]
+        assert store.get_source_track_id("s") == 7
+
+    async def test_mmap_word_vectors(self, tmp_path):
+        from recommender.model_store import ModelStore
+
+        class _KV:
+            index_to_key = ["c", "a", "b"]
+            vectors = np.array([[1, 0], [1, 0.1], [0, 1]], dtype=np.float32)
+
+        await ModelStore(tmp_path).save_w2v(_KV(), version=1)
+        store = ModelStore(tmp_path)
+        await store.load_latest()
+        assert store.w2v_ready
+        assert store.get_track_vector("b").tolist() == [0.0, 1.0]
+        assert store.get_track_vector("zzz") is None
+        similar = store.get_similar_tracks("c", topn=2)
+        assert [key for key, _ in similar] == ["a", "b"]
+        assert similar[0][1] == pytest.approx(1 / np.sqrt(1.01))
+
+
+class TestModelHotReload:
+    async def test_published_version_is_swapped_in(self, tmp_path):
+        import asyncio
+        import fakeredis.aioredis
+        from recommender.model_store import ModelStore
+
+        redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        trainer = ModelStore(tmp_path, redis_factory=lambda: redis)
+        worker = ModelStore(tmp_path, redis_factory=lambda: redis)
+        f = np.ones((1, 2), dtype=np.float32)
+        await trainer.save_als(f, f, {1: 0}, {10: 0}, {}, version=1)
+        assert await worker.load_latest(force=False)
+        served = worker._als
+
+        worker.start_reloader()
+        try:
+            await asyncio.sleep(0.1)  # subscribed
+            # Unchanged pointer: nothing is re-mapped
+            assert await worker.load_latest(force=False)
+            assert worker._als is served
+
+            await trainer.save_als(f * 2, f, {1: 0, 2: 0}, {10: 0}, {}, version=2)
+            await trainer.publish_version(2)
+            for _ in range(50):
+                if worker.version == 2:
+                    break
+                await asyncio.sleep(0.05)
+            assert worker.version == 2 and worker.n_users == 2
+            # The old snapshot stays intact for calls that were already using it
+            assert served.version == 1 and served.user_factors.tolist() == [[1.0, 1.0]]
+        finally:
+            await worker.stop_reloader()
+
+
+class TestFoldInAndWarmStart:
+    @pytest.fixture
+    async def store(self, tmp_path):
+        from recommender.model_store import ModelStore
+        rng = np.random.default_rng(7)
+        store = ModelStore(tmp_path)
+        await store.swap(
+            rng.normal(size=(2, 4)).astype(np.float32),
+            rng.normal(size=(6, 4)).astype(np.float32),
+            {1: 0, 2: 1},
+            {100 + i: i for i in range(6)},
+            {}, version=1,
+        )
+        return store
+
+    def test_fold_in_solves_the_implicit_als_user_step(self, store):
+        als = store.snapshot()
+        y = als.item_factors.astype(np.float64)
+        conf = np.ones(6)
+        conf[[1, 4]] = [3.0, 2.0]  # track 101 played three times, 104 twice
+        pref = (conf > 1).astype(np.float64)
+        expected = np.linalg.solve(
+            y.T @ np.diag(conf) @ y + als.regularization * np.eye(4), y.T @ (conf * pref)
+        )
+        folded = store.fold_in_user([101, 104, 101, 999, 104, 101])
+        assert folded == pytest.approx(expected, rel=1e-4, abs=1e-5)
+
+    def test_user_vector_folds_in_unknown_users(self, store):
+        assert store.user_vector(1).tolist() == store.get_user_factors()[0].tolist()
+        assert store.user_vector(3, [100, 101]) is None  # fewer than FOLD_IN_MIN_PLAYS
+        assert store.user_vector(3, [100, 101, 102]) is not None
+        assert store.user_vector(3, [997, 998, 999]) is None  # no track known to the model
+
+    async def test_user_vector_folds_in_known_users_with_newer_plays(self, store):
+        als = store.snapshot()
+        await store.swap(
+            als.user_factors, als.item_factors, {1: 0, 2: 1}, {100 + i: i for i in range(6)},
+            {}, version=2, trained_at=1000.0,
+        )
+        trained = store.get_user_factors()[0].tolist()
+        recent = [100, 101, 102]
+        assert store.user_vector(1, recent, last_play_at=900.0).tolist() == trained
+        assert store.user_vector(1, recent).tolist() == trained  # no timestamp: nothing to compare
+        folded = store.user_vector(1, recent, last_play_at=1001.0)
+        assert folded.tolist() == store.fold_in_user(recent).tolist() != trained
+        # Too little to fold in: keep the trained row rather than dropping the user
+        assert store.user_vector(1, [100], last_play_at=1001.0).tolist() == trained
+
+    def test_scorer_uses_folded_in_vector(self, store):
+        from recommender.scorer import HybridScorer
+        with patch("recommender.scorer.model_store", store):
+            scores = HybridScorer(embeddings=MagicMock())._get_als_scores(3, [103, 105], [100, 101, 102])
+        assert set(scores) == {103, 105}
+
+    def test_warm_start_reuses_known_factors(self, store):
+        from recommender.train import warm_start_factors
+        prev = store.snapshot()
+        user_ids = np.array([2, 5])
+        track_ids = np.array([100, 101, 102, 103, 777])
+        uf, itf = warm_start_factors(prev, user_ids, track_ids, factors=4)
+        assert uf[0].tolist() == prev.user_factors[1].tolist()
+        assert np.abs(uf[1]).max() <= 0.01  # new user: small random init
+        assert itf[:4].tolist() == prev.item_factors[:4].tolist()
+        # Mostly unknown tracks or other dimensionality → cold start
+        assert warm_start_factors(prev, user_ids, np.array([100, 801, 802]), factors=4) is None
+        assert warm_start_factors(prev, user_ids, track_ids, factors=8) is None
+
+
 # ── Embeddings ──────────────────────────────────────────────────────────
 
 class TestEmbeddings:
@@ -188,3 +362,249 @@ class TestScorer:
             )
             # Track 20 has highest ALS score
             assert result[0] == 20
+
+
+# ── Interaction export ──────────────────────────────────────────────────
+
+def _legacy_weight(action, listen, duration):
+    from recommender.config import ACTION_WEIGHTS
+    weight = ACTION_WEIGHTS.get(action, 0.5)
+    if listen and duration and duration > 0:
+        ratio = listen / duration
+        if ratio > 0.8:
+            weight *= 1.5
+        elif ratio < 0.3:
+            weight *= 0.5
+    return weight
+
+
+class TestInteractionExport:
+    def test_weights_match_per_row_rules(self):
+        from recommender.data_extractor import interaction_weights
+        rows = [
+            ("play", 190, 200), ("play", 30, 200), ("play", 100, 200),
+            ("like", None, 200), ("skip", 10, None), ("dislike", 0, 0), ("radio", 50, 100),
+        ]
+        actions, listens, durations = zip(*rows)
+        weights = interaction_weights(actions, listens, durations)
+        assert weights.tolist() == pytest.approx([_legacy_weight(*r) for r in rows])
+
+    def test_matrix_sums_duplicate_pairs(self):
+        from recommender.data_extractor import interaction_matrix
+        users = np.array([7_000_000_000, 5, 7_000_000_000, 5], dtype=np.int64)
+        tracks = np.array([30, 10, 30, 30], dtype=np.int64)
+        matrix, user_ids, track_ids = interaction_matrix(users, tracks, np.ones(4, dtype=np.float32))
+        assert user_ids.tolist() == [5, 7_000_000_000]
+        assert track_ids.tolist() == [10, 30]
+        assert matrix.toarray().tolist() == [[1.0, 1.0], [0.0, 2.0]]
+
+    def test_accumulator_folds_then_stops_at_ceiling(self):
+        from recommender.data_extractor import InteractionAccumulator
+        acc = InteractionAccumulator(max_bytes=20 * 20)  # folds above 10 buffered rows
+        ones = np.ones(8, dtype=np.float32)
+        # Same 2 pairs repeated: folding keeps the buffer tiny
+        for _ in range(5):
+            assert acc.add(np.array([1, 2] * 4), np.array([9, 9] * 4), ones)
+        matrix, _, _ = acc.to_csr()
+        assert matrix.toarray().ravel().tolist() == [20.0, 20.0]
+        # 12 distinct pairs cannot be folded below the ceiling
+        assert not acc.add(np.arange(12), np.arange(12), np.ones(12, dtype=np.float32))
+
+    def test_sessions_from_columns_match_tuple_version(self):
+        from datetime import datetime, timedelta
+        from recommender.embeddings import build_sessions_from_columns
+        now = datetime(2026, 1, 1)
+        plays = [
+            (1, 100, now), (1, 200, now + timedelta(minutes=5)), (1, 300, now + timedelta(minutes=10)),
+            (1, 400, now + timedelta(hours=1)), (1, 500, now + timedelta(hours=1, minutes=5)),
+            (2, 100, now), (2, 200, now + timedelta(minutes=5)), (3, 700, now),
+        ]
+        shuffled = plays[::-1]
+        sessions = build_sessions_from_columns(
+            np.array([p[0] for p in shuffled]),
+            np.array([p[1] for p in shuffled]),
+            np.array([p[2].timestamp() for p in shuffled]),
+        )
+        assert sessions == build_sessions(plays)
+
+    async def test_extract_interactions_streams_chunks(self, engine, db_tables, db_session):
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+        from bot.models.track import ListeningHistory, Track
+        from bot.models.user import User
+        from recommender import data_extractor
+
+        db_session.add_all([User(id=901, first_name="A"), User(id=902, first_name="B")])
+        t1 = Track(source_id="exp_t1", title="One", duration=200, file_id="f1")
+        t2 = Track(source_id="exp_t2", title="Two", duration=200, file_id="f2")
+        db_session.add_all([t1, t2])
+        await db_session.flush()
+        db_session.add_all([
+            ListeningHistory(user_id=901, track_id=t1.id, action="play", listen_duration=190),
+            ListeningHistory(user_id=901, track_id=t1.id, action="like"),
+            ListeningHistory(user_id=902, track_id=t2.id, action="skip", listen_duration=20),
+        ])
+        await db_session.commit()
+        try:
+            with patch.object(data_extractor, "async_session", async_sessionmaker(engine)):
+                matrix, user_map, track_map, source_map = await data_extractor.extract_interactions(
+                    chunk_rows=1, max_bytes=1 << 20
+                )
+            assert matrix[user_map[901], track_map[t1.id]] == pytest.approx(1.5 + 2.0)
+            assert matrix[user_map[902], track_map[t2.id]] == pytest.approx(0.3 * 0.5)
+            assert source_map == {"exp_t1": t1.id, "exp_t2": t2.id}
+        finally:
+            for obj in (t1, t2):
+                await db_session.delete(obj)
+            for uid in (901, 902):
+                await db_session.delete(await db_session.get(User, uid))
+            await db_session.commit()
+
+    async def test_export_source_map_covers_trained_tracks(self, engine, db_tables, db_session):
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+        from bot.models.track import Track
+        from recommender import train
+
+        t1 = Track(source_id="src_t1", title="One")
+        t2 = Track(source_id="src_t2", title="Two")
+        db_session.add_all([t1, t2])
+        await db_session.commit()
+        try:
+            with patch("bot.models.base.async_session", async_sessionmaker(engine)):
+                source_map = await train._export_source_map(np.array([t1.id, t2.id, 10**9]), chunk=1)
+            assert source_map == {"src_t1": t1.id, "src_t2": t2.id}
+        finally:
+            for obj in (t1, t2):
+                await db_session.delete(obj)
+            await db_session.commit()
+
+
+# ── Offline evaluation ──────────────────────────────────────────────────
+
+class TestEvaluation:
+    def test_ranking_metrics(self):
+        from recommender.evaluation import ndcg_at_k, recall_at_k
+
+        assert recall_at_k([1, 2, 3], {2, 9}, k=3) == pytest.approx(0.5)
+        assert recall_at_k([1, 2, 3], {1, 2, 3, 4}, k=2) == pytest.approx(1.0)
+        assert ndcg_at_k([2, 1], {2}, k=2) == pytest.approx(1.0)
+        assert ndcg_at_k([1, 2], {2}, k=2) == pytest.approx(1 / np.log2(3))
+        assert recall_at_k([1], set(), k=1) == 0.0
+
+    def test_time_split_scores_only_new_future_tracks(self):
+        from recommender.evaluation import time_split
+        from recommender.train import PlayColumns
+
+        plays = PlayColumns(
+            np.array([1, 1, 1, 2, 2, 3]),
+            np.array([10, 11, 12, 20, 21, 30]),
+            np.array([1.0, 2.0, 9.0, 3.0, 8.0, 10.0]),
+        )
+        split = time_split(plays, test_fraction=0.5)
+        assert split.train.timestamps.max() < split.cutoff
+        # User 3 only appears after the cutoff, so there is nothing to recommend from
+        assert split.test == {1: {12}, 2: {21}}
+
+    def test_synthetic_data_is_newest_first_and_deterministic(self):
+        from recommender.evaluation import synthetic_interactions
+
+        catalog, plays = synthetic_interactions(20, 50, plays_per_user=10, seed=1, now=1e9)
+        again = synthetic_interactions(20, 50, plays_per_user=10, seed=1, now=1e9)[1]
+        assert len(plays.user_ids) == 200 and len(catalog.track_ids) == 50
+        assert np.all(np.diff(plays.timestamps) <= 0) and plays.timestamps.max() <= 1e9
+        assert np.array_equal(plays.track_ids, again.track_ids)
+
+    def test_coverage_novelty_latency(self):
+        from recommender.evaluation import catalog_coverage, latency_summary, novelty
+        from recommender.train import PlayColumns
+
+        train = PlayColumns(np.array([1, 2, 2]), np.array([10, 10, 11]), np.zeros(3))
+        assert catalog_coverage([[10], [10, 11]], catalog_size=4) == pytest.approx(0.5)
+        # 10 reaches every user (0 bits), 11 half of them (1 bit)
+        assert novelty([[10, 11]], train) == pytest.approx(0.5)
+        summary = latency_summary([0.001] * 99 + [0.1])
+        assert summary["p50_ms"] == pytest.approx(1.0) and summary["p99_ms"] > 1.0
+
+
+# ── Batched similarity retrieval ────────────────────────────────────────
+
+class TestSimilarityIndex:
+    @pytest.fixture
+    def index(self):
+        from recommender.retrieval import SimilarityIndex
+
+        rng = np.random.default_rng(37)
+        vectors = rng.normal(size=(200, 16)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return SimilarityIndex(vectors, np.arange(1000, 1200)[::-1].copy())
+
+    def _brute(self, index, query, k, skip=()):
+        sims = index.vectors @ query
+        order = [int(index.track_ids[r]) for r in np.argsort(-sims) if int(index.track_ids[r]) not in skip]
+        return order[:k]
+
+    def test_batch_search_matches_brute_force(self, index):
+        queries = index.vectors[[3, 50, 199]]
+        excluded = [{1196}, set(), set()]
+        results = index.search(queries, k=5, exclude=excluded)
+        for q, skip, hits in zip(queries, excluded, results):
+            assert [tid for tid, _ in hits] == self._brute(index, q, 5, skip)
+        assert all(a[1] >= b[1] for hits in results for a, b in zip(hits, hits[1:]))
+
+    def test_similar_excludes_seed_sets_and_mask(self, index):
+        seed = int(index.track_ids[10])
+        plain = index.similar([seed, 5], k=4)
+        assert plain[1] == []  # unknown seed
+        assert seed not in [tid for tid, _ in plain[0]]
+
+        played = {plain[0][0][0]}
+        banned = index.mask([plain[0][1][0]])
+        filtered = [tid for tid, _ in index.similar([seed], 4, exclude=[played], exclude_mask=banned)[0]]
+        assert not ({plain[0][0][0], plain[0][1][0]} & set(filtered))
+        assert len(filtered) == 4
+
+    def test_precomputed_neighbours_answer_with_exclusions(self, index):
+        seed = int(index.track_ids[0])
+        assert index.precompute_neighbours([seed, 7]) == 1
+        expected = index.similar([seed], 3)[0]
+        with patch.object(index, "search", side_effect=AssertionError("not precomputed")):
+            assert index.similar([seed], 3)[0] == expected
+            skipped = index.similar([seed], 3, exclude=[{expected[0][0]}])[0]
+        assert skipped[0] == expected[1]
+
+    def test_search_blocks_fit_the_byte_budget(self, index):
+        from recommender import retrieval
+
+        queries = index.vectors[:7]
+        expected = index.search(queries, k=3)
+        # 2 queries × 200 tracks × 4 bytes per block
+        with patch.object(retrieval, "_SCORE_BLOCK_BYTES", 2 * 200 * 4), \
+                patch("numpy.argpartition", wraps=np.argpartition) as argpartition:
+            blocked = index.search(queries, k=3)
+        assert [c.args[0].shape[0] for c in argpartition.call_args_list] == [2, 2, 2, 1]
+        for got, want in zip(blocked, expected):
+            assert [tid for tid, _ in got] == [tid for tid, _ in want]
+            assert [sim for _, sim in got] == pytest.approx([sim for _, sim in want], abs=1e-6)
+
+    def test_session_scores_are_cosines(self, index):
+        query, ok = index.session_vectors([[1000, 1001], [1], []])
+        assert ok.tolist() == [True, False, False]
+        scores = index.score(query[0], [1000, 7, 1100])
+        assert set(scores) == {1000, 1100}
+        assert scores[1000] == pytest.approx(float(index.vectors[index.rows([1000])[0]] @ query[0]), rel=1e-5)
+
+    async def test_store_indexes_track_id_vectors_on_load(self, tmp_path):
+        from recommender.model_store import ModelStore
+
+        (tmp_path / "popularity_scores.json").write_text(json.dumps({"11": 1.0, "12": 0.5}))
+        writer = ModelStore(tmp_path)
+        vectors = np.eye(4, dtype=np.float32)[[0, 0, 1, 2]] + 0.01
+        await writer.save_w2v_vectors(vectors, ["11", "12", "13", "yt:abc"], version=1)
+
+        reader = ModelStore(tmp_path)
+        await reader.load_latest()
+        assert reader.similarity is not None and len(reader.similarity) == 3
+        assert reader.similar_track_ids([11], topn=1)[0][0][0] == 12
+        # Neighbour lists were computed when the version was saved and are mapped, not rebuilt
+        assert isinstance(reader.similarity._neighbour_ids, np.memmap)
+        assert reader.similarity._seed_ids.tolist() == [11, 12]
+        assert set(reader.session_scores([11], [12, 13])) == {12, 13}
@@ -0,0 +1,238 @@
+"""
+Тесты для webapp/party_state.py (версионированное состояние пати + JSON-patch)
+"""
+import uuid
+
+import fakeredis
+import fakeredis.aioredis
+import pytest
+
+from webapp.party_state import PartyStateStore, apply_patch, json_diff
+
+
+def _roundtrip(old, new):
+    ops = json_diff(old, new)
+    assert apply_patch(old, ops) == new
+    return ops
+
+
+class TestJsonDiff:
+    def test_equal_is_empty(self):
+        assert json_diff({"a": [1, 2]}, {"a": [1, 2]}) == []
+
+    def test_scalar_replace(self):
+        ops = _roundtrip({"current_position": 1, "name": "x"}, {"current_position": 2, "name": "x"})
+        assert ops == [{"op": "replace", "path": "/current_position", "value": 2}]
+
+    def test_append_to_queue(self):
+        old = {"tracks": [{"video_id": f"v{i}", "position": i} for i in range(50)]}
+        new = {"tracks": old["tracks"] + [{"video_id": "v50", "position": 50}]}
+        ops = _roundtrip(old, new)
+        assert ops == [{"op": "add", "path": "/tracks/50", "value": {"video_id": "v50", "position": 50}}]
+
+    def test_sliding_chat_window(self):
+        old = {"chat_messages": [{"id": i, "message": f"m{i}"} for i in range(30)]}
+        new = {"chat_messages": old["chat_messages"][1:] + [{"id": 30, "message": "m30"}]}
+        ops = _roundtrip(old, new)
+        assert [op["op"] for op in ops] == ["remove", "add"]
+
+    def test_nested_field_change(self):
+        old = {"tracks": [{"video_id": "a", "skip_votes": 0}, {"video_id": "b", "skip_votes": 0}]}
+        new = {"tracks": [{"video_id": "a", "skip_votes": 1}, {"video_id": "b", "skip_votes": 0}]}
+        ops = _roundtrip(old, new)
+        assert ops == [{"op": "replace", "path": "/tracks/0/skip_votes", "value": 1}]
+
+    def test_reshuffle_falls_back_to_replace(self):
+        old = {"tracks": [1, 2, 3, 4, 5]}
+        new = {"tracks": [5, 4, 3, 2, 1]}
+        ops = _roundtrip(old, new)
+        assert ops == [{"op": "replace", "path": "/tracks", "value": [5, 4, 3, 2, 1]}]
+
+    def test_keys_are_escaped(self):
+        _roundtrip({"current_reactions": {}}, {"current_reactions": {"a/b": 1, "~": 2}})
+
+    def test_removed_key(self):
+        _roundtrip({"a": 1, "b": 2}, {"a": 1})
+
+
+@pytest.fixture
+def store_pair():
+    server = fakeredis.FakeServer()
+    r1 = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+    r2 = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+    return PartyStateStore(lambda: r1), PartyStateStore(lambda: r2)
+
+
+class TestPartyStateStore:
+    async def test_partial_without_state_needs_full_load(self, store_pair):
+        a, _ = store_pair
+        assert await a.commit("P1", {"chat_messages": []}, partial=True) is None
+
+    async def test_revisions_shared_between_workers(self, store_pair):
+        a, b = store_pair
+        rev, state, ops = await a.commit("P1", {"name": "x", "chat_messages": []})
+        assert (rev, ops) == (1, [])
+
+        rev, state, ops = await b.commit("P1", {"chat_messages": [{"id": 1}]}, partial=True)
+        assert rev == 2
+        assert state == {"name": "x", "chat_messages": [{"id": 1}]}
+        assert apply_patch({"name": "x", "chat_messages": []}, ops) == state
+        assert await a.get("P1") == (2, state)
+
+    async def test_unchanged_state_keeps_revision(self, store_pair):
+        a, _ = store_pair
+        await a.commit("P1", {"name": "x"})
+        rev, _state, ops = await a.commit("P1", {"name": "x"}, partial=True)
+        assert (rev, ops) == (1, [])
+
+    async def test_drop(self, store_pair):
+        a, b = store_pair
+        await a.commit("P1", {"name": "x"})
+        await b.drop("P1")
+        assert await a.get("P1") is None
+
+    async def test_redis_down_issues_no_revision(self):
+        class _Down:
+            def __getattr__(self, name):
+                raise ConnectionError("redis down")
+
+        store = PartyStateStore(lambda: _Down())
+        assert await store.commit("P1", {"name": "x"}) == (0, {"name": "x"}, None)
+        # No revision or patch from a per-process copy: the caller must do a full load
+        assert await store.commit("P1", {"name": "y"}, partial=True) is None
+        assert await store.get("P1") is None
+
+    async def test_cas_contention_issues_no_revision(self, store_pair, monkeypatch):
+        from redis.exceptions import WatchError
+
+        import webapp.party_state as party_state_mod
+
+        a, b = store_pair
+        await a.commit("P1", {"name": "x"})
+        real_merge = party_state_mod._merge
+
+        def racing_merge(current, updates, partial):
+            raise WatchError("another worker wrote first")
+
+        monkeypatch.setattr(party_state_mod, "_merge", racing_merge)
+        assert await a.commit("P1", {"name": "y"}, partial=True) is None
+        assert await a.commit("P1", {"name": "y"}) == (0, {"name": "y"}, None)
+        monkeypatch.setattr(party_state_mod, "_merge", real_merge)
+        # The stored rev-1 state is behind the database: readers must rebuild it
+        assert await b.get("P1") is None
+        assert await b.commit("P1", {"name": "y"}, partial=True) is None
+        rev, state, ops = await b.commit("P1", {"name": "y"})
+        assert (rev, state, ops) == (2, {"name": "y"}, [])
+
+    async def test_tombstone_written_once_redis_is_back(self):
+        real = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        down = {"on": False}
+
+        class _Flaky:
+            def __getattr__(self, name):
+                if down["on"]:
+                    raise ConnectionError("redis down")
+                return getattr(real, name)
+
+        store = PartyStateStore(lambda: _Flaky())
+        await store.commit("P1", {"name": "x"})
+        down["on"] = True
+        assert await store.commit("P1", {"name": "y"}) == (0, {"name": "y"}, None)
+        down["on"] = False
+        assert await PartyStateStore(lambda: real).get("P1") == (1, {"name": "x"})  # not yet
+        assert await store.get("P1") is None
+        assert await PartyStateStore(lambda: real).get("P1") is None
+
+
+class TestPartyRoutesState:
+    @pytest.fixture
+    async def party_db(self, engine, db_tables, db_session, monkeypatch):
+        from bot.models.base import Base
+        from bot.models.party import PartySession, PartyTrack
+        import webapp.routes.party as party_routes
+
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        store = PartyStateStore(lambda r=fakeredis.aioredis.FakeRedis(decode_responses=True): r)
+        monkeypatch.setattr(party_routes, "party_state", store)
+        monkeypatch.setattr(party_routes, "_party_patches", {})
+        monkeypatch.setattr(party_routes, "_party_resync", set())
+
+        party = PartySession(invite_code=f"ST{uuid.uuid4().hex[:6].upper()}", creator_id=1, name="Test")
+        db_session.add(party)
+        await db_session.flush()
+        for i in range(3):
+            db_session.add(PartyTrack(party_id=party.id, video_id=f"v{i}", title=f"T{i}", added_by=1, position=i))
+        await db_session.commit()
+        yield party_routes, party
+        await store.drop(party.invite_code)
+
+    async def test_partial_refresh_matches_full_rebuild(self, party_db, db_session):
+        from bot.models.party import PartyChatMessage
+
+        party_routes, party = party_db
+        before = await party_routes._build_party_schema(db_session, party, viewer_id=1)
+        assert before.revision == 1 and before.viewer_role == "dj"
+
+        db_session.add(PartyChatMessage(party_id=party.id, user_id=1, display_name="DJ", message="hi"))
+        after = await party_routes._commit_and_build_party_schema(db_session, party, 1, sections=())
+        assert after.revision == 2
+        assert [m.message for m in after.chat_messages] == ["hi"]
+
+        full = await party_routes._build_party_schema(db_session, party, viewer_id=1)
+        assert full.revision == 2
+        assert full.model_dump() == after.model_dump()
+
+        patches = party_routes._party_patches[party.invite_code]
+        assert [p["rev"] for p in patches] == [2]
+        old_state = before.model_dump(exclude={"viewer_role", "revision", "track_count"})
+        new_state = apply_patch(old_state, patches[0]["ops"])
+        assert new_state["chat_messages"] == after.model_dump()["chat_messages"]
+        assert all(op["path"].startswith("/chat_messages") for op in patches[0]["ops"])
+
+    async def test_unversioned_commit_forces_resync(self, party_db, db_session, monkeypatch):
+        party_routes, party = party_db
+        await party_routes._build_party_schema(db_session, party, viewer_id=1)
+        party_routes._party_patches[party.invite_code] = [{"rev": 1, "ops": []}]
+
+        async def down(code, updates, *, partial=False):
+            return None if partial else (0, updates, None)
+
+        monkeypatch.setattr(party_routes.party_state, "commit", down)
+        revision, _state = await party_routes._refresh_party_state(db_session, party, sections=("chat",))
+        assert revision == 0
+        assert party.invite_code not in party_routes._party_patches
+
+        sent = []
+
+        async def notify(code, event, data=None, extra=None):
+            sent.append(extra)
+
+        monkeypatch.setattr(party_routes, "_notify_party", notify)
+        await party_routes._notify_party_state(party.invite_code, "chat", {})
+        await party_routes._notify_party_state(party.invite_code, "chat", {})
+        assert sent == [{"resync": True}, None]
+
+    async def test_get_publishes_the_member_touch_patch(self, party_db, engine, monkeypatch):
+        from unittest.mock import AsyncMock
+
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        party_routes, party = party_db
+        code = party.invite_code
+        monkeypatch.setattr(party_routes, "async_session", async_sessionmaker(engine, expire_on_commit=False))
+        monkeypatch.setattr(party_routes, "_get_or_create_webapp_user", AsyncMock())
+        sent = []
+
+        async def notify(code, event, data=None, extra=None):
+            sent.append((event, extra))
+
+        monkeypatch.setattr(party_routes, "_notify_party", notify)
+        guest = {"id": 9000 + party.id, "first_name": "Guest"}
+        await party_routes.get_party(code, user={"id": 1, "first_name": "DJ"})
+        sent.clear()
+
+        await party_routes.get_party(code, user=guest)       # new member: state changes
+        assert [e for e, _ in sent] == ["member_updated"]
+        assert sent[0][1]["patches"][0]["ops"]
+        assert code not in party_routes._party_patches
@@ -0,0 +1,132 @@
+"""Tests for the playlist import resolver pipeline (bot/services/playlist_import.py)."""
+import asyncio
+import json
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from bot.models.track import Track
+from bot.services import playlist_import
+from bot.services.cache import cache
+from bot.services.playlist_import import _AdaptiveLimit, iter_resolved_tracks, match_local_catalog
+
+
+def _row(artist, title, **kw):
+    return {"title": title, "uploader": artist, "duration": 180, "yt_query": f"{artist} - {title}", **kw}
+
+
+@pytest.fixture
+def session_factory(engine, db_tables):
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    with patch("bot.models.base.async_session", factory):
+        yield factory
+
+
+@pytest.fixture
+def fake_cache(fake_redis, monkeypatch):
+    monkeypatch.setattr(cache, "_redis", fake_redis)
+    return fake_redis
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    calls = []
+
+    async def search_yandex(query, limit=1):
+        calls.append(query)
+        await asyncio.sleep(0.001)
+        if "nowhere" in query:
+            return []
+        return [{"video_id": f"ym_{query}", "title": query, "uploader": "", "source": "yandex"}]
+
+    async def search_tracks(query, max_results=1, source="youtube"):
+        calls.append(f"yt:{query}")
+        return []
+
+    monkeypatch.setattr("bot.services.yandex_provider.search_yandex", search_yandex)
+    monkeypatch.setattr(playlist_import, "search_tracks", search_tracks)
+    return calls
+
+
+async def _add_tracks(factory, *tracks):
+    async with factory() as session:
+        session.add_all(tracks)
+        await session.commit()
+
+
+class TestLocalCatalog:
+    async def test_matches_isrc_and_normalized_artist_title(self, session_factory):
+        await _add_tracks(
+            session_factory,
+            Track(source_id="pl_local_1", source="yandex", artist="Кино", title="Группа крови", isrc="RUA1D8700001"),
+            Track(source_id="pl_local_2", source="channel", artist="Земфира", title="Искала", file_id="f2"),
+        )
+        rows = [
+            _row("Another Artist", "Other Name", isrc="rua1d8700001"),
+            _row("ЗЕМФИРА", "Искала"),
+            _row("Земфира, Гость", "Искала"),     # first credited artist matches
+            _row("Nobody", "Unknown song"),
+        ]
+        matched = await match_local_catalog(rows)
+        assert matched[0]["video_id"] == "pl_local_1"
+        assert matched[1]["video_id"] == "pl_local_2" and matched[1]["file_id"] == "f2"
+        assert matched[2]["video_id"] == "pl_local_2"
+        assert 3 not in matched
+
+
+class TestPipeline:
+    async def test_stages_and_cache_first(self, session_factory, fake_cache, providers):
+        await _add_tracks(session_factory, Track(source_id="pl_stage_1", artist="Сплин", title="Романс"))
+        cached = [{"video_id": "ym_cached", "title": "Cached", "uploader": "X", "source": "yandex"}]
+        await fake_cache.set("qcache:yandex:x - cached", json.dumps(cached))
+        rows = [_row("Сплин", "Романс"), _row("X", "Cached"), _row("Y", "Fresh"), _row("Z", "nowhere")]
+
+        out = [item async for item in iter_resolved_tracks(rows)]
+
+        stages = {pos: stage for pos, _t, stage in out}
+        assert stages == {0: "local", 1: "cache", 2: "provider", 3: "provider"}
+        assert dict((p, t) for p, t, _s in out)[3] is None
+        assert providers.count("Y - Fresh") == 1 and "X - Cached" not in providers
+        assert await fake_cache.get("qcache:yandex:y - fresh")   # provider result cached for next time
+
+    async def test_import_keeps_playlist_order_and_dedups(self, session_factory, fake_cache, providers):
+        rows = [_row("A", f"song {i % 5}") for i in range(12)]
+        progress = []
+
+        async def fetch(url):
+            return "Mix", rows
+
+        with patch.object(playlist_import, "fetch_yandex_playlist", fetch):
+            name, found, total = await playlist_import.import_playlist_tracks(
+                "u", "yandex", progress_cb=lambda f, t: progress.append((f, t)),
+            )
+        assert (name, total) == ("Mix", 12)
+        assert [t["video_id"] for t in found] == [f"ym_A - song {i}" for i in range(5)]
+        assert progress[-1] == (12, 12)
+
+
+class TestAdaptiveLimit:
+    async def test_grows_on_fast_calls_and_halves_on_failure(self):
+        limit = _AdaptiveLimit(start=4, low=2, high=6)
+        for _ in range(20):
+            await limit.acquire()
+            await limit.release(True, 0.1)
+        assert limit.limit == 6
+        await limit.acquire()
+        await limit.release(False, 0.1)
+        assert limit.limit == 3
+        await limit.acquire()
+        await limit.release(True, 10.0)        # too slow counts as congestion
+        assert limit.limit == 2
+
+    async def test_never_exceeds_limit(self):
+        limit = _AdaptiveLimit(start=3, low=3, high=3)
+
+        async def job():
+            await limit.acquire()
+            await asyncio.sleep(0.005)
+            await limit.release(True, 0.005)
+
+        await asyncio.gather(*(job() for _ in range(20)))
+        assert limit.peak == 3
@@ -0,0 +1,131 @@
+"""
+Тесты для recommender/profile_updater.py (пакетный пересчёт профилей)
+"""
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from recommender import profile_updater
+from recommender.profile_updater import compute_profiles
+
+_NOW = 1_700_000_000.0
+
+
+def _reference_top(rows, now, limit=10):
+    """The per-user loop the batch builder replaced."""
+    weights: Counter = Counter()
+    for label, ts in rows:
+        if label:
+            weights[label] += 2 ** (-((now - ts) // 86400) / 30)
+    return [label for label, _ in weights.most_common(limit)]
+
+
+class TestComputeProfiles:
+    def test_matches_per_user_loop(self):
+        rng = np.random.default_rng(7)
+        n = 3000
+        users = rng.integers(1, 40, size=n)
+        stamps = _NOW - rng.uniform(0, 89, size=n) * 86400
+        genres = np.array([None, "rock", "pop", "jazz", "metal", ""], dtype=object)[rng.integers(0, 6, size=n)]
+        artists = np.array([f"a{i}" for i in rng.integers(0, 30, size=n)], dtype=object)
+        bpms = np.where(rng.random(n) < 0.3, np.nan, rng.integers(60, 180, size=n)).astype(np.float64)
+
+        profiles = compute_profiles(users, stamps, genres, artists, bpms, now=_NOW)
+
+        for user in np.unique(users).tolist():
+            mine = users == user
+            expected_genres = _reference_top(zip(genres[mine], stamps[mine]), _NOW)
+            assert profiles[user]["fav_genres"] == expected_genres[:5]
+            expected_artists = _reference_top(zip(artists[mine], stamps[mine]), _NOW)
+            assert profiles[user]["fav_artists"] == expected_artists[:5]
+
+            recent = np.argsort(-stamps[mine], kind="stable")
+            user_bpms = [b for b in bpms[mine][recent] if b > 0][:100]
+            assert profiles[user]["avg_bpm"] == int(sum(user_bpms) / len(user_bpms))
+
+            hours = Counter(((stamps[mine] // 3600) % 24).astype(int).tolist())
+            top_counts = sorted(hours.values(), reverse=True)[:4]
+            assert sorted((hours[h] for h in profiles[user]["preferred_hours"]), reverse=True) == top_counts
+
+    def test_fields_without_data_are_omitted(self):
+        profiles = compute_profiles(
+            np.array([5]), np.array([_NOW]),
+            np.array([None], dtype=object), np.array([None], dtype=object),
+            np.array([np.nan]), now=_NOW,
+        )
+        assert set(profiles[5]) == {"preferred_hours"}
+
+    def test_vibe_from_genres(self):
+        profiles = compute_profiles(
+            np.array([1, 1]), np.array([_NOW, _NOW]),
+            np.array(["ambient", "rock"], dtype=object), np.array(["x", "y"], dtype=object),
+            np.array([140.0, 150.0]), now=_NOW,
+        )
+        assert profiles[1]["fav_vibe"] == "chill"
+        assert profiles[1]["avg_bpm"] == 145
+
+
+class TestUpdateProfilesBatch:
+    @pytest.fixture
+    async def history(self, engine, db_tables, db_session, cache_with_fake_redis):
+        from bot.models.track import ListeningHistory, Track
+        from bot.models.user import User
+
+        now = datetime.now(timezone.utc)
+        users = [User(id=uid, first_name=f"u{uid}") for uid in (9101, 9102)]
+        tracks = [
+            Track(source_id="prof_t1", title="t1", artist="Burial", genre="ambient", bpm=80),
+            Track(source_id="prof_t2", title="t2", artist="Metallica", genre="metal", bpm=160),
+        ]
+        db_session.add_all(users + tracks)
+        await db_session.flush()
+        db_session.add_all([
+            ListeningHistory(user_id=9101, track_id=tracks[0].id, action="play", created_at=now - timedelta(days=1)),
+            ListeningHistory(user_id=9101, track_id=tracks[1].id, action="play", created_at=now - timedelta(days=80)),
+            ListeningHistory(user_id=9102, track_id=tracks[1].id, action="play", created_at=now - timedelta(days=2)),
+        ])
+        await db_session.commit()
+
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        with patch.object(profile_updater, "async_session", factory), \
+                patch("recommender.data_extractor.async_session", factory), \
+                patch("bot.services.cache.cache", cache_with_fake_redis):
+            yield factory, tracks
+        async with factory() as session:
+            for obj in [*tracks, *users]:
+                await session.delete(await session.get(type(obj), obj.id))
+            await session.commit()
+
+    async def test_full_then_incremental(self, history):
+        from bot.models.track import ListeningHistory
+        from bot.models.user import User
+
+        factory, tracks = history
+        assert await profile_updater.update_profiles_batch() >= 2
+        async with factory() as session:
+            first = await session.get(User, 9101)
+            assert first.fav_genres == ["ambient", "metal"]
+            assert first.fav_artists == ["Burial", "Metallica"]
+            assert first.avg_bpm == 120
+            assert first.fav_vibe == "chill"
+            assert (await session.get(User, 9102)).fav_genres == ["metal"]
+
+            # Only 9102 plays after the last run
+            session.add(ListeningHistory(user_id=9102, track_id=tracks[0].id, action="play"))
+            await session.commit()
+
+        assert await profile_updater.update_profiles_batch() == 1
+        async with factory() as session:
+            assert set((await session.get(User, 9102)).fav_genres) == {"ambient", "metal"}
+
+    async def test_one_batch_run_per_interval_across_processes(self, cache_with_fake_redis):
+        with patch("bot.services.cache.cache", cache_with_fake_redis):
+            assert await profile_updater._claim_batch_run(60)
+            assert not await profile_updater._claim_batch_run(60)
+            assert 0 < await cache_with_fake_redis.redis.ttl(profile_updater._RUN_LOCK_KEY) <= 60
+            await cache_with_fake_redis.redis.delete(profile_updater._RUN_LOCK_KEY)
+            assert await profile_updater._claim_batch_run(60)
@@ -35,6 +35,68 @@ class TestHealthSummary:
         assert _stats["yandex:search"].successes == 1
         assert _stats["youtube:download"].failures == 1
         assert _stats["youtube:download"].last_error == "timeout"
+        assert _stats["yandex:search"].p95_latency == pytest.approx(1.2, rel=0.025)
+
+    def test_legacy_latency_list_is_loaded(self):
+        from bot.services.provider_health import _deserialize_stats
+
+        _deserialize_stats({"vk:search": {"successes": 3, "failures": 0, "latencies": [0.5, 1.0, 4.0]}})
+        stat = _stats["vk:search"]
+        assert stat.successes == 3
+        assert stat.p50_latency == pytest.approx(1.0, rel=0.025)
+        assert stat.p99_latency == pytest.approx(4.0, rel=0.025)
+
+
+class TestFleetStats:
+    def setup_method(self):
+        _stats.clear()
+        _disabled_providers.clear()
+
+    async def test_merges_other_nodes_from_redis(self):
+        import json
+        import time
+        from unittest.mock import patch
+
+        import fakeredis.aioredis
+
+        from bot.services import provider_health as ph
+
+        redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        other = _ProviderStat()
+        for latency in (5.0, 6.0, 7.0):
+            other.record_success(latency)
+        stats = {
+            "yandex:search": {"successes": other.successes, "failures": 0,
+                              "latency": other.latency.to_dict(),
+                              "latency_long": other.latency_long.to_dict()},
+        }
+        await redis.hset(ph._REDIS_KEY, "node-b", json.dumps({"updated_at": time.time(), "stats": stats}))
+        # A node gone since long ago, and a field from before updated_at was stored
+        await redis.hset(ph._REDIS_KEY, "node-dead", json.dumps({
+            "updated_at": time.time() - ph._NODE_STALE_SEC - 60, "stats": stats,
+        }))
+        await redis.hset(ph._REDIS_KEY, "node-old", json.dumps(stats))
+        for _ in range(3):
+            record_provider_event("yandex", "search", 0.5, True)
+
+        with patch("bot.services.cache.cache") as cache, patch.object(ph, "_node_field", return_value="node-a"):
+            cache.redis = redis
+            fleet = await ph.get_fleet_stats()
+
+        assert fleet["yandex:search"].successes == 6
+        assert fleet["yandex:search"].p99_latency == pytest.approx(7.0, rel=0.025)
+        assert _stats["yandex:search"].successes == 3   # local stats untouched
+        assert sorted(await redis.hkeys(ph._REDIS_KEY)) == ["node-b"]
+
+    def test_node_field_is_per_process_without_node_id(self, monkeypatch):
+        import os
+        import socket
+        import bot.services.provider_health as ph
+
+        monkeypatch.setattr(ph.settings, "NODE_ID", None)
+        assert ph._node_field() == f"{socket.gethostname()}:{os.getpid()}"
+        monkeypatch.setattr(ph.settings, "NODE_ID", "node-1")
+        assert ph._node_field() == "node-1"
 
 
 class TestAutoDisable:
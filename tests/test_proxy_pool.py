@@ -0,0 +1,136 @@
+"""Tests for health-weighted proxy selection (bot/services/proxy_pool.py)."""
+import time
+from collections import Counter
+
+import pytest
+
+from bot.config import settings
+from bot.services.proxy_pool import ProxyPool, _label
+
+A, B, C = "socks5://user:pw@10.0.0.1:1080", "socks5://10.0.0.2:1080", "http://10.0.0.3:3128"
+
+
+@pytest.fixture
+def pool():
+    p = ProxyPool()
+    p.set_proxies([A, B, C])
+    return p
+
+
+def _warm(pool, url, latency, ok=True, n=5):
+    for _ in range(n):
+        (pool.record_success if ok else pool.record_failure)(url, latency)
+
+
+class TestSelection:
+    def test_slow_proxy_gets_little_traffic(self, pool):
+        _warm(pool, A, 0.2)
+        _warm(pool, B, 0.25)
+        _warm(pool, C, 3.0)
+        picks = Counter(pool.get_next() for _ in range(3000))
+        # P2C: the worst of three only wins when sampled twice — never here
+        assert picks[C] == 0
+        assert picks[A] > picks[B] > 0
+
+    def test_failing_proxy_is_avoided_and_benched(self, pool):
+        _warm(pool, A, 0.3)
+        _warm(pool, B, 0.3)
+        pool.record_failure(C, 0.3)
+        pool.record_failure(C, 0.3)
+        assert C not in {pool.get_next() for _ in range(500)}
+        pool.record_failure(C, 0.3)
+        assert pool.available_count == 2
+
+    def test_idle_penalty_fades_back_to_prior(self, pool, monkeypatch):
+        monkeypatch.setattr(settings, "PROXY_RECOVERY_SEC", 10.0)
+        _warm(pool, A, 0.3)
+        _warm(pool, C, 5.0)
+        entry_a, entry_c = pool._by_url[A], pool._by_url[C]
+        now = time.monotonic()
+        assert entry_c.score(0.3, now) > 10 * entry_a.score(0.3, now)
+        later = now + 100
+        assert entry_c.score(0.3, later) == pytest.approx(0.3, rel=0.01)
+
+    def test_inflight_cap_spreads_load(self, pool, monkeypatch):
+        monkeypatch.setattr(settings, "PROXY_MAX_INFLIGHT", 2)
+        held = [pool.acquire() for _ in range(6)]
+        assert Counter(held) == {A: 2, B: 2, C: 2}
+        extra = pool.acquire()              # all at cap: still served, least-cost proxy
+        assert extra in (A, B, C)
+        for url in held + [extra]:
+            pool.release(url, True, 0.1)
+        assert all(p.inflight == 0 for p in pool._proxies)
+
+
+class TestSticky:
+    def test_host_keeps_its_proxy_while_healthy(self, pool):
+        _warm(pool, A, 0.3)
+        _warm(pool, B, 0.3)
+        _warm(pool, C, 0.3)
+        first = pool.get_next("www.youtube.com")
+        assert {pool.get_next("www.youtube.com") for _ in range(50)} == {first}
+
+    def test_host_moves_off_degraded_proxy(self, pool):
+        for url in (A, B, C):
+            _warm(pool, url, 0.3)
+        first = pool.get_next("api.music.yandex.net")
+        _warm(pool, first, 8.0, ok=False, n=2)
+        assert pool.get_next("api.music.yandex.net") != first
+
+
+class TestMixedHosts:
+    YT, YM = "www.youtube.com", "api.music.yandex.net"
+
+    def test_slow_host_does_not_make_its_proxy_look_slow(self, pool):
+        pool.set_proxies([A, B])
+        for _ in range(10):
+            pool.record_success(A, 3.0, host=self.YT)     # search: seconds
+            pool.record_success(A, 0.3, host=self.YM)     # API call: sub-second
+            pool.record_success(B, 0.3, host=self.YM)
+        prior = pool._prior()
+        assert pool._by_url[A].score(prior) == pytest.approx(pool._by_url[B].score(prior), rel=0.1)
+        picks = Counter(pool.get_next() for _ in range(1000))
+        assert picks[A] > 300 and picks[B] > 300
+
+    def test_sticky_proxy_survives_slow_host_samples(self, pool):
+        for url in (A, B, C):
+            pool.record_success(url, 0.3, host=self.YM)
+        yt = pool.get_next(self.YT)
+        for i in range(30):
+            pool.record_success(yt, 2.5 + (i % 3) * 0.5, host=self.YT)
+            pool.record_success(A, 0.3, host=self.YM)
+            assert pool.get_next(self.YT) == yt
+
+    def test_slow_proxy_is_still_caught_within_a_host(self, pool):
+        for _ in range(5):
+            pool.record_success(A, 3.0, host=self.YT)
+            pool.record_success(B, 3.0, host=self.YT)
+            pool.record_success(C, 12.0, host=self.YT)
+        assert C not in {pool.get_next() for _ in range(300)}
+
+
+class TestLease:
+    def test_lease_records_outcome_and_latency(self, pool):
+        with pool.lease("h") as lease:
+            assert pool._by_url[lease.url].inflight == 1
+        entry = pool._by_url[lease.url]
+        assert entry.inflight == 0 and entry.successes == 1 and entry.latency is not None
+
+    def test_exception_counts_as_failure_unless_filtered(self, pool):
+        with pytest.raises(RuntimeError):
+            with pool.lease(is_failure=lambda e: "proxy" in str(e)) as lease:
+                raise RuntimeError("Video unavailable")
+        assert pool._by_url[lease.url].failures == 0
+
+        with pytest.raises(RuntimeError):
+            with pool.lease(is_failure=lambda e: "proxy" in str(e)) as lease:
+                raise RuntimeError("Unable to connect to proxy")
+        assert pool._by_url[lease.url].failures == 1
+
+    def test_empty_pool_yields_no_proxy(self):
+        with ProxyPool().lease("h") as lease:
+            assert lease.url is None
+
+
+def test_metric_label_hides_credentials():
+    assert _label(A) == "10.0.0.1:1080"
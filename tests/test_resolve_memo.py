@@ -0,0 +1,136 @@
+"""Tests for bot/services/resolve_memo.py and the memoized canonical resolver."""
+import asyncio
+import time
+
+import fakeredis.aioredis
+import pytest
+
+from bot.services import canonical_resolver
+from bot.services.resolve_memo import ERROR, HIT, MISS, ResolveMemo
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.aioredis.FakeRedis(decode_responses=True)
+
+
+def _memo(redis, **kw):
+    return ResolveMemo("t:", ttl_hit=1000, ttl_miss=100, ttl_error=10, redis_factory=lambda: redis, **kw)
+
+
+class _Resolver:
+    def __init__(self, result=("value", HIT), delay=0.0):
+        self.result = result
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+class TestResolveMemo:
+    async def test_ttl_follows_outcome(self, redis):
+        memo = _memo(redis)
+        for key, outcome, ttl in (("a", HIT, 1000), ("b", MISS, 100), ("c", ERROR, 10)):
+            await memo.resolve(key, _Resolver(("x" if outcome == HIT else "", outcome)))
+            assert 0 < await redis.ttl("t:" + key) <= ttl
+
+    async def test_resolver_exception_is_short_lived_negative(self, redis):
+        memo = _memo(redis)
+        assert await memo.resolve("k", _Resolver(RuntimeError("down"))) == ""
+        assert await redis.get("t:k") == ""
+        assert await redis.ttl("t:k") <= 10
+
+    async def test_single_flight(self, redis):
+        memo = _memo(redis)
+        fn = _Resolver(delay=0.02)
+        results = await asyncio.gather(*(memo.resolve("same", fn) for _ in range(10)))
+        assert results == ["value"] * 10
+        assert fn.calls == 1
+        assert memo.stats["coalesced"] >= 1
+
+    async def test_local_tier_then_redis(self, redis):
+        memo = _memo(redis)
+        fn = _Resolver()
+        await memo.resolve("k", fn)
+        await memo.resolve("k", fn)
+        assert fn.calls == 1 and memo.stats["local"] == 1
+
+        other = _memo(redis)          # another process: L2 hit, no resolve
+        assert await other.resolve("k", fn) == "value"
+        assert fn.calls == 1 and other.stats["redis"] == 1
+
+    async def test_negative_from_redis_lives_no_longer_than_error_ttl(self, redis):
+        writer = _memo(redis)
+        await writer.resolve("neg", _Resolver(RuntimeError("down")))
+        await writer.put("pos", "v", HIT)
+
+        other = _memo(redis)
+        assert await other.get("neg") == ""
+        assert await other.get_many(["pos"]) == {"pos": "v"}
+        now = time.monotonic()
+        assert other._local["neg"][0] <= now + 10 + 1
+        assert other._local["pos"][0] > now + 10 + 1
+
+    async def test_local_lru_is_bounded(self, redis):
+        memo = _memo(redis, local_size=2)
+        for key in ("a", "b", "c"):
+            await memo.put(key, key, HIT)
+        assert list(memo._local) == ["b", "c"]
+
+    async def test_get_many(self, redis):
+        memo = _memo(redis)
+        await memo.put("a", "1", HIT)
+        await redis.set("t:b", "")
+        memo.clear_local()
+        assert await memo.get_many(["a", "b", "c", "a"]) == {"a": "1", "b": ""}
+
+
+class TestCanonicalResolver:
+    @pytest.fixture
+    def apis(self, monkeypatch, redis):
+        calls = {"itunes": 0, "deezer": 0}
+        answers = {
+            "мокрые кросы": ([("Тима Белорусских", "Мокрые кроссы")], [("Тима Белорусских", "Мокрые кроссы")]),
+            "розовое вино": ([("Элджей", "Розовое вино")], [("Other", "Другое")]),
+        }
+
+        async def itunes(q):
+            calls["itunes"] += 1
+            if q == "down":
+                raise RuntimeError("itunes status 503")
+            return answers.get(q, ([], []))[0]
+
+        async def deezer(q):
+            calls["deezer"] += 1
+            return answers.get(q, ([], []))[1]
+
+        monkeypatch.setattr(canonical_resolver, "_itunes", itunes)
+        monkeypatch.setattr(canonical_resolver, "_deezer", deezer)
+        memo = ResolveMemo("canon:", ttl_hit=1000, ttl_miss=100, ttl_error=10, redis_factory=lambda: redis)
+        monkeypatch.setattr(canonical_resolver, "_canon_memo", memo)
+        return calls
+
+    async def test_agreement_and_negative_are_memoized(self, apis, redis):
+        assert await canonical_resolver.resolve_canonical("мокрые кросы") == "Тима Белорусских Мокрые кроссы"
+        assert await canonical_resolver.resolve_canonical("Розовое вино") is None
+        assert await canonical_resolver.resolve_canonical("мокрые кросы") == "Тима Белорусских Мокрые кроссы"
+        assert await canonical_resolver.resolve_canonical("розовое вино") is None
+        assert apis["itunes"] == 2
+        assert 100 < await redis.ttl("canon:мокрые кросы") <= 1000
+        assert await redis.ttl("canon:розовое вино") <= 100
+
+    async def test_api_failure_gets_error_ttl(self, apis, redis):
+        assert await canonical_resolver.resolve_canonical("down") is None
+        assert await redis.get("canon:down") == ""
+        assert await redis.ttl("canon:down") <= 10
+
+    async def test_resolve_many(self, apis):
+        await canonical_resolver.resolve_canonical("мокрые кросы")
+        out = await canonical_resolver.resolve_canonical_many(["мокрые кросы", "розовое вино", "x"])
+        assert out == {"мокрые кросы": "Тима Белорусских Мокрые кроссы", "розовое вино": None, "x": None}
+        assert apis["itunes"] == 2  # the first query came from the memo, "x" is too short
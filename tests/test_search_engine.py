@@ -7,10 +7,15 @@ from bot.services.search_engine import (
     transliterate_lat_to_cyr,
     deduplicate_results,
     suggest_query,
+    SuggestIndex,
     parse_query,
     _normalize_for_dedup,
     _jaccard_similarity,
     _relevance_score,
+    _LAT_DIGRAPHS_TO_CYR,
+    _LAT_TO_CYR,
+    _CYR_TO_LAT,
+    track_search_text,
     is_lyric_like_query,
     needs_lyrics_search_boost,
     lyric_search_variants,
@@ -90,6 +95,64 @@ class TestTransliterate:
         assert transliterate_cyr_to_lat("кино 2") == "kino 2"
 
 
+class TestTranslitKernelParity:
+    """translate()/single-pass regex kernels must match the old per-char loops."""
+
+    @staticmethod
+    def _ref_cyr_to_lat(text: str) -> str:
+        return "".join(_CYR_TO_LAT.get(ch, ch) for ch in text.lower())
+
+    @staticmethod
+    def _ref_lat_to_cyr(text: str) -> str:
+        text = text.lower()
+        for lat, cyr in _LAT_DIGRAPHS_TO_CYR:
+            text = text.replace(lat, cyr)
+        return "".join(_LAT_TO_CYR.get(ch, ch) for ch in text)
+
+    @staticmethod
+    def _ref_normalize(query: str) -> str:
+        import re
+        q = query.strip().lower()
+        q = q.replace("‘", "").replace("’", "").replace("`", "")
+        q = re.sub(r'\s*[\(\[][^\)\]]{0,50}[\)\]]\s*', ' ', q)
+        q = re.sub(r"[?!.,;:'\"\(\)\[\]{}]", " ", q)
+        q = re.sub(r"\s{2,}", " ", q)
+        return q.strip()
+
+    def test_lat_to_cyr_overlapping_digraphs(self):
+        for word in ("tsh", "tssh", "shch", "kotsya", "yoyo", "tsar", "Tshirt", "shyu"):
+            assert transliterate_lat_to_cyr(word) == self._ref_lat_to_cyr(word), word
+
+    def test_randomized_parity(self):
+        import random
+        rng = random.Random(26)
+        lat_alpha = "abcdefghijklmnopqrstuvwxyz hstcyaouzkpABSH-1"
+        cyr_alpha = "абвгдеёжзийклмнопрстуфхцчшщъыьэюя АБЩЁ-1"
+        for _ in range(2000):
+            lat = "".join(rng.choice(lat_alpha) for _ in range(rng.randint(0, 12)))
+            cyr = "".join(rng.choice(cyr_alpha) for _ in range(rng.randint(0, 12)))
+            assert transliterate_lat_to_cyr(lat) == self._ref_lat_to_cyr(lat), lat
+            assert transliterate_cyr_to_lat(cyr) == self._ref_cyr_to_lat(cyr), cyr
+
+    def test_normalize_parity(self):
+        for q in (
+            "  Queen — Bohemian Rhapsody (Official Video) ",
+            "Rock’n‘roll `star`!!", "a [b] (c) d", "Макс Корж - Мотылёк [Remix]?",
+            "x" * 60 + " (" + "y" * 60 + ")", "", "   ",
+        ):
+            assert normalize_query(q) == self._ref_normalize(q), q
+
+    def test_memo_is_bounded(self):
+        assert normalize_query.cache_info().maxsize
+        assert transliterate_lat_to_cyr.cache_info().maxsize
+        assert transliterate_cyr_to_lat.cache_info().maxsize
+
+    def test_track_search_text(self):
+        assert track_search_text("Queen", "Bohemian Rhapsody (Remastered)") == "queen bohemian rhapsody"
+        assert track_search_text(None, "Song") == "song"
+        assert track_search_text(None, None) == ""
+
+
 # ── _normalize_for_dedup ─────────────────────────────────────────────────
 
 class TestNormalizeForDedup:
@@ -198,6 +261,32 @@ class TestSuggestQuery:
         assert suggest_query("test", []) == []
 
 
+class TestSuggestIndex:
+    CORPUS = [
+        "Queen - Bohemian Rhapsody",
+        "Metallica - Nothing Else Matters",
+        "Nirvana - Smells Like Teen Spirit",
+        "AC/DC - Thunderstruck",
+        "Земфира - Прости меня моя любовь",
+    ]
+
+    def test_matches_linear_scan(self):
+        index = SuggestIndex(self.CORPUS)
+        for q in ("bohemian rhapsody", "nirvana smells", "thunderstrack", "земфира прости", "xyzabc"):
+            assert index.suggest(q) == suggest_query(q, self.CORPUS), q
+
+    def test_top_k_and_dedup(self):
+        index = SuggestIndex(self.CORPUS + ["queen - bohemian rhapsody", "Queen - Bohemian Rhapsody Live"])
+        assert len(index) == 6
+        assert index.suggest("queen bohemian", max_suggestions=2) == [
+            "Queen - Bohemian Rhapsody", "Queen - Bohemian Rhapsody Live",
+        ]
+
+    def test_empty(self):
+        assert SuggestIndex([]).suggest("test") == []
+        assert SuggestIndex(self.CORPUS).suggest("") == []
+
+
 # ── Cyrillic artist + title relevance ─────────────────────────────────────
 
 class TestLyricFragmentSearch:
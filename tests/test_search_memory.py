@@ -61,3 +61,13 @@ async def test_ignores_track_without_video_id(_fake_redis):
 
     await remember_correction("no id song", {"title": "no id", "uploader": "y"})
     assert await get_learned_track("no id song") is None
+
+
+@pytest.mark.asyncio
+async def test_learned_queries_only_trusted(_fake_redis):
+    from bot.services.search_memory import learned_queries, remember_correction
+
+    track = {"video_id": "abc", "title": "My Party", "uploader": "Scriptonite"}
+    await remember_correction("Моя Вечеринка", track, weight=3)
+    await remember_correction("вечеринка скрип", track)
+    assert await learned_queries() == ["моя вечеринка"]
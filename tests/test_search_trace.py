@@ -0,0 +1,104 @@
+"""Tests for bot/services/search_trace.py (per-phase search timing)."""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from unittest.mock import MagicMock, patch
+
+import fakeredis.aioredis
+import pytest
+
+from bot.config import settings
+from bot.services import search_trace
+from bot.services.search_trace import SearchTrace, current_trace, span, start_trace, traced
+
+
+@pytest.fixture(autouse=True)
+def _reset_trace():
+    yield
+    search_trace._current.set(None)
+
+
+class TestSampling:
+    def test_rate_one_samples_everything(self, monkeypatch):
+        monkeypatch.setattr(settings, "SEARCH_TRACE_SAMPLE_RATE", 1.0)
+        trace = start_trace("q")
+        assert trace.sampled and current_trace() is trace
+
+    def test_rate_zero_records_nothing(self, monkeypatch):
+        monkeypatch.setattr(settings, "SEARCH_TRACE_SAMPLE_RATE", 0.0)
+        trace = start_trace("q")
+        assert not trace.sampled
+        with span("tier0.curated"):
+            pass
+        trace.lap("providers")
+        assert trace.totals == {} and trace.spans == []
+
+
+class TestRecording:
+    def test_span_lap_and_traced_accumulate(self):
+        search_trace._current.set(trace := SearchTrace("q"))
+
+        @traced("dedup")
+        def work(x):
+            return x * 2
+
+        with span("tier0.learned"):
+            pass
+        trace.lap("tier0")
+        assert work(2) == 4 and work(3) == 6
+        assert set(trace.totals) == {"tier0.learned", "tier0", "dedup"}
+        assert [s[0] for s in trace.spans] == ["tier0.learned", "tier0"]  # traced keeps totals only
+
+    def test_traced_outside_search_is_passthrough(self):
+        assert traced("x")(lambda: 42)() == 42
+
+    async def test_gather_tasks_record_into_parent_trace(self):
+        search_trace._current.set(trace := SearchTrace("q"))
+
+        async def provider(name):
+            with span(f"provider.{name}"):
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(provider("yandex"), provider("vk"))
+        assert trace.totals["provider.yandex"] >= 0.005
+        assert "provider.vk" in trace.totals
+
+
+class TestFinish:
+    async def test_observes_phases_and_dumps_slow_search(self, monkeypatch):
+        redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        monkeypatch.setattr(settings, "SEARCH_TRACE_DUMP_MS", 1)
+        hist = MagicMock()
+        search_trace._current.set(trace := SearchTrace("медленный запрос"))
+        with span("provider.yandex"):
+            await asyncio.sleep(0.01)
+
+        with patch("bot.services.metrics.search_phase_seconds", hist), \
+                patch("bot.services.cache.cache") as cache:
+            cache.redis = redis
+            await trace.finish(n=3)
+
+        phases = [c.kwargs["phase"] for c in hist.labels.call_args_list]
+        assert phases == ["provider.yandex", "total"]
+        assert current_trace() is None
+        dumped = json.loads((await redis.lrange("search:trace", 0, -1))[0])
+        assert dumped["q"] == "медленный запрос" and dumped["n"] == 3
+        assert dumped["spans"][0][0] == "provider.yandex"
+
+    async def test_fast_search_is_not_dumped(self, monkeypatch):
+        redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        monkeypatch.setattr(settings, "SEARCH_TRACE_DUMP_MS", 60_000)
+        with patch("bot.services.cache.cache") as cache:
+            cache.redis = redis
+            await SearchTrace("q").finish()
+        assert await redis.llen("search:trace") == 0
+
+
+def test_search_engine_imports_without_bot_config():
+    # The normalisation benchmarks import search_engine without BOT_TOKEN
+    env = {k: v for k, v in os.environ.items() if k != "BOT_TOKEN"}
+    code = "import sys, bot.services.search_engine; assert 'bot.config' not in sys.modules"
+    proc = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
@@ -0,0 +1,116 @@
+"""
+Тесты для bot/services/speller.py (локальный SymSpell-индекс по каталогу)
+"""
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from bot.services import speller
+from bot.services.speller import CatalogSpeller, SymSpellIndex, _edit_distance
+
+
+def _catalog(*texts):
+    sp = CatalogSpeller(max_distance=2, query_min_count=2)
+    for text in texts:
+        sp.add_text(text)
+    return sp
+
+
+class TestSymSpellIndex:
+    def test_lookup_within_distance(self):
+        idx = SymSpellIndex(max_distance=2)
+        for word in ("скриптонит", "космос", "макан"):
+            idx.add(word)
+        assert idx.lookup("скриптанит") == "скриптонит"     # substitution
+        assert idx.lookup("космс") == "космос"              # deletion
+        assert idx.lookup("маккан") == "макан"              # insertion
+        assert idx.lookup("абвгд") is None
+
+    def test_tie_goes_to_most_frequent(self):
+        idx = SymSpellIndex(max_distance=1)
+        idx.add("rose", 1)
+        idx.add("rise", 10)
+        assert idx.lookup("rXse") == "rise"
+
+    def test_words_longer_than_prefix(self):
+        idx = SymSpellIndex(max_distance=2)
+        idx.add("пропаганда")
+        assert idx.lookup("пропогонда") == "пропаганда"
+
+    def test_edit_distance_transposition_and_cutoff(self):
+        assert _edit_distance("ab", "ba", 2) == 1
+        assert _edit_distance("kitten", "sitting", 2) == 3  # limit + 1
+
+
+class TestCatalogSpeller:
+    def test_corrects_unknown_words_only(self):
+        sp = _catalog("земфира прости меня моя любовь", "скриптонит космос")
+        assert sp.correct("земфера прости меня") == "земфира прости меня"
+        assert sp.correct("скриптонит космос") is None
+
+    def test_short_words_need_one_edit(self):
+        sp = _catalog("макан")
+        assert sp.correct("макон") == "макан"
+        assert sp.correct("мкнн") is None
+
+    def test_translit_fallback(self):
+        sp = _catalog("кино группа крови")
+        assert sp.correct("gruppa krovi") == "группа крови"
+
+    def test_query_words_need_min_count(self):
+        sp = _catalog("баста")
+        sp.add_query("мияги капкан")
+        assert "мияги" not in sp.index
+        sp.add_query("мияги эндшпиль")
+        assert "мияги" in sp.index
+        assert sp.correct("мияхи") == "мияги"
+
+
+class TestRefresh:
+    async def test_incremental_refresh_from_db(self, engine, db_tables, db_session):
+        from bot.models.track import ListeningHistory, Track
+        from bot.models.user import User
+
+        db_session.add(User(id=4101, first_name="t"))
+        db_session.add(Track(source_id="sp-1", artist="Скриптонит", title="Космос"))
+        for q in ("jah khalib медина", "jah khalib леди"):
+            db_session.add(ListeningHistory(user_id=4101, query=q, action="search"))
+        await db_session.commit()
+
+        sp = CatalogSpeller(query_min_count=2)
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        try:
+            with patch("bot.models.base.async_session", factory):
+                added = await sp.refresh()
+                assert {"скриптонит", "космос", "khalib"} <= set(sp.index._words)
+                assert added >= 3
+                assert await sp.refresh() == 0
+
+                db_session.add(Track(source_id="sp-2", artist="Макан", title="Спартак"))
+                await db_session.commit()
+                assert await sp.refresh() == 2
+            assert sp.correct("макан спатрак") == "макан спартак"
+        finally:
+            from sqlalchemy import delete
+            await db_session.execute(delete(ListeningHistory).where(ListeningHistory.user_id == 4101))
+            await db_session.execute(delete(Track).where(Track.source_id.in_(["sp-1", "sp-2"])))
+            await db_session.execute(delete(User).where(User.id == 4101))
+            await db_session.commit()
+
+
+class TestCorrectQuery:
+    async def test_local_answer_skips_remote(self, monkeypatch):
+        monkeypatch.setattr(speller, "local_speller", _catalog("земфира"))
+        remote = AsyncMock(return_value="remote")
+        monkeypatch.setattr(speller, "_correct_remote", remote)
+        monkeypatch.setattr(speller.settings, "SPELLER_REMOTE_FALLBACK", True)
+        assert await speller.correct_query("земфера") == "земфира"
+        remote.assert_not_called()
+
+    @pytest.mark.parametrize("fallback, expected", [(False, None), (True, "remote")])
+    async def test_remote_fallback_is_optional(self, monkeypatch, fallback, expected):
+        monkeypatch.setattr(speller, "local_speller", _catalog("земфира"))
+        monkeypatch.setattr(speller, "_correct_remote", AsyncMock(return_value="remote"))
+        monkeypatch.setattr(speller.settings, "SPELLER_REMOTE_FALLBACK", fallback)
+        assert await speller.correct_query("неизвестнословище") == expected
@@ -0,0 +1,124 @@
+"""Tests for the story card render cache and worker pool (bot/services/story_cards.py)."""
+import asyncio
+import io
+import os
+import time
+
+import pytest
+
+from bot.config import settings
+from bot.services import story_cards
+
+PIL = pytest.importorskip("PIL")
+from PIL import Image  # noqa: E402
+
+
+def _cover(color=(120, 40, 200)) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (300, 300), color).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+@pytest.fixture
+def card_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "STORY_CARD_CACHE_DIR", tmp_path)
+    monkeypatch.setattr(settings, "STORY_RENDER_WORKERS", 0)
+    return tmp_path
+
+
+@pytest.fixture
+def fake_renderer(monkeypatch):
+    calls = []
+
+    def render(**kwargs):
+        calls.append(kwargs)
+        time.sleep(0.02)
+        return f"png:{kwargs['title']}".encode()
+
+    monkeypatch.setitem(story_cards._RENDERERS, "track", render)
+    return calls
+
+
+class TestRenderCache:
+    async def test_second_request_is_served_from_disk(self, card_cache, fake_renderer):
+        first = await story_cards.render_track_card("A", "Song", 1, "3:00", _cover())
+        second = await story_cards.render_track_card("A", "Song", 1, "3:00", _cover())
+        assert first == second == b"png:Song"
+        assert len(fake_renderer) == 1
+        assert len(list(card_cache.glob("*.png"))) == 1
+
+    async def test_key_covers_fields_cover_and_template(self, card_cache, fake_renderer, monkeypatch):
+        await story_cards.render_track_card("A", "Song", 1, "3:00", _cover())
+        await story_cards.render_track_card("A", "Song", 1, "3:00", _cover((10, 200, 10)))
+        await story_cards.render_track_card("A", "Song", 2, "3:00", _cover())
+        monkeypatch.setattr(story_cards, "TEMPLATE_VERSION", story_cards.TEMPLATE_VERSION + 1)
+        await story_cards.render_track_card("A", "Song", 1, "3:00", _cover())
+        assert len(fake_renderer) == 4
+
+    async def test_concurrent_requests_share_one_render(self, card_cache, fake_renderer):
+        results = await asyncio.gather(*(story_cards.render_track_card("A", "Burst", 7) for _ in range(10)))
+        assert set(results) == {b"png:Burst"}
+        assert len(fake_renderer) == 1
+
+    async def test_failed_render_is_not_cached(self, card_cache, monkeypatch):
+        def broken(**kwargs):
+            raise RuntimeError("boom")
+
+        monkeypatch.setitem(story_cards._RENDERERS, "track", broken)
+        assert await story_cards.render_track_card("A", "Song", 1) is None
+        assert not list(card_cache.glob("*.png"))
+
+    def test_eviction_keeps_most_recent(self, card_cache, monkeypatch):
+        monkeypatch.setattr(settings, "STORY_CARD_CACHE_MAX_FILES", 3)
+        for i in range(5):
+            path = card_cache / f"k{i}.png"
+            path.write_bytes(b"x")
+            os.utime(path, (1000 + i, 1000 + i))
+        story_cards._evict_cached(card_cache)
+        assert sorted(p.name for p in card_cache.glob("*.png")) == ["k2.png", "k3.png", "k4.png"]
+
+
+class TestLayers:
+    def test_cover_layers_are_lru_bounded(self, monkeypatch):
+        monkeypatch.setattr(settings, "STORY_BG_CACHE_SIZE", 2)
+        monkeypatch.setattr(story_cards, "_layers", type(story_cards._layers)())
+        built = []
+        monkeypatch.setattr(story_cards, "_build_background", lambda c, d: built.append(d) or "bg")
+        a, b, c = _cover((200, 0, 0)), _cover((0, 200, 0)), _cover((0, 0, 200))
+        for cover in (a, b, a, c, a):
+            story_cards._cover_layers(cover)
+        assert len(built) == 3                 # b evicted, a stayed hot
+        assert len(story_cards._layers) == 2
+
+
+class TestWorkerPool:
+    async def test_renders_real_card_in_process_pool(self, card_cache, monkeypatch):
+        monkeypatch.setattr(settings, "STORY_RENDER_WORKERS", 1)
+        try:
+            recap = await story_cards.render_recap_card("Тест", 42, ["Кино", "Сплин"], "Кино — Кукушка")
+            assert not list(card_cache.glob("*.png"))   # one-off recap cards are not cached
+            track = await story_cards.render_track_card("Кино", "Кукушка", 1, "6:35", _cover())
+        finally:
+            story_cards.shutdown_render_pool()
+        for png in (recap, track):
+            assert png and png.startswith(b"\x89PNG")
+            assert Image.open(io.BytesIO(png)).size == (1080, 1920)
+        assert len(list(card_cache.glob("*.png"))) == 1  # written by the worker
+
+    async def test_broken_pool_is_shut_down_and_replaced(self, card_cache, fake_renderer, monkeypatch):
+        from concurrent.futures.process import BrokenProcessPool
+
+        class _Broken:
+            shut_down = False
+
+            def submit(self, *args, **kwargs):
+                raise BrokenProcessPool("worker died")
+
+            def shutdown(self, wait=True, cancel_futures=False):
+                self.shut_down = True
+
+        broken = _Broken()
+        monkeypatch.setattr(story_cards, "_pool", broken)
+        monkeypatch.setattr(settings, "STORY_RENDER_WORKERS", 1)
+        assert await story_cards.render_track_card("A", "Song", 1) == b"png:Song"
+        assert broken.shut_down and story_cards._pool is None
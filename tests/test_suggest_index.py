@@ -0,0 +1,46 @@
+"""Tests for bot/services/suggest_index.py — background-built "did you mean?" index."""
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from bot.services import suggest_index
+
+
+@pytest.fixture(autouse=True)
+def _fresh_index():
+    prev = suggest_index._index, suggest_index._pending_build
+    suggest_index._index, suggest_index._pending_build = None, None
+    yield
+    suggest_index._index, suggest_index._pending_build = prev
+
+
+async def test_miss_before_first_build_does_not_wait():
+    gate = asyncio.Event()
+
+    async def slow_corpus():
+        await gate.wait()
+        return ["Imagine Dragons Believer"]
+
+    with patch.object(suggest_index, "_load_corpus", side_effect=slow_corpus) as load:
+        assert await suggest_index.did_you_mean("imagin dragons") == []
+        assert await suggest_index.did_you_mean("imagin dragons") == []
+        pending = suggest_index._pending_build
+        assert pending is not None and not pending.done()
+        gate.set()
+        await pending
+        assert await suggest_index.did_you_mean("imagine dragon beliver") == ["Imagine Dragons Believer"]
+    load.assert_called_once()  # the second miss joined the pending build
+
+
+async def test_waiters_reuse_an_index_built_while_they_queued():
+    load = AsyncMock(return_value=["Linkin Park Numb"])
+    with patch.object(suggest_index, "_load_corpus", load):
+        first, second = await asyncio.gather(
+            suggest_index.rebuild_suggest_index(force=False),
+            suggest_index.rebuild_suggest_index(force=False),
+        )
+        assert first is second
+        load.assert_awaited_once()
+        # The scheduler always rebuilds
+        assert await suggest_index.rebuild_suggest_index() is not first
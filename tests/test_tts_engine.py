@@ -0,0 +1,139 @@
+"""Tests for the TTS clip store and pre-synthesis queue (bot/services/tts_engine.py)."""
+import asyncio
+import os
+import threading
+
+import pytest
+
+from bot.config import settings
+from bot.services import dj_comments, tts_engine
+from bot.services.cache import cache
+
+
+@pytest.fixture
+def clip_store(tmp_path, fake_redis, monkeypatch):
+    monkeypatch.setattr(settings, "TTS_CLIP_DIR", tmp_path)
+    monkeypatch.setattr(cache, "_redis", fake_redis)
+    monkeypatch.setattr(tts_engine, "_store_bytes", None)
+    return tmp_path
+
+
+@pytest.fixture
+def engine_calls(monkeypatch):
+    calls = []
+
+    async def synth(text, lang):
+        calls.append(text)
+        await asyncio.sleep(0.01)
+        return f"mp3:{lang}:{text}".encode()
+
+    monkeypatch.setattr(tts_engine, "_synthesize_uncached", synth)
+    return calls
+
+
+@pytest.fixture
+async def presynth():
+    await tts_engine.start_tts_presynth()
+    yield
+    await tts_engine.stop_tts_presynth()
+
+
+class TestClipStore:
+    async def test_clip_on_disk_redis_holds_only_index(self, clip_store, fake_redis, engine_calls):
+        first = await tts_engine.synthesize("Привет", "ru")
+        second = await tts_engine.synthesize("Привет", "ru")
+        assert first == second == "mp3:ru:Привет".encode()
+        assert engine_calls == ["Привет"]
+        clips = list(clip_store.glob("*.mp3"))
+        assert len(clips) == 1 and clips[0].read_bytes() == first
+        keys = await fake_redis.keys("tts:*")
+        assert len(keys) == 1 and await fake_redis.get(keys[0]) == clips[0].stem
+
+    async def test_legacy_redis_clip_is_deleted(self, clip_store, fake_redis, engine_calls):
+        legacy = f"tts:{tts_engine._phrase_key('Привет', 'ru')}"
+        await fake_redis.set(legacy, "ID3 old mp3 bytes")
+        await tts_engine.synthesize("Привет", "ru")
+        assert not await fake_redis.exists(legacy)
+        assert await fake_redis.keys("tts:*") == [f"tts:idx:{tts_engine._phrase_key('Привет', 'ru')}"]
+
+    async def test_clip_read_runs_off_the_event_loop(self, clip_store, engine_calls, monkeypatch):
+        await tts_engine.synthesize("hello", "en")
+        loop_thread = threading.get_ident()
+        read_threads = []
+        read = tts_engine._read_clip
+
+        def tracking_read(digest):
+            read_threads.append(threading.get_ident())
+            return read(digest)
+
+        monkeypatch.setattr(tts_engine, "_read_clip", tracking_read)
+        assert await tts_engine.synthesize("hello", "en") == b"mp3:en:hello"
+        assert read_threads and loop_thread not in read_threads
+
+    async def test_identical_audio_stored_once(self, clip_store, monkeypatch):
+        async def same_audio(text, lang):
+            return b"beep"
+
+        monkeypatch.setattr(tts_engine, "_synthesize_uncached", same_audio)
+        await tts_engine.synthesize("one", "en")
+        await tts_engine.synthesize("two", "en")
+        assert len(list(clip_store.glob("*.mp3"))) == 1
+
+    async def test_missing_clip_is_resynthesized(self, clip_store, engine_calls):
+        await tts_engine.synthesize("hello", "en")
+        for clip in clip_store.glob("*.mp3"):
+            clip.unlink()
+        assert await tts_engine.synthesize("hello", "en")
+        assert engine_calls == ["hello", "hello"]
+
+    async def test_concurrent_requests_share_one_synthesis(self, clip_store, engine_calls):
+        results = await asyncio.gather(*(tts_engine.synthesize("same", "en") for _ in range(5)))
+        assert len(set(results)) == 1 and engine_calls == ["same"]
+
+    async def test_clip_write_runs_off_the_event_loop(self, clip_store, engine_calls, monkeypatch):
+        threads = []
+        write = tts_engine._write_clip
+
+        def recording_write(data):
+            threads.append(threading.current_thread())
+            return write(data)
+
+        monkeypatch.setattr(tts_engine, "_write_clip", recording_write)
+        await tts_engine.synthesize("hello", "en")
+        assert threads and threads[0] is not threading.main_thread()
+
+    def test_eviction_drops_least_recently_used(self, clip_store, monkeypatch):
+        monkeypatch.setattr(settings, "TTS_CLIP_MAX_MB", 1)
+        for i in range(5):
+            path = clip_store / f"c{i}.mp3"
+            path.write_bytes(b"x" * 300_000)
+            os.utime(path, (1000 + i, 1000 + i))
+        tts_engine._evict_clips()
+        assert sorted(p.name for p in clip_store.glob("*.mp3")) == ["c2.mp3", "c3.mp3", "c4.mp3"]
+        assert tts_engine._store_bytes == 900_000
+
+
+class TestPresynthesis:
+    async def test_queued_phrases_are_ready_before_playback(self, clip_store, engine_calls, presynth):
+        tracks = [{"uploader": f"Artist {i}", "title": f"Song {i}"} for i in range(10)]
+        script = dj_comments.plan_dj_script(tracks, "en", name="Ann")
+        assert [i for i, _ in script.comments] == [2, 5, 8]
+        dj_comments.prepare_dj_script(script, "en")
+        await asyncio.wait_for(tts_engine._queue.join(), 2)
+
+        for _, text in script.comments:
+            assert await tts_engine.synthesize(text, "en")
+        assert sorted(engine_calls) == sorted(text for _, text in script.comments)
+
+    async def test_static_warmup_skips_personal_templates(self, clip_store, engine_calls, presynth):
+        phrases = dj_comments.static_phrases("en")
+        assert "Fire! Keep listening." in phrases
+        assert "Good evening! Time for some amazing music." in phrases
+        assert not any("{" in p for p in phrases)
+        tts_engine.presynthesize(phrases, "en", priority=tts_engine.PRIORITY_WARM)
+        await asyncio.wait_for(tts_engine._queue.join(), 5)
+        assert len(engine_calls) == len(set(phrases))
+
+    def test_presynthesize_is_noop_without_workers(self):
+        assert tts_engine._queue is None
+        assert tts_engine.presynthesize(["hi"], "en") == 0
@@ -0,0 +1,170 @@
+"""
+Тесты для bot/services/upload_queue.py (durable CDN upload queue)
+"""
+import asyncio
+import json
+
+import fakeredis.aioredis
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendAudio
+
+from bot.services import metrics
+from bot.services import upload_queue as uq
+from bot.services.upload_queue import PRIORITY_PREFETCH, PRIORITY_USER, UploadQueue
+
+
+class _Uploader:
+    def __init__(self, result="FILE_ID", exc=None):
+        self.result = result
+        self.exc = exc
+        self.calls = []
+
+    async def __call__(self, path, source_id, job):
+        self.calls.append(source_id)
+        if self.exc is not None:
+            raise self.exc
+        return self.result
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.aioredis.FakeRedis(decode_responses=True)
+
+
+def _queue(redis, uploader=None, **kw):
+    kw.setdefault("per_minute", 100)
+    kw.setdefault("max_attempts", 3)
+    return UploadQueue(lambda: redis, uploader or _Uploader(), **kw)
+
+
+class TestEnqueue:
+    async def test_user_jobs_go_before_prefetch(self, redis, tmp_path):
+        q = _queue(redis)
+        await q.enqueue(tmp_path / "a.mp3", "pre1", priority=PRIORITY_PREFETCH)
+        await q.enqueue(tmp_path / "b.mp3", "pre2", priority=PRIORITY_PREFETCH)
+        await q.enqueue(tmp_path / "c.mp3", "user1", priority=PRIORITY_USER)
+
+        order = []
+        while (claimed := await q.claim()) is not None:
+            order.append(claimed[0])
+        assert order == ["user1", "pre1", "pre2"]
+
+    async def test_dedup_and_promotion(self, redis, tmp_path):
+        q = _queue(redis)
+        assert await q.enqueue(tmp_path / "a.mp3", "v1", priority=PRIORITY_PREFETCH, cleanup=True)
+        await q.enqueue(tmp_path / "b.mp3", "v2", priority=PRIORITY_USER)
+        assert not await q.enqueue(tmp_path / "a.mp3", "v1", priority=PRIORITY_USER)
+
+        assert await q.depth() == {"user": 2, "prefetch": 0, "delayed": 0, "inflight": 0}
+        job = json.loads(await redis.get("cdnq:job:v1"))
+        assert job["priority"] == PRIORITY_USER
+        assert job["cleanup"] is False  # the user path still needs the file
+        # Promotion keeps the original enqueue order inside the band
+        assert (await q.claim())[0] == "v1"
+
+    async def test_wait_for_capacity(self, redis, tmp_path):
+        q = _queue(redis)
+        await q.enqueue(tmp_path / "a.mp3", "v1", priority=PRIORITY_PREFETCH)
+        assert await q.wait_for_capacity(PRIORITY_PREFETCH, limit=2)
+        assert not await q.wait_for_capacity(PRIORITY_PREFETCH, limit=1, timeout=0)
+        assert await q.wait_for_capacity(PRIORITY_USER, limit=1)
+
+
+class TestProcess:
+    async def test_success_acks_and_cleans_up(self, redis, tmp_path, monkeypatch):
+        observed = []
+
+        class _Histogram:
+            def labels(self, **_):
+                return self
+
+            def observe(self, value):
+                observed.append(value)
+
+        monkeypatch.setattr(metrics, "cdn_time_to_cdn", _Histogram())
+        mp3 = tmp_path / "v1.mp3"
+        mp3.write_bytes(b"x")
+        q = _queue(redis)
+        await q.enqueue(mp3, "v1", priority=PRIORITY_PREFETCH, cleanup=True)
+
+        assert await q.process(*await q.claim()) == "uploaded"
+        assert not mp3.exists()
+        assert await redis.get("cdnq:job:v1") is None
+        assert await q.depth() == {"user": 0, "prefetch": 0, "delayed": 0, "inflight": 0}
+        assert len(observed) == 1
+
+    async def test_failure_backs_off_then_gives_up(self, redis, tmp_path):
+        q = _queue(redis, _Uploader(exc=RuntimeError("boom")), max_attempts=2)
+        await q.enqueue(tmp_path / "a.mp3", "v1")
+
+        assert await q.process(*await q.claim()) == "retry"
+        retry_at = await redis.zscore("cdnq:delayed", "v1")
+        assert retry_at >= uq._now_ms() + 25_000
+        assert await q.claim() is None  # not due yet
+
+        await redis.zadd("cdnq:delayed", {"v1": 0})
+        source_id, job = await q.claim()
+        assert job["attempts"] == 1
+        assert await q.process(source_id, job) == "failed"
+        assert await redis.get("cdnq:job:v1") is None
+
+    async def test_flood_wait_sets_shared_barrier(self, redis, tmp_path):
+        exc = TelegramRetryAfter(
+            method=SendAudio(chat_id=1, audio="x"), message="Too Many Requests", retry_after=42
+        )
+        q = _queue(redis, _Uploader(exc=exc))
+        await q.enqueue(tmp_path / "a.mp3", "v1")
+
+        assert await q.process(*await q.claim()) == "flood_wait"
+        assert int(await redis.get("cdnq:flood")) >= uq._now_ms() + 40_000
+        job = json.loads(await redis.get("cdnq:job:v1"))
+        assert job["attempts"] == 0  # flood-wait is not the job's fault
+
+    async def test_expired_lease_returns_to_pending(self, redis, tmp_path):
+        q = _queue(redis)
+        await q.enqueue(tmp_path / "a.mp3", "v1")
+        assert (await q.claim())[0] == "v1"
+        await redis.zadd("cdnq:inflight", {"v1": 0})  # worker died mid-upload
+        assert (await q.claim())[0] == "v1"
+
+    async def test_rate_governor_shared_budget(self, redis, monkeypatch):
+        q = _queue(redis, per_minute=2)
+        sleeps = []
+
+        async def _sleep(seconds):
+            sleeps.append(seconds)
+            raise RuntimeError("stop")
+
+        monkeypatch.setattr(uq.asyncio, "sleep", _sleep)
+        await q._governor_wait()
+        await _queue(redis, per_minute=2)._governor_wait()
+        with pytest.raises(RuntimeError):
+            await q._governor_wait()
+        assert sleeps and 0 < sleeps[0] <= 61
+
+    async def test_lease_renewed_during_flood_wait(self, redis, tmp_path, monkeypatch):
+        q = _queue(redis)
+        await q.enqueue(tmp_path / "a.mp3", "v1")
+        source_id, _job = await q.claim()
+        await redis.set("cdnq:flood", uq._now_ms() + 3 * uq._LEASE_MS)
+        await redis.zadd("cdnq:inflight", {"v1": uq._now_ms() + 1000})  # lease nearly out
+        sleeps = []
+
+        async def _sleep(seconds):
+            sleeps.append(seconds)
+            raise RuntimeError("stop")
+
+        monkeypatch.setattr(uq.asyncio, "sleep", _sleep)
+        with pytest.raises(RuntimeError):
+            await q._governor_wait(source_id)
+        assert sleeps[0] <= uq._LEASE_RENEW_MS / 1000
+        assert await redis.zscore("cdnq:inflight", "v1") > uq._now_ms() + uq._LEASE_MS - 5000
+
+    async def test_concurrent_claims_take_a_job_once(self, redis, tmp_path):
+        q = _queue(redis)
+        await q.enqueue(tmp_path / "a.mp3", "v1")
+        results = await asyncio.gather(q.claim(), _queue(redis).claim())
+        assert sorted(r is None for r in results) == [False, True]
+        assert await redis.zrange("cdnq:inflight", 0, -1) == ["v1"]
+        assert await redis.zcard("cdnq:pending") == 0
@@ -0,0 +1,153 @@
+"""Tests for streamer/prefetch.py and the prefetching voice-chat scheduler."""
+import asyncio
+import json
+import sys
+import types
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+from streamer.prefetch import TrackPrefetcher
+
+
+class _DownloadingApp:
+    """Pyrogram-like client: download_media writes the file_id into file_name."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.downloads: list[str] = []
+        self.active = 0
+        self.max_active = 0
+
+    async def download_media(self, file_id, file_name):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            Path(file_name).write_text(file_id)
+            self.downloads.append(file_id)
+            return file_name
+        finally:
+            self.active -= 1
+
+    def on_message(self, _filter):
+        return lambda func: func
+
+
+def _prefetcher(app, tmp_path, **kw):
+    return TrackPrefetcher(app, cache_dir=tmp_path, **{"depth": 3, "concurrency": 2, "wait_sec": 1.0, **kw})
+
+
+class TestTrackPrefetcher:
+    async def test_refill_warms_upcoming(self, tmp_path):
+        app = _DownloadingApp()
+        pf = _prefetcher(app, tmp_path)
+        upcoming = [{"file_id": f"f{i}"} for i in range(5)]
+        assert await pf.refill(upcoming) == 3
+        await asyncio.sleep(0.01)
+
+        source, warm = await pf.source_for({"file_id": "f1"})
+        assert warm and Path(source).read_text() == "f1"
+        assert await pf.refill(upcoming) == 0      # already on disk
+        assert sorted(app.downloads) == ["f0", "f1", "f2"]
+
+    async def test_shared_budget_bounds_concurrency(self, tmp_path):
+        app = _DownloadingApp(delay=0.02)
+        pf = _prefetcher(app, tmp_path, depth=6, concurrency=2)
+        await pf.refill([{"file_id": f"f{i}"} for i in range(6)])
+        while pf.inflight:
+            await asyncio.sleep(0.01)
+        assert app.max_active == 2
+        assert len(app.downloads) == 6
+
+    async def test_source_waits_for_inflight_then_falls_back(self, tmp_path):
+        app = _DownloadingApp(delay=0.05)
+        pf = _prefetcher(app, tmp_path, wait_sec=0.5)
+        await pf.refill([{"file_id": "slow"}])
+        assert (await pf.source_for({"file_id": "slow"}))[1] is True
+
+        pf = _prefetcher(_DownloadingApp(delay=1.0), tmp_path / "b", wait_sec=0.01)
+        await pf.refill([{"file_id": "slower"}])
+        assert await pf.source_for({"file_id": "slower"}) == ("slower", False)
+
+    async def test_disabled_without_download_media(self, tmp_path):
+        pf = _prefetcher(object(), tmp_path)
+        assert not pf.enabled
+        assert await pf.refill([{"file_id": "x"}]) == 0
+        assert await pf.source_for({"file_id": "x"}) == ("x", False)
+
+    async def test_evicts_oldest_files(self, tmp_path):
+        import os
+        pf = _prefetcher(_DownloadingApp(), tmp_path, max_files=2)
+        for i, fid in enumerate(("a", "b")):
+            path = pf.path_for(fid)
+            path.write_text(fid)
+            os.utime(path, (1000 + i, 1000 + i))
+        await pf.refill([{"file_id": "c"}])
+        await asyncio.sleep(0.01)
+        assert not pf.path_for("a").exists()
+        assert pf.path_for("b").exists() and pf.path_for("c").exists()
+
+
+class _FakeTgCalls:
+    def __init__(self):
+        self.play_calls: list[tuple[int, str]] = []
+        self.stream_end_handler = None
+
+    def on_stream_end(self):
+        def decorator(func):
+            self.stream_end_handler = func
+            return func
+        return decorator
+
+    async def play(self, group_id, audio):
+        self.play_calls.append((group_id, audio.file_id))
+
+
+@pytest.fixture
+def fake_streamer_deps(monkeypatch):
+    fake_pyrogram = types.ModuleType("pyrogram")
+    fake_pyrogram.filters = MagicMock()
+    fake_types = types.ModuleType("pytgcalls.types")
+    fake_types.AudioPiped = lambda source, audio_parameters=None: types.SimpleNamespace(file_id=source)
+    fake_types.AudioQuality = types.SimpleNamespace(HIGH="high")
+    monkeypatch.setitem(sys.modules, "pyrogram", fake_pyrogram)
+    monkeypatch.setitem(sys.modules, "pytgcalls.types", fake_types)
+
+
+class TestPrefetchingScheduler:
+    async def test_peek_upcoming_does_not_pop(self, fake_redis):
+        from streamer import voice_chat
+
+        await fake_redis.set("broadcast:live", "1")
+        await fake_redis.hset("broadcast:state", mapping={"channel": "sunset"})
+        await fake_redis.rpush("radio:queue:sunset", json.dumps({"file_id": "s1"}))
+        await fake_redis.rpush("radio:queue:tequila", *(json.dumps({"file_id": f"t{i}"}) for i in range(3)))
+
+        upcoming = await voice_chat._peek_upcoming(types.SimpleNamespace(redis=fake_redis), 3)
+        assert [t["file_id"] for t in upcoming] == ["s1", "t0", "t1"]
+        assert await fake_redis.llen("radio:queue:tequila") == 3
+
+    async def test_next_track_plays_from_warm_file(self, fake_redis, fake_streamer_deps, tmp_path, monkeypatch):
+        from streamer import voice_chat
+
+        for fid in ("file-1", "file-2"):
+            await fake_redis.rpush("radio:queue:tequila", json.dumps({"file_id": fid, "channel": "tequila"}))
+        gap = MagicMock()
+        monkeypatch.setattr(voice_chat, "voice_chat_gap", gap)
+
+        app = _DownloadingApp()
+        tgcalls = _FakeTgCalls()
+        pf = _prefetcher(app, tmp_path)
+        with monkeypatch.context() as m:
+            m.setattr(voice_chat, "_prefetch_loop", MagicMock(side_effect=lambda *a: asyncio.sleep(0)))
+            await voice_chat._run_group(app, tgcalls, -100123, types.SimpleNamespace(redis=fake_redis), prefetcher=pf)
+            await asyncio.sleep(0.01)
+            await tgcalls.stream_end_handler(None, types.SimpleNamespace(chat_id=-100123))
+
+        # First track streamed by file_id (nothing warm yet), the second from disk
+        assert tgcalls.play_calls[0] == (-100123, "file-1")
+        assert tgcalls.play_calls[1] == (-100123, str(pf.path_for("file-2")))
+        gap.labels.assert_called_once_with(source="local")
+        gap.labels.return_value.observe.assert_called_once()
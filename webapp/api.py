@@ -136,6 +136,7 @@ _LYRICS_CACHE_TTL = 86400 * 7
 _LYRICS_MISS_TTL = 86400  # 24h — tracks without lyrics rarely gain them
 _LYRICS_CACHE_MISS = "__MISS__"
 from webapp.auth import verify_init_data
+from webapp.event_bus import hub as sse_hub
 from webapp.schemas import (
     LyricsResponse,
     PartyAddTrackRequest,
@@ -293,12 +294,23 @@ async def lifespan(app: FastAPI):
             except Exception:
                 logger.debug("stale download cleanup error", exc_info=True)
 
+    # Recommender models: map the current version, hot-reload published ones
+    from recommender.model_store import ModelStore, start_model_reloader
+    try:
+        await start_model_reloader()
+    except Exception:
+        logger.warning("ML model reloader failed to start", exc_info=True)
+
     cleanup_task = _fire_task(_cleanup_url_cache())
     dl_cleanup_task = _fire_task(_cleanup_stale_downloads())
     yield
     cleanup_task.cancel()
     dl_cleanup_task.cancel()
     await download_manager.shutdown()
+    await sse_hub.close()
+    await ModelStore.get().stop_reloader()
+    from bot.services.story_cards import shutdown_render_pool
+    shutdown_render_pool()
 
 
 # ── App ──────────────────────────────────────────────────────────────────
@@ -2088,8 +2100,7 @@ async def get_story_card(
     user = verify_init_data(init_data) if init_data else None
     if user is None:
         raise HTTPException(status_code=401, detail="Unauthorized")
-    from bot.services.story_cards import generate_track_card
-    import aiohttp
+    from bot.services.story_cards import fetch_cover, render_track_card
 
     # Resolve track info
     title, artist, duration_fmt, cover_bytes = "Unknown", "Unknown", "", None
@@ -2105,18 +2116,11 @@ async def get_story_card(
                 artist = t.artist or artist
                 dur = t.duration or 0
                 duration_fmt = f"{dur // 60}:{dur % 60:02d}"
-                if t.cover_url:
-                    try:
-                        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as client:
-                            async with client.get(t.cover_url) as resp:
-                                if resp.status == 200:
-                                    cover_bytes = await resp.read()
-                    except Exception:
-                        pass
+                cover_bytes = await fetch_cover(t.cover_url, timeout=5)
     except Exception:
         pass
 
-    png_bytes = generate_track_card(artist, title, video_id, duration_fmt, cover_bytes)
+    png_bytes = await render_track_card(artist, title, video_id, duration_fmt, cover_bytes)
     if not png_bytes:
         raise HTTPException(status_code=500, detail="Story card generation failed")
 
@@ -2929,7 +2933,9 @@ async def radio_next(
                         select(TrackModel).where(TrackModel.source_id == seed_id)
                     )).scalar_one_or_none()
                     if row:
-                        similar = await get_similar_tracks(row.id, limit=limit)
+                        similar = await get_similar_tracks(
+                            row.id, limit=limit, exclude_source_ids=exclude_set
+                        )
             except Exception:
                 pass
 
@@ -0,0 +1,368 @@
+"""Cluster-wide SSE fan-out over Redis Streams + pub/sub.
+
+Every event is appended to a capped Redis Stream (``sse:<topic>``) so a client
+can resume from its ``Last-Event-ID``, then announced on the pub/sub channel of
+the same name. Each webapp worker holds ONE pattern subscription and fans the
+announcement out to its local SSE clients, so a party or broadcast stays in
+sync no matter which worker a client is connected to.
+
+Slow clients are never dropped: when a client's buffer overflows, its pending
+events are coalesced to the latest event of each type. Some events carry
+content (chat messages, state patches) that coalescing loses, so the client
+then also gets a ``resync`` event (``{"event": "resync", "resync": true}``)
+telling it to refetch the full state. The same marker follows a
+Last-Event-ID replay whose start has already been trimmed from the stream.
+"""
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import deque
+from typing import AsyncIterator, Callable
+
+logger = logging.getLogger(__name__)
+
+_PREFIX = "sse"
+_STREAM_MAXLEN = 500                 # events kept per topic for Last-Event-ID resume
+_STREAM_TTL = 24 * 3600              # idle topics (closed parties) expire
+_CLIENT_BUFFER = 50                  # pending events per client before coalescing
+_KEEPALIVE_SEC = 30
+_HEARTBEAT_SEC = 30                  # how often a worker marks itself alive
+_WORKER_TTL = 3 * _HEARTBEAT_SEC     # a silent worker's subscriber counts are dropped
+
+
+def _stream_id_key(event_id: str) -> tuple[int, int]:
+    ms, _, seq = event_id.partition("-")
+    try:
+        return int(ms), int(seq or 0)
+    except ValueError:
+        return 0, 0
+
+
+RESYNC_EVENT = "resync"
+_RESYNC_PAYLOAD = json.dumps({"event": RESYNC_EVENT, "data": {}, "resync": True})
+
+
+def _sse_frame(event_id: str | None, payload: str) -> str:
+    if event_id:
+        return f"id: {event_id}\ndata: {payload}\n\n"
+    return f"data: {payload}\n\n"
+
+
+class SSESubscriber:
+    """One connected SSE client: a coalescing mailbox fed by the hub."""
+
+    def __init__(self, topic: str, buffer: int = _CLIENT_BUFFER) -> None:
+        self.topic = topic
+        self.last_id: str | None = None
+        self.coalesced = 0
+        self._resync = False                # events were dropped: client must refetch
+        self._buffer = max(1, buffer)
+        self._pending: deque[tuple[str | None, str, str]] = deque()
+        self._ready = asyncio.Event()
+
+    def push(self, event_id: str | None, event: str, payload: str) -> None:
+        self._pending.append((event_id, event, payload))
+        if len(self._pending) > self._buffer:
+            self._coalesce()
+        self._ready.set()
+
+    def _coalesce(self) -> None:
+        """Keep only the latest pending event of each type, in arrival order.
+
+        Dropped events may have carried content, so the next drain ends with a
+        resync marker.
+        """
+        latest: dict[str, tuple[str | None, str, str]] = {}
+        for item in self._pending:
+            latest.pop(item[1], None)
+            latest[item[1]] = item
+        before = self.coalesced
+        self.coalesced += len(self._pending) - len(latest)
+        self._pending = deque(latest.values())
+        # Still over budget (many distinct event types): keep the newest ones
+        while len(self._pending) > self._buffer:
+            self._pending.popleft()
+            self.coalesced += 1
+        if self.coalesced > before:
+            self._resync = True
+
+    async def drain(self, timeout: float) -> list[tuple[str | None, str, str]]:
+        if not self._pending:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                return []
+        items = list(self._pending)
+        if self._resync:
+            items.append((None, RESYNC_EVENT, _RESYNC_PAYLOAD))
+            self._resync = False
+        self._pending.clear()
+        self._ready.clear()
+        return items
+
+
+class SSEHub:
+    """Per-process SSE hub backed by Redis Streams (history) + pub/sub (live)."""
+
+    def __init__(self, redis_factory: Callable | None = None, prefix: str = _PREFIX) -> None:
+        self._redis_factory = redis_factory
+        self._prefix = prefix
+        self._subscribers: dict[str, set[SSESubscriber]] = {}
+        self._listener: asyncio.Task | None = None
+        self._listening = asyncio.Event()
+        self._pubsub = None
+        self._worker_id = uuid.uuid4().hex
+        self._heartbeat_at = 0.0
+
+    @property
+    def redis(self):
+        if self._redis_factory is not None:
+            return self._redis_factory()
+        from bot.services.cache import cache
+        return cache.redis
+
+    def _key(self, topic: str) -> str:
+        return f"{self._prefix}:{topic}"
+
+    def local_count(self, topic: str) -> int:
+        return len(self._subscribers.get(topic, ()))
+
+    def _subs_key(self, topic: str) -> str:
+        return f"{self._prefix}:subs:{topic}"
+
+    def _workers_key(self) -> str:
+        return f"{self._prefix}:workers"
+
+    async def count(self, topic: str) -> int:
+        """Cluster-wide number of connected clients of *topic*.
+
+        Each worker writes its own local count into the ``subs:<topic>`` hash;
+        fields of workers whose heartbeat went silent (crashed without
+        unsubscribing) are skipped and deleted.
+        """
+        key = self._subs_key(topic)
+        try:
+            r = self.redis
+            counts = await r.hgetall(key)
+            live = set(await r.zrangebyscore(self._workers_key(), time.time() - _WORKER_TTL, "+inf"))
+            total, dead = 0, []
+            for worker, value in (counts or {}).items():
+                if worker == self._worker_id or worker in live:
+                    total += max(0, int(value))
+                else:
+                    dead.append(worker)
+            if dead:
+                await r.hdel(key, *dead)
+            return total
+        except Exception:
+            return self.local_count(topic)
+
+    # ── Publishing ──────────────────────────────────────────────────────
+
+    async def publish(
+        self,
+        topic: str,
+        event: str,
+        data: dict | None = None,
+        extra: dict | None = None,
+    ) -> str | None:
+        """Append to the topic stream and announce it to every worker.
+
+        *extra* keys are added to the top-level message next to ``event``/``data``.
+        """
+        payload = json.dumps({"event": event, "data": data or {}, **(extra or {})}, ensure_ascii=False)
+        key = self._key(topic)
+        try:
+            r = self.redis
+            event_id = await r.xadd(key, {"p": payload}, maxlen=_STREAM_MAXLEN, approximate=True)
+            await r.expire(key, _STREAM_TTL)
+            await r.publish(key, json.dumps({"id": event_id, "event": event, "p": payload}, ensure_ascii=False))
+            return event_id
+        except Exception:
+            # Redis down: degrade to this worker's clients only
+            logger.warning("SSE publish via Redis failed topic=%s — local fan-out only", topic, exc_info=True)
+            self._dispatch(topic, None, event, payload)
+            return None
+
+    def _dispatch(self, topic: str, event_id: str | None, event: str, payload: str) -> None:
+        for sub in tuple(self._subscribers.get(topic, ())):
+            sub.push(event_id, event, payload)
+
+    # ── Subscription ────────────────────────────────────────────────────
+
+    async def subscribe(self, topic: str, buffer: int = _CLIENT_BUFFER) -> tuple[SSESubscriber, int]:
+        """Register a local client. Returns (subscriber, cluster-wide client count)."""
+        self._ensure_listener()
+        sub = SSESubscriber(topic, buffer=buffer)
+        self._subscribers.setdefault(topic, set()).add(sub)
+        if not self._listening.is_set():
+            # Don't hand out a stream that would miss events published right now
+            try:
+                await asyncio.wait_for(self._listening.wait(), timeout=2.0)
+            except asyncio.TimeoutError:
+                logger.warning("SSE listener not ready — topic=%s starts without live events", topic)
+        return sub, await self._sync_count(topic)
+
+    async def unsubscribe(self, sub: SSESubscriber) -> int:
+        """Drop a local client. Returns the remaining cluster-wide client count."""
+        subs = self._subscribers.get(sub.topic)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                self._subscribers.pop(sub.topic, None)
+        return await self._sync_count(sub.topic)
+
+    def drop_topic(self, topic: str) -> None:
+        """Forget local clients of a finished topic (their streams end on their own)."""
+        self._subscribers.pop(topic, None)
+
+    async def _sync_count(self, topic: str) -> int:
+        """Publish this worker's client count of *topic*; returns the cluster-wide count."""
+        key = self._subs_key(topic)
+        try:
+            r = self.redis
+            await self._heartbeat(force=True)
+            local = self.local_count(topic)
+            if local:
+                await r.hset(key, self._worker_id, local)
+                await r.expire(key, _STREAM_TTL)
+            else:
+                await r.hdel(key, self._worker_id)
+        except Exception:
+            return self.local_count(topic)
+        return await self.count(topic)
+
+    async def _heartbeat(self, force: bool = False) -> None:
+        now = time.time()
+        if not force and now - self._heartbeat_at < _HEARTBEAT_SEC:
+            return
+        r = self.redis
+        await r.zadd(self._workers_key(), {self._worker_id: now})
+        await r.zremrangebyscore(self._workers_key(), "-inf", now - 10 * _WORKER_TTL)
+        self._heartbeat_at = now
+
+    async def replay(self, topic: str, last_event_id: str) -> list[tuple[str | None, str, str]]:
+        """Events after *last_event_id* still held in the topic stream.
+
+        If *last_event_id* itself is gone (trimmed past, or the stream expired),
+        events in between may be lost: the replay ends with a resync marker.
+        """
+        try:
+            entries = await self.redis.xrange(self._key(topic), min=last_event_id, max="+", count=_STREAM_MAXLEN)
+        except Exception:
+            logger.debug("SSE replay failed topic=%s", topic, exc_info=True)
+            return [(None, RESYNC_EVENT, _RESYNC_PAYLOAD)]
+        out: list[tuple[str | None, str, str]] = []
+        gap = not entries or entries[0][0] != last_event_id
+        for event_id, fields in entries:
+            if event_id == last_event_id:
+                continue
+            payload = fields.get("p", "{}")
+            try:
+                event = json.loads(payload).get("event", "")
+            except ValueError:
+                event = ""
+            out.append((event_id, event, payload))
+        if gap:
+            logger.info("SSE replay gap topic=%s last_id=%s — client resyncs", topic, last_event_id)
+            out.append((None, RESYNC_EVENT, _RESYNC_PAYLOAD))
+        return out
+
+    async def stream(
+        self,
+        sub: SSESubscriber,
+        is_disconnected: Callable,
+        last_event_id: str | None = None,
+    ) -> AsyncIterator[str]:
+        """Yield SSE frames for *sub*: missed events first, then live ones."""
+        if last_event_id:
+            for event_id, _event, payload in await self.replay(sub.topic, last_event_id):
+                if event_id:
+                    sub.last_id = event_id
+                yield _sse_frame(event_id, payload)
+        while True:
+            if await is_disconnected():
+                return
+            items = await sub.drain(timeout=_KEEPALIVE_SEC)
+            if not items:
+                yield ": keepalive\n\n"
+                continue
+            for event_id, _event, payload in items:
+                if event_id:
+                    # Already delivered through Last-Event-ID replay
+                    if sub.last_id and _stream_id_key(event_id) <= _stream_id_key(sub.last_id):
+                        continue
+                    sub.last_id = event_id
+                yield _sse_frame(event_id, payload)
+
+    # ── Listener (one pattern subscription per worker) ─────────────────
+
+    def _ensure_listener(self) -> None:
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        delay = 1.0
+        while True:
+            try:
+                self._pubsub = self.redis.pubsub()
+                await self._pubsub.psubscribe(f"{self._prefix}:*")
+                self._listening.set()
+                delay = 1.0
+                while True:
+                    await self._heartbeat()
+                    msg = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if msg is None:
+                        continue
+                    self._on_message(msg)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("SSE listener lost Redis — retrying in %.0fs", delay, exc_info=True)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+            finally:
+                self._listening.clear()
+                await self._close_pubsub()
+
+    def _on_message(self, msg: dict) -> None:
+        channel = msg.get("channel") or ""
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+        topic = channel[len(self._prefix) + 1:]
+        if topic not in self._subscribers:
+            return
+        try:
+            envelope = json.loads(msg.get("data") or "{}")
+        except (TypeError, ValueError):
+            return
+        self._dispatch(topic, envelope.get("id"), envelope.get("event", ""), envelope.get("p", "{}"))
+
+    async def _close_pubsub(self) -> None:
+        ps, self._pubsub = self._pubsub, None
+        if ps is None:
+            return
+        try:
+            await ps.aclose()
+        except Exception:
+            logger.debug("SSE pubsub close failed", exc_info=True)
+
+    async def close(self) -> None:
+        try:
+            await self.redis.zrem(self._workers_key(), self._worker_id)
+        except Exception:
+            logger.debug("SSE worker deregistration failed", exc_info=True)
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener = None
+        self._subscribers.clear()
+
+
+hub = SSEHub()
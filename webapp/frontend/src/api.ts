@@ -962,6 +962,7 @@ export interface Party {
   chat_messages: PartyChatMessage[];
   playback: PartyPlaybackState;
   current_reactions: Record<string, number>;
+  revision?: number;
 }
 
 export async function createParty(name = "Party"): Promise<Party> {
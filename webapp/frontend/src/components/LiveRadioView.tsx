@@ -373,6 +373,11 @@ export const LiveRadioView = memo(function LiveRadioView({
           } : null);
           return;
         }
+        if (msg.event === "resync") {
+          // Events were coalesced away or trimmed from history: reload the full state
+          scheduleRefresh(0);
+          return;
+        }
         if (msg.event === "started") {
           scheduleRefresh(0);
           return;
@@ -7,6 +7,7 @@ import {
 } from "../api";
 import { IconMusic, IconSpinner, IconSearch, IconPlus, IconUsers, IconTV, IconHeadphones, IconUpload, IconSparkles, IconRobot, IconSave, IconFlag, IconTrophy, IconFire, IconHeartFilled, IconBolt, IconDisco, IconPicture, IconClipboard, IconClock, IconClose, IconParty, IconSync } from "./Icons";
 import { showToast as globalToast } from "./Toast";
+import { applyPartyPatches } from "../partyPatch";
 import { getThemeById } from "../themes";
 
 interface Props {
@@ -54,6 +55,8 @@ export const PartyView = memo(function PartyView({ userId, onPlayTrack, onPlayba
   const reconnectAttemptsRef = useRef(0);
   const reactionBurstIdRef = useRef(0);
   const lastTrackIdRef = useRef<string | null>(null);
+  const partyRef = useRef<Party | null>(null);
+  partyRef.current = party;
   const onPlaybackActionRef = useRef(onPlaybackAction);
   onPlaybackActionRef.current = onPlaybackAction;
 
@@ -136,6 +139,14 @@ export const PartyView = memo(function PartyView({ userId, onPlayTrack, onPlayba
     es.onmessage = (ev) => {
       try {
         const msg = JSON.parse(ev.data);
+        if (msg.event === "connected") {
+          // Full snapshot on join; later events carry revision patches
+          if (msg.data?.invite_code) {
+            partyRef.current = msg.data;
+            setParty(msg.data);
+          }
+          return;
+        }
         if (msg.event === "closed") {
           showToast("Пати завершена!");
           setParty(null);
@@ -158,7 +169,8 @@ export const PartyView = memo(function PartyView({ userId, onPlayTrack, onPlayba
           }, 900);
         }
 
-        fetchParty(code).then((updatedParty) => {
+        const applyUpdate = (updatedParty: Party) => {
+          partyRef.current = updatedParty;
           setParty(updatedParty);
           if (msg.event === "playback_sync") {
             const action = msg.data?.action as "play" | "pause" | "seek" | undefined;
@@ -172,7 +184,18 @@ export const PartyView = memo(function PartyView({ userId, onPlayTrack, onPlayba
               void onPlaybackActionRef.current?.("seek", undefined, seekPosition);
             }
           }
-        }).catch(() => {});
+        };
+
+        const current = partyRef.current;
+        const patches = Array.isArray(msg.patches) ? msg.patches : [];
+        // resync: the server changed state without a revision — only a snapshot is safe
+        const patched = current && !msg.resync ? applyPartyPatches(current, patches, userId) : null;
+        if (patched) {
+          if (patched !== current || msg.event === "playback_sync") applyUpdate(patched);
+        } else {
+          // Revision gap, resync, or no local state yet: fall back to a full snapshot
+          fetchParty(code).then(applyUpdate).catch(() => {});
+        }
       } catch {}
     };
 
@@ -0,0 +1,71 @@
+import type { Party } from "./api";
+
+export interface PartyPatchOp {
+  op: "add" | "remove" | "replace";
+  path: string;
+  value?: unknown;
+}
+
+export interface PartyPatch {
+  rev: number;
+  ops: PartyPatchOp[];
+}
+
+const unescapeToken = (token: string) => token.replace(/~1/g, "/").replace(/~0/g, "~");
+
+function applyOps(doc: any, ops: PartyPatchOp[]): any {
+  for (const op of ops) {
+    const value = op.value === undefined ? undefined : JSON.parse(JSON.stringify(op.value));
+    if (op.path === "") {
+      doc = value;
+      continue;
+    }
+    const tokens = op.path.split("/").slice(1).map(unescapeToken);
+    const last = tokens.pop() as string;
+    let target = doc;
+    for (const token of tokens) {
+      target = Array.isArray(target) ? target[Number(token)] : target[token];
+    }
+    if (Array.isArray(target)) {
+      const idx = last === "-" ? target.length : Number(last);
+      if (op.op === "add") target.splice(idx, 0, value);
+      else if (op.op === "remove") target.splice(idx, 1);
+      else target[idx] = value;
+    } else if (op.op === "remove") {
+      delete target[last];
+    } else {
+      target[last] = value;
+    }
+  }
+  return doc;
+}
+
+/**
+ * Apply revision patches from a party SSE event.
+ * Returns the patched party, the same object when every patch is already applied,
+ * or null on a revision gap (caller must refetch the snapshot).
+ */
+export function applyPartyPatches(party: Party, patches: PartyPatch[], viewerId: number): Party | null {
+  let current = party.revision ?? 0;
+  let next: any = null;
+  let playbackTouched = false;
+  for (const patch of patches) {
+    if (patch.rev <= current) continue;
+    if (patch.rev !== current + 1) return null;
+    next = applyOps(next ?? JSON.parse(JSON.stringify(party)), patch.ops);
+    playbackTouched = playbackTouched || patch.ops.some((op) => op.path === "" || op.path.startsWith("/playback"));
+    current = patch.rev;
+  }
+  if (next === null) return party;
+
+  next.revision = current;
+  const member = next.members.find((m: { user_id: number }) => m.user_id === viewerId);
+  next.viewer_role = next.creator_id === viewerId ? "dj" : member?.role ?? "listener";
+  // Patches carry the stored seek; derive the live position like the API does
+  const pb = next.playback;
+  if (playbackTouched && pb.action === "play" && pb.updated_at) {
+    const elapsed = (Date.now() - Date.parse(pb.updated_at)) / 1000;
+    pb.seek_position = Math.floor((pb.seek_position || 0) + Math.max(0, elapsed));
+  }
+  return next as Party;
+}
@@ -0,0 +1,268 @@
+"""Versioned, materialized party state with JSON-patch deltas.
+
+Each active party keeps its rendered state (everything in ``PartySchema``
+except per-viewer fields) in Redis under ``party:state:<code>`` together with
+a monotonically increasing revision. Mutating endpoints refresh only the
+sections they touched; the difference to the previous revision is a small
+JSON-patch (RFC 6902 subset: add / remove / replace) that is pushed to SSE
+clients. A client applies patches whose revision follows its own and fetches
+a full snapshot on a gap.
+"""
+import json
+import logging
+from typing import Any, Callable
+
+from redis.exceptions import WatchError
+
+logger = logging.getLogger(__name__)
+
+_STATE_PREFIX = "party:state"
+_STATE_TTL = 24 * 3600
+_CAS_RETRIES = 5
+_MAX_WINDOW_SHIFT = 4        # chat / event feed slide by a few items per mutation
+
+
+# ── JSON patch ──────────────────────────────────────────────────────────────
+
+def _escape(token: Any) -> str:
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def _encoded_len(value: Any) -> int:
+    return len(json.dumps(value, ensure_ascii=False, separators=(",", ":")))
+
+
+def json_diff(old: Any, new: Any, path: str = "") -> list[dict]:
+    """Patch operations turning *old* into *new*."""
+    if old == new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops: list[dict] = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in new.items():
+            child = f"{path}/{_escape(key)}"
+            if key not in old:
+                ops.append({"op": "add", "path": child, "value": value})
+            else:
+                ops.extend(json_diff(old[key], value, child))
+        return ops
+    if isinstance(old, list) and isinstance(new, list):
+        ops = _diff_list(old, new, path)
+        # A reshuffled list is cheaper to resend whole
+        if _encoded_len(ops) < _encoded_len(new):
+            return ops
+    return [{"op": "replace", "path": path, "value": new}]
+
+
+def _diff_list(old: list, new: list, path: str) -> list[dict]:
+    ops = _diff_list_edges(old, new, path)
+    # Sliding window (last N chat messages / events): drop from the head, append the tail
+    for shift in range(1, min(_MAX_WINDOW_SHIFT, len(old)) + 1):
+        kept = len(old) - shift
+        if kept and len(new) >= kept and old[shift:] == new[:kept]:
+            shifted = [{"op": "remove", "path": f"{path}/0"} for _ in range(shift)]
+            shifted.extend({"op": "add", "path": f"{path}/-", "value": v} for v in new[kept:])
+            if _encoded_len(shifted) < _encoded_len(ops):
+                return shifted
+            break
+    return ops
+
+
+def _diff_list_edges(old: list, new: list, path: str) -> list[dict]:
+    limit = min(len(old), len(new))
+    prefix = 0
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+    old_mid = old[prefix:len(old) - suffix]
+    new_mid = new[prefix:len(new) - suffix]
+
+    ops: list[dict] = []
+    if len(old_mid) == len(new_mid):
+        for i, (a, b) in enumerate(zip(old_mid, new_mid)):
+            ops.extend(json_diff(a, b, f"{path}/{prefix + i}"))
+        return ops
+    ops.extend({"op": "remove", "path": f"{path}/{prefix}"} for _ in old_mid)
+    ops.extend(
+        {"op": "add", "path": f"{path}/{prefix + i}", "value": v}
+        for i, v in enumerate(new_mid)
+    )
+    return ops
+
+
+def apply_patch(doc: Any, ops: list[dict]) -> Any:
+    """Return a copy of *doc* with *ops* applied (mirror of the client-side applier)."""
+    doc = json.loads(json.dumps(doc))
+    for op in ops:
+        path = op["path"]
+        value = json.loads(json.dumps(op.get("value")))
+        if path == "":
+            doc = value
+            continue
+        *parents, last = [_unescape(t) for t in path.split("/")[1:]]
+        target = doc
+        for token in parents:
+            target = target[int(token)] if isinstance(target, list) else target[token]
+        if isinstance(target, list):
+            idx = len(target) if last == "-" else int(last)
+            if op["op"] == "add":
+                target.insert(idx, value)
+            elif op["op"] == "remove":
+                del target[idx]
+            else:
+                target[idx] = value
+        elif op["op"] == "remove":
+            target.pop(last, None)
+        else:
+            target[last] = value
+    return doc
+
+
+# ── Store ───────────────────────────────────────────────────────────────────
+
+def _merge(current: dict | None, updates: dict, partial: bool) -> tuple[int, dict, list[dict], bool] | None:
+    """(revision, state, patch, changed) after merging *updates* into *current*.
+
+    *current* may be a tombstone (``state`` None, see ``PartyStateStore``):
+    it needs a full update, and revisions continue after its one.
+    """
+    if current is None or current["state"] is None:
+        if partial:
+            return None
+        return (current["rev"] if current else 0) + 1, updates, [], True
+    old = current["state"]
+    state = {**old, **updates} if partial else updates
+    ops = json_diff(old, state)
+    if not ops:
+        return current["rev"], old, [], False
+    return current["rev"] + 1, state, ops, True
+
+
+class PartyStateStore:
+    """Materialized party state + revision, shared by all webapp workers via Redis.
+
+    Revisions are only ever issued by a successful CAS write in Redis. When
+    Redis fails or stays contended, ``commit`` issues no revision and no
+    patch: clients must refetch a full snapshot, and the stored state (now
+    behind the database) is replaced by a tombstone that keeps the revision
+    but forces the next read to rebuild. A tombstone that could not be
+    written is retried by this process on its next access to the party.
+    """
+
+    def __init__(self, redis_factory: Callable | None = None, prefix: str = _STATE_PREFIX) -> None:
+        self._redis_factory = redis_factory
+        self._prefix = prefix
+        self._stale: set[str] = set()     # parties whose tombstone is still to be written
+
+    @property
+    def redis(self):
+        if self._redis_factory is not None:
+            return self._redis_factory()
+        from bot.services.cache import cache
+        return cache.redis
+
+    def _key(self, code: str) -> str:
+        return f"{self._prefix}:{code}"
+
+    async def get(self, code: str) -> tuple[int, dict] | None:
+        if code in self._stale and not await self._invalidate(code):
+            return None
+        try:
+            raw = await self.redis.get(self._key(code))
+        except Exception:
+            logger.debug("party state get failed code=%s", code, exc_info=True)
+            return None
+        if not raw:
+            return None
+        current = json.loads(raw)
+        if current["state"] is None:
+            return None
+        return current["rev"], current["state"]
+
+    async def _invalidate(self, code: str) -> bool:
+        """Replace the stored state by a tombstone keeping its revision."""
+        key = self._key(code)
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                for _ in range(_CAS_RETRIES):
+                    try:
+                        await pipe.watch(key)
+                        raw = await pipe.get(key)
+                        pipe.multi()
+                        if raw:
+                            rev = json.loads(raw)["rev"]
+                            pipe.set(key, json.dumps({"rev": rev, "state": None}), ex=_STATE_TTL)
+                        await pipe.execute()
+                        self._stale.discard(code)
+                        return True
+                    except WatchError:
+                        continue
+        except Exception:
+            logger.debug("party state invalidate failed code=%s", code, exc_info=True)
+        self._stale.add(code)
+        return False
+
+    async def commit(
+        self,
+        code: str,
+        updates: dict,
+        *,
+        partial: bool = False,
+    ) -> tuple[int, dict, list[dict] | None] | None:
+        """Merge *updates* and bump the revision if anything changed.
+
+        Returns ``(revision, state, patch)``; ``None`` when *partial* updates
+        arrive for a party that has no materialized state yet, or when the
+        shared state could not be read or written (the caller must load the
+        full state). If a full update cannot be committed, returns
+        ``(0, updates, None)``: an unversioned snapshot with no patch, so
+        clients have to refetch instead of applying deltas.
+        """
+        key = self._key(code)
+        if code in self._stale and not await self._invalidate(code):
+            return None if partial else (0, updates, None)
+        try:
+            r = self.redis
+            for _ in range(_CAS_RETRIES):
+                async with r.pipeline(transaction=True) as pipe:
+                    try:
+                        await pipe.watch(key)
+                        raw = await pipe.get(key)
+                        merged = _merge(json.loads(raw) if raw else None, updates, partial)
+                        if merged is None:
+                            return None
+                        rev, state, ops, changed = merged
+                        if changed:
+                            pipe.multi()
+                            pipe.set(key, json.dumps({"rev": rev, "state": state}, ensure_ascii=False), ex=_STATE_TTL)
+                            await pipe.execute()
+                        return rev, state, ops
+                    except WatchError:
+                        continue
+            logger.warning("party state CAS gave up after %d retries code=%s", _CAS_RETRIES, code)
+        except Exception:
+            logger.warning("party state via Redis failed code=%s — unversioned snapshot", code, exc_info=True)
+
+        # Another worker may own the next revision: never issue one from here.
+        if partial:
+            return None
+        await self._invalidate(code)
+        return 0, updates, None
+
+    async def drop(self, code: str) -> None:
+        self._stale.discard(code)
+        try:
+            await self.redis.delete(self._key(code))
+        except Exception:
+            logger.debug("party state drop failed code=%s", code, exc_info=True)
+
+
+party_state = PartyStateStore()
@@ -22,12 +22,13 @@ from webapp.deps import (
     get_current_user,
     logger,
 )
+from webapp.event_bus import hub
 
 router = APIRouter(tags=["broadcast"])
 
-# ── In-memory state ──────────────────────────────────────────────────────
-_MAX_BROADCAST_SUBSCRIBERS = 500
-_broadcast_subscribers: list[asyncio.Queue] = []
+# ── SSE ──────────────────────────────────────────────────────────────────
+_MAX_BROADCAST_SUBSCRIBERS = 500     # per worker
+_BCAST_TOPIC = "broadcast"
 
 # ── Redis keys ───────────────────────────────────────────────────────────
 _BCAST_LIVE_KEY = "broadcast:live"
@@ -51,18 +52,8 @@ async def _require_broadcast_admin(user: dict):
 
 
 async def _notify_broadcast(event: str, data: dict | None = None):
-    payload = json.dumps({"event": event, "data": data or {}}, ensure_ascii=False)
-    dead: list[asyncio.Queue] = []
-    for q in _broadcast_subscribers:
-        try:
-            q.put_nowait(payload)
-        except asyncio.QueueFull:
-            dead.append(q)
-    for q in dead:
-        try:
-            _broadcast_subscribers.remove(q)
-        except ValueError:
-            pass
+    # Fanned out to every webapp worker via the Redis-backed SSE hub
+    await hub.publish(_BCAST_TOPIC, event, data)
 
 
 def _clamp_broadcast_index(index: int, queue_len: int) -> int:
@@ -109,7 +100,7 @@ async def _get_broadcast_state() -> dict:
             "is_live": False, "dj_id": None, "dj_name": None,
             "current_idx": 0, "seek_pos": 0, "action": "idle",
             "started_at": None, "updated_at": None, "channel": None,
-            "listener_count": len(_broadcast_subscribers), "tracks": [],
+            "listener_count": await hub.count(_BCAST_TOPIC), "tracks": [],
         }
 
     current_idx, _queue_len = await _normalize_broadcast_state(r)
@@ -152,7 +143,7 @@ async def _get_broadcast_state() -> dict:
         "started_at": state.get("started_at"),
         "updated_at": state.get("updated_at"),
         "channel": state.get("channel"),
-        "listener_count": len(_broadcast_subscribers),
+        "listener_count": await hub.count(_BCAST_TOPIC),
         "tracks": tracks,
     }
 
@@ -878,6 +869,8 @@ async def broadcast_events(
     request: Request,
     x_telegram_init_data: str | None = Header(None),
     token: str | None = Query(None),
+    last_event_id_header: str | None = Header(None, alias="Last-Event-ID"),
+    last_event_id: str | None = Query(None),
 ):
     init_data = x_telegram_init_data or token
     if not init_data:
@@ -887,14 +880,14 @@ async def broadcast_events(
         raise HTTPException(status_code=401, detail="Invalid initData")
     await _get_or_create_webapp_user(user)
 
-    if len(_broadcast_subscribers) >= _MAX_BROADCAST_SUBSCRIBERS:
+    if hub.local_count(_BCAST_TOPIC) >= _MAX_BROADCAST_SUBSCRIBERS:
         raise HTTPException(status_code=503, detail="Broadcast at capacity")
 
-    queue: asyncio.Queue[str] = asyncio.Queue(maxsize=50)
-    _broadcast_subscribers.append(queue)
+    resume_from = last_event_id_header or last_event_id
+    sub, listener_count = await hub.subscribe(_BCAST_TOPIC)
 
     await _notify_broadcast("listener_count", {
-        "count": len(_broadcast_subscribers),
+        "count": listener_count,
     })
 
     async def event_generator():
@@ -902,21 +895,12 @@ async def broadcast_events(
             state = await _get_broadcast_state()
             state["is_dj"] = _is_broadcast_dj(user)
             yield f"data: {json.dumps({'event': 'connected', 'data': state}, ensure_ascii=False)}\n\n"
-            while True:
-                if await request.is_disconnected():
-                    break
-                try:
-                    msg = await asyncio.wait_for(queue.get(), timeout=30)
-                    yield f"data: {msg}\n\n"
-                except asyncio.TimeoutError:
-                    yield ": keepalive\n\n"
+            async for frame in hub.stream(sub, request.is_disconnected, resume_from):
+                yield frame
         finally:
-            try:
-                _broadcast_subscribers.remove(queue)
-            except ValueError:
-                pass
+            listener_count = await hub.unsubscribe(sub)
             await _notify_broadcast("listener_count", {
-                "count": len(_broadcast_subscribers),
+                "count": listener_count,
             })
 
     return StreamingResponse(
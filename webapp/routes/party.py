@@ -2,7 +2,6 @@
 Party Playlists — collaborative listening rooms.
 Extracted from webapp/api.py for modularity.
 """
-import asyncio
 import json
 import math
 import secrets
@@ -27,6 +26,8 @@ from bot.models.party import (
 )
 from webapp.auth import verify_init_data
 from webapp.deps import _get_or_create_webapp_user, get_current_user, logger
+from webapp.event_bus import hub
+from webapp.party_state import party_state
 from webapp.schemas import (
     PartyChatMessageSchema,
     PartyChatRequest,
@@ -49,8 +50,6 @@ from webapp.schemas import (
 
 router = APIRouter(tags=["party"])
 
-# In-memory SSE subscribers: invite_code -> list[asyncio.Queue]
-_party_subscribers: dict[str, list[asyncio.Queue]] = {}
 _PARTY_MEMBER_TOUCH_INTERVAL = timedelta(seconds=30)
 
 
@@ -170,104 +169,127 @@ async def _normalize_party_positions(session, party_id: int):
     return changed
 
 
-async def _build_party_schema(session, party: PartySession, viewer_id: int | None = None) -> PartySchema:
-    tracks = (
-        await session.execute(
-            select(PartyTrack)
-            .where(PartyTrack.party_id == party.id)
-            .order_by(PartyTrack.position, PartyTrack.id)
-        )
-    ).scalars().all()
-    track_ids = [t.id for t in tracks]
-    vote_counts: dict[int, int] = {}
-    reaction_counts: dict[str, int] = {}
-    if track_ids:
-        rows = await session.execute(
-            select(PartyTrackVote.track_id, func.count())
-            .where(
-                PartyTrackVote.track_id.in_(track_ids),
-                PartyTrackVote.vote_type == "skip",
+_PARTY_STATE_SECTIONS = frozenset({"party", "tracks", "reactions", "members", "events", "chat", "playback"})
+_PARTY_MODEL_SECTIONS = {
+    PartySession: "party",
+    PartyTrack: "tracks",
+    PartyTrackVote: "tracks",
+    PartyReaction: "reactions",
+    PartyMember: "members",
+    PartyEvent: "events",
+    PartyChatMessage: "chat",
+    PartyPlaybackState: "playback",
+}
+# Patches committed by this worker but not yet sent with a party event
+_party_patches: dict[str, list[dict]] = {}
+# Parties whose state changed without a revision (Redis down / CAS contention):
+# the next event tells clients to refetch the snapshot
+_party_resync: set[str] = set()
+_MAX_PENDING_PATCHES = 16
+
+
+async def _load_party_state(session, party: PartySession, sections=None) -> dict:
+    """Query the given state sections of a party (all of them when *sections* is None)."""
+    sections = _PARTY_STATE_SECTIONS if sections is None else sections
+    state: dict = {
+        "id": party.id,
+        "invite_code": party.invite_code,
+        "creator_id": party.creator_id,
+        "name": party.name,
+        "is_active": party.is_active,
+        "current_position": party.current_position,
+    }
+
+    if "tracks" in sections:
+        tracks = (
+            await session.execute(
+                select(PartyTrack)
+                .where(PartyTrack.party_id == party.id)
+                .order_by(PartyTrack.position, PartyTrack.id)
             )
-            .group_by(PartyTrackVote.track_id)
-        )
-        vote_counts = {track_id: count for track_id, count in rows.all()}
-
-    current_track = next((t for t in tracks if t.position == party.current_position), None)
-    if current_track is not None:
-        reaction_rows = await session.execute(
-            select(PartyReaction.emoji, func.count())
-            .where(PartyReaction.track_id == current_track.id)
-            .group_by(PartyReaction.emoji)
-        )
-        reaction_counts = {emoji: count for emoji, count in reaction_rows.all()}
-
-    members = (
-        await session.execute(
-            select(PartyMember)
-            .where(PartyMember.party_id == party.id)
-            .order_by(PartyMember.is_online.desc(), PartyMember.joined_at.asc())
-        )
-    ).scalars().all()
-    events = (
-        await session.execute(
-            select(PartyEvent)
-            .where(PartyEvent.party_id == party.id)
-            .order_by(PartyEvent.created_at.desc())
-            .limit(12)
-        )
-    ).scalars().all()
-    events = list(reversed(events))
-    chat_messages = (
-        await session.execute(
-            select(PartyChatMessage)
-            .where(PartyChatMessage.party_id == party.id)
-            .order_by(PartyChatMessage.created_at.desc())
-            .limit(30)
-        )
-    ).scalars().all()
-    chat_messages = list(reversed(chat_messages))
+        ).scalars().all()
+        track_ids = [t.id for t in tracks]
+        vote_counts: dict[int, int] = {}
+        if track_ids:
+            rows = await session.execute(
+                select(PartyTrackVote.track_id, func.count())
+                .where(
+                    PartyTrackVote.track_id.in_(track_ids),
+                    PartyTrackVote.vote_type == "skip",
+                )
+                .group_by(PartyTrackVote.track_id)
+            )
+            vote_counts = {track_id: count for track_id, count in rows.all()}
+        state["tracks"] = [
+            PartyTrackSchema(
+                video_id=t.video_id,
+                title=t.title,
+                artist=t.artist,
+                duration=t.duration,
+                duration_fmt=t.duration_fmt,
+                source=t.source,
+                cover_url=t.cover_url,
+                added_by=t.added_by,
+                added_by_name=t.added_by_name,
+                skip_votes=vote_counts.get(t.id, 0),
+                position=t.position,
+            ).model_dump()
+            for t in tracks
+        ]
 
-    playback = await _get_party_playback(session, party.id)
-    online_count = sum(1 for member in members if member.is_online)
-    viewer_role = "listener"
-    if viewer_id is not None:
-        if viewer_id == party.creator_id:
-            viewer_role = "dj"
-        else:
-            viewer_member = next((m for m in members if m.user_id == viewer_id), None)
-            if viewer_member:
-                viewer_role = viewer_member.role
+    if "reactions" in sections:
+        reaction_counts: dict[str, int] = {}
+        current_track_id = (
+            await session.execute(
+                select(PartyTrack.id)
+                .where(
+                    PartyTrack.party_id == party.id,
+                    PartyTrack.position == party.current_position,
+                )
+                .order_by(PartyTrack.id)
+                .limit(1)
+            )
+        ).scalar()
+        if current_track_id is not None:
+            reaction_rows = await session.execute(
+                select(PartyReaction.emoji, func.count())
+                .where(PartyReaction.track_id == current_track_id)
+                .group_by(PartyReaction.emoji)
+            )
+            reaction_counts = {emoji: count for emoji, count in reaction_rows.all()}
+        state["current_reactions"] = reaction_counts
 
-    # Compute real-time seek position: stored position + elapsed time since last sync
-    _raw_seek = (playback.seek_position if playback is not None else 0) or 0
-    if (
-        playback is not None
-        and playback.action == "play"
-        and playback.updated_at is not None
-    ):
-        elapsed = (datetime.now(timezone.utc) - playback.updated_at.replace(tzinfo=timezone.utc)).total_seconds()
-        _raw_seek = _raw_seek + max(0, elapsed)
-
-    return PartySchema(
-        id=party.id,
-        invite_code=party.invite_code,
-        creator_id=party.creator_id,
-        name=party.name,
-        is_active=party.is_active,
-        current_position=party.current_position,
-        member_count=online_count,
-        skip_threshold=_party_skip_threshold(online_count),
-        viewer_role=viewer_role,
-        members=[
+    if "members" in sections:
+        members = (
+            await session.execute(
+                select(PartyMember)
+                .where(PartyMember.party_id == party.id)
+                .order_by(PartyMember.is_online.desc(), PartyMember.joined_at.asc())
+            )
+        ).scalars().all()
+        online_count = sum(1 for member in members if member.is_online)
+        state["member_count"] = online_count
+        state["skip_threshold"] = _party_skip_threshold(online_count)
+        state["members"] = [
             PartyMemberSchema(
                 user_id=m.user_id,
                 display_name=m.display_name,
                 role=m.role,
                 is_online=bool(m.is_online),
-            )
+            ).model_dump()
             for m in members
-        ],
-        events=[
+        ]
+
+    if "events" in sections:
+        events = (
+            await session.execute(
+                select(PartyEvent)
+                .where(PartyEvent.party_id == party.id)
+                .order_by(PartyEvent.created_at.desc())
+                .limit(12)
+            )
+        ).scalars().all()
+        state["events"] = [
             PartyEventSchema(
                 id=e.id,
                 event_type=e.event_type,
@@ -276,44 +298,111 @@ async def _build_party_schema(session, party: PartySession, viewer_id: int | Non
                 message=e.message,
                 payload=e.payload,
                 created_at=_iso_dt(e.created_at),
+            ).model_dump()
+            for e in reversed(events)
+        ]
+
+    if "chat" in sections:
+        chat_messages = (
+            await session.execute(
+                select(PartyChatMessage)
+                .where(PartyChatMessage.party_id == party.id)
+                .order_by(PartyChatMessage.created_at.desc())
+                .limit(30)
             )
-            for e in events
-        ],
-        chat_messages=[
+        ).scalars().all()
+        state["chat_messages"] = [
             PartyChatMessageSchema(
                 id=message.id,
                 user_id=message.user_id,
                 display_name=message.display_name,
                 message=message.message,
                 created_at=_iso_dt(message.created_at),
-            )
-            for message in chat_messages
-        ],
-        playback=PartyPlaybackStateSchema(
+            ).model_dump()
+            for message in reversed(chat_messages)
+        ]
+
+    if "playback" in sections:
+        # Raw stored seek; the live position is derived from updated_at when rendering
+        playback = await _get_party_playback(session, party.id)
+        state["playback"] = PartyPlaybackStateSchema(
             track_position=playback.track_position if playback is not None else 0,
             action=playback.action if playback is not None else "idle",
-            seek_position=_raw_seek,
+            seek_position=(playback.seek_position if playback is not None else 0) or 0,
             updated_by=playback.updated_by if playback is not None else None,
             updated_at=_iso_dt(playback.updated_at) if playback is not None else None,
-        ),
-        current_reactions=reaction_counts,
-        tracks=[
-            PartyTrackSchema(
-                video_id=t.video_id,
-                title=t.title,
-                artist=t.artist,
-                duration=t.duration,
-                duration_fmt=t.duration_fmt,
-                source=t.source,
-                cover_url=t.cover_url,
-                added_by=t.added_by,
-                added_by_name=t.added_by_name,
-                skip_votes=vote_counts.get(t.id, 0),
-                position=t.position,
-            )
-            for t in tracks
-        ],
-    )
+        ).model_dump()
+
+    return state
+
+
+def _party_schema_from_state(state: dict, revision: int, viewer_id: int | None = None) -> PartySchema:
+    viewer_role = "listener"
+    if viewer_id is not None:
+        if viewer_id == state["creator_id"]:
+            viewer_role = "dj"
+        else:
+            viewer_member = next((m for m in state["members"] if m["user_id"] == viewer_id), None)
+            if viewer_member:
+                viewer_role = viewer_member["role"]
+
+    # Compute real-time seek position: stored position + elapsed time since last sync
+    playback = dict(state["playback"])
+    if playback["action"] == "play" and playback["updated_at"]:
+        elapsed = (datetime.now(timezone.utc) - datetime.fromisoformat(playback["updated_at"])).total_seconds()
+        playback["seek_position"] = int((playback["seek_position"] or 0) + max(0, elapsed))
+
+    return PartySchema(**{**state, "playback": playback}, viewer_role=viewer_role, revision=revision)
+
+
+def _touched_party_sections(session) -> set[str]:
+    """State sections affected by the session's pending (not yet flushed) changes."""
+    touched = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        section = _PARTY_MODEL_SECTIONS.get(type(obj))
+        if section is not None:
+            touched.add(section)
+    return touched
+
+
+async def _refresh_party_state(session, party: PartySession, sections=None) -> tuple[int, dict]:
+    """Re-query *sections* into the materialized state and queue the resulting patch.
+
+    ``sections=None`` rebuilds everything. Flushed ORM changes and bulk
+    statements are invisible to the session, so callers name those sections.
+    """
+    code = party.invite_code
+    committed = None
+    if sections is not None:
+        sections = set(sections)
+        if "party" in sections:
+            # current_position may have moved to another track
+            sections.add("reactions")
+        committed = await party_state.commit(
+            code, await _load_party_state(session, party, sections), partial=True
+        )
+    if committed is None:
+        committed = await party_state.commit(code, await _load_party_state(session, party))
+    revision, state, ops = committed
+    if ops is None:
+        _party_resync.add(code)
+        _party_patches.pop(code, None)
+    elif ops:
+        pending = _party_patches.setdefault(code, [])
+        pending.append({"rev": revision, "ops": ops})
+        # Clients that miss a revision refetch the snapshot, so old patches can go
+        del pending[:-_MAX_PENDING_PATCHES]
+    return revision, state
+
+
+async def _build_party_schema(
+    session,
+    party: PartySession,
+    viewer_id: int | None = None,
+    sections=None,
+) -> PartySchema:
+    revision, state = await _refresh_party_state(session, party, sections)
+    return _party_schema_from_state(state, revision, viewer_id)
 
 
 async def _get_party_with_tracks(code: str, viewer_id: int | None = None) -> PartySchema:
@@ -326,30 +415,32 @@ async def _commit_and_build_party_schema(
     session,
     party: PartySession,
     viewer_id: int | None = None,
+    sections=None,
 ) -> PartySchema:
+    if sections is not None:
+        sections = set(sections) | _touched_party_sections(session)
     if session.new or session.dirty or session.deleted:
         await session.commit()
-    return await _build_party_schema(session, party, viewer_id)
+    return await _build_party_schema(session, party, viewer_id, sections)
 
 
-async def _notify_party(code: str, event: str, data: dict | None = None):
-    subs = _party_subscribers.get(code, [])
-    payload = json.dumps({"event": event, "data": data or {}}, ensure_ascii=False)
-    dead: list[asyncio.Queue] = []
-    for q in subs:
-        try:
-            q.put_nowait(payload)
-        except asyncio.QueueFull:
-            dead.append(q)
-    for q in dead:
-        try:
-            subs.remove(q)
-        except ValueError:
-            pass
+def _party_topic(code: str) -> str:
+    return f"party:{code}"
+
+
+async def _notify_party(code: str, event: str, data: dict | None = None, extra: dict | None = None):
+    # Fanned out to every webapp worker via the Redis-backed SSE hub
+    await hub.publish(_party_topic(code), event, data, extra)
 
 
 async def _notify_party_state(code: str, event: str, data: dict | None = None):
-    await _notify_party(code, event, data)
+    """Notify members and ship the state patches committed since the last event."""
+    patches = _party_patches.pop(code, None)
+    if code in _party_resync:
+        _party_resync.discard(code)
+        await _notify_party(code, event, data, {"resync": True})
+        return
+    await _notify_party(code, event, data, {"patches": patches} if patches else None)
 
 
 @router.post("/api/party", response_model=PartySchema)
@@ -394,7 +485,11 @@ async def get_party(code: str, user: dict = Depends(get_current_user)):
     async with async_session() as session:
         party = await _get_party_or_404(session, code)
         await _ensure_party_member(session, party, user, mark_online=False)
-        party_schema = await _commit_and_build_party_schema(session, party, int(user["id"]))
+        party_schema = await _commit_and_build_party_schema(session, party, int(user["id"]), sections=())
+    if code in _party_patches or code in _party_resync:
+        # The member touch changed the state: ship its patch now, not with
+        # whatever event this worker happens to send next
+        await _notify_party_state(code, "member_updated", {"user_id": user["id"]})
     return party_schema
 
 
@@ -444,7 +539,7 @@ async def add_party_track(code: str, body: PartyAddTrackRequest, user: dict = De
             actor_name=user.get("first_name", "User"),
             payload={"video_id": body.video_id, "title": body.title},
         )
-        party_schema = await _commit_and_build_party_schema(session, party, int(user["id"]))
+        party_schema = await _commit_and_build_party_schema(session, party, int(user["id"]), sections={"tracks"})
 
     await _notify_party_state(code, "track_added", {
         "video_id": body.video_id,
@@ -491,7 +586,7 @@ async def play_next_party_track(code: str, video_id: str, user: dict = Depends(g
             actor_name=user.get("first_name", "DJ"),
             payload={"video_id": video_id, "mode": "play_next"},
         )
-        party_schema = await _commit_and_build_party_schema(session, party, int(user["id"]))
+        party_schema = await _commit_and_build_party_schema(session, party, int(user["id"]), sections={"tracks"})
 
     await _notify_party_state(code, "queue_reordered", {"video_id": video_id, "mode": "play_next"})
     return party_schema
@@ -535,7 +630,7 @@ async def reorder_party_tracks(code: str, body: PartyReorderRequest, user: dict
             actor_name=user.get("first_name", "DJ"),
             payload={"from_position": body.from_position, "to_position": body.to_position},
         )
-        party_schema = await _commit_and_build_party_schema(session, party, int(user["id"]))
+        party_schema = await _commit_and_build_party_schema(session, party, int(user["id"]), sections={"tracks"})
 
     await _notify_party_state(code, "queue_reordered", {"from_position": body.from_position, "to_position": body.to_position})
     return party_schema
@@ -575,7 +670,7 @@ async def remove_party_track(code: str, video_id: str, user: dict = Depends(get_
             actor_name=user.get("first_name", "DJ"),
             payload={"video_id": video_id},
         )
-        await session.commit()
+        await _commit_and_build_party_schema(session, party, sections={"tracks", "party"})
 
     await _notify_party_state(code, "track_removed", {"video_id": video_id})
     return {"ok": True}
@@ -669,7 +764,9 @@ async def skip_party_track(code: str, user: dict = Depends(get_current_user)):
                 payload={"position": party.current_position},
             )
 
-        party_schema = await _commit_and_build_party_schema(session, party, int(user["id"]))
+        party_schema = await _commit_and_build_party_schema(
+            session, party, int(user["id"]), sections={"tracks", "party", "playback"}
+        )
 
     if skip:
         await _notify_party_state(code, "next", {"position": party.current_position})
@@ -718,7 +815,7 @@ async def update_party_member_role(
             actor_name=user.get("first_name", "DJ"),
             payload={"user_id": member_user_id, "role": body.role},
         )
-        party_schema = await _commit_and_build_party_schema(session, party, int(user["id"]))
+        party_schema = await _commit_and_build_party_schema(session, party, int(user["id"]), sections={"members"})
 
     await _notify_party_state(code, "role_updated", {"user_id": member_user_id, "role": body.role})
     return party_schema
@@ -757,7 +854,9 @@ async def sync_party_playback(code: str, body: PartyPlaybackRequest, user: dict
                 "seek_position": body.seek_position,
             },
         )
-        party_schema = await _commit_and_build_party_schema(session, party, int(user["id"]))
+        party_schema = await _commit_and_build_party_schema(
+            session, party, int(user["id"]), sections={"playback", "party"}
+        )
 
     await _notify_party_state(
         code,
@@ -791,7 +890,10 @@ async def close_party(code: str, user: dict = Depends(get_current_user)):
         await session.commit()
 
     await _notify_party_state(code, "closed", {})
-    _party_subscribers.pop(code, None)
+    hub.drop_topic(_party_topic(code))
+    _party_patches.pop(code, None)
+    _party_resync.discard(code)
+    await party_state.drop(code)
     return {"ok": True}
 
 
@@ -838,6 +940,7 @@ async def save_party_as_playlist(code: str, user: dict = Depends(get_current_use
             payload={"playlist_name": playlist.name},
         )
         await session.commit()
+        await _refresh_party_state(session, party, {"events"})
 
         cnt = (
             await session.execute(
@@ -874,7 +977,7 @@ async def send_party_chat_message(code: str, body: PartyChatRequest, user: dict
             actor_name=user.get("first_name", "User"),
             payload={"message": message[:400]},
         )
-        party_schema = await _commit_and_build_party_schema(session, party, int(user["id"]))
+        party_schema = await _commit_and_build_party_schema(session, party, int(user["id"]), sections={"chat"})
 
     await _notify_party_state(code, "chat", {"message": message[:400], "actor_name": user.get("first_name", "User")})
     return party_schema
@@ -910,7 +1013,7 @@ async def delete_party_chat_message(code: str, message_id: int, user: dict = Dep
             actor_name=user.get("first_name", "User"),
             payload={"message_id": message_id, "preview": deleted_preview},
         )
-        party_schema = await _commit_and_build_party_schema(session, party, int(user["id"]))
+        party_schema = await _commit_and_build_party_schema(session, party, int(user["id"]), sections={"chat"})
 
     await _notify_party_state(code, "chat_delete", {"message_id": message_id})
     return party_schema
@@ -935,7 +1038,7 @@ async def clear_party_chat(code: str, user: dict = Depends(get_current_user)):
             actor_id=user["id"],
             actor_name=user.get("first_name", "User"),
         )
-        party_schema = await _commit_and_build_party_schema(session, party, int(user["id"]))
+        party_schema = await _commit_and_build_party_schema(session, party, int(user["id"]), sections={"chat"})
 
     await _notify_party_state(code, "chat_clear", {})
     return party_schema
@@ -985,9 +1088,7 @@ async def react_to_party_track(code: str, body: PartyReactionRequest, user: dict
                 actor_name=user.get("first_name", "User"),
                 payload={"emoji": emoji, "video_id": current_track.video_id},
             )
-            party_schema = await _commit_and_build_party_schema(session, party, int(user["id"]))
-        else:
-            party_schema = await _build_party_schema(session, party, int(user["id"]))
+        party_schema = await _commit_and_build_party_schema(session, party, int(user["id"]), sections={"reactions"})
 
     await _notify_party_state(code, "reaction", {"emoji": emoji, "user_id": user["id"]})
     return party_schema
@@ -1073,7 +1174,7 @@ async def auto_dj_fill_party(code: str, limit: int = Query(default=5, ge=1, le=1
             actor_name=user.get("first_name", "DJ"),
             payload={"added": added},
         )
-        party_schema = await _commit_and_build_party_schema(session, party, int(user["id"]))
+        party_schema = await _commit_and_build_party_schema(session, party, int(user["id"]), sections={"tracks"})
 
     await _notify_party_state(code, "auto_dj", {"added": added})
     return party_schema
@@ -1125,6 +1226,8 @@ async def party_events(
     request: Request,
     x_telegram_init_data: str | None = Header(None),
     token: str | None = Query(None),
+    last_event_id_header: str | None = Header(None, alias="Last-Event-ID"),
+    last_event_id: str | None = Query(None),
 ):
     init_data = x_telegram_init_data or token
     if not init_data:
@@ -1132,6 +1235,8 @@ async def party_events(
     user = verify_init_data(init_data)
     if user is None:
         raise HTTPException(status_code=401, detail="Invalid initData")
+    # EventSource sends Last-Event-ID on auto-reconnect; the query param covers manual reconnects
+    resume_from = last_event_id_header or last_event_id
     await _get_or_create_webapp_user(user)
     async with async_session() as session:
         party = await _get_party_or_404(session, code)
@@ -1148,36 +1253,25 @@ async def party_events(
             actor_name=user.get("first_name", "User"),
             payload={"user_id": user["id"]},
         )
-        await session.commit()
+        snapshot = await _commit_and_build_party_schema(session, party, int(user["id"]), sections={"members"})
 
-    queue: asyncio.Queue[str] = asyncio.Queue(maxsize=50)
-    if code not in _party_subscribers:
-        _party_subscribers[code] = []
-    _party_subscribers[code].append(queue)
+    sub, member_count = await hub.subscribe(_party_topic(code))
 
     await _notify_party_state(code, "member_joined", {
         "user_id": user["id"],
         "name": user.get("first_name", "User"),
-        "member_count": len(_party_subscribers.get(code, [])),
+        "member_count": member_count,
     })
 
     async def event_generator():
         try:
-            yield f"data: {json.dumps({'event': 'connected'})}\n\n"
-            while True:
-                if await request.is_disconnected():
-                    break
-                try:
-                    msg = await asyncio.wait_for(queue.get(), timeout=30)
-                    yield f"data: {msg}\n\n"
-                except asyncio.TimeoutError:
-                    yield ": keepalive\n\n"
+            # Full snapshot on join; afterwards clients follow the revision patches
+            connected = {"event": "connected", "data": snapshot.model_dump()}
+            yield f"data: {json.dumps(connected, ensure_ascii=False)}\n\n"
+            async for frame in hub.stream(sub, request.is_disconnected, resume_from):
+                yield frame
         finally:
-            subs = _party_subscribers.get(code, [])
-            try:
-                subs.remove(queue)
-            except ValueError:
-                pass
+            member_count = await hub.unsubscribe(sub)
             try:
                 async with async_session() as session:
                     result = await session.execute(
@@ -1206,10 +1300,12 @@ async def party_events(
                             payload={"user_id": user["id"]},
                         )
                         await session.commit()
+                        if party.is_active:
+                            await _refresh_party_state(session, party, {"members", "events"})
             except Exception:
                 pass
             await _notify_party_state(code, "member_left", {
-                "member_count": len(_party_subscribers.get(code, [])),
+                "member_count": member_count,
             })
 
     return StreamingResponse(
@@ -161,6 +161,7 @@ class PartySchema(BaseModel):
     chat_messages: list[PartyChatMessageSchema] = []
     playback: PartyPlaybackStateSchema = PartyPlaybackStateSchema()
     current_reactions: dict[str, int] = {}
+    revision: int = 0
 
 
 class PartyAddTrackRequest(BaseModel):